@@ -10,14 +10,18 @@ from sqlalchemy import desc, asc, func, or_
 from datetime import datetime, timedelta
 import csv
 import io
+import json
 
 from app.utils.admin_auth import admin_auth_service, get_current_admin
-from app.database import get_db
+from app.config import settings
+from app.database import get_db, SessionLocal
 from app.models.user import User, UserBalance
 from app.models.transaction import CreditTransaction
 from app.models.email_verification import EmailVerification
 from app.models.payment import RedeemCode
 from app.services.user_service import UserService
+from app.utils.redeem_code import RedeemCodeService
+from app.utils.redeem_guard import redeem_code_guard
 from app.utils.logger import admin_logger, api_logger, log_admin_action, log_user_credit_change
 
 
@@ -627,6 +631,17 @@ class GenerateRedeemCodesRequest(BaseModel):
     batch_name: Optional[str] = Field(None, description="批次名称")
 
 
+class BulkGenerateRedeemCodesRequest(BaseModel):
+    """大批量生成兑换码请求模型"""
+    count: int = Field(..., ge=1, description="生成数量（上限见 REDEEM_CODE_BULK_MAX_COUNT）")
+    credits: int = Field(..., ge=1, description="每个兑换码的积分值")
+    expires_days: int = Field(365, ge=1, le=3650, description="有效期天数（默认365天）")
+    batch_name: Optional[str] = Field(None, description="批次名称")
+    product_id: int = Field(1, description="产品ID")
+    prefix: Optional[str] = Field(None, max_length=8, description="兑换码前缀")
+    code_length: int = Field(16, ge=8, le=32, description="兑换码长度")
+
+
 class GenerateRedeemCodesResponse(BaseModel):
     """生成兑换码响应模型"""
     success: bool = True
@@ -652,14 +667,14 @@ class UpdateRedeemCodeResponse(BaseModel):
 redeem_router = APIRouter(prefix="/api/v1/admin/redeem-codes", tags=["admin-redeem-codes"])
 
 
-def generate_redeem_code() -> str:
-    """生成16位兑换码"""
-    import string
-    import secrets
+def _build_batch_id(batch_name: Optional[str]) -> str:
+    """生成批次ID（可带批次名称前缀）"""
+    import uuid
 
-    # 使用大写字母和数字，排除容易混淆的字符
-    chars = string.ascii_uppercase.replace('O', '').replace('I', '') + string.digits.replace('0', '').replace('1', '')
-    return ''.join(secrets.choice(chars) for _ in range(16))
+    batch_id = str(uuid.uuid4())
+    if batch_name:
+        batch_id = f"{batch_name}_{batch_id[:8]}"
+    return batch_id
 
 
 @redeem_router.get("", response_model=RedeemCodeListResponse)
@@ -759,50 +774,29 @@ async def generate_redeem_codes(
 ):
     """批量生成兑换码"""
     try:
-        import uuid
-        from datetime import timedelta
-
-        # 生成批次ID
-        batch_id = str(uuid.uuid4())
-        if request.batch_name:
-            batch_id = f"{request.batch_name}_{batch_id[:8]}"
-
-        # 计算过期时间
-        expires_at = datetime.utcnow() + timedelta(days=request.expires_days)
-
-        # 批量生成兑换码
-        generated_codes = []
-        redeem_codes = []
-
-        for _ in range(request.count):
-            # 生成唯一兑换码
-            while True:
-                code = generate_redeem_code()
-                # 检查是否已存在
-                existing = db.query(RedeemCode).filter(RedeemCode.code == code).first()
-                if not existing:
-                    break
-
-            redeem_code = RedeemCode(
-                code=code,
-                product_id=1,  # 默认产品ID
-                credits=request.credits,
-                expires_at=expires_at,
-                batch_id=batch_id,
-                status="active"
-            )
-            redeem_codes.append(redeem_code)
-            generated_codes.append(code)
+        batch_id = _build_batch_id(request.batch_name)
+
+        # 分块插入，冲突的码只重新生成冲突的那部分
+        progress = RedeemCodeService.create_redeem_codes_bulk(
+            db,
+            product_id=1,  # 默认产品ID
+            credits=request.credits,
+            count=request.count,
+            expires_days=request.expires_days,
+            batch_id=batch_id
+        )
 
-        # 批量插入数据库
-        db.add_all(redeem_codes)
-        db.commit()
+        generated_codes = [
+            code for (code,) in db.query(RedeemCode.code)
+            .filter(RedeemCode.batch_id == batch_id)
+            .order_by(RedeemCode.id)
+        ]
 
         return GenerateRedeemCodesResponse(
-            message=f"成功生成{request.count}个兑换码",
+            message=f"成功生成{progress.inserted}个兑换码",
             batch_id=batch_id,
             generated_codes=generated_codes,
-            count=request.count
+            count=progress.inserted
         )
 
     except Exception as e:
@@ -813,6 +807,59 @@ async def generate_redeem_codes(
         )
 
 
+@redeem_router.post("/generate/bulk")
+async def generate_redeem_codes_bulk(
+    request: BulkGenerateRedeemCodesRequest,
+    current_admin: str = Depends(get_current_admin)
+):
+    """
+    大批量生成兑换码（数十万级别）
+
+    以 NDJSON 流式返回进度，每插入一个分块输出一行，最后一行 finished=true。
+    生成的兑换码可通过 /export/csv?batch_id=... 导出。
+    """
+    if request.count > settings.REDEEM_CODE_BULK_MAX_COUNT:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"单批次最多生成{settings.REDEEM_CODE_BULK_MAX_COUNT}个兑换码"
+        )
+
+    batch_id = _build_batch_id(request.batch_name)
+    log_admin_action(
+        "generate_redeem_codes_bulk",
+        current_admin,
+        target=batch_id,
+        data={"count": request.count, "credits": request.credits}
+    )
+
+    def progress_stream():
+        # 流式响应期间请求级会话可能已关闭，这里使用独立会话
+        db = SessionLocal()
+        try:
+            for progress in RedeemCodeService.iter_create_redeem_codes_bulk(
+                db,
+                product_id=request.product_id,
+                credits=request.credits,
+                count=request.count,
+                expires_days=request.expires_days,
+                batch_id=batch_id,
+                prefix=request.prefix,
+                code_length=request.code_length
+            ):
+                yield json.dumps(progress.to_dict()) + "\n"
+        except Exception as e:
+            admin_logger.error(f"批量生成兑换码失败: {batch_id}", e)
+            yield json.dumps({"batch_id": batch_id, "finished": False, "error": str(e)}) + "\n"
+        finally:
+            db.close()
+
+    return StreamingResponse(
+        progress_stream(),
+        media_type="application/x-ndjson",
+        headers={"X-Batch-Id": batch_id}
+    )
+
+
 @redeem_router.put("/{redeem_code_id}", response_model=UpdateRedeemCodeResponse)
 async def update_redeem_code(
     redeem_code_id: int,
@@ -856,6 +903,12 @@ async def update_redeem_code(
 
         db.commit()
 
+        # 同步兑换码 Bloom 过滤器（过滤器无法删除元素，停用时需重建）
+        if request.status == "active":
+            redeem_code_guard.add_codes([redeem_code.code])
+        elif old_status == "active":
+            redeem_code_guard.schedule_rebuild()
+
         return UpdateRedeemCodeResponse(
             message=f"兑换码状态已从 {old_status} 更新为 {request.status}"
         )
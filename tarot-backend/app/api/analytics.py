@@ -0,0 +1,112 @@
+"""
+Admin analytics API routes (reading question volume, repeated questions and
+precomputed analyze results).
+"""
+import asyncio
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal, get_db
+from app.services.analytics_service import analytics_service
+from app.services.llm_service import get_llm_service
+from app.services.precompute_service import precompute_service
+from app.utils.admin_auth import require_admin
+
+admin_router = APIRouter(prefix="/admin/analytics", tags=["admin-analytics"])
+
+# 当前 worker 中正在运行的预计算任务（同一时间只允许一个）
+_precompute_task: Optional[asyncio.Task] = None
+
+
+@admin_router.get("/questions/volume")
+def get_question_volume(
+    days: int = Query(30, ge=1, le=366, description="统计最近天数"),
+    group_by: str = Query("day", pattern="^(day|category|locale)$", description="分组维度"),
+    category: Optional[str] = Query(None, description="类别筛选"),
+    locale: Optional[str] = Query(None, description="语言筛选"),
+    current_admin: str = Depends(require_admin),
+    db: Session = Depends(get_db)
+) -> dict:
+    """Question volume by day, category or locale from the precomputed daily aggregates."""
+    try:
+        data = analytics_service.get_volume(db, days=days, group_by=group_by, category=category, locale=locale)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return {"success": True, "group_by": group_by, "data": data}
+
+
+@admin_router.get("/questions/top")
+def get_top_questions(
+    limit: int = Query(20, ge=1, le=200, description="返回条数"),
+    min_count: int = Query(2, ge=1, description="最少重复次数"),
+    category: Optional[str] = Query(None, description="类别筛选"),
+    locale: Optional[str] = Query(None, description="语言筛选"),
+    current_admin: str = Depends(require_admin),
+    db: Session = Depends(get_db)
+) -> dict:
+    """Most repeated questions, grouped by the hash of their normalized text."""
+    return {
+        "success": True,
+        "data": analytics_service.get_top_questions(
+            db, limit=limit, category=category, locale=locale, min_count=min_count
+        ),
+    }
+
+
+@admin_router.get("/status")
+def get_analytics_status(
+    current_admin: str = Depends(require_admin),
+    db: Session = Depends(get_db)
+) -> dict:
+    """Aggregation progress (watermark and number of pending log rows)."""
+    return {"success": True, "data": analytics_service.get_status(db)}
+
+
+def _refresh() -> dict:
+    db = SessionLocal()
+    try:
+        return analytics_service.refresh_aggregates(db)
+    finally:
+        db.close()
+
+
+@admin_router.post("/refresh")
+async def refresh_analytics(current_admin: str = Depends(require_admin)) -> dict:
+    """Fold pending log rows into the aggregates now (also used for the initial backfill)."""
+    result = await asyncio.to_thread(_refresh)
+    return {"success": True, "data": result}
+
+
+@admin_router.get("/precompute/status")
+def get_precompute_status(
+    current_admin: str = Depends(require_admin),
+    db: Session = Depends(get_db)
+) -> dict:
+    """Stored precomputed results per version/locale and lookup hit counters."""
+    data = precompute_service.get_status(db)
+    data["running"] = _precompute_task is not None and not _precompute_task.done()
+    return {"success": True, "data": data}
+
+
+async def _run_precompute(top_n: Optional[int], refresh: bool) -> dict:
+    db = SessionLocal()
+    try:
+        return await precompute_service.run_batch(db, get_llm_service(), top_n=top_n, refresh=refresh)
+    finally:
+        db.close()
+
+
+@admin_router.post("/precompute/run", status_code=status.HTTP_202_ACCEPTED)
+async def run_precompute(
+    top_n: Optional[int] = Query(None, ge=1, le=5000, description="处理的高频问题数量"),
+    refresh: bool = Query(False, description="重新计算已有结果"),
+    current_admin: str = Depends(require_admin)
+) -> dict:
+    """Start the rate-limited precompute batch in the background of this worker."""
+    global _precompute_task
+    if _precompute_task is not None and not _precompute_task.done():
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Precompute batch already running")
+    _precompute_task = asyncio.create_task(_run_precompute(top_n, refresh))
+    return {"success": True, "message": "Precompute batch started"}
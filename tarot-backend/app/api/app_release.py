@@ -1,6 +1,7 @@
 """
 API routes for managing application releases.
 """
+import asyncio
 import re
 from typing import Optional
 
@@ -11,19 +12,30 @@ from fastapi import (
     Form,
     HTTPException,
     Query,
+    Request,
+    Response,
     UploadFile,
     status,
 )
 from sqlalchemy.orm import Session
 
+from app.config import settings
 from app.database import get_db
+from app.models.app_release import AppRelease
 from app.schemas.app_release import (
     AppReleaseHistoryResponse,
     AppReleaseLatestResponse,
     AppReleaseUploadResponse,
+    ReleaseUploadCompleteRequest,
+    ReleaseUploadInitRequest,
+    ReleaseUploadStatusResponse,
 )
 from app.services.app_release_service import app_release_service
+from app.services.release_patch_service import release_patch_service
+from app.services.release_upload_service import release_upload_service
 from app.utils.admin_auth import require_admin
+from app.utils.file_delivery import file_response
+from app.utils.http_cache import cached_json_response
 
 public_router = APIRouter(prefix="/app-release", tags=["app-release"])
 admin_router = APIRouter(prefix="/admin/app-release", tags=["admin-app-release"])
@@ -33,12 +45,78 @@ BUILD_PATTERN = re.compile(r"^[0-9A-Za-z._-]{1,50}$")
 
 
 @public_router.get("/latest", response_model=AppReleaseLatestResponse)
-def get_public_latest_release(db: Session = Depends(get_db)) -> AppReleaseLatestResponse:
-    """Return the latest active release for public consumption."""
+def get_public_latest_release(request: Request, db: Session = Depends(get_db)) -> Response:
+    """
+    Return the latest active release for public consumption.
+
+    The ETag combines the release id with its number of ready patches, so
+    polling clients get 304 until a new release or patch is published.
+    """
     release = app_release_service.get_latest_release(db)
-    return AppReleaseLatestResponse(
-        release=release,
-        data=release,
+    if release is None:
+        etag = '"r0"'
+    else:
+        etag = f'"r{release.id}-p{release_patch_service.count_ready(db, release)}"'
+    return cached_json_response(
+        request,
+        "app_release_latest",
+        etag=etag,
+        build=lambda: _latest_response(db, release),
+        cache_control="public, no-cache",
+    )
+
+
+@public_router.api_route("/download/{file_name}", methods=["GET", "HEAD"])
+def download_release(file_name: str, request: Request, db: Session = Depends(get_db)) -> Response:
+    """
+    Download a release APK.
+
+    The SHA-256 checksum is the strong ETag, so clients can revalidate with
+    ``If-None-Match`` and resume interrupted downloads with ``Range``/``If-Range``.
+    With ``APP_RELEASE_X_ACCEL_PREFIX`` set, nginx sends the file body.
+    """
+    release = app_release_service.get_release_by_file_name(db, file_name)
+    if release is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="安装包不存在")
+
+    accel_redirect = app_release_service.get_accel_redirect(release)
+    path = app_release_service.get_file_path(release)
+    if accel_redirect is None and not path.is_file():
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="安装包不存在")
+
+    return file_response(
+        request,
+        path,
+        etag=f'"{release.checksum_sha256}"',
+        media_type="application/vnd.android.package-archive",
+        filename=release.file_name,
+        cache_control=settings.APP_RELEASE_CACHE_CONTROL,
+        accel_redirect=accel_redirect,
+    )
+
+
+@public_router.api_route("/download/patches/{file_name}", methods=["GET", "HEAD"])
+def download_release_patch(file_name: str, request: Request, db: Session = Depends(get_db)) -> Response:
+    """Download a binary patch listed in ``patches`` of the latest release."""
+    found = release_patch_service.get_patch_path(db, file_name)
+    if found is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="补丁不存在")
+    patch, path = found
+
+    accel_redirect = None
+    if settings.APP_RELEASE_X_ACCEL_PREFIX:
+        accel_redirect = f"{settings.APP_RELEASE_X_ACCEL_PREFIX.rstrip('/')}/patches/{file_name}"
+    elif not path.is_file():
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="补丁不存在")
+
+    return file_response(
+        request,
+        path,
+        etag=f'"{patch.checksum_sha256}"',
+        media_type="application/octet-stream",
+        filename=file_name,
+        cache_control=settings.APP_RELEASE_CACHE_CONTROL,
+        accel_redirect=accel_redirect,
     )
 
 
@@ -48,11 +126,7 @@ def get_admin_latest_release(
     current_admin: str = Depends(require_admin),
 ) -> AppReleaseLatestResponse:
     """Return the latest active release for admin dashboard."""
-    release = app_release_service.get_latest_release(db)
-    return AppReleaseLatestResponse(
-        release=release,
-        data=release,
-    )
+    return _latest_response(db, app_release_service.get_latest_release(db))
 
 
 @admin_router.get("/history", response_model=AppReleaseHistoryResponse)
@@ -106,7 +180,9 @@ async def upload_app_release(
     combined_notes = _validate_release_notes(release_notes, description)
     normalized_notes_url = _validate_notes_url(notes_url)
 
-    release = app_release_service.create_release(
+    # 哈希与落盘在线程池中执行，避免大文件阻塞事件循环
+    release = await asyncio.to_thread(
+        app_release_service.create_release,
         db=db,
         upload_file=upload,
         version=normalized_version,
@@ -116,6 +192,76 @@ async def upload_app_release(
         admin_username=current_admin,
     )
 
+    release_patch_service.schedule(release.id)
+    return AppReleaseUploadResponse(
+        message="上传成功",
+        release=release,
+        data=release,
+    )
+
+
+@admin_router.post(
+    "/uploads", response_model=ReleaseUploadStatusResponse, status_code=status.HTTP_201_CREATED
+)
+def init_release_upload(
+    payload: ReleaseUploadInitRequest,
+    current_admin: str = Depends(require_admin),
+) -> ReleaseUploadStatusResponse:
+    """Start a resumable chunked upload; send chunks with ``PUT /uploads/{id}?offset=N``."""
+    upload = release_upload_service.init_upload(
+        filename=payload.filename,
+        total_size=payload.total_size,
+        content_type=payload.content_type,
+        expected_sha256=payload.sha256,
+        admin_username=current_admin,
+    )
+    return ReleaseUploadStatusResponse(**upload)
+
+
+@admin_router.get("/uploads/{upload_id}", response_model=ReleaseUploadStatusResponse)
+def get_release_upload(
+    upload_id: str,
+    current_admin: str = Depends(require_admin),
+) -> ReleaseUploadStatusResponse:
+    """Return the received offset of an upload so an interrupted client can resume."""
+    return ReleaseUploadStatusResponse(**release_upload_service.get_status(upload_id))
+
+
+@admin_router.put("/uploads/{upload_id}", response_model=ReleaseUploadStatusResponse)
+async def put_release_upload_chunk(
+    upload_id: str,
+    request: Request,
+    offset: int = Query(..., ge=0, description="分片在文件中的起始字节偏移"),
+    current_admin: str = Depends(require_admin),
+) -> ReleaseUploadStatusResponse:
+    """Append the raw request body at ``offset`` (409 with ``received`` on mismatch)."""
+    upload = await release_upload_service.write_chunk(upload_id, offset, request.stream())
+    return ReleaseUploadStatusResponse(**upload)
+
+
+@admin_router.post(
+    "/uploads/{upload_id}/complete",
+    response_model=AppReleaseUploadResponse,
+    status_code=status.HTTP_201_CREATED,
+)
+async def complete_release_upload(
+    upload_id: str,
+    payload: ReleaseUploadCompleteRequest,
+    db: Session = Depends(get_db),
+    current_admin: str = Depends(require_admin),
+) -> AppReleaseUploadResponse:
+    """Verify the assembled file and publish it as the active release."""
+    release = await asyncio.to_thread(
+        release_upload_service.complete_upload,
+        db,
+        upload_id,
+        version=_validate_version(payload.version),
+        build_number=_validate_build_number(payload.build_number),
+        release_notes=_validate_release_notes(payload.release_notes, None),
+        notes_url=_validate_notes_url(payload.notes_url),
+        admin_username=current_admin,
+    )
+    release_patch_service.schedule(release.id)
     return AppReleaseUploadResponse(
         message="上传成功",
         release=release,
@@ -123,6 +269,26 @@ async def upload_app_release(
     )
 
 
+@admin_router.delete("/uploads/{upload_id}", status_code=status.HTTP_204_NO_CONTENT)
+def abort_release_upload(
+    upload_id: str,
+    current_admin: str = Depends(require_admin),
+) -> Response:
+    """Discard an unfinished upload."""
+    release_upload_service.get_status(upload_id)
+    release_upload_service.abort_upload(upload_id)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+def _latest_response(db: Session, release: Optional[AppRelease]) -> AppReleaseLatestResponse:
+    patches = release_patch_service.list_patches(db, release) if release is not None else []
+    return AppReleaseLatestResponse(
+        release=release,
+        data=release,
+        patches=patches,
+    )
+
+
 def _validate_version(version: str) -> str:
     candidate = (version or "").strip()
     if not candidate or not VERSION_PATTERN.match(candidate):
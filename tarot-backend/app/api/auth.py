@@ -17,7 +17,7 @@ from ..schemas.auth import (
 )
 from ..utils.auth import generate_anonymous_user_id, create_jwt_token, verify_jwt_token, extract_user_id_from_token
 from ..utils.password import hash_password, verify_password, validate_password_strength
-from ..services.email_service import EmailService
+from ..services.email_outbox import email_outbox
 from ..models.user import User
 from ..models.email_verification import EmailVerification
 from ..database import get_db
@@ -256,10 +256,9 @@ async def send_verification_email(
         db.commit()
         db.refresh(verification)
 
-        # 发送验证邮件
-        email_service = EmailService()
-
-        email_service.send_verification_email(
+        # 验证邮件入队，由后台发送器投递
+        email_outbox.enqueue_verification_email(
+            db,
             to_email=request.email,
             verification_token=verification.token,
             user_name=request.email.split('@')[0]  # 使用邮箱前缀作为用户名
@@ -514,10 +513,9 @@ async def send_password_reset(
         db.commit()
         db.refresh(verification)
 
-        # 发送重置邮件
-        email_service = EmailService()
-
-        email_service.send_password_reset_email(
+        # 重置邮件入队，由后台发送器投递
+        email_outbox.enqueue_password_reset_email(
+            db,
             to_email=user.email,
             reset_token=verification.token,
             user_name=user.email.split('@')[0]
@@ -0,0 +1,94 @@
+"""
+App launch bootstrap endpoint.
+
+Replaces the launch sequence of ``/me``, ``/me/balance``, ``/auth/email/status``
+and ``/app-release/latest`` with one request: the user is resolved once from
+the token, and balance, transaction summary and latest release are read
+concurrently, each in a worker thread with its own session.
+"""
+import asyncio
+from datetime import datetime
+from typing import Callable, TypeVar
+
+from fastapi import APIRouter, Depends
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..database import get_db
+from ..models import CreditTransaction, User
+from ..schemas.app_release import AppReleaseResponse
+from ..schemas.bootstrap import BootstrapEmailStatus, BootstrapResponse, BootstrapTransactionSummary
+from ..schemas.user import BalanceResponse, TransactionResponse, UserResponse
+from ..services.app_release_service import app_release_service
+from ..services.release_patch_service import release_patch_service
+from ..services.user_service import UserService
+from .users import get_current_user
+
+router = APIRouter(prefix="/api/v1", tags=["bootstrap"])
+
+T = TypeVar("T")
+
+
+async def _in_session(db: Session, work: Callable[[Session], T]) -> T:
+    """Run ``work`` in a thread with a dedicated session on the request's engine."""
+    def run() -> T:
+        with Session(bind=db.get_bind()) as session:
+            return work(session)
+    return await asyncio.to_thread(run)
+
+
+def _load_balance(user_id: int):
+    def work(session: Session):
+        balance = UserService.get_user_balance(session, user_id)
+        return BalanceResponse.from_orm(balance) if balance else None
+    return work
+
+
+def _load_transactions(user_id: int):
+    def work(session: Session) -> BootstrapTransactionSummary:
+        count = session.query(func.count(CreditTransaction.id)).filter(
+            CreditTransaction.user_id == user_id
+        ).scalar()
+        recent = UserService.get_user_transactions(session, user_id, settings.BOOTSTRAP_RECENT_TRANSACTIONS, 0)
+        return BootstrapTransactionSummary(
+            transaction_count=count or 0,
+            recent=[TransactionResponse.from_orm(item) for item in recent],
+        )
+    return work
+
+
+def _load_release(session: Session):
+    release = app_release_service.get_latest_release(session)
+    if release is None:
+        return None, []
+    return AppReleaseResponse.model_validate(release), release_patch_service.list_patches(session, release)
+
+
+@router.get("/bootstrap", response_model=BootstrapResponse)
+async def bootstrap(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Return user, balance, email status, recent transactions and the latest release.
+    """
+    balance, transactions, (release, patches) = await asyncio.gather(
+        _in_session(db, _load_balance(current_user.id)),
+        _in_session(db, _load_transactions(current_user.id)),
+        _in_session(db, _load_release),
+    )
+
+    return BootstrapResponse(
+        user=UserResponse.from_orm(current_user),
+        balance=balance,
+        email=BootstrapEmailStatus(
+            email=current_user.email,
+            email_verified=bool(current_user.email_verified),
+            email_verified_at=current_user.email_verified_at,
+        ),
+        transactions=transactions,
+        release=release,
+        patches=patches,
+        server_time=datetime.utcnow(),
+    )
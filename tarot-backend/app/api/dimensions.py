@@ -1,10 +1,15 @@
 """
 Dimensions API endpoints placeholder.
 """
-from fastapi import APIRouter, HTTPException, status, Query
+import hashlib
+import json
+from datetime import datetime
+
+from fastapi import APIRouter, HTTPException, Request, status, Query
 from typing import Optional
 
 from ..schemas.reading import DimensionInfo
+from ..utils.http_cache import cached_json_response
 
 router = APIRouter(prefix="/dimensions", tags=["Dimensions"])
 
@@ -25,6 +30,18 @@ _SUPPORTED_CATEGORIES = [
 ]
 
 
+_CATEGORIES_PAYLOAD = {
+    "categories": _SUPPORTED_CATEGORIES,
+    "total": len(_SUPPORTED_CATEGORIES),
+    "message": _DIMENSION_UNAVAILABLE_MESSAGE,
+}
+# 分类列表只随部署变化：ETag 取内容哈希，Last-Modified 取进程启动时间
+_CATEGORIES_ETAG = '"c{}"'.format(
+    hashlib.sha1(json.dumps(_CATEGORIES_PAYLOAD, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+)
+_CATEGORIES_LAST_MODIFIED = datetime.utcnow()
+
+
 @router.get("/", response_model=list[DimensionInfo])
 async def get_dimensions(
     category: Optional[str] = Query(None, description="筛选类别"),
@@ -50,12 +67,15 @@ async def get_dimension_detail(dimension_id: int):
 
 
 @router.get("/categories/list")
-async def get_dimension_categories():
+async def get_dimension_categories(request: Request):
     """
     返回支持的分类列表（用于前端展示或兜底文案）。
     """
-    return {
-        "categories": _SUPPORTED_CATEGORIES,
-        "total": len(_SUPPORTED_CATEGORIES),
-        "message": _DIMENSION_UNAVAILABLE_MESSAGE,
-    }
+    return cached_json_response(
+        request,
+        "dimension_categories",
+        etag=_CATEGORIES_ETAG,
+        build=lambda: _CATEGORIES_PAYLOAD,
+        cache_control="public, max-age=3600",
+        last_modified=_CATEGORIES_LAST_MODIFIED,
+    )
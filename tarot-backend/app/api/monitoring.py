@@ -0,0 +1,147 @@
+"""
+Admin monitoring API routes (background jobs and runtime state).
+"""
+import asyncio
+from dataclasses import asdict
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import FileResponse
+from pydantic import BaseModel, Field
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.services.email_outbox import email_outbox
+from app.services.llm_usage_service import llm_usage_service
+from app.services.maintenance_service import maintenance_scheduler
+from app.services.play_notification_service import play_notification_service
+from app.utils.admin_auth import require_admin
+from app.utils.batch_writer import get_batch_writer_stats
+from app.utils.logger import get_logging_stats
+from app.utils.profiler import profile_store, profiler_config
+from app.utils.tracing import span_exporter
+
+admin_router = APIRouter(prefix="/admin/monitoring", tags=["admin-monitoring"])
+
+
+@admin_router.get("/maintenance")
+def get_maintenance_status(current_admin: str = Depends(require_admin)) -> dict:
+    """Return scheduler state and per-job run-time metrics of this worker."""
+    return {"success": True, "data": maintenance_scheduler.get_status()}
+
+
+@admin_router.post("/maintenance/{job_name}/run")
+async def run_maintenance_job(job_name: str, current_admin: str = Depends(require_admin)) -> dict:
+    """Run a maintenance job immediately in this worker."""
+    if job_name not in maintenance_scheduler.jobs:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Unknown maintenance job: {job_name}",
+        )
+
+    stats = await asyncio.to_thread(maintenance_scheduler.run_job, job_name)
+    return {"success": stats.last_error is None, "job": job_name, "data": stats.to_dict()}
+
+
+@admin_router.get("/logging")
+def get_logging_status(current_admin: str = Depends(require_admin)) -> dict:
+    """Return log queue backlog and dropped-record counters of this worker."""
+    return {"success": True, "data": get_logging_stats()}
+
+
+@admin_router.get("/tracing")
+def get_tracing_status(current_admin: str = Depends(require_admin)) -> dict:
+    """Return span export counters of this worker."""
+    return {"success": True, "data": span_exporter.get_stats()}
+
+
+@admin_router.get("/batch-writers")
+def get_batch_writers_status(current_admin: str = Depends(require_admin)) -> dict:
+    """Return queue depth, written/dropped/failed row counters of every write-behind writer."""
+    return {"success": True, "data": get_batch_writer_stats()}
+
+
+@admin_router.get("/email-outbox")
+def get_email_outbox_status(
+    current_admin: str = Depends(require_admin),
+    db: Session = Depends(get_db)
+) -> dict:
+    """Outbox counts by status, age of the oldest pending message and SMTP pool state."""
+    return {"success": True, "data": email_outbox.get_status(db)}
+
+
+@admin_router.get("/google-play-notifications")
+def get_play_notifications_status(
+    current_admin: str = Depends(require_admin),
+    db: Session = Depends(get_db)
+) -> dict:
+    """RTDN inbox counts by status and age of the oldest pending notification."""
+    return {"success": True, "data": play_notification_service.get_status(db)}
+
+
+@admin_router.get("/llm-usage/daily")
+def get_llm_usage_daily(
+    days: int = Query(7, ge=1, le=90, description="统计最近天数"),
+    current_admin: str = Depends(require_admin),
+    db: Session = Depends(get_db)
+) -> dict:
+    """Per model per day: call count, failures, p50/p95 latency, tokens and cost."""
+    return {"success": True, "data": llm_usage_service.get_daily_model_stats(db, days)}
+
+
+@admin_router.get("/llm-usage/endpoints")
+def get_llm_usage_by_endpoint(
+    days: int = Query(7, ge=1, le=90, description="统计最近天数"),
+    current_admin: str = Depends(require_admin),
+    db: Session = Depends(get_db)
+) -> dict:
+    """Average tokens and cost per call (one call per reading) by endpoint and locale."""
+    return {
+        "success": True,
+        "data": llm_usage_service.get_endpoint_stats(db, days),
+        "writer": llm_usage_service.writer.get_stats(),
+    }
+
+
+class ProfilerSettingsRequest(BaseModel):
+    """采样分析器开关（未提供的字段保持不变）"""
+    enabled: Optional[bool] = None
+    sample_rate: Optional[float] = Field(None, ge=0, le=1, description="随机采样比例")
+    routes: Optional[List[str]] = Field(None, description="始终采样的路径前缀")
+    interval_ms: Optional[float] = Field(None, ge=1, le=1000, description="采样间隔（毫秒）")
+    max_files: Optional[int] = Field(None, ge=1, le=1000, description="保留的分析文件数")
+
+
+@admin_router.get("/profiler")
+def get_profiler_status(current_admin: str = Depends(require_admin)) -> dict:
+    """Return the profiler switch and the most recent profiles."""
+    return {
+        "success": True,
+        "data": {
+            "config": asdict(profiler_config.get()),
+            "profiles": profile_store.list(),
+        },
+    }
+
+
+@admin_router.put("/profiler")
+def update_profiler_settings(
+    request: ProfilerSettingsRequest,
+    current_admin: str = Depends(require_admin)
+) -> dict:
+    """Turn the sampling profiler on/off for all workers."""
+    changes = request.model_dump(exclude_none=True)
+    config = profiler_config.update(**changes)
+    return {"success": True, "data": asdict(config)}
+
+
+@admin_router.get("/profiler/profiles/{filename}")
+def download_profile(filename: str, current_admin: str = Depends(require_admin)):
+    """Download a speedscope profile (open it at https://www.speedscope.app)."""
+    path = profile_store.path_for(filename)
+    if path is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Profile not found: {filename}",
+        )
+    return FileResponse(path, media_type="application/json", filename=filename)
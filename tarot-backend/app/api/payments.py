@@ -1,20 +1,25 @@
 """
 Payment related API routes.
 """
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+import logging
+
+from fastapi import APIRouter, Depends, Header, HTTPException, status, Query, Request
 from sqlalchemy.orm import Session
 from sqlalchemy import func, desc
 from typing import List, Optional
-import uuid
 
 from ..database import get_db
 from ..services.user_service import UserService
 from ..utils.redeem_code import RedeemCodeService
+from ..utils.redeem_guard import redeem_code_guard
+from ..utils.network import get_client_ip
+from ..utils.pubsub_auth import PushAuthenticationError, PushAuthNotConfiguredError, pubsub_push_verifier
 from ..schemas.payment import (
     RedeemCodeValidateRequest,
     RedeemCodeValidateResponse,
     RedeemCodeInfoRequest,
     RedeemCodeInfoResponse,
+    RedeemCodeResponse,
     PurchaseRequest,
     PurchaseResponse,
     GooglePlayPurchaseRequest,
@@ -25,6 +30,9 @@ from ..schemas.payment import (
 from ..models import User, RedeemCode, Purchase
 from ..config import settings
 from ..services.google_play import google_play_service
+from ..services.play_notification_service import InvalidNotificationError, play_notification_service
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/v1/payments", tags=["payments"])
 
@@ -32,6 +40,7 @@ router = APIRouter(prefix="/api/v1/payments", tags=["payments"])
 @router.post("/redeem", response_model=RedeemCodeValidateResponse)
 async def redeem_code(
     request: RedeemCodeValidateRequest,
+    http_request: Request,
     db: Session = Depends(get_db)
 ):
     """
@@ -39,7 +48,27 @@ async def redeem_code(
 
     This endpoint validates a redeem code and adds credits to the user's balance
     if the code is valid and unused.
+
+    Codes that cannot exist are rejected by the in-memory Bloom filter without a
+    database lookup; repeated failures from the same device/IP are delayed.
     """
+    throttle_keys = redeem_code_guard.throttle_keys(
+        request.installation_id, get_client_ip(http_request)
+    )
+    await redeem_code_guard.throttle(throttle_keys)
+
+    code = request.code.strip().upper()
+    if not redeem_code_guard.might_exist(code, db):
+        redeem_code_guard.record_failure(throttle_keys)
+        return RedeemCodeValidateResponse(
+            success=False,
+            credits=0,
+            balance=0,
+            message="Invalid redeem code",
+            transaction_id=None,
+            code_info=None
+        )
+
     try:
         # Find user by installation_id
         user = db.query(User).filter(
@@ -50,47 +79,23 @@ async def redeem_code(
             # Register the user if they don't exist
             user = UserService.register_user(db, request.installation_id)
 
-        # Validate and use the redeem code
-        redeem_code, used_successfully = RedeemCodeService.validate_and_use_code(
-            db, request.code, user
+        # Claim the code, grant credits and record the purchase in one transaction
+        redeem_code, new_balance, transaction = RedeemCodeService.redeem_code_for_user(
+            db, code, user
         )
+        redeem_code_guard.reset_failures(throttle_keys)
 
-        if used_successfully:
-            # Add credits to user balance
-            balance, transaction = UserService.update_user_balance(
-                db=db,
-                user_id=user.id,
-                credit_change=redeem_code.credits,
-                transaction_type="earn",
-                reference_type="redeem_code",
-                reference_id=redeem_code.id,
-                description=f"Redeemed code: {redeem_code.code}"
-            )
-
-            # Create purchase record for tracking
-            purchase = Purchase(
-                order_id=f"redeem_{redeem_code.id}_{uuid.uuid4().hex[:8]}",
-                platform="redeem_code",
-                user_id=user.id,
-                product_id=redeem_code.product_id,
-                credits=redeem_code.credits,
-                status="completed",
-                redeem_code=redeem_code.code,
-                completed_at=redeem_code.used_at
-            )
-            db.add(purchase)
-            db.commit()
-
-            return RedeemCodeValidateResponse(
-                success=True,
-                credits=redeem_code.credits,
-                balance=balance.credits,
-                message=f"Successfully redeemed {redeem_code.credits} credits",
-                transaction_id=transaction.id,
-                code_info=RedeemCodeResponse.from_orm(redeem_code)
-            )
+        return RedeemCodeValidateResponse(
+            success=True,
+            credits=redeem_code.credits,
+            balance=new_balance,
+            message=f"Successfully redeemed {redeem_code.credits} credits",
+            transaction_id=transaction.id,
+            code_info=RedeemCodeResponse.from_orm(redeem_code)
+        )
 
     except ValueError as e:
+        redeem_code_guard.record_failure(throttle_keys)
         return RedeemCodeValidateResponse(
             success=False,
             credits=0,
@@ -109,6 +114,7 @@ async def redeem_code(
 @router.post("/redeem/info", response_model=RedeemCodeInfoResponse)
 async def get_redeem_code_info(
     request: RedeemCodeInfoRequest,
+    http_request: Request,
     db: Session = Depends(get_db)
 ):
     """
@@ -117,10 +123,17 @@ async def get_redeem_code_info(
     This endpoint allows checking if a code is valid and what credits
     it provides without actually redeeming it.
     """
+    throttle_keys = redeem_code_guard.throttle_keys(client_ip=get_client_ip(http_request))
+    await redeem_code_guard.throttle(throttle_keys)
+
     try:
-        redeem_code = RedeemCodeService.get_code_info(db, request.code)
+        code = request.code.strip().upper()
+        redeem_code = None
+        if redeem_code_guard.might_exist(code, db):
+            redeem_code = RedeemCodeService.get_code_info(db, code)
 
         if not redeem_code:
+            redeem_code_guard.record_failure(throttle_keys)
             return RedeemCodeInfoResponse(
                 valid=False,
                 code_info=None,
@@ -251,39 +264,49 @@ async def consume_google_play_purchase(
 
 
 @router.post("/webhooks/google/play")
-async def google_play_webhook(
+def google_play_webhook(
     request: dict,
+    authorization: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
     """
     Webhook endpoint for Google Play Real-time Developer Notifications.
 
-    This endpoint receives notifications from Google Play about
-    subscription and purchase events for automated processing.
+    Only Pub/Sub push requests carrying a valid Google OIDC token for
+    ``GOOGLE_PLAY_PUBSUB_AUDIENCE`` are accepted. The message is decoded and
+    stored in the notification inbox (duplicates are dropped by their dedupe
+    key) and acknowledged right away; the background processor applies it to
+    purchases in order per token.
     """
     try:
-        # Basic webhook structure validation
-        if "message" not in request:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid webhook format"
-            )
-
-        # TODO: Implement webhook signature verification
-        # TODO: Parse and process different notification types
-        # TODO: Handle subscription events, purchase events, etc.
-
-        # For now, just log the webhook
-        import logging
-        logger = logging.getLogger(__name__)
-        logger.info(f"Received Google Play webhook: {request}")
-
-        return {"status": "received"}
+        pubsub_push_verifier.verify(authorization)
+    except PushAuthNotConfiguredError:
+        # 未配置校验时不信任任何通知；Pub/Sub 会保留并重投，配置后仍可处理
+        logger.error("Google Play webhook rejected: GOOGLE_PLAY_PUBSUB_AUDIENCE is not configured")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Webhook authentication is not configured"
+        )
+    except PushAuthenticationError as e:
+        logger.warning(f"Google Play webhook rejected: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid webhook credentials"
+        )
 
-    except HTTPException:
-        raise
-    except Exception as e:
+    try:
+        queued = play_notification_service.ingest(db, request)
+    except InvalidNotificationError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception:
+        db.rollback()
+        # 非 2xx 响应会让 Pub/Sub 稍后重投
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to process Google Play webhook"
-        )
\ No newline at end of file
+        )
+
+    return {"status": "received", "duplicate": not queued}
\ No newline at end of file
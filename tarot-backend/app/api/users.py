@@ -1,7 +1,7 @@
 """
 User related API routes.
 """
-from fastapi import APIRouter, Depends, HTTPException, status, Header
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Header
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from sqlalchemy import func
@@ -24,6 +24,7 @@ from ..schemas.user import (
 )
 from ..models import User, UserBalance, CreditTransaction
 from ..utils.auth import verify_jwt_token
+from ..utils.http_cache import cached_json_response
 from ..config import settings
 
 router = APIRouter(prefix="/api/v1", tags=["users"])
@@ -135,21 +136,33 @@ async def get_current_user_info(
 
 @router.get("/me/balance", response_model=BalanceResponse)
 async def get_user_balance(
+    request: Request,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
     Get current user's balance.
-    """
-    balance = UserService.get_user_balance(db, current_user.id)
 
-    if not balance:
+    The ETag is the balance version, so an unchanged balance is answered
+    with 304 (or a cached body) without loading and serializing the row.
+    """
+    marker = UserService.get_balance_marker(db, current_user.id)
+    if not marker:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Balance record not found"
         )
 
-    return BalanceResponse.from_orm(balance)
+    def build():
+        return BalanceResponse.from_orm(UserService.get_user_balance(db, current_user.id))
+
+    return cached_json_response(
+        request,
+        "me_balance",
+        etag=f'"b{current_user.id}-{marker[0]}"',
+        build=build,
+        owner=current_user.id,
+    )
 
 
 @router.get("/me/transactions", response_model=TransactionHistoryResponse)
@@ -182,21 +195,36 @@ async def get_user_transactions(
 
 @router.get("/me/stats", response_model=UserStatsResponse)
 async def get_user_stats(
+    request: Request,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
     Get current user's statistics summary.
+
+    Totals and the transaction count only change together with the balance
+    version; ``last_active_at`` is part of the ETag as well.
     """
-    try:
-        stats = UserService.get_user_stats(db, current_user.id)
-        return UserStatsResponse(**stats)
+    marker = UserService.get_balance_marker(db, current_user.id)
+    version = marker[0] if marker else 0
+    last_active = int(current_user.last_active_at.timestamp()) if current_user.last_active_at else 0
+
+    def build():
+        try:
+            return UserStatsResponse(**UserService.get_user_stats(db, current_user.id))
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=str(e)
+            )
 
-    except ValueError as e:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=str(e)
-        )
+    return cached_json_response(
+        request,
+        "me_stats",
+        etag=f'"s{current_user.id}-{version}-{last_active}"',
+        build=build,
+        owner=current_user.id,
+    )
 
 
 @router.post("/consume", response_model=CreditConsumeResponse)
@@ -38,6 +38,10 @@ class Settings(BaseSettings):
 
     # API 调用限制
     RATE_LIMIT_PER_MINUTE: int = 60
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "sqlite"  # sqlite: 多 worker 共享；memory: 仅进程内
+    # 只信任来自这些地址（IP 或 CIDR）的 X-Real-IP / X-Forwarded-For；默认为本机与 Docker 网段（nginx 容器）
+    TRUSTED_PROXIES: list[str] = ["127.0.0.1", "::1", "172.16.0.0/12"]
     BATCH_SIZE: int = 10
 
     # JWT configuration
@@ -55,20 +59,49 @@ class Settings(BaseSettings):
     GOOGLE_PLAY_SERVICE_ACCOUNT_JSON: Optional[str] = None
     GOOGLE_PACKAGE_NAME: str = "com.mysixth.tarot"
     GOOGLE_PLAY_ENABLED: bool = False
+    GOOGLE_PLAY_API_ROOT: Optional[str] = None  # 覆盖 API 根地址（本地假服务器），未配置服务账号时使用匿名凭据
+    GOOGLE_PLAY_MAX_WORKERS: int = 8  # 调用 Google Play API 的线程数上限
+    GOOGLE_PLAY_DEADLINE_SECONDS: float = 10.0  # 单次调用的截止时间（含排队）
+    GOOGLE_PLAY_TIMEOUT_SECONDS: float = 8.0  # httplib2 套接字超时
+    GOOGLE_PLAY_NUM_RETRIES: int = 1  # googleapiclient 对 5xx/429 的重试次数
+    GOOGLE_PLAY_TOKEN_CACHE_TTL_SECONDS: int = 300
+    GOOGLE_PLAY_TOKEN_CACHE_MAX_ENTRIES: int = 10000
+    # RTDN 通知：webhook 去重入库后立即返回，后台 worker（leader）按令牌顺序处理
+    GOOGLE_PLAY_NOTIFICATIONS_ENABLED: bool = True
+    # Pub/Sub 推送订阅的 OIDC 身份校验：audience 未配置时 webhook 拒收全部通知
+    GOOGLE_PLAY_PUBSUB_AUDIENCE: Optional[str] = None
+    GOOGLE_PLAY_PUBSUB_SERVICE_ACCOUNT: Optional[str] = None  # 推送订阅使用的服务账号邮箱
+    GOOGLE_PLAY_NOTIFICATION_POLL_SECONDS: float = 2.0
+    GOOGLE_PLAY_NOTIFICATION_BATCH_SIZE: int = 100
+    GOOGLE_PLAY_NOTIFICATION_MAX_ATTEMPTS: int = 8  # 超过后标记为 failed
+    GOOGLE_PLAY_NOTIFICATION_BACKOFF_BASE_SECONDS: int = 10
+    GOOGLE_PLAY_NOTIFICATION_BACKOFF_MAX_SECONDS: int = 1800
+    GOOGLE_PLAY_NOTIFICATION_RETENTION_DAYS: int = 30
 
     # 兑换码配置
     REDEEM_CODE_LENGTH: int = 16
     REDEEM_CODE_PREFIX: Optional[str] = "TAROT"
     REDEEM_CODE_EXPIRES_DAYS: int = 365
     REDEEM_CODE_DAILY_LIMIT_PER_DEVICE: int = 5
+    REDEEM_CODE_BULK_CHUNK_SIZE: int = 2000  # 批量生成时每次插入的行数
+    REDEEM_CODE_BULK_MAX_COUNT: int = 500000  # 单批次最大生成数量
+    REDEEM_GUARD_ENABLED: bool = True  # Bloom 过滤器 + 失败次数延迟
+    REDEEM_BLOOM_FALSE_POSITIVE_RATE: float = 0.001
+    REDEEM_BLOOM_REFRESH_SECONDS: int = 5  # 多 worker 时同步其他进程新生成的兑换码
+    REDEEM_FAILURE_WINDOW_SECONDS: int = 900
+    REDEEM_FAILURE_FREE_ATTEMPTS: int = 3  # 超过该失败次数后开始延迟
+    REDEEM_FAILURE_BASE_DELAY_SECONDS: float = 0.5
+    REDEEM_FAILURE_MAX_DELAY_SECONDS: float = 8.0
 
     # 积分系统配置
     DEFAULT_INITIAL_CREDITS: int = 10
     DEFAULT_CREDITS_PER_AI_READING: int = 1
     CREDITS_EXPIRE_DAYS: int = 0  # 0表示永不过期
+    BOOTSTRAP_RECENT_TRANSACTIONS: int = 5  # /bootstrap 返回的最近交易条数
 
     # 支付安全配置
-    PAYMENT_RATE_LIMIT_PER_HOUR: int = 10
+    PAYMENT_RATE_LIMIT_PER_HOUR: int = 10  # 兑换码等接口（按 IP/设备）
+    GOOGLE_PLAY_VERIFY_RATE_LIMIT_PER_HOUR: int = 120  # Google Play 校验/消耗（按 IP/设备，令牌须经 Google 确认）
     WEBHOOK_SECRET_KEY: str = "your-webhook-secret"
 
     # 邮箱SMTP配置 (QQ邮箱)
@@ -79,6 +112,20 @@ class Settings(BaseSettings):
     EMAIL_PASSWORD: str = ""  # QQ邮箱授权码
     EMAIL_USE_TLS: bool = True
     EMAIL_TIMEOUT: int = 60  # 连接超时时间（秒）
+    EMAIL_DEFAULT_LOCALE: str = "zh-CN"  # 邮件模板默认语言（templates/email/<locale>/，缺失时用根目录模板）
+    EMAIL_TEMPLATE_LOCALES: list[str] = ["zh-CN"]  # 启动时预编译的模板语言
+
+    # 邮件发件箱（接口只入队；leader worker 复用已登录的 SMTP 连接批量发送）
+    EMAIL_OUTBOX_ENABLED: bool = True
+    EMAIL_OUTBOX_POLL_SECONDS: float = 2.0
+    EMAIL_OUTBOX_BATCH_SIZE: int = 50
+    EMAIL_OUTBOX_MAX_ATTEMPTS: int = 6  # 超过后标记为 failed
+    EMAIL_OUTBOX_BACKOFF_BASE_SECONDS: int = 30  # 重试间隔 base * 2^(attempts-1)
+    EMAIL_OUTBOX_BACKOFF_MAX_SECONDS: int = 3600
+    EMAIL_OUTBOX_RETENTION_DAYS: int = 7  # 已发送记录保留天数
+    EMAIL_SMTP_POOL_SIZE: int = 2  # 保持登录状态的 SMTP 连接数
+    EMAIL_SMTP_IDLE_CHECK_SECONDS: int = 30  # 连接空闲超过该时间，复用前先 NOOP 探活
+    EMAIL_SMTP_MAX_MESSAGES_PER_CONNECTION: int = 100  # 单连接发送上限后重建，避免服务端断开
 
     # CORS settings
     CORS_ORIGINS: list[str] = ["*"]  # 开发环境允许所有来源
@@ -90,7 +137,21 @@ class Settings(BaseSettings):
     STATIC_DIR: str = "static"
     CARDS_IMAGE_PATH: str = "static/images"
     APP_RELEASE_STORAGE_DIR: str = "static/app-releases"
-    APP_RELEASE_BASE_URL: str = "/static/app-releases"
+    APP_RELEASE_BASE_URL: str = "/api/v1/app-release/download"  # 下载接口（ETag/Range）；旧记录仍可走 /static
+    # nginx internal location 前缀；设置后下载由 nginx 经 X-Accel-Redirect 直接发送文件
+    APP_RELEASE_X_ACCEL_PREFIX: Optional[str] = None  # 例如 /_protected/app-releases/
+    APP_RELEASE_CACHE_CONTROL: str = "public, max-age=31536000, immutable"  # 文件名唯一，内容不变
+    # 分片断点续传上传（分片文件与 JSON 元数据，不可放在 static 目录下）
+    APP_RELEASE_UPLOAD_DIR: str = "run/uploads"
+    APP_RELEASE_UPLOAD_CHUNK_MB: int = 8  # 建议客户端使用的分片大小
+    APP_RELEASE_UPLOAD_EXPIRE_HOURS: int = 24  # 超时未更新的上传任务由维护任务清理
+    # 增量补丁（需要安装 bsdiff4；未安装时只提供完整 APK）
+    APP_RELEASE_PATCH_ENABLED: bool = True
+    APP_RELEASE_PATCH_BASES: int = 3  # 为最近 N 个旧版本生成到新版本的补丁
+    APP_RELEASE_PATCH_WORKERS: int = 1  # 补丁生成进程数（bsdiff 内存占用约为文件大小的数倍）
+    APP_RELEASE_PATCH_MAX_SOURCE_MB: int = 200  # 超过该大小的 APK 不生成补丁
+    APP_RELEASE_PATCH_MAX_RATIO: float = 0.7  # 补丁大于完整包的该比例时不提供
+    APP_RELEASE_PATCH_CLAIM_TIMEOUT_MINUTES: int = 60  # 认领后超过该时间仍未完成的补丁可被重新生成
     APP_RELEASE_MAX_SIZE_MB: int = 300
     APP_RELEASE_ALLOWED_EXTENSIONS: list[str] = [".apk"]
     APP_RELEASE_ALLOWED_MIME_TYPES: list[str] = [
@@ -99,6 +160,81 @@ class Settings(BaseSettings):
         "binary/octet-stream",
     ]
 
+    # 日志（后台队列写出）
+    LOG_QUEUE_SIZE: int = 10000  # 队列满时丢弃新日志
+    LOG_RETENTION_DAYS: int = 14
+
+    # 指标（Prometheus 文本格式，/metrics）
+    METRICS_ENABLED: bool = True
+
+    # 热点只读接口的条件 GET 与响应缓存（每个 worker 独立）
+    HTTP_CACHE_ENABLED: bool = True
+    HTTP_CACHE_MAX_ENTRIES: int = 10000
+    HTTP_CACHE_TTL_SECONDS: int = 300
+
+    # SQL 统计（Server-Timing 头、慢查询日志、N+1 告警）
+    QUERY_STATS_ENABLED: bool = True
+    SLOW_QUERY_THRESHOLD_MS: int = 200
+    QUERY_REPEAT_WARNING_THRESHOLD: int = 10  # 同一语句在单个请求内执行次数达到该值时告警
+
+    # 采样分析器（默认值；运行时开关写在 RUNTIME_DIR/profiler.json，由管理接口修改）
+    PROFILER_ENABLED: bool = False
+    PROFILER_SAMPLE_RATE: float = 0.0
+    PROFILER_ROUTES: list[str] = []
+    PROFILER_INTERVAL_MS: float = 5.0
+    PROFILER_MAX_FILES: int = 50
+    PROFILER_OUTPUT_DIR: str = "run/profiles"
+
+    # LLM 用量账本（llm_call_logs，批量写入）
+    LLM_USAGE_LOG_ENABLED: bool = True
+    LLM_USAGE_QUEUE_SIZE: int = 10000
+    # 模型单价：模型名 -> [输入, 输出]（美元/百万 tokens），用于估算费用
+    LLM_PRICING: dict[str, list[float]] = {}
+
+    # 分析日志批量写入（reading_analyze_logs）
+    ANALYZE_LOG_QUEUE_SIZE: int = 10000  # 队列满时丢弃并计数
+    ANALYZE_LOG_BATCH_SIZE: int = 200
+    ANALYZE_LOG_FLUSH_SECONDS: float = 2.0
+
+    # 高频问题分析结果离线预计算（precomputed_analyses）
+    PRECOMPUTE_LOOKUP_ENABLED: bool = True  # 分析前先查预计算结果
+    PRECOMPUTE_VERSION: int = 1  # 提示词或模型变化时递增，旧结果自动失效
+    PRECOMPUTE_LOCALES: list[str] = ["zh-CN", "en"]
+    PRECOMPUTE_TOP_N: int = 300
+    PRECOMPUTE_MIN_COUNT: int = 3  # 至少重复提问次数
+    PRECOMPUTE_REQUESTS_PER_MINUTE: int = 30  # 批处理调用模型的速率上限
+
+    # 近似问题匹配（字符 n-gram 哈希向量 + 余弦相似度，按语言分区的内存索引）
+    SIMILARITY_LOOKUP_ENABLED: bool = True
+    SIMILARITY_THRESHOLD: float = 0.85  # 余弦相似度阈值，过低会把不同问题误判为同一问题
+    SIMILARITY_VECTOR_DIM: int = 1024
+    SIMILARITY_INDEX_MAX_ENTRIES: int = 5000  # 每个语言的条目上限，满时覆盖最旧条目
+    SIMILARITY_SYNC_SECONDS: int = 30  # 从 precomputed_analyses 增量同步的最小间隔
+    # 同时索引本 worker 新生成的 LLM 结果。默认关闭：实时结果是针对个人问题的摘要，
+    # 改写后的他人问题（如只换了性别）也可能超过阈值而拿到这份摘要
+    SIMILARITY_INDEX_LIVE_RESULTS: bool = False
+
+    # 链路追踪（W3C traceparent 传播；导出到 JSONL 文件或本地 OTLP/HTTP collector）
+    TRACING_ENABLED: bool = False
+    TRACING_SAMPLE_RATE: float = 1.0  # 无上游 traceparent 时的采样比例
+    TRACING_SERVICE_NAME: str = "tarot-backend"
+    TRACING_EXPORT_PATH: str = "run/traces.jsonl"
+    TRACING_EXPORT_MAX_MB: int = 100  # 超过后轮转为 .1
+    TRACING_OTLP_ENDPOINT: Optional[str] = None  # 例如 http://localhost:4318/v1/traces
+
+    # 后台维护任务（仅持有 leader 锁的 worker 执行）
+    RUNTIME_DIR: str = "run"  # leader 锁等运行时文件目录
+    MAINTENANCE_ENABLED: bool = True
+    MAINTENANCE_TICK_SECONDS: int = 30
+    MAINTENANCE_CHUNK_SIZE: int = 1000
+    MAINTENANCE_EXPIRY_SWEEP_INTERVAL_SECONDS: int = 3600
+    MAINTENANCE_EMAIL_PURGE_INTERVAL_SECONDS: int = 21600
+    MAINTENANCE_SQLITE_OPTIMIZE_INTERVAL_SECONDS: int = 21600
+    MAINTENANCE_SQLITE_ANALYZE_INTERVAL_SECONDS: int = 86400
+    MAINTENANCE_WAL_CHECKPOINT_INTERVAL_SECONDS: int = 600
+    MAINTENANCE_ANALYTICS_INTERVAL_SECONDS: int = 60  # 提问统计增量汇总
+    EMAIL_VERIFICATION_RETENTION_DAYS: int = 7  # 已使用/过期令牌保留天数
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
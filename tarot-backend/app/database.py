@@ -1,13 +1,21 @@
 """
 Database configuration and session management.
 """
-from sqlalchemy import create_engine
-from sqlalchemy.exc import OperationalError
+import logging
+import time
+
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError, ProgrammingError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
-from typing import Generator
+from typing import Dict, Generator, List, Optional
 
 from .config import settings
+from .utils.query_stats import instrument_engine
+from .utils.tracing import instrument_engine_tracing
+
+logger = logging.getLogger(__name__)
 
 # 创建数据库引擎
 engine = create_engine(
@@ -16,12 +24,19 @@ engine = create_engine(
     echo=settings.DEBUG  # 在调试模式下显示SQL语句
 )
 
+# 记录每个请求的 SQL 次数与耗时
+instrument_engine(engine)
+instrument_engine_tracing(engine)
+
 # 创建会话工厂
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 # 创建基类
 Base = declarative_base()
 
+# 与模型对应的 Alembic 迁移版本；新增迁移时同步更新（tests/test_startup.py 会校验）
+SCHEMA_HEAD_REVISION = "d5a8f2c6e1b4"
+
 
 def get_db() -> Generator[Session, None, None]:
     """
@@ -30,8 +45,14 @@ def get_db() -> Generator[Session, None, None]:
     Yields:
         Session: SQLAlchemy数据库会话
     """
+    from .utils.metrics import DB_SESSION_WAIT
+
     db = SessionLocal()
     try:
+        # 预先取出连接，记录连接池等待时间
+        started = time.perf_counter()
+        db.connection()
+        DB_SESSION_WAIT.observe(time.perf_counter() - started)
         yield db
     finally:
         db.close()
@@ -49,6 +70,14 @@ def create_tables():
         EmailVerification,
         ReadingAnalyzeLog,
         AppRelease,
+        AppReleasePatch,
+        LLMCallLog,
+        ReadingDailyStat,
+        ReadingQuestionStat,
+        AnalyticsWatermark,
+        PrecomputedAnalysis,
+        EmailOutbox,
+        GooglePlayNotification,
     )  # noqa: WPS433
 
     tables_to_create = [
@@ -60,6 +89,14 @@ def create_tables():
         EmailVerification.__table__,
         ReadingAnalyzeLog.__table__,
         AppRelease.__table__,
+        AppReleasePatch.__table__,
+        LLMCallLog.__table__,
+        ReadingDailyStat.__table__,
+        ReadingQuestionStat.__table__,
+        AnalyticsWatermark.__table__,
+        PrecomputedAnalysis.__table__,
+        EmailOutbox.__table__,
+        GooglePlayNotification.__table__,
     ]
     try:
         Base.metadata.create_all(bind=engine, tables=tables_to_create)
@@ -70,6 +107,103 @@ def create_tables():
             raise
 
 
+def get_schema_revision(bind: Optional[Engine] = None) -> Optional[str]:
+    """Alembic revision the database is stamped with; None if it was never migrated."""
+    with (bind or engine).connect() as conn:
+        try:
+            revisions = conn.execute(text("SELECT version_num FROM alembic_version")).scalars().all()
+        except (OperationalError, ProgrammingError):
+            return None
+    # 多个 head（分支未合并）时无法确定版本，按未迁移处理
+    return revisions[0] if len(revisions) == 1 else None
+
+
+def missing_tables(bind: Optional[Engine] = None) -> List[str]:
+    """ORM tables that do not exist in the database."""
+    from . import models  # noqa: F401  注册全部模型
+
+    existing = set(inspect(bind or engine).get_table_names())
+    return sorted(name for name in Base.metadata.tables if name not in existing)
+
+
+def missing_columns(bind: Optional[Engine] = None) -> Dict[str, List[str]]:
+    """ORM columns missing from tables that already exist, by table name."""
+    from . import models  # noqa: F401  注册全部模型
+
+    inspector = inspect(bind or engine)
+    existing_tables = set(inspector.get_table_names())
+    missing: Dict[str, List[str]] = {}
+    for name, table in Base.metadata.tables.items():
+        if name not in existing_tables:
+            continue
+        existing = {column["name"] for column in inspector.get_columns(name)}
+        columns = [column.name for column in table.columns if column.name not in existing]
+        if columns:
+            missing[name] = columns
+    return missing
+
+
+def add_missing_columns(bind: Optional[Engine] = None) -> Dict[str, List[str]]:
+    """
+    Add ORM columns that ``create_all`` cannot add to existing tables.
+
+    Only nullable columns without a server default are added (the ones new
+    migrations introduce for existing data); their indexes are created too.
+    Databases without Alembic (the Docker image does not ship the migrations)
+    get new columns this way.
+
+    Returns:
+        Dict[str, List[str]]: the columns that were added, by table name
+    """
+    bind = bind or engine
+    missing = missing_columns(bind)
+    compiler = bind.dialect.ddl_compiler(bind.dialect, None)
+    preparer = bind.dialect.identifier_preparer
+    for table_name, column_names in missing.items():
+        table = Base.metadata.tables[table_name]
+        for column_name in column_names:
+            column = table.columns[column_name]
+            if not column.nullable or column.primary_key:
+                raise RuntimeError(f"Cannot add NOT NULL column {table_name}.{column_name}; run the migrations")
+            try:
+                with bind.begin() as conn:
+                    conn.execute(text(
+                        f"ALTER TABLE {preparer.format_table(table)} "
+                        f"ADD COLUMN {compiler.get_column_specification(column)}"
+                    ))
+            except OperationalError as error:
+                # 多个 worker 同时启动时另一个已经加上了该列
+                if "duplicate column" not in str(error).lower():
+                    raise
+        for index in table.indexes:
+            if set(column_names) & {column.name for column in index.columns}:
+                index.create(bind=bind, checkfirst=True)
+        logger.warning(f"Added missing columns to {table_name}: {', '.join(column_names)}")
+    return missing
+
+
+def ensure_schema() -> bool:
+    """
+    Make sure the tables and columns exist at worker start.
+
+    A database that Alembic has already migrated to ``SCHEMA_HEAD_REVISION``
+    and that has every ORM table is used as is (two cheap catalog queries
+    instead of ``create_all`` inspecting each table); anything else falls
+    back to ``create_tables()`` plus ``add_missing_columns()``.
+
+    Returns:
+        bool: True when ``create_tables()`` ran
+    """
+    if get_schema_revision() == SCHEMA_HEAD_REVISION:
+        missing = missing_tables()
+        if not missing:
+            return False
+        logger.warning(f"Schema is at {SCHEMA_HEAD_REVISION} but tables are missing: {', '.join(missing)}")
+    create_tables()
+    add_missing_columns()
+    return True
+
+
 def drop_tables():
     """删除所有表（谨慎使用）。"""
     from .models import (
@@ -81,6 +215,14 @@ def drop_tables():
         EmailVerification,
         ReadingAnalyzeLog,
         AppRelease,
+        AppReleasePatch,
+        LLMCallLog,
+        ReadingDailyStat,
+        ReadingQuestionStat,
+        AnalyticsWatermark,
+        PrecomputedAnalysis,
+        EmailOutbox,
+        GooglePlayNotification,
     )  # noqa: WPS433
 
     tables_to_drop = [
@@ -92,5 +234,13 @@ def drop_tables():
         EmailVerification.__table__,
         ReadingAnalyzeLog.__table__,
         AppRelease.__table__,
+        AppReleasePatch.__table__,
+        LLMCallLog.__table__,
+        ReadingDailyStat.__table__,
+        ReadingQuestionStat.__table__,
+        AnalyticsWatermark.__table__,
+        PrecomputedAnalysis.__table__,
+        EmailOutbox.__table__,
+        GooglePlayNotification.__table__,
     ]
     Base.metadata.drop_all(bind=engine, tables=tables_to_drop)
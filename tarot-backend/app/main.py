@@ -3,20 +3,31 @@ FastAPI application entry point.
 """
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 import uvicorn
 import logging
 import traceback
 
 from app.config import settings
-from app.database import create_tables
-
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO if not settings.DEBUG else logging.DEBUG,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
+from app.database import ensure_schema
+from app.utils.redeem_guard import redeem_code_guard
+from app.utils.rate_limit import RateLimitMiddleware
+from app.utils.logger import setup_logging, start_logging, shutdown_logging
+from app.utils.metrics import MetricsMiddleware, registry as metrics_registry
+from app.utils.query_stats import QueryStatsMiddleware
+from app.utils.profiler import ProfilerMiddleware
+from app.utils.tracing import TracingMiddleware, span_exporter
+from app.utils.batch_writer import shutdown_batch_writers
+from app.services.maintenance_service import maintenance_scheduler
+from app.services.email_outbox import email_outbox
+from app.services.email_service import email_service
+from app.services.play_notification_service import play_notification_service
+from app.services.release_patch_service import release_patch_service
+from app.services.similarity_index import similarity_index
+
+# 配置日志（经后台队列写出，不阻塞事件循环）
+setup_logging(logging.INFO if not settings.DEBUG else logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 # 创建 FastAPI 应用实例
@@ -27,6 +38,15 @@ app = FastAPI(
     debug=settings.DEBUG
 )
 
+# 添加采样分析器中间件（默认关闭，由 /api/v1/admin/monitoring/profiler 开启）
+app.add_middleware(ProfilerMiddleware)
+
+# 添加 SQL 统计中间件（Server-Timing 头、N+1 告警；最内层，只统计进入路由的请求）
+app.add_middleware(QueryStatsMiddleware)
+
+# 添加限流中间件（/readings 与 /payments 路由组；先注册以位于 CORS 内层，429 也带 CORS 头）
+app.add_middleware(RateLimitMiddleware)
+
 # 添加 CORS 中间件
 app.add_middleware(
     CORSMiddleware,
@@ -36,6 +56,13 @@ app.add_middleware(
     allow_headers=settings.CORS_HEADERS,
 )
 
+# 添加指标中间件（最外层，429 与 CORS 预检也计入）
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+# 添加链路追踪中间件（最外层，traceparent 传播与 X-Trace-Id 响应头）
+app.add_middleware(TracingMiddleware)
+
 # 挂载静态文件目录
 app.mount("/static", StaticFiles(directory=settings.STATIC_DIR), name="static")
 
@@ -99,22 +126,48 @@ async def http_exception_handler(request: Request, exc: HTTPException):
 @app.on_event("startup")
 async def startup_event():
     """应用启动时的初始化操作"""
+    start_logging()
     logger.info(f"Starting {settings.APP_NAME} v{settings.APP_VERSION}")
 
-    # 创建数据库表（如果不存在）
+    # 数据库已由 Alembic 迁移到最新版本时跳过建表检查，否则创建缺失的表和列
     try:
-        create_tables()
-        logger.info("Database tables created/verified successfully")
+        if ensure_schema():
+            logger.info("Database tables created/verified successfully")
+        else:
+            logger.info("Database schema is at the Alembic head revision")
     except Exception as e:
         logger.error(f"Failed to create database tables: {e}")
         raise
 
+    # 后台构建兑换码 Bloom 过滤器
+    redeem_code_guard.schedule_rebuild()
+
+    # 后台加载近似问题索引，避免首个分析请求在事件循环上全量构建
+    similarity_index.schedule_warm()
+
+    # 启动后台维护任务（多 worker 时仅 leader 执行）
+    await maintenance_scheduler.start()
+
+    # 预编译邮件模板，启动邮件发件箱发送器（多 worker 时仅 leader 发送）
+    email_service.templates.compile_all()
+    await email_outbox.start()
+
+    # 启动 Google Play RTDN 处理器（多 worker 时仅 leader 处理）
+    await play_notification_service.start()
+
 
 # 关闭事件
 @app.on_event("shutdown")
 async def shutdown_event():
     """应用关闭时的清理操作"""
     logger.info(f"Shutting down {settings.APP_NAME}")
+    await maintenance_scheduler.stop()
+    await email_outbox.stop()
+    await play_notification_service.stop()
+    release_patch_service.shutdown()
+    span_exporter.flush()
+    shutdown_batch_writers()
+    shutdown_logging()
 
 
 # 健康检查端点
@@ -140,20 +193,34 @@ async def health_check():
     }
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus 指标端点（本 worker 的计数）"""
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return PlainTextResponse(
+        metrics_registry.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
 # TODO: 注册API路由
-from app.api import auth, readings, dimensions, spreads, users, payments, admin, app_release
+from app.api import auth, readings, dimensions, spreads, users, payments, admin, app_release, monitoring, analytics, bootstrap
 
 app.include_router(auth.router, prefix="/api/v1")
 app.include_router(readings.router, prefix="/api/v1")
 app.include_router(dimensions.router, prefix="/api/v1")
 app.include_router(spreads.router, prefix="/api/v1")
 app.include_router(users.router)  # Users router already includes /api/v1 prefix
+app.include_router(bootstrap.router)  # App launch bundle (/api/v1/bootstrap)
 app.include_router(payments.router)  # Payments router already includes /api/v1 prefix
 app.include_router(admin.router, prefix="/api/v1")  # Admin API routes (/api/v1/admin-api/*)
 app.include_router(admin.user_router)  # Admin user management API (/api/v1/admin/*)
 app.include_router(admin.redeem_router)  # Admin redeem codes management API (/api/v1/admin/redeem-codes/*)
 app.include_router(app_release.public_router, prefix="/api/v1")
 app.include_router(app_release.admin_router, prefix="/api/v1")
+app.include_router(monitoring.admin_router, prefix="/api/v1")  # Admin monitoring API (/api/v1/admin/monitoring/*)
+app.include_router(analytics.admin_router, prefix="/api/v1")  # Admin analytics API (/api/v1/admin/analytics/*)
 
 
 if __name__ == "__main__":
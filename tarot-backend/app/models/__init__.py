@@ -7,6 +7,12 @@ from .transaction import CreditTransaction
 from .email_verification import EmailVerification
 from .reading_analyze_log import ReadingAnalyzeLog
 from .app_release import AppRelease
+from .app_release_patch import AppReleasePatch
+from .llm_call_log import LLMCallLog
+from .reading_analytics import AnalyticsWatermark, ReadingDailyStat, ReadingQuestionStat
+from .precomputed_analysis import PrecomputedAnalysis
+from .email_outbox import EmailOutbox
+from .google_play_notification import GooglePlayNotification
 
 __all__ = [
     "User",
@@ -17,4 +23,12 @@ __all__ = [
     "EmailVerification",
     "ReadingAnalyzeLog",
     "AppRelease",
+    "AppReleasePatch",
+    "LLMCallLog",
+    "ReadingDailyStat",
+    "ReadingQuestionStat",
+    "AnalyticsWatermark",
+    "PrecomputedAnalysis",
+    "EmailOutbox",
+    "GooglePlayNotification",
 ]
@@ -0,0 +1,34 @@
+"""
+App release binary patch SQLAlchemy model.
+"""
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Text, UniqueConstraint
+
+from ..database import Base
+
+
+class AppReleasePatch(Base):
+    """旧版本 APK 到新版本的 bsdiff 增量补丁（上传后后台生成）。"""
+
+    __tablename__ = "app_release_patches"
+
+    id = Column(Integer, primary_key=True)
+    from_release_id = Column(Integer, ForeignKey("app_releases.id"), nullable=False, comment="基准版本")
+    to_release_id = Column(Integer, ForeignKey("app_releases.id"), nullable=False, index=True, comment="目标版本")
+    status = Column(String(16), nullable=False, comment="状态：pending, ready, skipped, failed")
+    file_name = Column(String(255), nullable=True, comment="补丁文件名（位于发布目录的 patches/ 下）")
+    file_size = Column(Integer, nullable=True, comment="补丁大小（字节）")
+    checksum_sha256 = Column(String(64), nullable=True, comment="补丁文件的 SHA256")
+    download_url = Column(String(255), nullable=True, comment="补丁下载地址")
+    error = Column(Text, nullable=True, comment="生成失败或跳过的原因")
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow, comment="创建（认领）时间")
+
+    __table_args__ = (
+        UniqueConstraint("from_release_id", "to_release_id", name="uq_app_release_patches_from_to"),
+    )
+
+    def __repr__(self) -> str:
+        return (
+            f"<AppReleasePatch(from={self.from_release_id}, to={self.to_release_id}, status='{self.status}')>"
+        )
@@ -0,0 +1,34 @@
+"""
+Email outbox SQLAlchemy model.
+"""
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Index, Integer, String, Text
+
+from ..database import Base
+
+
+class EmailOutbox(Base):
+    """待发送邮件表（接口只入队，由后台发送器批量发送并按退避策略重试）。"""
+
+    __tablename__ = "email_outbox"
+
+    id = Column(Integer, primary_key=True)
+    to_email = Column(String(255), nullable=False, comment="收件人邮箱")
+    subject = Column(String(255), nullable=False, comment="邮件主题")
+    text_body = Column(Text, nullable=False, comment="纯文本内容")
+    html_body = Column(Text, nullable=True, comment="HTML内容")
+    kind = Column(String(32), nullable=False, default="generic", comment="邮件类型：verify_email, reset_password, generic")
+    status = Column(String(16), nullable=False, default="pending", comment="状态：pending, sent, failed")
+    attempts = Column(Integer, nullable=False, default=0, comment="已尝试发送次数")
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow, comment="下次可发送时间")
+    last_error = Column(Text, nullable=True, comment="最近一次发送错误")
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_email_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+
+    def __repr__(self) -> str:
+        return f"<EmailOutbox(id={self.id}, to='{self.to_email}', status='{self.status}')>"
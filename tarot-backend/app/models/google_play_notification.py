@@ -0,0 +1,37 @@
+"""
+Google Play real-time developer notification SQLAlchemy model.
+"""
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Index, Integer, String, Text
+
+from ..database import Base
+
+
+class GooglePlayNotification(Base):
+    """Google Play RTDN 收件箱（webhook 只去重入库，由后台 worker 按购买令牌顺序处理）。"""
+
+    __tablename__ = "google_play_notifications"
+
+    id = Column(Integer, primary_key=True)
+    dedupe_key = Column(String(64), nullable=False, unique=True, comment="去重键：令牌+类型+事件时间的 SHA256")
+    message_id = Column(String(128), nullable=True, comment="Pub/Sub messageId")
+    purchase_token = Column(Text, nullable=True, comment="购买令牌（测试通知为空）")
+    kind = Column(String(32), nullable=False, comment="通知类别：one_time, subscription, voided, test, unknown")
+    notification_type = Column(Integer, nullable=True, comment="Google Play notificationType")
+    product_id = Column(String(255), nullable=True, comment="商品或订阅 ID")
+    event_time = Column(DateTime, nullable=False, comment="Google Play 事件时间")
+    payload = Column(Text, nullable=False, comment="解码后的通知 JSON")
+    status = Column(String(16), nullable=False, default="pending", comment="状态：pending, done, failed")
+    attempts = Column(Integer, nullable=False, default=0, comment="已处理次数")
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow, comment="下次可处理时间")
+    last_error = Column(Text, nullable=True, comment="最近一次处理错误")
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    processed_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_google_play_notifications_status_token", "status", "purchase_token"),
+    )
+
+    def __repr__(self) -> str:
+        return f"<GooglePlayNotification(id={self.id}, kind='{self.kind}', status='{self.status}')>"
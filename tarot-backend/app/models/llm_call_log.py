@@ -0,0 +1,34 @@
+"""
+LLM call log SQLAlchemy model.
+"""
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Float, Index, Integer, String
+
+from ..database import Base
+
+
+class LLMCallLog(Base):
+    """每次 LLM 调用的用量记录（批量写入，仅追加）。"""
+
+    __tablename__ = "llm_call_logs"
+
+    id = Column(Integer, primary_key=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow, comment="调用时间（UTC）")
+    provider = Column(String(20), nullable=False, comment="zhipu / openai")
+    model = Column(String(64), nullable=False, comment="模型名称")
+    locale = Column(String(16), nullable=True, comment="请求语言")
+    endpoint = Column(String(50), nullable=True, comment="调用来源，如 readings.generate")
+    prompt_tokens = Column(Integer, nullable=True)
+    completion_tokens = Column(Integer, nullable=True)
+    latency_ms = Column(Integer, nullable=False, comment="调用耗时（毫秒）")
+    outcome = Column(String(10), nullable=False, comment="success / empty / error")
+    cost_usd = Column(Float, nullable=True, comment="按 LLM_PRICING 估算的费用")
+
+    __table_args__ = (
+        Index("ix_llm_call_logs_created_at", "created_at"),
+        Index("ix_llm_call_logs_model_created_at", "model", "created_at"),
+    )
+
+    def __repr__(self) -> str:
+        return f"<LLMCallLog(id={self.id}, model='{self.model}', outcome='{self.outcome}', latency_ms={self.latency_ms})>"
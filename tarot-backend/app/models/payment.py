@@ -60,6 +60,14 @@ class RedeemCode(Base):
         nullable=False,
         comment="创建时间"
     )
+    updated_at = Column(
+        DateTime,
+        default=datetime.utcnow,
+        onupdate=datetime.utcnow,
+        nullable=True,
+        index=True,
+        comment="最后更新时间（兑换码 Bloom 过滤器据此同步重新启用的兑换码）"
+    )
     batch_id = Column(
         String(50),
         nullable=True,
@@ -0,0 +1,31 @@
+"""
+Precomputed analyze result SQLAlchemy model.
+"""
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, String, Text, UniqueConstraint
+
+from ..database import Base
+
+
+class PrecomputedAnalysis(Base):
+    """离线预计算的高频问题分析结果（按问题哈希、语言、版本查找）。"""
+
+    __tablename__ = "precomputed_analyses"
+
+    id = Column(Integer, primary_key=True)
+    question_hash = Column(String(40), nullable=False, comment="规范化问题文本的 SHA1")
+    locale = Column(String(16), nullable=False, comment="结果语言")
+    version = Column(Integer, nullable=False, comment="预计算版本，提示词变化时递增")
+    question = Column(Text, nullable=False, comment="规范化后的问题文本")
+    dimension_names = Column(Text, nullable=False, comment="推荐维度名称（JSON 数组）")
+    description = Column(Text, nullable=False, comment="统一概要描述")
+    source_count = Column(Integer, nullable=False, default=0, comment="预计算时该问题的累计提问次数")
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("question_hash", "locale", "version", name="uq_precomputed_analyses_hash_locale_version"),
+    )
+
+    def __repr__(self) -> str:
+        return f"<PrecomputedAnalysis(hash='{self.question_hash}', locale='{self.locale}', version={self.version})>"
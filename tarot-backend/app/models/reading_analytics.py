@@ -0,0 +1,58 @@
+"""
+Precomputed analytics aggregates over reading analyze logs.
+"""
+from datetime import datetime
+
+from sqlalchemy import Column, Date, DateTime, Integer, String, Text, UniqueConstraint
+
+from ..database import Base
+
+
+class ReadingDailyStat(Base):
+    """按日期、类别、语言汇总的提问量。"""
+
+    __tablename__ = "reading_daily_stats"
+
+    id = Column(Integer, primary_key=True)
+    day = Column(Date, nullable=False, comment="汇总日期（UTC，按日志 created_at）")
+    category = Column(String(32), nullable=False, comment="归类后的关注类别")
+    locale = Column(String(16), nullable=False, default="", comment="语言区域代码，未知为空串")
+    question_count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("day", "category", "locale", name="uq_reading_daily_stats_day_category_locale"),
+    )
+
+    def __repr__(self) -> str:
+        return f"<ReadingDailyStat(day={self.day}, category='{self.category}', locale='{self.locale}', count={self.question_count})>"
+
+
+class ReadingQuestionStat(Base):
+    """按规范化问题文本哈希汇总的重复提问。"""
+
+    __tablename__ = "reading_question_stats"
+
+    id = Column(Integer, primary_key=True)
+    question_hash = Column(String(40), nullable=False, unique=True, index=True, comment="规范化文本的 SHA1")
+    normalized_text = Column(Text, nullable=False, comment="规范化后的问题文本（截断）")
+    category = Column(String(32), nullable=False, comment="最近一次归类的类别")
+    locale = Column(String(16), nullable=False, default="", comment="最近一次提问的语言")
+    question_count = Column(Integer, nullable=False, default=0)
+    first_seen_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    last_seen_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+    def __repr__(self) -> str:
+        return f"<ReadingQuestionStat(hash='{self.question_hash}', count={self.question_count})>"
+
+
+class AnalyticsWatermark(Base):
+    """增量汇总进度：每个汇总任务已处理的最大源记录 ID。"""
+
+    __tablename__ = "analytics_watermarks"
+
+    name = Column(String(50), primary_key=True)
+    last_id = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self) -> str:
+        return f"<AnalyticsWatermark(name='{self.name}', last_id={self.last_id})>"
@@ -1,7 +1,9 @@
 """
 Reading analyze log SQLAlchemy model.
 """
-from sqlalchemy import Column, Integer, String, Text
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, String, Text
 
 from ..database import Base
 
@@ -15,6 +17,7 @@ class ReadingAnalyzeLog(Base):
     questions = Column(Text, nullable=False, comment="用户输入的问题内容")
     category = Column(String(32), nullable=False, comment="归类后的关注类别")
     locate = Column(String(16), nullable=True, comment="语言区域代码")
+    created_at = Column(DateTime, nullable=True, default=datetime.utcnow, comment="请求时间（UTC），旧记录为空")
 
     def __repr__(self) -> str:
         return f"<ReadingAnalyzeLog(id={self.id}, category='{self.category}', locate='{self.locate}')>"
@@ -33,12 +33,28 @@ class AppReleaseResponse(BaseModel):
         populate_by_name = True
 
 
+class AppReleasePatchResponse(BaseModel):
+    """Binary patch that turns an older APK into the latest one."""
+
+    from_version: str
+    from_build_number: Optional[str] = None
+    from_checksum: str = Field(..., description="基准 APK 的 SHA256，客户端据此判断补丁是否适用")
+    download_url: str
+    file_size: int
+    checksum: str = Field(..., description="补丁文件的 SHA256")
+    algorithm: str = "bsdiff4"
+
+
 class AppReleaseLatestResponse(BaseModel):
     """Response envelope for latest release endpoints."""
 
     success: bool = True
     release: Optional[AppReleaseResponse] = None
     data: Optional[AppReleaseResponse] = None
+    patches: List[AppReleasePatchResponse] = Field(
+        default_factory=list,
+        description="从旧版本到最新版本的增量补丁；应用后须用 release.checksum 校验",
+    )
 
 
 class AppReleaseUploadResponse(BaseModel):
@@ -50,6 +66,36 @@ class AppReleaseUploadResponse(BaseModel):
     data: AppReleaseResponse
 
 
+class ReleaseUploadInitRequest(BaseModel):
+    """Start a resumable chunked upload."""
+
+    filename: str = Field(..., max_length=255, description="原始文件名（.apk）")
+    total_size: int = Field(..., gt=0, description="文件总字节数")
+    content_type: Optional[str] = Field(None, description="MIME 类型")
+    sha256: Optional[str] = Field(None, pattern="^[0-9a-fA-F]{64}$", description="可选的期望 SHA-256，完成时校验")
+
+
+class ReleaseUploadStatusResponse(BaseModel):
+    """State of a chunked upload; ``received`` is the offset to continue from."""
+
+    success: bool = True
+    upload_id: str
+    filename: str
+    total_size: int
+    received: int
+    chunk_size: int
+    complete: bool
+
+
+class ReleaseUploadCompleteRequest(BaseModel):
+    """Release metadata submitted when finishing a chunked upload."""
+
+    version: str = Field(..., description="语义化版本号，例如 1.0.0")
+    build_number: Optional[str] = Field(None, description="可选的构建号")
+    release_notes: Optional[str] = Field(None, description="发布说明")
+    notes_url: Optional[str] = Field(None, description="外部更新日志链接")
+
+
 class AppReleaseHistoryResponse(BaseModel):
     """Paginated release history for admin."""
 
@@ -0,0 +1,35 @@
+"""
+Bootstrap (app launch) Pydantic schemas.
+"""
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+from .app_release import AppReleasePatchResponse, AppReleaseResponse
+from .user import BalanceResponse, TransactionResponse, UserResponse
+
+
+class BootstrapEmailStatus(BaseModel):
+    """Email binding state of the current user."""
+    email: Optional[str] = None
+    email_verified: bool = False
+    email_verified_at: Optional[datetime] = None
+
+
+class BootstrapTransactionSummary(BaseModel):
+    """Transaction count and the most recent entries."""
+    transaction_count: int
+    recent: List[TransactionResponse]
+
+
+class BootstrapResponse(BaseModel):
+    """Everything the app needs on launch, in one round trip."""
+    success: bool = True
+    user: UserResponse
+    balance: Optional[BalanceResponse] = None
+    email: BootstrapEmailStatus
+    transactions: BootstrapTransactionSummary
+    release: Optional[AppReleaseResponse] = None
+    patches: List[AppReleasePatchResponse] = Field(default_factory=list)
+    server_time: datetime
@@ -0,0 +1,239 @@
+"""
+Reading question analytics backed by incrementally maintained aggregate tables.
+
+``refresh_aggregates`` folds new ``reading_analyze_logs`` rows (tracked by an
+id watermark) into per-day/category/locale counters and per-question counters
+keyed by the SHA1 of the normalized question text. The admin views then only
+read the small aggregate tables, whatever the size of the raw log.
+
+Rows are attributed to the UTC day of their ``created_at`` (stamped when the
+request queued the log row), so backfills and aggregation delays do not move
+counts between days. Rows logged before the column existed have no
+timestamp and fall back to the day they are aggregated on.
+"""
+import hashlib
+import re
+import unicodedata
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import case, func, select
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models import AnalyticsWatermark, ReadingAnalyzeLog, ReadingDailyStat, ReadingQuestionStat
+
+WATERMARK_NAME = "reading_analyze_logs"
+_WHITESPACE_RE = re.compile(r"\s+")
+_EDGE_PUNCTUATION = " \t\n\r.,!?;:'\"，。！？；：、…「」“”‘’()（）"
+
+
+def normalize_question(text: str) -> str:
+    """NFKC, lower-case, collapse whitespace and strip surrounding punctuation."""
+    normalized = unicodedata.normalize("NFKC", text or "").lower()
+    return _WHITESPACE_RE.sub(" ", normalized).strip(_EDGE_PUNCTUATION)
+
+
+def question_hash(text: str) -> str:
+    return hashlib.sha1(normalize_question(text).encode("utf-8")).hexdigest()
+
+
+def _dialect_insert(db: Session):
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        raise ValueError(f"Analytics aggregates need ON CONFLICT support (got {dialect})")
+    return insert
+
+
+class AnalyticsService:
+    """提问分析统计服务"""
+
+    def refresh_aggregates(self, db: Session, chunk_size: Optional[int] = None) -> Dict[str, int]:
+        """
+        Fold log rows newer than the watermark into the aggregate tables.
+
+        Each chunk updates the aggregates and the watermark in one commit, so a
+        crash never double-counts or skips rows.
+        """
+        chunk_size = chunk_size or settings.MAINTENANCE_CHUNK_SIZE
+        processed = 0
+
+        while True:
+            watermark = db.get(AnalyticsWatermark, WATERMARK_NAME)
+            last_id = watermark.last_id if watermark else 0
+            rows = db.execute(
+                select(ReadingAnalyzeLog.id, ReadingAnalyzeLog.questions, ReadingAnalyzeLog.category,
+                       ReadingAnalyzeLog.locate, ReadingAnalyzeLog.created_at)
+                .where(ReadingAnalyzeLog.id > last_id)
+                .order_by(ReadingAnalyzeLog.id)
+                .limit(chunk_size)
+            ).all()
+            if not rows:
+                break
+
+            try:
+                self._apply_chunk(db, rows)
+                if watermark is None:
+                    watermark = AnalyticsWatermark(name=WATERMARK_NAME, last_id=0)
+                    db.add(watermark)
+                watermark.last_id = rows[-1].id
+                watermark.updated_at = datetime.utcnow()
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+
+            processed += len(rows)
+            if len(rows) < chunk_size:
+                break
+
+        return {"processed": processed}
+
+    def _apply_chunk(self, db: Session, rows: Sequence) -> None:
+        insert = _dialect_insert(db)
+        now = datetime.utcnow()
+
+        daily = Counter(((row.created_at or now).date(), row.category, row.locate or "") for row in rows)
+        if daily:
+            stmt = insert(ReadingDailyStat.__table__)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["day", "category", "locale"],
+                set_={"question_count": ReadingDailyStat.__table__.c.question_count + stmt.excluded.question_count},
+            )
+            db.execute(stmt, [
+                {"day": day, "category": category, "locale": locale, "question_count": count}
+                for (day, category, locale), count in daily.items()
+            ])
+
+        questions: Dict[str, Dict[str, Any]] = {}
+        for row in rows:
+            normalized = normalize_question(row.questions)
+            if not normalized:
+                continue
+            digest = hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+            seen_at = row.created_at or now
+            entry = questions.get(digest)
+            if entry is None:
+                questions[digest] = {
+                    "question_hash": digest,
+                    "normalized_text": normalized[:500],
+                    "category": row.category,
+                    "locale": row.locate or "",
+                    "question_count": 1,
+                    "first_seen_at": seen_at,
+                    "last_seen_at": seen_at,
+                }
+            else:
+                entry["question_count"] += 1
+                entry["first_seen_at"] = min(entry["first_seen_at"], seen_at)
+                entry["last_seen_at"] = max(entry["last_seen_at"], seen_at)
+                entry["category"] = row.category
+                entry["locale"] = row.locate or ""
+
+        if questions:
+            table = ReadingQuestionStat.__table__
+            stmt = insert(table)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["question_hash"],
+                set_={
+                    "question_count": table.c.question_count + stmt.excluded.question_count,
+                    "category": stmt.excluded.category,
+                    "locale": stmt.excluded.locale,
+                    "last_seen_at": case(
+                        (stmt.excluded.last_seen_at > table.c.last_seen_at, stmt.excluded.last_seen_at),
+                        else_=table.c.last_seen_at,
+                    ),
+                },
+            )
+            db.execute(stmt, list(questions.values()))
+
+    def get_volume(
+        self,
+        db: Session,
+        days: int = 30,
+        group_by: str = "day",
+        category: Optional[str] = None,
+        locale: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Question volume grouped by ``day``, ``category`` or ``locale``."""
+        columns = {
+            "day": ReadingDailyStat.day,
+            "category": ReadingDailyStat.category,
+            "locale": ReadingDailyStat.locale,
+        }
+        if group_by not in columns:
+            raise ValueError(f"Unsupported group_by: {group_by}")
+
+        key = columns[group_by]
+        since: date = datetime.utcnow().date() - timedelta(days=days - 1)
+        query = (
+            select(key.label("key"), func.sum(ReadingDailyStat.question_count).label("count"))
+            .where(ReadingDailyStat.day >= since)
+            .group_by(key)
+        )
+        if category:
+            query = query.where(ReadingDailyStat.category == category)
+        if locale is not None:
+            query = query.where(ReadingDailyStat.locale == locale)
+        query = query.order_by(key) if group_by == "day" else query.order_by(func.sum(ReadingDailyStat.question_count).desc())
+
+        return [
+            {group_by: row.key.isoformat() if isinstance(row.key, date) else row.key, "count": int(row.count)}
+            for row in db.execute(query)
+        ]
+
+    def get_top_questions(
+        self,
+        db: Session,
+        limit: int = 20,
+        category: Optional[str] = None,
+        locale: Optional[str] = None,
+        min_count: int = 2
+    ) -> List[Dict[str, Any]]:
+        """Most repeated questions by normalized-text hash."""
+        query = (
+            select(ReadingQuestionStat)
+            .where(ReadingQuestionStat.question_count >= min_count)
+            .order_by(ReadingQuestionStat.question_count.desc(), ReadingQuestionStat.last_seen_at.desc())
+            .limit(limit)
+        )
+        if category:
+            query = query.where(ReadingQuestionStat.category == category)
+        if locale is not None:
+            query = query.where(ReadingQuestionStat.locale == locale)
+
+        return [
+            {
+                "question_hash": stat.question_hash,
+                "question": stat.normalized_text,
+                "category": stat.category,
+                "locale": stat.locale,
+                "count": stat.question_count,
+                "first_seen_at": stat.first_seen_at.isoformat(),
+                "last_seen_at": stat.last_seen_at.isoformat(),
+            }
+            for stat in db.scalars(query)
+        ]
+
+    def get_status(self, db: Session) -> Dict[str, Any]:
+        watermark = db.get(AnalyticsWatermark, WATERMARK_NAME)
+        latest_id = db.query(func.max(ReadingAnalyzeLog.id)).scalar() or 0
+        last_id = watermark.last_id if watermark else 0
+        return {
+            "last_processed_id": last_id,
+            "pending": max(0, latest_id - last_id),
+            "updated_at": watermark.updated_at.isoformat() if watermark else None,
+        }
+
+
+# 全局实例
+analytics_service = AnalyticsService()
+
+
+def get_analytics_service() -> AnalyticsService:
+    return analytics_service
@@ -5,10 +5,11 @@ from __future__ import annotations
 
 import hashlib
 import re
+import shutil
 from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Optional
 
 from fastapi import HTTPException, status, UploadFile
 from sqlalchemy.orm import Session
@@ -85,10 +86,115 @@ class AppReleaseService:
 
         self._validate_upload(upload_file)
 
+        try:
+            return self._publish_release(
+                db,
+                lambda: self._store_file(upload_file, version, build_number),
+                version=version,
+                build_number=build_number,
+                release_notes=release_notes,
+                notes_url=notes_url,
+                admin_username=admin_username,
+            )
+        finally:
+            if upload_file and upload_file.file:
+                upload_file.file.close()
+
+    def create_release_from_file(
+        self,
+        db: Session,
+        source_path: Path,
+        original_filename: str,
+        checksum: str,
+        version: str,
+        build_number: Optional[str],
+        release_notes: Optional[str],
+        notes_url: Optional[str],
+        admin_username: str,
+    ) -> AppRelease:
+        """
+        Publish a release from an already assembled and verified file.
+
+        The file is moved into the storage directory; used by the chunked
+        upload flow, which hashes the content while receiving it.
+        """
+        version = version.strip()
+        release_notes = (release_notes or "").strip() or None
+        notes_url = (notes_url or "").strip() or None
+        build_number = (build_number or "").strip() or None
+
+        def store() -> StoredFileInfo:
+            target_path = self._target_path(original_filename, version, build_number)
+            shutil.move(str(source_path), str(target_path))
+            return StoredFileInfo(
+                file_name=target_path.name,
+                file_path=target_path,
+                file_size=target_path.stat().st_size,
+                checksum=checksum,
+            )
+
+        return self._publish_release(
+            db,
+            store,
+            version=version,
+            build_number=build_number,
+            release_notes=release_notes,
+            notes_url=notes_url,
+            admin_username=admin_username,
+        )
+
+    def get_latest_release(self, db: Session, include_inactive: bool = False) -> Optional[AppRelease]:
+        """Return the most recent release, optionally including inactive ones."""
+        query = db.query(AppRelease)
+        if not include_inactive:
+            query = query.filter(AppRelease.is_active.is_(True))
+        return query.order_by(AppRelease.uploaded_at.desc(), AppRelease.id.desc()).first()
+
+    def get_release_by_file_name(self, db: Session, file_name: str) -> Optional[AppRelease]:
+        """Return the release whose stored APK is ``file_name``."""
+        if not file_name or Path(file_name).name != file_name:
+            return None
+        return db.query(AppRelease).filter(AppRelease.file_name == file_name).first()
+
+    def get_file_path(self, release: AppRelease) -> Path:
+        """Location of the stored APK of ``release``."""
+        return self.storage_dir / release.file_name
+
+    def get_accel_redirect(self, release: AppRelease) -> Optional[str]:
+        """nginx internal URI of the APK when X-Accel-Redirect offloading is enabled."""
+        prefix = settings.APP_RELEASE_X_ACCEL_PREFIX
+        if not prefix:
+            return None
+        return f"{prefix.rstrip('/')}/{release.file_name}"
+
+    def list_releases(self, db: Session, page: int, size: int) -> tuple[list[AppRelease], int]:
+        """Return paginated release history."""
+        page = max(page, 1)
+        size = max(1, min(size, 100))
+        query = db.query(AppRelease).order_by(AppRelease.uploaded_at.desc(), AppRelease.id.desc())
+
+        total = query.count()
+        items = query.offset((page - 1) * size).limit(size).all()
+        return items, total
+
+    # --------------------------------------------------------------------- #
+    # Internal helpers
+    # --------------------------------------------------------------------- #
+    def _publish_release(
+        self,
+        db: Session,
+        store: Callable[[], StoredFileInfo],
+        version: str,
+        build_number: Optional[str],
+        release_notes: Optional[str],
+        notes_url: Optional[str],
+        admin_username: str,
+    ) -> AppRelease:
+        """Store the file via ``store`` and make it the only active release."""
         stored_file: Optional[StoredFileInfo] = None
 
         try:
-            stored_file = self._store_file(upload_file, version, build_number)
+            stored_file = store()
 
             # Deactivate previous releases
             db.query(AppRelease).filter(AppRelease.is_active.is_(True)).update(
@@ -146,33 +252,14 @@ class AppReleaseService:
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="上传应用版本失败，请稍后重试",
             ) from exc
-        finally:
-            if upload_file and upload_file.file:
-                upload_file.file.close()
 
-    def get_latest_release(self, db: Session, include_inactive: bool = False) -> Optional[AppRelease]:
-        """Return the most recent release, optionally including inactive ones."""
-        query = db.query(AppRelease)
-        if not include_inactive:
-            query = query.filter(AppRelease.is_active.is_(True))
-        return query.order_by(AppRelease.uploaded_at.desc(), AppRelease.id.desc()).first()
-
-    def list_releases(self, db: Session, page: int, size: int) -> tuple[list[AppRelease], int]:
-        """Return paginated release history."""
-        page = max(page, 1)
-        size = max(1, min(size, 100))
-        query = db.query(AppRelease).order_by(AppRelease.uploaded_at.desc(), AppRelease.id.desc())
-
-        total = query.count()
-        items = query.offset((page - 1) * size).limit(size).all()
-        return items, total
-
-    # --------------------------------------------------------------------- #
-    # Internal helpers
-    # --------------------------------------------------------------------- #
     def _validate_upload(self, upload_file: UploadFile) -> None:
         """Validate filename, extension, MIME type, and size constraints."""
-        filename = (upload_file.filename or "").strip()
+        self.validate_file_meta(upload_file.filename, upload_file.content_type)
+
+    def validate_file_meta(self, filename: Optional[str], content_type: Optional[str]) -> None:
+        """Validate filename, extension and MIME type of an incoming APK."""
+        filename = (filename or "").strip()
         if not filename:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -186,18 +273,18 @@ class AppReleaseService:
                 detail="仅支持上传 APK 文件",
             )
 
-        content_type = (upload_file.content_type or "").lower()
+        content_type = (content_type or "").lower()
         if content_type and content_type not in self.allowed_mime_types:
             raise HTTPException(
                 status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
                 detail="文件类型不受支持",
             )
 
-    def _store_file(self, upload_file: UploadFile, version: str, build_number: Optional[str]) -> StoredFileInfo:
-        """Persist the uploaded file, returning metadata."""
+    def _target_path(self, original_filename: Optional[str], version: str, build_number: Optional[str]) -> Path:
+        """Return a unique storage path for a new release file."""
         self.storage_dir.mkdir(parents=True, exist_ok=True)
 
-        original_extension = Path(upload_file.filename or "").suffix.lower()
+        original_extension = Path(original_filename or "").suffix.lower()
         safe_version = self._sanitize_for_filename(version)
         safe_build = self._sanitize_for_filename(build_number) if build_number else ""
         timestamp = datetime.utcnow().strftime("%Y%m%d%H%M%S")
@@ -216,6 +303,13 @@ class AppReleaseService:
             target_path = self.storage_dir / target_name
             counter += 1
 
+        return target_path
+
+    def _store_file(self, upload_file: UploadFile, version: str, build_number: Optional[str]) -> StoredFileInfo:
+        """Persist the uploaded file, returning metadata."""
+        target_path = self._target_path(upload_file.filename, version, build_number)
+        target_name = target_path.name
+
         upload_file.file.seek(0)
         hasher = hashlib.sha256()
         total_bytes = 0
@@ -1,11 +1,12 @@
 from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_
+from sqlalchemy import func, and_, or_, text
 from app.models.user import User, UserBalance
 from app.models.payment import RedeemCode, Purchase
 from app.models.transaction import CreditTransaction
 from app.database import get_db
+from app.utils.metrics import process_sampler
 import logging
 
 logger = logging.getLogger(__name__)
@@ -208,7 +209,7 @@ class DashboardService:
             # 数据库健康检查
             db_status = "healthy"
             try:
-                db.execute("SELECT 1").fetchone()
+                db.execute(text("SELECT 1")).fetchone()
             except:
                 db_status = "error"
 
@@ -217,11 +218,19 @@ class DashboardService:
             pending_orders = db.query(Purchase).filter(Purchase.status == 'pending').count()
             active_redeem_codes = db.query(RedeemCode).filter(RedeemCode.status == 'active').count()
 
+            # 系统负载：1 分钟平均负载占 CPU 核数的百分比（0-100）
+            process = process_sampler.sample()
+            load1 = process['load_average'][0]
+            system_load = min(100, round(load1 / process['cpu_count'] * 100))
+
             return {
                 'database_status': db_status,
                 'google_play_status': 'healthy',  # 实际实现中应该调用Google Play API检查
                 'llm_service_status': 'healthy',  # 实际实现中应该调用LLM API检查
-                'system_load': 65,  # 实际实现中应该获取真实的系统负载
+                'system_load': system_load,
+                'load_average': [round(value, 2) for value in process['load_average']],
+                'cpu_percent': process['cpu_percent'],
+                'rss_mb': round(process['rss_bytes'] / (1024 * 1024), 1) if process['rss_bytes'] is not None else None,
                 'total_transactions': total_transactions,
                 'pending_orders': pending_orders,
                 'active_redeem_codes': active_redeem_codes
@@ -0,0 +1,399 @@
+"""
+Persistent email outbox with a background batch sender.
+
+API handlers render the message and insert an ``email_outbox`` row, then
+return; nothing talks to the SMTP server on the request path. Every worker
+runs the sender loop, but only the one holding the ``email_outbox`` leader
+lock sends. It claims due rows in batches, spreads them over a small pool of
+authenticated SMTP connections kept alive between batches, and reschedules
+failures with exponential backoff until ``EMAIL_OUTBOX_MAX_ATTEMPTS``.
+"""
+import asyncio
+import logging
+import smtplib
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..database import SessionLocal
+from ..models import EmailOutbox
+from ..utils.leader_lock import LeaderLock
+from ..utils.metrics import registry
+from .email_service import email_service
+
+logger = logging.getLogger(__name__)
+
+EMAILS_SENT = registry.counter("email_outbox_messages_total", "Outbox delivery attempts", ("outcome",))
+
+# 收件人/发件人被拒等 5xx 错误重试无意义，直接标记失败
+_PERMANENT_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused)
+
+
+def _is_permanent(error: Exception) -> bool:
+    if isinstance(error, _PERMANENT_ERRORS):
+        return True
+    code = getattr(error, "smtp_code", None)
+    return isinstance(code, int) and 500 <= code < 600 and not isinstance(error, smtplib.SMTPAuthenticationError)
+
+
+def backoff_seconds(attempts: int) -> int:
+    """Delay before the next try after ``attempts`` failed deliveries."""
+    delay = settings.EMAIL_OUTBOX_BACKOFF_BASE_SECONDS * (2 ** max(0, attempts - 1))
+    return min(delay, settings.EMAIL_OUTBOX_BACKOFF_MAX_SECONDS)
+
+
+class _PooledConnection:
+    __slots__ = ("smtp", "last_used", "messages")
+
+    def __init__(self, smtp: smtplib.SMTP):
+        self.smtp = smtp
+        self.last_used = time.monotonic()
+        self.messages = 0
+
+
+class SMTPConnectionPool:
+    """已登录 SMTP 连接池：空闲连接复用前 NOOP 探活，出错即丢弃重建。"""
+
+    def __init__(
+        self,
+        factory: Callable[[], smtplib.SMTP],
+        size: Optional[int] = None,
+        idle_check_seconds: Optional[int] = None,
+        max_messages: Optional[int] = None
+    ):
+        self.factory = factory
+        self.size = size or settings.EMAIL_SMTP_POOL_SIZE
+        self.idle_check_seconds = idle_check_seconds if idle_check_seconds is not None else settings.EMAIL_SMTP_IDLE_CHECK_SECONDS
+        self.max_messages = max_messages or settings.EMAIL_SMTP_MAX_MESSAGES_PER_CONNECTION
+        self._idle: Deque[_PooledConnection] = deque()
+        self._lock = threading.Lock()
+        self.created = 0
+        self.discarded = 0
+
+    def _take_idle(self) -> Optional[_PooledConnection]:
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None
+                conn = self._idle.pop()
+            if time.monotonic() - conn.last_used < self.idle_check_seconds:
+                return conn
+            try:
+                if conn.smtp.noop()[0] == 250:
+                    return conn
+            except Exception:
+                pass
+            self._discard(conn)
+
+    def _discard(self, conn: _PooledConnection) -> None:
+        self.discarded += 1
+        try:
+            conn.smtp.quit()
+        except Exception:
+            try:
+                conn.smtp.close()
+            except Exception:
+                pass
+
+    @contextmanager
+    def connection(self) -> Iterator[_PooledConnection]:
+        """Borrow a logged-in connection; it is discarded if the block raises a connection error."""
+        conn = self._take_idle()
+        if conn is None:
+            conn = _PooledConnection(self.factory())
+            self.created += 1
+
+        healthy = True
+        try:
+            yield conn
+        except (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, OSError):
+            healthy = False
+            raise
+        finally:
+            conn.last_used = time.monotonic()
+            if healthy and conn.messages < self.max_messages:
+                with self._lock:
+                    if len(self._idle) < self.size:
+                        self._idle.append(conn)
+                        conn = None
+            if conn is not None:
+                self._discard(conn)
+
+    def close_all(self) -> None:
+        with self._lock:
+            idle, self._idle = list(self._idle), deque()
+        for conn in idle:
+            self._discard(conn)
+
+    def get_stats(self) -> Dict[str, int]:
+        return {"size": self.size, "idle": len(self._idle), "created": self.created, "discarded": self.discarded}
+
+
+class EmailOutboxService:
+    """邮件发件箱：入队、后台批量发送与重试"""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        pool: Optional[SMTPConnectionPool] = None,
+        lock: Optional[LeaderLock] = None
+    ):
+        self.session_factory = session_factory
+        self.pool = pool or SMTPConnectionPool(email_service._create_smtp_connection)
+        self.lock = lock or LeaderLock("email_outbox")
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    # ------------------------------------------------------------------
+    # Enqueue (request path)
+    # ------------------------------------------------------------------
+
+    def enqueue(
+        self,
+        db: Session,
+        to_email: str,
+        subject: str,
+        text_body: str,
+        html_body: Optional[str] = None,
+        kind: str = "generic"
+    ) -> EmailOutbox:
+        """Persist a rendered message for background delivery."""
+        entry = EmailOutbox(
+            to_email=to_email,
+            subject=subject,
+            text_body=text_body,
+            html_body=html_body,
+            kind=kind,
+            status="pending",
+            attempts=0,
+            next_attempt_at=datetime.utcnow(),
+        )
+        db.add(entry)
+        db.commit()
+        self.notify()
+        return entry
+
+    def enqueue_verification_email(
+        self,
+        db: Session,
+        to_email: str,
+        verification_token: str,
+        user_name: Optional[str] = None,
+        locale: Optional[str] = None
+    ) -> EmailOutbox:
+        subject, text_body, html_body = email_service.render_verification_email(verification_token, user_name, locale)
+        return self.enqueue(db, to_email, subject, text_body, html_body, kind="verify_email")
+
+    def enqueue_password_reset_email(
+        self,
+        db: Session,
+        to_email: str,
+        reset_token: str,
+        user_name: Optional[str] = None,
+        locale: Optional[str] = None
+    ) -> EmailOutbox:
+        subject, text_body, html_body = email_service.render_password_reset_email(reset_token, user_name, locale)
+        return self.enqueue(db, to_email, subject, text_body, html_body, kind="reset_password")
+
+    def notify(self) -> None:
+        """Wake the sender of this worker (others pick the row up on their next poll)."""
+        loop, event = self._loop, self._wakeup
+        if loop is None or event is None or loop.is_closed():
+            return
+        try:
+            loop.call_soon_threadsafe(event.set)
+        except RuntimeError:
+            pass
+
+    # ------------------------------------------------------------------
+    # Delivery (leader worker)
+    # ------------------------------------------------------------------
+
+    def _send_chunk(self, messages: List[Tuple[int, str, str]]) -> List[Tuple[int, Optional[Exception]]]:
+        """Send messages over one pooled connection, reconnecting after a dropped connection."""
+        results: List[Tuple[int, Optional[Exception]]] = []
+        pending = deque(messages)
+        while pending:
+            connected = False
+            try:
+                with self.pool.connection() as conn:
+                    connected = True
+                    while pending:
+                        entry_id, to_email, message = pending[0]
+                        try:
+                            conn.smtp.sendmail(email_service.from_address, [to_email], message)
+                            conn.messages += 1
+                            results.append((entry_id, None))
+                        except (smtplib.SMTPServerDisconnected, OSError):
+                            raise
+                        except Exception as e:
+                            results.append((entry_id, e))
+                        pending.popleft()
+            except Exception as e:
+                if not connected:
+                    # 无法建立连接：本批剩余邮件全部按失败处理，等待退避后重试
+                    results.extend((entry_id, e) for entry_id, _, _ in pending)
+                    break
+                # 连接中途断开：当前邮件记为失败，其余邮件换新连接继续
+                results.append((pending.popleft()[0], e))
+        return results
+
+    def process_batch(self, db: Optional[Session] = None) -> Dict[str, int]:
+        """Deliver one batch of due messages and record the outcomes."""
+        own_session = db is None
+        db = db or self.session_factory()
+        try:
+            now = datetime.utcnow()
+            entries = db.scalars(
+                select(EmailOutbox)
+                .where(EmailOutbox.status == "pending", EmailOutbox.next_attempt_at <= now)
+                .order_by(EmailOutbox.next_attempt_at, EmailOutbox.id)
+                .limit(settings.EMAIL_OUTBOX_BATCH_SIZE)
+            ).all()
+            if not entries:
+                return {"sent": 0, "retried": 0, "failed": 0}
+
+            messages = [
+                (entry.id, entry.to_email,
+                 email_service.build_message(entry.to_email, entry.subject, entry.text_body, entry.html_body))
+                for entry in entries
+            ]
+            chunks = [messages[i::self.pool.size] for i in range(min(self.pool.size, len(messages)))]
+            if len(chunks) == 1:
+                outcomes = self._send_chunk(chunks[0])
+            else:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.pool.size, thread_name_prefix="email-outbox")
+                outcomes = [item for chunk in self._executor.map(self._send_chunk, chunks) for item in chunk]
+
+            return self._record_outcomes(db, {entry.id: entry for entry in entries}, outcomes)
+        finally:
+            if own_session:
+                db.close()
+
+    def _record_outcomes(
+        self,
+        db: Session,
+        entries: Dict[int, EmailOutbox],
+        outcomes: List[Tuple[int, Optional[Exception]]]
+    ) -> Dict[str, int]:
+        counts = {"sent": 0, "retried": 0, "failed": 0}
+        now = datetime.utcnow()
+        for entry_id, error in outcomes:
+            entry = entries[entry_id]
+            entry.attempts += 1
+            if error is None:
+                entry.status = "sent"
+                entry.sent_at = now
+                entry.last_error = None
+                counts["sent"] += 1
+            elif _is_permanent(error) or entry.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+                entry.status = "failed"
+                entry.last_error = str(error)[:1000]
+                counts["failed"] += 1
+                logger.error(f"Email {entry_id} to {entry.to_email} failed permanently: {error}")
+            else:
+                entry.next_attempt_at = now + timedelta(seconds=backoff_seconds(entry.attempts))
+                entry.last_error = str(error)[:1000]
+                counts["retried"] += 1
+                logger.warning(f"Email {entry_id} to {entry.to_email} failed (attempt {entry.attempts}): {error}")
+        db.commit()
+
+        for outcome, count in counts.items():
+            if count:
+                EMAILS_SENT.inc(count, outcome=outcome)
+        return counts
+
+    async def start(self) -> None:
+        if not settings.EMAIL_OUTBOX_ENABLED or self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name="email-outbox-sender")
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            try:
+                if self.lock.acquire():
+                    counts = await asyncio.to_thread(self.process_batch)
+                    if sum(counts.values()) >= settings.EMAIL_OUTBOX_BATCH_SIZE:
+                        continue  # 还有积压，立即处理下一批
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Email outbox sender error: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=settings.EMAIL_OUTBOX_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._wakeup = None
+        self._loop = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self.pool.close_all()
+        self.lock.release()
+
+    # ------------------------------------------------------------------
+    # Housekeeping
+    # ------------------------------------------------------------------
+
+    def purge(self, db: Session) -> dict:
+        """Delete sent and failed rows older than the retention window."""
+        cutoff = datetime.utcnow() - timedelta(days=settings.EMAIL_OUTBOX_RETENTION_DAYS)
+        deleted = db.query(EmailOutbox).filter(
+            EmailOutbox.status.in_(("sent", "failed")),
+            EmailOutbox.created_at < cutoff,
+        ).delete(synchronize_session=False)
+        db.commit()
+        return {"deleted": deleted}
+
+    def get_status(self, db: Session) -> dict:
+        counts = dict(db.execute(
+            select(EmailOutbox.status, func.count()).group_by(EmailOutbox.status)
+        ).all())
+        oldest = db.execute(
+            select(func.min(EmailOutbox.created_at)).where(EmailOutbox.status == "pending")
+        ).scalar()
+        return {
+            "enabled": settings.EMAIL_OUTBOX_ENABLED,
+            "running": self.running,
+            "is_leader": self.lock.is_leader,
+            "counts": counts,
+            "oldest_pending_age_seconds": (
+                round((datetime.utcnow() - oldest).total_seconds(), 1) if oldest else None
+            ),
+            "pool": self.pool.get_stats(),
+        }
+
+
+# 全局实例
+email_outbox = EmailOutboxService()
+
+
+def get_email_outbox() -> EmailOutboxService:
+    return email_outbox
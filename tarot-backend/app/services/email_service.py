@@ -7,12 +7,13 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.utils import formataddr, formatdate
 from email.header import Header
-from typing import Optional, List
+from typing import Optional, List, Tuple
 from jinja2 import Environment, FileSystemLoader, select_autoescape
 import os
 from pathlib import Path
 
 from app.config import settings
+from app.services.email_templates import EmailTemplateRegistry
 
 # 配置日志
 logger = logging.getLogger(__name__)
@@ -37,6 +38,9 @@ class EmailService:
             autoescape=select_autoescape(['html', 'xml'])
         )
 
+        # 验证/重置邮件使用预编译模板骨架，只替换收件人相关字段
+        self.templates = EmailTemplateRegistry(templates_dir, html_to_text=self._html_to_text)
+
     def _create_smtp_connection(self) -> smtplib.SMTP:
         """创建SMTP连接"""
         try:
@@ -60,6 +64,31 @@ class EmailService:
             logger.error(f"SMTP连接失败: {e}")
             raise EmailServiceError(f"无法连接到邮件服务器: {e}")
 
+    def build_message(
+        self,
+        to_email: str,
+        subject: str,
+        text_content: str,
+        html_content: Optional[str] = None
+    ) -> str:
+        """构建 MIME 邮件并序列化为字符串"""
+        msg = MIMEMultipart('alternative')
+        msg['Subject'] = Header(subject, 'utf-8')
+        msg['From'] = self.from_address  # 直接使用地址，不使用formataddr
+        msg['To'] = to_email  # 直接使用邮箱地址
+
+        # 设置邮件日期
+        msg['Date'] = formatdate(localtime=True)
+
+        # 添加纯文本内容
+        msg.attach(MIMEText(text_content, 'plain', 'utf-8'))
+
+        # 添加HTML内容（如果提供）
+        if html_content:
+            msg.attach(MIMEText(html_content, 'html', 'utf-8'))
+
+        return msg.as_string()
+
     def send_email(
         self,
         to_email: str,
@@ -83,29 +112,12 @@ class EmailService:
         """
         smtp = None
         try:
-            # 创建邮件对象
-            msg = MIMEMultipart('alternative')
-            msg['Subject'] = Header(subject, 'utf-8')
-            msg['From'] = self.from_address  # 直接使用地址，不使用formataddr
-            msg['To'] = to_email  # 直接使用邮箱地址
-
-            # 设置邮件日期
-            msg['Date'] = formatdate(localtime=True)
-
-            # 添加纯文本内容
-            text_part = MIMEText(text_content, 'plain', 'utf-8')
-            msg.attach(text_part)
-
-            # 添加HTML内容（如果提供）
-            if html_content:
-                html_part = MIMEText(html_content, 'html', 'utf-8')
-                msg.attach(html_part)
+            text = self.build_message(to_email, subject, text_content, html_content)
 
             # 创建SMTP连接
             smtp = self._create_smtp_connection()
 
             # 发送邮件
-            text = msg.as_string()
             smtp.sendmail(self.from_address, [to_email], text)
 
             logger.info(f"邮件发送成功: {to_email}")
@@ -150,18 +162,7 @@ class EmailService:
             bool: 发送是否成功
         """
         try:
-            # 渲染HTML模板
-            html_template = self.template_env.get_template(f"{template_name}.html")
-            html_content = html_template.render(**context)
-
-            # 尝试渲染文本模板（如果存在）
-            text_content = ""
-            try:
-                text_template = self.template_env.get_template(f"{template_name}.txt")
-                text_content = text_template.render(**context)
-            except Exception:
-                # 如果没有文本模板，从HTML中生成简单的文本内容
-                text_content = self._html_to_text(html_content)
+            html_content, text_content = self.render_template(template_name, context)
 
             return self.send_email(
                 to_email=to_email,
@@ -175,6 +176,50 @@ class EmailService:
             logger.error(f"模板邮件发送失败 {to_email}: {e}")
             return False
 
+    def render_template(self, template_name: str, context: dict) -> Tuple[str, str]:
+        """渲染模板，返回 (HTML内容, 纯文本内容)"""
+        # 渲染HTML模板
+        html_template = self.template_env.get_template(f"{template_name}.html")
+        html_content = html_template.render(**context)
+
+        # 尝试渲染文本模板（如果存在）
+        try:
+            text_template = self.template_env.get_template(f"{template_name}.txt")
+            text_content = text_template.render(**context)
+        except Exception:
+            # 如果没有文本模板，从HTML中生成简单的文本内容
+            text_content = self._html_to_text(html_content)
+
+        return html_content, text_content
+
+    def render_verification_email(
+        self,
+        verification_token: str,
+        user_name: Optional[str] = None,
+        locale: Optional[str] = None
+    ) -> Tuple[str, str, str]:
+        """渲染邮箱验证邮件（预编译模板），返回 (主题, 纯文本内容, HTML内容)"""
+        return self.templates.render(
+            "email_verification",
+            locale,
+            user_name=user_name or "用户",
+            verification_url=f"{settings.APP_BASE_URL}/api/v1/auth/email/verify?token={verification_token}",
+        )
+
+    def render_password_reset_email(
+        self,
+        reset_token: str,
+        user_name: Optional[str] = None,
+        locale: Optional[str] = None
+    ) -> Tuple[str, str, str]:
+        """渲染密码重置邮件（预编译模板），返回 (主题, 纯文本内容, HTML内容)"""
+        return self.templates.render(
+            "password_reset",
+            locale,
+            user_name=user_name or "用户",
+            reset_url=f"{settings.APP_BASE_URL}/api/v1/auth/email/reset-password?token={reset_token}",
+        )
+
     def send_verification_email(
         self,
         to_email: str,
@@ -192,20 +237,12 @@ class EmailService:
         Returns:
             bool: 发送是否成功
         """
-        verification_url = f"{settings.APP_BASE_URL}/api/v1/auth/email/verify?token={verification_token}"
-
-        context = {
-            "user_name": user_name or "用户",
-            "verification_url": verification_url,
-            "app_name": self.from_name,
-            "expires_hours": 24
-        }
-
-        return self.send_template_email(
+        subject, text_content, html_content = self.render_verification_email(verification_token, user_name)
+        return self.send_email(
             to_email=to_email,
-            template_name="email_verification",
-            context=context,
-            subject="验证您的邮箱地址",
+            subject=subject,
+            text_content=text_content,
+            html_content=html_content,
             to_name=user_name
         )
 
@@ -226,20 +263,12 @@ class EmailService:
         Returns:
             bool: 发送是否成功
         """
-        reset_url = f"{settings.APP_BASE_URL}/api/v1/auth/email/reset-password?token={reset_token}"
-
-        context = {
-            "user_name": user_name or "用户",
-            "reset_url": reset_url,
-            "app_name": self.from_name,
-            "expires_hours": 1  # 密码重置链接1小时有效
-        }
-
-        return self.send_template_email(
+        subject, text_content, html_content = self.render_password_reset_email(reset_token, user_name)
+        return self.send_email(
             to_email=to_email,
-            template_name="password_reset",
-            context=context,
-            subject="重置您的密码",
+            subject=subject,
+            text_content=text_content,
+            html_content=html_content,
             to_name=user_name
         )
 
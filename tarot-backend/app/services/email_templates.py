@@ -0,0 +1,144 @@
+"""
+Precompiled transactional email templates.
+
+Verification and reset emails differ per recipient only in a couple of
+fields (name, link). Each template is rendered through Jinja once per locale
+with placeholder markers in place of those fields; the result is split into
+static segments, so building an email is a join of cached strings plus the
+escaped field values. The output is identical to rendering the Jinja
+template with the same context.
+
+Locale-specific templates live in ``templates/email/<locale>/``; missing
+locales fall back to the templates in ``templates/email/``.
+"""
+import re
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+from jinja2 import Environment, FileSystemLoader, TemplateNotFound, select_autoescape
+from markupsafe import escape
+
+from ..config import settings
+
+# 私有区字符作为占位符边界：不会出现在模板中，也不会被 HTML 转义改写
+_MARKER = "\ue000{}\ue001"
+_MARKER_RE = re.compile("\ue000([a-z_]+)\ue001")
+
+TEMPLATES_DIR = Path(__file__).parent.parent / "templates" / "email"
+
+
+@dataclass(frozen=True)
+class EmailTemplateSpec:
+    """Per-template subject, per-recipient fields and static context."""
+
+    subject: str
+    fields: Tuple[str, ...]
+    static_context: Tuple[Tuple[str, object], ...] = ()
+
+
+EMAIL_TEMPLATES: Dict[str, EmailTemplateSpec] = {
+    "email_verification": EmailTemplateSpec(
+        subject="验证您的邮箱地址",
+        fields=("user_name", "verification_url"),
+        static_context=(("expires_hours", 24),),
+    ),
+    "password_reset": EmailTemplateSpec(
+        subject="重置您的密码",
+        fields=("user_name", "reset_url"),
+        static_context=(("expires_hours", 1),),  # 密码重置链接1小时有效
+    ),
+}
+
+
+class _Skeleton:
+    """Static segments with field names at the odd positions."""
+
+    __slots__ = ("parts", "escape")
+
+    def __init__(self, rendered: str, escape_values: bool):
+        self.parts = _MARKER_RE.split(rendered)
+        self.escape = escape_values
+
+    def render(self, values: Dict[str, str]) -> str:
+        parts = list(self.parts)
+        for index in range(1, len(parts), 2):
+            value = values[parts[index]]
+            parts[index] = str(escape(value)) if self.escape else value
+        return "".join(parts)
+
+
+@dataclass
+class CompiledEmailTemplate:
+    subject: str
+    html: _Skeleton
+    text: _Skeleton
+
+    def render(self, **values: str) -> Tuple[str, str, str]:
+        """Return ``(subject, text_body, html_body)``."""
+        return self.subject, self.text.render(values), self.html.render(values)
+
+
+class EmailTemplateRegistry:
+    """按语言编译并缓存邮件模板骨架"""
+
+    def __init__(
+        self,
+        templates_dir: Path = TEMPLATES_DIR,
+        html_to_text: Optional[Callable[[str], str]] = None
+    ):
+        self.templates_dir = Path(templates_dir)
+        self.env = Environment(
+            loader=FileSystemLoader(str(self.templates_dir)),
+            autoescape=select_autoescape(['html', 'xml'])
+        )
+        self.html_to_text = html_to_text
+        self._compiled: Dict[Tuple[str, str], CompiledEmailTemplate] = {}
+        self._lock = threading.Lock()
+
+    def _get_template(self, name: str, locale: str):
+        try:
+            return self.env.get_template(f"{locale}/{name}")
+        except TemplateNotFound:
+            return self.env.get_template(name)
+
+    def compile(self, template_name: str, locale: str) -> CompiledEmailTemplate:
+        spec = EMAIL_TEMPLATES[template_name]
+        context = {"app_name": settings.EMAIL_FROM_NAME, **dict(spec.static_context)}
+        context.update({field: _MARKER.format(field) for field in spec.fields})
+
+        html = self._get_template(f"{template_name}.html", locale).render(**context)
+        try:
+            text = self._get_template(f"{template_name}.txt", locale).render(**context)
+        except TemplateNotFound:
+            # 没有文本模板时从HTML骨架生成一次，占位符会原样保留
+            text = self.html_to_text(html) if self.html_to_text else html
+
+        return CompiledEmailTemplate(
+            subject=spec.subject,
+            html=_Skeleton(html, escape_values=True),
+            text=_Skeleton(text, escape_values=False),
+        )
+
+    def get(self, template_name: str, locale: Optional[str] = None) -> CompiledEmailTemplate:
+        key = (template_name, locale or settings.EMAIL_DEFAULT_LOCALE)
+        compiled = self._compiled.get(key)
+        if compiled is None:
+            with self._lock:
+                compiled = self._compiled.get(key)
+                if compiled is None:
+                    compiled = self.compile(*key)
+                    self._compiled[key] = compiled
+        return compiled
+
+    def compile_all(self, locales: Optional[Sequence[str]] = None) -> int:
+        """Compile every known template for the given locales (called at startup)."""
+        locales = locales or settings.EMAIL_TEMPLATE_LOCALES
+        for locale in locales:
+            for template_name in EMAIL_TEMPLATES:
+                self.get(template_name, locale)
+        return len(self._compiled)
+
+    def render(self, template_name: str, locale: Optional[str] = None, **values: str) -> Tuple[str, str, str]:
+        return self.get(template_name, locale).render(**values)
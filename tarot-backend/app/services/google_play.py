@@ -1,15 +1,24 @@
 """
 Google Play Developer API Integration Service
+
+googleapiclient calls are blocking, so every ``.execute()`` runs in a bounded
+thread pool under a per-call deadline and never on the event loop. httplib2
+connections are not thread-safe; each pool thread keeps its own authorized
+``Http`` (and so its own keep-alive connection). Purchase tokens in the
+purchased state are cached for ``GOOGLE_PLAY_TOKEN_CACHE_TTL_SECONDS``;
+pending and cancelled results are not cached. The Google client libraries are
+imported on first use.
 """
+import asyncio
 import json
 import logging
-from typing import Optional, Dict, Any
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Callable, Optional, Dict, Any, Tuple
 from datetime import datetime
-from google.auth.credentials import Credentials
-from google.auth import default
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
+
 from sqlalchemy.orm import Session
 
 from app.config import settings
@@ -18,9 +27,75 @@ from app.models.user import User
 from app.models.transaction import CreditTransaction
 from app.services.user_service import UserService
 from app.schemas.payment import GooglePlayPurchaseRequest, GooglePlayPurchaseResponse
+from app.utils.lazy_import import lazy_import
+from app.utils.metrics import registry
+
+if TYPE_CHECKING:
+    from google.auth.credentials import Credentials
+
+# Google API 客户端库导入很慢，首次使用时才加载（未启用 Google Play 的 worker 不加载）
+httplib2 = lazy_import("httplib2")
+google_auth_httplib2 = lazy_import("google_auth_httplib2")
+google_credentials = lazy_import("google.auth.credentials")
+service_account = lazy_import("google.oauth2.service_account")
+discovery = lazy_import("googleapiclient.discovery")
+googleapiclient_errors = lazy_import("googleapiclient.errors")
 
 logger = logging.getLogger(__name__)
 
+GOOGLE_PLAY_CALL_SECONDS = registry.histogram(
+    "google_play_call_duration_seconds", "Google Play Developer API call latency", ("operation",)
+)
+GOOGLE_PLAY_CALLS = registry.counter(
+    "google_play_calls_total", "Google Play Developer API calls", ("operation", "result")
+)
+GOOGLE_PLAY_TOKEN_CACHE = registry.counter(
+    "google_play_token_cache_total", "Purchase token lookups served from the verification cache", ("result",)
+)
+
+
+class GooglePlayTimeoutError(Exception):
+    """A Google Play API call did not finish within its deadline."""
+
+
+class PurchaseTokenCache:
+    """按 (商品ID, 购买令牌) 缓存 Google Play 返回的购买状态（有界、带 TTL）"""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, product_id: str, token: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get((product_id, token))
+            if entry is None:
+                return None
+            if time.monotonic() - entry[1] > self.ttl_seconds:
+                del self._entries[(product_id, token)]
+                return None
+            return dict(entry[0])
+
+    def put(self, product_id: str, token: str, result: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[(product_id, token)] = (dict(result), time.monotonic())
+            self._entries.move_to_end((product_id, token))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def update(self, product_id: str, token: str, **fields: Any) -> None:
+        """Apply a state change we caused (acknowledge/consume) to a cached entry."""
+        with self._lock:
+            entry = self._entries.get((product_id, token))
+            if entry is not None:
+                entry[0].update(fields)
+
+    def invalidate(self, token: str) -> None:
+        with self._lock:
+            for key in [key for key in self._entries if key[1] == token]:
+                del self._entries[key]
+
 
 class GooglePlayService:
     """Google Play Developer API service for purchase verification"""
@@ -28,6 +103,13 @@ class GooglePlayService:
     def __init__(self):
         self.package_name = settings.GOOGLE_PACKAGE_NAME
         self.service = None
+        self._credentials: Optional["Credentials"] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self._local = threading.local()
+        self.token_cache = PurchaseTokenCache(
+            settings.GOOGLE_PLAY_TOKEN_CACHE_MAX_ENTRIES, settings.GOOGLE_PLAY_TOKEN_CACHE_TTL_SECONDS
+        )
         self._initialize_service()
 
     def _initialize_service(self):
@@ -37,24 +119,89 @@ class GooglePlayService:
                 logger.info("Google Play API is disabled")
                 return
 
-            if not settings.GOOGLE_PLAY_SERVICE_ACCOUNT_JSON:
+            api_root = settings.GOOGLE_PLAY_API_ROOT
+            if settings.GOOGLE_PLAY_SERVICE_ACCOUNT_JSON:
+                # Load service account credentials
+                credentials = service_account.Credentials.from_service_account_file(
+                    settings.GOOGLE_PLAY_SERVICE_ACCOUNT_JSON,
+                    scopes=['https://www.googleapis.com/auth/androidpublisher']
+                )
+            elif api_root:
+                # 本地/测试用的 androidpublisher 假服务器不校验身份
+                credentials = google_credentials.AnonymousCredentials()
+            else:
                 logger.error("Google Play service account JSON path not configured")
                 return
 
-            # Load service account credentials
-            credentials = service_account.Credentials.from_service_account_file(
-                settings.GOOGLE_PLAY_SERVICE_ACCOUNT_JSON,
-                scopes=['https://www.googleapis.com/auth/androidpublisher']
+            # Build the service (bundled discovery document, no network fetch)
+            self.service = discovery.build(
+                'androidpublisher',
+                'v3',
+                credentials=credentials,
+                static_discovery=True,
+                cache_discovery=False,
+                client_options={"api_endpoint": api_root} if api_root else None
             )
-
-            # Build the service
-            self.service = build('androidpublisher', 'v3', credentials=credentials)
+            self._credentials = credentials
             logger.info("Google Play Developer API service initialized successfully")
 
         except Exception as e:
             logger.error(f"Failed to initialize Google Play service: {e}")
             self.service = None
 
+    def _http(self) -> Optional["httplib2.Http"]:
+        """Authorized Http of the current pool thread (httplib2 is not thread-safe)."""
+        if self._credentials is None:
+            return None
+        http = getattr(self._local, "http", None)
+        if http is None:
+            http = google_auth_httplib2.AuthorizedHttp(
+                self._credentials,
+                http=httplib2.Http(timeout=settings.GOOGLE_PLAY_TIMEOUT_SECONDS)
+            )
+            self._local.http = http
+        return http
+
+    def _pool(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=settings.GOOGLE_PLAY_MAX_WORKERS,
+                    thread_name_prefix="google-play"
+                )
+            return self._executor
+
+    async def _execute(self, operation: str, build_request: Callable[[], Any]) -> Any:
+        """
+        Run ``build_request().execute()`` in the pool within ``GOOGLE_PLAY_DEADLINE_SECONDS``.
+
+        The deadline includes time spent waiting for a free pool thread.
+
+        Raises:
+            GooglePlayTimeoutError: If the deadline passes first
+        """
+        def run() -> Any:
+            return build_request().execute(http=self._http(), num_retries=settings.GOOGLE_PLAY_NUM_RETRIES)
+
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        result = "error"
+        try:
+            response = await asyncio.wait_for(
+                loop.run_in_executor(self._pool(), run),
+                timeout=settings.GOOGLE_PLAY_DEADLINE_SECONDS
+            )
+            result = "ok"
+            return response
+        except asyncio.TimeoutError:
+            result = "timeout"
+            raise GooglePlayTimeoutError(
+                f"Google Play {operation} exceeded {settings.GOOGLE_PLAY_DEADLINE_SECONDS}s"
+            ) from None
+        finally:
+            GOOGLE_PLAY_CALLS.inc(operation=operation, result=result)
+            GOOGLE_PLAY_CALL_SECONDS.observe(time.perf_counter() - started, operation=operation)
+
     async def verify_purchase(
         self,
         db: Session,
@@ -148,6 +295,13 @@ class GooglePlayService:
                 new_balance=new_balance
             )
 
+        except GooglePlayTimeoutError as e:
+            logger.warning(str(e))
+            return GooglePlayPurchaseResponse(
+                success=False,
+                error="Google Play verification timed out, please retry",
+                order_id=None
+            )
         except Exception as e:
             db.rollback()
             logger.error(f"Error verifying Google Play purchase: {e}")
@@ -171,14 +325,27 @@ class GooglePlayService:
 
         Returns:
             Purchase information if valid, None if invalid
+
+        Raises:
+            GooglePlayTimeoutError: If Google Play did not answer in time
         """
         try:
-            # Call Google Play API to verify the purchase
-            result = self.service.purchases().products().get(
-                packageName=self.package_name,
-                productId=product_id,
-                token=purchase_token
-            ).execute()
+            result = self.token_cache.get(product_id, purchase_token)
+            GOOGLE_PLAY_TOKEN_CACHE.inc(result="miss" if result is None else "hit")
+            if result is None:
+                # Call Google Play API to verify the purchase
+                result = await self._execute(
+                    "products.get",
+                    lambda: self.service.purchases().products().get(
+                        packageName=self.package_name,
+                        productId=product_id,
+                        token=purchase_token
+                    )
+                )
+                if result.get('purchaseState') == 0:
+                    # 仅缓存已完成的购买；挂起（2）等状态随时可能变化，而缓存按 worker
+                    # 独立，RTDN 处理器只能失效本 worker 的条目
+                    self.token_cache.put(product_id, purchase_token, result)
 
             # Check purchase state (0 = purchased, 1 = canceled)
             if result.get('purchaseState') != 0:
@@ -192,7 +359,9 @@ class GooglePlayService:
 
             return result
 
-        except HttpError as e:
+        except GooglePlayTimeoutError:
+            raise
+        except googleapiclient_errors.HttpError as e:
             logger.error(f"Google Play API error: {e}")
             return None
         except Exception as e:
@@ -218,11 +387,15 @@ class GooglePlayService:
             return False
 
         try:
-            self.service.purchases().products().acknowledge(
-                packageName=self.package_name,
-                productId=product_id,
-                token=purchase_token
-            ).execute()
+            await self._execute(
+                "products.acknowledge",
+                lambda: self.service.purchases().products().acknowledge(
+                    packageName=self.package_name,
+                    productId=product_id,
+                    token=purchase_token
+                )
+            )
+            self.token_cache.update(product_id, purchase_token, acknowledgementState=1)
 
             logger.info(f"Successfully acknowledged purchase: {purchase_token}")
             return True
@@ -253,11 +426,15 @@ class GooglePlayService:
 
         try:
             # Mark as consumed in Google Play
-            self.service.purchases().products().consume(
-                packageName=self.package_name,
-                productId=product_id,
-                token=purchase_token
-            ).execute()
+            await self._execute(
+                "products.consume",
+                lambda: self.service.purchases().products().consume(
+                    packageName=self.package_name,
+                    productId=product_id,
+                    token=purchase_token
+                )
+            )
+            self.token_cache.update(product_id, purchase_token, consumptionState=1)
 
             # Update purchase record in database
             purchase = db.query(Purchase).filter(
@@ -316,11 +493,14 @@ class GooglePlayService:
             return None
 
         try:
-            result = self.service.purchases().subscriptions().get(
-                packageName=self.package_name,
-                subscriptionId=subscription_id,
-                token=purchase_token
-            ).execute()
+            result = await self._execute(
+                "subscriptions.get",
+                lambda: self.service.purchases().subscriptions().get(
+                    packageName=self.package_name,
+                    subscriptionId=subscription_id,
+                    token=purchase_token
+                )
+            )
 
             return result
 
@@ -5,20 +5,15 @@ import asyncio
 import json
 import logging
 import re
+import time
 from typing import Any, Dict, List, Optional
 
 from ..utils.locale import is_english_locale
 from ..utils.logger import api_logger  # 添加日志导入
-try:
-    from zhipuai import ZhipuAI
-except ImportError:
-    ZhipuAI = None
-
-try:
-    from openai import OpenAI
-except ImportError:
-    OpenAI = None
-
+from ..utils.metrics import LLM_LATENCY, record_llm_usage
+from ..utils.tracing import start_span, traced
+from ..utils.lazy_import import optional_attr
+from .llm_usage_service import llm_usage_service
 from ..config import settings
 
 
@@ -32,11 +27,13 @@ class LLMService:
         self._initialize_clients()
 
     def _initialize_clients(self):
-        """初始化可用的 LLM 客户端"""
-        if ZhipuAI and self.config.ZHIPUAI_API_KEY:
+        """初始化可用的 LLM 客户端（只导入已配置 API Key 的 SDK）"""
+        ZhipuAI = optional_attr("zhipuai", "ZhipuAI") if self.config.ZHIPUAI_API_KEY else None
+        if ZhipuAI:
             self.clients['zhipu'] = ZhipuAI(api_key=self.config.ZHIPUAI_API_KEY)
 
-        if OpenAI and self.config.OPENAI_API_KEY:
+        OpenAI = optional_attr("openai", "OpenAI") if self.config.OPENAI_API_KEY else None
+        if OpenAI:
             self.clients['openai'] = OpenAI(
                 api_key=self.config.OPENAI_API_KEY,
                 base_url=self.config.OPENAI_BASE_URL
@@ -55,19 +52,27 @@ class LLMService:
         locale: Optional[str] = None,
         provider: Optional[str] = None,
         model: Optional[str] = None,
-        force_json: bool = False
+        force_json: bool = False,
+        endpoint: Optional[str] = None
     ) -> Optional[str]:
-        """调用AI API生成内容（异步版本）"""
+        """调用AI API生成内容（异步版本）；endpoint 标记调用来源，写入用量账本"""
         resolved_provider, resolved_model = self._resolve_provider_and_model(locale, provider, model)
         try:
-            # 在线程池中执行同步API调用
-            return await asyncio.to_thread(
-                self._call_ai_api_sync,
-                prompt,
-                resolved_provider,
-                resolved_model,
-                force_json
-            )
+            # 在线程池中执行同步API调用（子 span 的开始时间减去本 span 即线程池排队时间）
+            with start_span("LLMService.call_ai_api", {
+                "llm.provider": resolved_provider,
+                "llm.model": resolved_model,
+                "llm.prompt_length": len(prompt),
+            }):
+                return await asyncio.to_thread(
+                    self._call_ai_api_sync,
+                    prompt,
+                    resolved_provider,
+                    resolved_model,
+                    force_json,
+                    locale,
+                    endpoint
+                )
         except Exception as e:
             api_logger.log_error(
                 "llm_api_call",
@@ -76,12 +81,22 @@ class LLMService:
             )
             return None
 
-    def _call_ai_api_sync(self, prompt: str, provider: str, model: str, force_json: bool) -> Optional[str]:
+    @traced("llm.provider_request")
+    def _call_ai_api_sync(
+        self,
+        prompt: str,
+        provider: str,
+        model: str,
+        force_json: bool,
+        locale: Optional[str] = None,
+        endpoint: Optional[str] = None
+    ) -> Optional[str]:
         """同步版本的AI API调用"""
         client = self.clients.get(provider)
         if not client:
             raise ValueError(f"LLM provider '{provider}' is not initialized")
 
+        started = time.perf_counter()
         try:
             if provider == 'zhipu':
                 response = client.chat.completions.create(
@@ -105,8 +120,20 @@ class LLMService:
             else:
                 raise ValueError(f"Unsupported provider: {provider}")
 
-            return response.choices[0].message.content.strip()
+            elapsed = time.perf_counter() - started
+            usage = getattr(response, "usage", None)
+            content = response.choices[0].message.content
+            LLM_LATENCY.observe(elapsed, provider=provider, model=model, outcome="success")
+            record_llm_usage(provider, model, usage)
+            llm_usage_service.record_call(
+                provider, model, elapsed, "success" if content else "empty",
+                usage=usage, locale=locale, endpoint=endpoint
+            )
+            return content.strip() if content else content
         except Exception as e:
+            elapsed = time.perf_counter() - started
+            LLM_LATENCY.observe(elapsed, provider=provider, model=model, outcome="error")
+            llm_usage_service.record_call(provider, model, elapsed, "error", locale=locale, endpoint=endpoint)
             api_logger.log_error(
                 f"{provider}_api_call",
                 e,
@@ -159,7 +186,8 @@ class LLMService:
         self,
         description: str,
         spread_type: str = "three-card",
-        locale: str = "zh-CN"
+        locale: str = "zh-CN",
+        endpoint: str = "readings.analyze"
     ) -> tuple[List[str], str]:
         """
         分析用户描述，返回推荐的维度名称列表和统一的描述。
@@ -168,12 +196,17 @@ class LLMService:
             raise ValueError(f"Unsupported spread type: {spread_type}")
 
         try:
-            return await self._analyze_for_three_card(description, locale)
+            return await self._analyze_for_three_card(description, locale, endpoint)
         except Exception as e:
             api_logger.log_error("analyze_user_description", e, {"description_length": len(description)})
             raise
 
-    async def _analyze_for_three_card(self, description: str, locale: str) -> tuple[List[str], str]:
+    async def _analyze_for_three_card(
+        self,
+        description: str,
+        locale: str,
+        endpoint: str = "readings.analyze"
+    ) -> tuple[List[str], str]:
         """
         三牌阵专用分析：基于因果率和发展趋势动态确定三个维度
         """
@@ -251,7 +284,7 @@ DESCRIPTION:
 请使用简体中文输出，确保三个维度类别名称完全一致。"""
 
         try:
-            result = await self.call_ai_api(analysis_prompt, locale=locale)
+            result = await self.call_ai_api(analysis_prompt, locale=locale, endpoint=endpoint)
             if result:
                 dimensions, summary = self._parse_combined_result(result)
                 if dimensions:
@@ -261,6 +294,7 @@ DESCRIPTION:
             api_logger.log_error("analyze_three_card_question", e, {"description_length": len(description)})
             raise
 
+    @traced("llm.parse")
     def _parse_combined_result(self, result: str) -> tuple[List[str], str]:
         """解析合并的LLM结果，提取维度和描述"""
         try:
@@ -326,7 +360,8 @@ DESCRIPTION:
         raw_result = await self.call_ai_api(
             prompt=prompt,
             locale=locale,
-            force_json=True
+            force_json=True,
+            endpoint="readings.generate"
         )
         if not raw_result:
             raise ValueError("LLM调用失败，未返回解读内容")
@@ -380,6 +415,7 @@ DESCRIPTION:
             prepared.append(dim_dict)
         return prepared
 
+    @traced("llm.build_prompt")
     def _build_three_card_prompt(
         self,
         cards_info: List[Dict[str, Any]],
@@ -552,6 +588,7 @@ Always respond in English."""
             return f"Position {position}"
         return f"位置{position}"
 
+    @traced("llm.parse")
     def _parse_three_card_interpretation(self, raw_result: str) -> Dict[str, Any]:
         """解析LLM返回的完整解读结果。"""
         try:
@@ -0,0 +1,163 @@
+"""
+LLM usage ledger: records every LLM call and aggregates latency, tokens and cost.
+"""
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import case, func, select
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models import LLMCallLog
+from ..utils.batch_writer import BatchWriter
+
+
+def estimate_cost(model: str, prompt_tokens: Optional[int], completion_tokens: Optional[int]) -> Optional[float]:
+    """Cost in USD from ``LLM_PRICING`` (model -> [input, output] USD per million tokens)."""
+    pricing = settings.LLM_PRICING.get(model)
+    if not pricing or (prompt_tokens is None and completion_tokens is None):
+        return None
+    input_price, output_price = pricing
+    return round(((prompt_tokens or 0) * input_price + (completion_tokens or 0) * output_price) / 1_000_000, 8)
+
+
+def _usage_value(usage: Any, key: str) -> Optional[int]:
+    if usage is None:
+        return None
+    value = usage.get(key) if isinstance(usage, dict) else getattr(usage, key, None)
+    return int(value) if value is not None else None
+
+
+class LLMUsageService:
+    """LLM 调用用量记录与统计"""
+
+    def __init__(self):
+        self.writer = BatchWriter(
+            "llm_call_logs",
+            LLMCallLog,
+            max_queue=settings.LLM_USAGE_QUEUE_SIZE,
+            batch_size=200,
+            flush_interval=2.0,
+        )
+
+    def record_call(
+        self,
+        provider: str,
+        model: str,
+        latency_seconds: float,
+        outcome: str,
+        usage: Any = None,
+        locale: Optional[str] = None,
+        endpoint: Optional[str] = None
+    ) -> bool:
+        """Queue one call for the ledger (never blocks the caller)."""
+        if not settings.LLM_USAGE_LOG_ENABLED:
+            return False
+
+        prompt_tokens = _usage_value(usage, "prompt_tokens")
+        completion_tokens = _usage_value(usage, "completion_tokens")
+        return self.writer.submit({
+            "created_at": datetime.utcnow(),
+            "provider": provider,
+            "model": model,
+            "locale": locale,
+            "endpoint": endpoint,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "latency_ms": int(latency_seconds * 1000),
+            "outcome": outcome,
+            "cost_usd": estimate_cost(model, prompt_tokens, completion_tokens),
+        })
+
+    def get_daily_model_stats(self, db: Session, days: int = 7) -> List[Dict[str, Any]]:
+        """
+        Per model per day: calls, errors, p50/p95 latency, tokens and cost.
+
+        Percentiles use the nearest-rank method over a window function, so the
+        whole aggregation runs in the database.
+        """
+        since = datetime.utcnow() - timedelta(days=days)
+        day = func.date(LLMCallLog.created_at)
+        ranked = select(
+            day.label("day"),
+            LLMCallLog.model,
+            LLMCallLog.outcome,
+            LLMCallLog.latency_ms,
+            LLMCallLog.prompt_tokens,
+            LLMCallLog.completion_tokens,
+            LLMCallLog.cost_usd,
+            func.row_number().over(partition_by=(day, LLMCallLog.model), order_by=LLMCallLog.latency_ms).label("rn"),
+            func.count().over(partition_by=(day, LLMCallLog.model)).label("cnt"),
+        ).where(LLMCallLog.created_at >= since).subquery()
+
+        rows = db.execute(
+            select(
+                ranked.c.day,
+                ranked.c.model,
+                func.count().label("calls"),
+                func.sum(case((ranked.c.outcome != "success", 1), else_=0)).label("failures"),
+                func.min(case((ranked.c.rn >= ranked.c.cnt * 0.5, ranked.c.latency_ms))).label("p50"),
+                func.min(case((ranked.c.rn >= ranked.c.cnt * 0.95, ranked.c.latency_ms))).label("p95"),
+                func.avg(ranked.c.latency_ms).label("avg_latency"),
+                func.coalesce(func.sum(ranked.c.prompt_tokens), 0).label("prompt_tokens"),
+                func.coalesce(func.sum(ranked.c.completion_tokens), 0).label("completion_tokens"),
+                func.sum(ranked.c.cost_usd).label("cost_usd"),
+            )
+            .group_by(ranked.c.day, ranked.c.model)
+            .order_by(ranked.c.day.desc(), ranked.c.model)
+        ).all()
+
+        return [
+            {
+                "day": str(row.day),
+                "model": row.model,
+                "calls": row.calls,
+                "failures": int(row.failures or 0),
+                "p50_latency_ms": row.p50,
+                "p95_latency_ms": row.p95,
+                "avg_latency_ms": round(float(row.avg_latency or 0), 1),
+                "prompt_tokens": int(row.prompt_tokens),
+                "completion_tokens": int(row.completion_tokens),
+                "cost_usd": round(float(row.cost_usd), 6) if row.cost_usd is not None else None,
+            }
+            for row in rows
+        ]
+
+    def get_endpoint_stats(self, db: Session, days: int = 7) -> List[Dict[str, Any]]:
+        """Per endpoint and locale: calls and average tokens/cost per call (i.e. per reading)."""
+        since = datetime.utcnow() - timedelta(days=days)
+        rows = db.execute(
+            select(
+                LLMCallLog.endpoint,
+                LLMCallLog.locale,
+                func.count().label("calls"),
+                func.avg(LLMCallLog.prompt_tokens).label("avg_prompt_tokens"),
+                func.avg(LLMCallLog.completion_tokens).label("avg_completion_tokens"),
+                func.avg(LLMCallLog.cost_usd).label("avg_cost_usd"),
+                func.sum(LLMCallLog.cost_usd).label("cost_usd"),
+            )
+            .where(LLMCallLog.created_at >= since, LLMCallLog.outcome == "success")
+            .group_by(LLMCallLog.endpoint, LLMCallLog.locale)
+            .order_by(func.count().desc())
+        ).all()
+
+        return [
+            {
+                "endpoint": row.endpoint or "unknown",
+                "locale": row.locale,
+                "calls": row.calls,
+                "avg_prompt_tokens": round(float(row.avg_prompt_tokens or 0), 1),
+                "avg_completion_tokens": round(float(row.avg_completion_tokens or 0), 1),
+                "avg_cost_usd": round(float(row.avg_cost_usd), 8) if row.avg_cost_usd is not None else None,
+                "cost_usd": round(float(row.cost_usd), 6) if row.cost_usd is not None else None,
+            }
+            for row in rows
+        ]
+
+
+# 全局实例
+llm_usage_service = LLMUsageService()
+
+
+def get_llm_usage_service() -> LLMUsageService:
+    return llm_usage_service
@@ -0,0 +1,301 @@
+"""
+In-process background maintenance scheduler.
+
+Started from the FastAPI startup hook. Every worker runs the loop, but only the
+worker holding the ``maintenance`` leader lock executes jobs; the others keep
+trying so a replacement takes over if the leader exits. Jobs are synchronous
+database work and run in a thread so they never block the event loop.
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import or_, text
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..database import SessionLocal
+from ..models import EmailVerification
+from .analytics_service import analytics_service
+from .app_release_service import app_release_service
+from .email_outbox import email_outbox
+from .play_notification_service import play_notification_service
+from .release_patch_service import release_patch_service
+from .release_upload_service import release_upload_service
+from ..utils.leader_lock import LeaderLock
+from ..utils.redeem_code import RedeemCodeService
+from ..utils.redeem_guard import redeem_code_guard
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class JobStats:
+    """Run-time metrics of a scheduled job."""
+
+    runs: int = 0
+    failures: int = 0
+    total_duration_ms: float = 0.0
+    last_duration_ms: Optional[float] = None
+    last_started_at: Optional[datetime] = None
+    last_result: Any = None
+    last_error: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "runs": self.runs,
+            "failures": self.failures,
+            "total_duration_ms": round(self.total_duration_ms, 2),
+            "avg_duration_ms": round(self.total_duration_ms / self.runs, 2) if self.runs else None,
+            "last_duration_ms": round(self.last_duration_ms, 2) if self.last_duration_ms is not None else None,
+            "last_started_at": self.last_started_at.isoformat() if self.last_started_at else None,
+            "last_result": self.last_result,
+            "last_error": self.last_error,
+        }
+
+
+@dataclass(slots=True)
+class ScheduledJob:
+    """A periodic job; ``func`` receives a fresh session and returns a JSON-able result."""
+
+    name: str
+    interval_seconds: int
+    func: Callable[[Session], Any]
+    next_run_at: float = 0.0
+    stats: JobStats = field(default_factory=JobStats)
+
+
+# ---------------------------------------------------------------------------
+# Job implementations
+# ---------------------------------------------------------------------------
+
+def expire_redeem_codes(db: Session) -> dict:
+    """Mark expired redeem codes in chunks."""
+    expired = RedeemCodeService.cleanup_expired_codes(db, chunk_size=settings.MAINTENANCE_CHUNK_SIZE)
+    if expired:
+        redeem_code_guard.schedule_rebuild()
+    return {"expired": expired}
+
+
+def purge_email_verifications(db: Session) -> dict:
+    """Delete verification tokens that were used or expired past the retention window."""
+    cutoff = datetime.utcnow() - timedelta(days=settings.EMAIL_VERIFICATION_RETENTION_DAYS)
+    chunk_size = settings.MAINTENANCE_CHUNK_SIZE
+
+    deleted = 0
+    while True:
+        ids = [
+            token_id for (token_id,) in db.query(EmailVerification.id).filter(
+                or_(
+                    EmailVerification.verified_at < cutoff,
+                    EmailVerification.expires_at < cutoff
+                )
+            ).limit(chunk_size)
+        ]
+        if not ids:
+            break
+
+        deleted += db.query(EmailVerification).filter(
+            EmailVerification.id.in_(ids)
+        ).delete(synchronize_session=False)
+        db.commit()
+
+        if len(ids) < chunk_size:
+            break
+
+    return {"deleted": deleted}
+
+
+def refresh_reading_analytics(db: Session) -> dict:
+    """Fold new reading analyze logs into the analytics aggregate tables."""
+    return analytics_service.refresh_aggregates(db, chunk_size=settings.MAINTENANCE_CHUNK_SIZE)
+
+
+def purge_email_outbox(db: Session) -> dict:
+    """Delete delivered and permanently failed outbox rows past the retention window."""
+    return email_outbox.purge(db)
+
+
+def purge_play_notifications(db: Session) -> dict:
+    """Delete processed and permanently failed Google Play notifications past the retention window."""
+    return play_notification_service.purge(db)
+
+
+def purge_release_uploads(db: Session) -> dict:
+    """Remove abandoned chunked release uploads."""
+    return release_upload_service.purge_expired()
+
+
+def generate_release_patches(db: Session) -> dict:
+    """Catch up on patches to the active release (e.g. after a restart during generation)."""
+    if not release_patch_service.enabled:
+        return {"skipped": "disabled"}
+    release = app_release_service.get_latest_release(db)
+    if release is None or not release_patch_service.select_bases(db, release):
+        return {"scheduled": False}
+    return {"scheduled": release_patch_service.schedule(release.id)}
+
+
+def _is_sqlite(db: Session) -> bool:
+    return db.get_bind().dialect.name == "sqlite"
+
+
+def sqlite_optimize(db: Session) -> dict:
+    """Let SQLite refresh statistics for tables whose shape changed."""
+    if not _is_sqlite(db):
+        return {"skipped": "not sqlite"}
+    db.execute(text("PRAGMA optimize"))
+    db.commit()
+    return {"optimized": True}
+
+
+def sqlite_analyze(db: Session) -> dict:
+    """Full ANALYZE so the planner has fresh index statistics."""
+    if not _is_sqlite(db):
+        return {"skipped": "not sqlite"}
+    db.execute(text("ANALYZE"))
+    db.commit()
+    return {"analyzed": True}
+
+
+def sqlite_wal_checkpoint(db: Session) -> dict:
+    """Checkpoint and truncate the WAL file so it does not grow unbounded."""
+    if not _is_sqlite(db):
+        return {"skipped": "not sqlite"}
+    journal_mode = db.execute(text("PRAGMA journal_mode")).scalar()
+    if str(journal_mode).lower() != "wal":
+        return {"skipped": f"journal_mode={journal_mode}"}
+    busy, log_frames, checkpointed = db.execute(text("PRAGMA wal_checkpoint(TRUNCATE)")).one()
+    return {"busy": busy, "log_frames": log_frames, "checkpointed": checkpointed}
+
+
+def default_jobs() -> List[ScheduledJob]:
+    return [
+        ScheduledJob("expire_redeem_codes", settings.MAINTENANCE_EXPIRY_SWEEP_INTERVAL_SECONDS, expire_redeem_codes),
+        ScheduledJob("purge_email_verifications", settings.MAINTENANCE_EMAIL_PURGE_INTERVAL_SECONDS, purge_email_verifications),
+        ScheduledJob("sqlite_optimize", settings.MAINTENANCE_SQLITE_OPTIMIZE_INTERVAL_SECONDS, sqlite_optimize),
+        ScheduledJob("sqlite_analyze", settings.MAINTENANCE_SQLITE_ANALYZE_INTERVAL_SECONDS, sqlite_analyze),
+        ScheduledJob("sqlite_wal_checkpoint", settings.MAINTENANCE_WAL_CHECKPOINT_INTERVAL_SECONDS, sqlite_wal_checkpoint),
+        ScheduledJob("refresh_reading_analytics", settings.MAINTENANCE_ANALYTICS_INTERVAL_SECONDS, refresh_reading_analytics),
+        ScheduledJob("purge_email_outbox", settings.MAINTENANCE_EMAIL_PURGE_INTERVAL_SECONDS, purge_email_outbox),
+        ScheduledJob("purge_play_notifications", settings.MAINTENANCE_EMAIL_PURGE_INTERVAL_SECONDS, purge_play_notifications),
+        ScheduledJob("purge_release_uploads", settings.MAINTENANCE_EXPIRY_SWEEP_INTERVAL_SECONDS, purge_release_uploads),
+        ScheduledJob("generate_release_patches", settings.MAINTENANCE_EXPIRY_SWEEP_INTERVAL_SECONDS, generate_release_patches),
+    ]
+
+
+# ---------------------------------------------------------------------------
+# Scheduler
+# ---------------------------------------------------------------------------
+
+class MaintenanceScheduler:
+    """Runs ``ScheduledJob``s on their cadence in the leader worker."""
+
+    def __init__(
+        self,
+        jobs: Optional[List[ScheduledJob]] = None,
+        session_factory: Callable[[], Session] = SessionLocal,
+        lock: Optional[LeaderLock] = None
+    ):
+        self.jobs: Dict[str, ScheduledJob] = {job.name: job for job in (jobs or default_jobs())}
+        self.session_factory = session_factory
+        self.lock = lock or LeaderLock("maintenance")
+        self.tick_seconds = settings.MAINTENANCE_TICK_SECONDS
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def register(self, job: ScheduledJob) -> None:
+        self.jobs[job.name] = job
+
+    async def start(self) -> None:
+        if not settings.MAINTENANCE_ENABLED or self.running:
+            return
+        now = time.monotonic()
+        for job in self.jobs.values():
+            # 启动后错开一个 tick 再执行，避免与启动期初始化抢锁
+            job.next_run_at = now + self.tick_seconds
+        self._task = asyncio.create_task(self._loop(), name="maintenance-scheduler")
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self.lock.release()
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                if self.lock.acquire():
+                    await self.run_due_jobs()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Maintenance loop error: {e}")
+            await asyncio.sleep(self.tick_seconds)
+
+    async def run_due_jobs(self) -> None:
+        now = time.monotonic()
+        for job in list(self.jobs.values()):
+            if job.next_run_at <= now:
+                await asyncio.to_thread(self.run_job, job.name)
+
+    def run_job(self, name: str) -> JobStats:
+        """Execute one job synchronously and record its metrics."""
+        job = self.jobs[name]
+        stats = job.stats
+        stats.last_started_at = datetime.utcnow()
+        started = time.perf_counter()
+
+        db = self.session_factory()
+        try:
+            stats.last_result = job.func(db)
+            stats.last_error = None
+        except Exception as e:
+            db.rollback()
+            stats.failures += 1
+            stats.last_error = str(e)
+            logger.error(f"Maintenance job {name} failed: {e}")
+        finally:
+            db.close()
+            stats.runs += 1
+            stats.last_duration_ms = (time.perf_counter() - started) * 1000
+            stats.total_duration_ms += stats.last_duration_ms
+            job.next_run_at = time.monotonic() + job.interval_seconds
+
+        logger.info(f"Maintenance job {name} finished in {stats.last_duration_ms:.1f}ms: {stats.last_result}")
+        return stats
+
+    def get_status(self) -> dict:
+        now = time.monotonic()
+        return {
+            "enabled": settings.MAINTENANCE_ENABLED,
+            "running": self.running,
+            "is_leader": self.lock.is_leader,
+            "jobs": {
+                name: {
+                    "interval_seconds": job.interval_seconds,
+                    "next_run_in_seconds": max(0, round(job.next_run_at - now, 1)) if self.running else None,
+                    **job.stats.to_dict(),
+                }
+                for name, job in self.jobs.items()
+            },
+        }
+
+
+# 全局实例
+maintenance_scheduler = MaintenanceScheduler()
+
+
+def get_maintenance_scheduler() -> MaintenanceScheduler:
+    """获取后台维护调度器实例"""
+    return maintenance_scheduler
@@ -0,0 +1,390 @@
+"""
+Google Play real-time developer notification (RTDN) inbox.
+
+The webhook authenticates the Pub/Sub push (``app.utils.pubsub_auth``), then
+only decodes the envelope, inserts a ``google_play_notifications`` row keyed
+by a dedupe key derived from the purchase token, notification kind/type and
+event time, and acknowledges.
+Pub/Sub redeliveries and Google's own duplicate notifications collapse onto
+the existing row via ``ON CONFLICT DO NOTHING``, so a burst costs one small
+insert per message and never contends with user traffic for Google Play API
+calls.
+
+Every worker runs the processor loop, but only the one holding the
+``google_play_notifications`` leader lock drains the inbox. Notifications of
+the same purchase token are handled strictly in event-time order: only the
+oldest pending row of each token is eligible, so a row waiting for a retry
+holds back the later events of its token (and only of its token). Failures
+are retried with exponential backoff until
+``GOOGLE_PLAY_NOTIFICATION_MAX_ATTEMPTS``.
+"""
+import asyncio
+import base64
+import binascii
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy import String, cast, func, insert, select
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..database import SessionLocal
+from ..models import GooglePlayNotification, Purchase
+from ..utils.leader_lock import LeaderLock
+from ..utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+PLAY_NOTIFICATIONS_RECEIVED = registry.counter(
+    "google_play_notifications_received_total", "Google Play RTDN webhook deliveries", ("result",)
+)
+PLAY_NOTIFICATIONS_PROCESSED = registry.counter(
+    "google_play_notifications_processed_total", "Google Play RTDN processing attempts", ("kind", "result")
+)
+PLAY_NOTIFICATIONS_BACKLOG = registry.gauge(
+    "google_play_notifications_backlog", "Pending Google Play RTDN rows"
+)
+PLAY_NOTIFICATIONS_OLDEST = registry.gauge(
+    "google_play_notifications_oldest_pending_seconds", "Age of the oldest pending Google Play RTDN row"
+)
+
+# oneTimeProductNotification.notificationType
+ONE_TIME_PRODUCT_PURCHASED = 1
+ONE_TIME_PRODUCT_CANCELED = 2
+
+_NOTIFICATION_FIELDS = (
+    ("oneTimeProductNotification", "one_time"),
+    ("subscriptionNotification", "subscription"),
+    ("voidedPurchaseNotification", "voided"),
+    ("testNotification", "test"),
+)
+
+
+class InvalidNotificationError(ValueError):
+    """The webhook body is not a decodable Pub/Sub push message."""
+
+
+def backoff_seconds(attempts: int) -> int:
+    """Delay before the next try after ``attempts`` failed processing runs."""
+    delay = settings.GOOGLE_PLAY_NOTIFICATION_BACKOFF_BASE_SECONDS * (2 ** max(0, attempts - 1))
+    return min(delay, settings.GOOGLE_PLAY_NOTIFICATION_BACKOFF_MAX_SECONDS)
+
+
+def parse_push_message(body: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Decode a Pub/Sub push body into the column values of a notification row.
+
+    Raises:
+        InvalidNotificationError: missing message or undecodable data
+    """
+    message = body.get("message") if isinstance(body, dict) else None
+    if not isinstance(message, dict) or not message.get("data"):
+        raise InvalidNotificationError("Invalid webhook format")
+    try:
+        notification = json.loads(base64.b64decode(message["data"]))
+    except (binascii.Error, ValueError, TypeError) as e:
+        raise InvalidNotificationError(f"Undecodable notification data: {e}")
+    if not isinstance(notification, dict):
+        raise InvalidNotificationError("Notification data is not an object")
+
+    kind, detail = "unknown", {}
+    for field, name in _NOTIFICATION_FIELDS:
+        if isinstance(notification.get(field), dict):
+            kind, detail = name, notification[field]
+            break
+
+    try:
+        event_millis = int(notification.get("eventTimeMillis") or 0)
+    except (TypeError, ValueError):
+        event_millis = 0
+    event_time = datetime.utcfromtimestamp(event_millis / 1000) if event_millis else datetime.utcnow()
+
+    purchase_token = detail.get("purchaseToken")
+    notification_type = detail.get("notificationType")
+    product_id = detail.get("sku") or detail.get("subscriptionId")
+    message_id = message.get("messageId") or message.get("message_id")
+
+    # Google 可能对同一事件发送多条通知（messageId 不同），按事件内容去重；
+    # 无法识别的通知只能按 messageId 去重
+    if purchase_token:
+        identity = f"{purchase_token}|{kind}|{notification_type}|{event_millis}"
+    else:
+        identity = f"message|{message_id or message['data']}"
+
+    return {
+        "dedupe_key": hashlib.sha256(identity.encode("utf-8")).hexdigest(),
+        "message_id": message_id,
+        "purchase_token": purchase_token,
+        "kind": kind,
+        "notification_type": notification_type if isinstance(notification_type, int) else None,
+        "product_id": product_id,
+        "event_time": event_time,
+        "payload": json.dumps(notification, ensure_ascii=False),
+    }
+
+
+class PlayNotificationService:
+    """Google Play RTDN 收件箱：去重入库、后台按令牌顺序处理与重试"""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        lock: Optional[LeaderLock] = None
+    ):
+        self.session_factory = session_factory
+        self.lock = lock or LeaderLock("google_play_notifications")
+        self.handlers: Dict[str, Callable[[Session, GooglePlayNotification], None]] = {
+            "one_time": self._handle_one_time,
+            "voided": self._handle_voided,
+        }
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    # ------------------------------------------------------------------
+    # Ingest (request path)
+    # ------------------------------------------------------------------
+
+    def ingest(self, db: Session, body: Dict[str, Any]) -> bool:
+        """
+        Persist one webhook delivery; returns False when it duplicates a stored notification.
+
+        Raises:
+            InvalidNotificationError: the body is not a Pub/Sub push message
+        """
+        row = parse_push_message(body)
+        now = datetime.utcnow()
+        row.update(status="pending", attempts=0, next_attempt_at=now, created_at=now)
+
+        dialect = db.get_bind().dialect.name
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        elif dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            dialect_insert = None
+
+        if dialect_insert is not None:
+            stmt = dialect_insert(GooglePlayNotification.__table__).on_conflict_do_nothing(
+                index_elements=["dedupe_key"]
+            )
+            inserted = db.execute(stmt, row).rowcount != 0
+        else:
+            exists = db.query(GooglePlayNotification.id).filter(
+                GooglePlayNotification.dedupe_key == row["dedupe_key"]
+            ).first()
+            if not exists:
+                db.execute(insert(GooglePlayNotification.__table__), row)
+            inserted = not exists
+        db.commit()
+
+        PLAY_NOTIFICATIONS_RECEIVED.inc(result="queued" if inserted else "duplicate")
+        if inserted:
+            self.notify()
+        return inserted
+
+    def notify(self) -> None:
+        """Wake the processor of this worker (others pick the row up on their next poll)."""
+        loop, event = self._loop, self._wakeup
+        if loop is None or event is None or loop.is_closed():
+            return
+        try:
+            loop.call_soon_threadsafe(event.set)
+        except RuntimeError:
+            pass
+
+    # ------------------------------------------------------------------
+    # Processing (leader worker)
+    # ------------------------------------------------------------------
+
+    def process_batch(self, db: Optional[Session] = None) -> Dict[str, int]:
+        """Handle the due head notification of up to ``BATCH_SIZE`` purchase tokens."""
+        own_session = db is None
+        db = db or self.session_factory()
+        try:
+            now = datetime.utcnow()
+            # 每个令牌只取最早的一条待处理通知；没有令牌的通知各自独立
+            order_key = func.coalesce(
+                GooglePlayNotification.purchase_token,
+                "#" + cast(GooglePlayNotification.id, String),
+            )
+            heads = (
+                select(
+                    GooglePlayNotification.id,
+                    GooglePlayNotification.next_attempt_at,
+                    func.row_number().over(
+                        partition_by=order_key,
+                        order_by=(GooglePlayNotification.event_time, GooglePlayNotification.id),
+                    ).label("position"),
+                )
+                .where(GooglePlayNotification.status == "pending")
+                .subquery()
+            )
+            entries = db.scalars(
+                select(GooglePlayNotification)
+                .join(heads, heads.c.id == GooglePlayNotification.id)
+                .where(heads.c.position == 1, heads.c.next_attempt_at <= now)
+                .order_by(GooglePlayNotification.event_time, GooglePlayNotification.id)
+                .limit(settings.GOOGLE_PLAY_NOTIFICATION_BATCH_SIZE)
+            ).all()
+
+            counts = {"done": 0, "retried": 0, "failed": 0}
+            for entry in entries:
+                outcome = self._process_one(db, entry)
+                counts[outcome] += 1
+                PLAY_NOTIFICATIONS_PROCESSED.inc(kind=entry.kind, result=outcome)
+            self._update_backlog(db)
+            return counts
+        finally:
+            if own_session:
+                db.close()
+
+    def _process_one(self, db: Session, entry: GooglePlayNotification) -> str:
+        entry_id = entry.id
+        try:
+            handler = self.handlers.get(entry.kind)
+            if handler is not None:
+                handler(db, entry)
+            entry.attempts += 1
+            entry.status = "done"
+            entry.processed_at = datetime.utcnow()
+            entry.last_error = None
+            db.commit()
+            return "done"
+        except Exception as e:
+            db.rollback()
+            entry = db.get(GooglePlayNotification, entry_id)
+            entry.attempts += 1
+            entry.last_error = str(e)[:1000]
+            if entry.attempts >= settings.GOOGLE_PLAY_NOTIFICATION_MAX_ATTEMPTS:
+                entry.status = "failed"
+                entry.processed_at = datetime.utcnow()
+                outcome = "failed"
+                logger.error(f"Google Play notification {entry_id} failed permanently: {e}")
+            else:
+                entry.next_attempt_at = datetime.utcnow() + timedelta(seconds=backoff_seconds(entry.attempts))
+                outcome = "retried"
+                logger.warning(f"Google Play notification {entry_id} failed (attempt {entry.attempts}): {e}")
+            db.commit()
+            return outcome
+
+    def _purchases_for(self, db: Session, token: str):
+        return db.query(Purchase).filter(
+            Purchase.platform == "google_play",
+            Purchase.purchase_token == token,
+        )
+
+    def _handle_one_time(self, db: Session, entry: GooglePlayNotification) -> None:
+        from .google_play import google_play_service
+
+        # 购买状态已变化，下次校验必须重新询问 Google Play
+        google_play_service.token_cache.invalidate(entry.purchase_token)
+        if entry.notification_type == ONE_TIME_PRODUCT_CANCELED:
+            # 仅影响尚未发放积分的挂起订单；已完成订单的退款走 voided 通知
+            self._purchases_for(db, entry.purchase_token).filter(
+                Purchase.status == "pending"
+            ).update({Purchase.status: "failed"}, synchronize_session=False)
+
+    def _handle_voided(self, db: Session, entry: GooglePlayNotification) -> None:
+        from .google_play import google_play_service
+
+        google_play_service.token_cache.invalidate(entry.purchase_token)
+        purchases = self._purchases_for(db, entry.purchase_token).filter(
+            Purchase.status != "refunded"
+        ).all()
+        for purchase in purchases:
+            purchase.status = "refunded"
+            logger.warning(
+                f"Google Play purchase voided: order={purchase.order_id} user={purchase.user_id} "
+                f"credits={purchase.credits}"
+            )
+
+    def _update_backlog(self, db: Session) -> None:
+        count, oldest = db.execute(
+            select(func.count(), func.min(GooglePlayNotification.created_at))
+            .where(GooglePlayNotification.status == "pending")
+        ).one()
+        PLAY_NOTIFICATIONS_BACKLOG.set(count)
+        PLAY_NOTIFICATIONS_OLDEST.set((datetime.utcnow() - oldest).total_seconds() if oldest else 0)
+
+    async def start(self) -> None:
+        if not settings.GOOGLE_PLAY_NOTIFICATIONS_ENABLED or self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name="google-play-notifications")
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            try:
+                if self.lock.acquire():
+                    counts = await asyncio.to_thread(self.process_batch)
+                    if sum(counts.values()) >= settings.GOOGLE_PLAY_NOTIFICATION_BATCH_SIZE:
+                        continue  # 还有积压，立即处理下一批
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Google Play notification processor error: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=settings.GOOGLE_PLAY_NOTIFICATION_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._wakeup = None
+        self._loop = None
+        self.lock.release()
+
+    # ------------------------------------------------------------------
+    # Housekeeping
+    # ------------------------------------------------------------------
+
+    def purge(self, db: Session) -> dict:
+        """Delete processed and failed rows older than the retention window."""
+        cutoff = datetime.utcnow() - timedelta(days=settings.GOOGLE_PLAY_NOTIFICATION_RETENTION_DAYS)
+        deleted = db.query(GooglePlayNotification).filter(
+            GooglePlayNotification.status.in_(("done", "failed")),
+            GooglePlayNotification.created_at < cutoff,
+        ).delete(synchronize_session=False)
+        db.commit()
+        return {"deleted": deleted}
+
+    def get_status(self, db: Session) -> dict:
+        counts = dict(db.execute(
+            select(GooglePlayNotification.status, func.count()).group_by(GooglePlayNotification.status)
+        ).all())
+        oldest = db.execute(
+            select(func.min(GooglePlayNotification.created_at)).where(GooglePlayNotification.status == "pending")
+        ).scalar()
+        return {
+            "enabled": settings.GOOGLE_PLAY_NOTIFICATIONS_ENABLED,
+            "running": self.running,
+            "is_leader": self.lock.is_leader,
+            "counts": counts,
+            "oldest_pending_age_seconds": (
+                round((datetime.utcnow() - oldest).total_seconds(), 1) if oldest else None
+            ),
+        }
+
+
+# 全局实例
+play_notification_service = PlayNotificationService()
+
+
+def get_play_notification_service() -> PlayNotificationService:
+    return play_notification_service
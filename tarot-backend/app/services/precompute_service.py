@@ -0,0 +1,189 @@
+"""
+Offline precomputation of analyze results for the most frequent questions.
+
+The batch reads the top repeated questions from the analytics aggregates
+(``reading_question_stats``, maintained from ``reading_analyze_logs``), runs
+``LLMService.analyze_user_description`` for each supported locale at a
+bounded request rate, and stores the dimension names and summary under the
+current ``PRECOMPUTE_VERSION``. ``ReadingService.analyze_user_description``
+looks results up by normalized-question hash before calling the provider.
+Bumping the version (e.g. after a prompt change) retires every stored answer.
+"""
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models import PrecomputedAnalysis, ReadingQuestionStat
+from ..utils.metrics import registry
+from .analytics_service import normalize_question, question_hash
+from .similarity_index import similarity_index
+
+logger = logging.getLogger(__name__)
+
+PRECOMPUTED_LOOKUPS = registry.counter(
+    "precomputed_analysis_lookups_total", "Analyze requests checked against precomputed results", ("result",)
+)
+
+
+class PrecomputeService:
+    """高频问题分析结果预计算服务"""
+
+    def lookup(self, db: Session, description: str, locale: str) -> Optional[Tuple[List[str], str]]:
+        """Stored ``(dimension_names, description)`` for this question and locale, if any."""
+        if not settings.PRECOMPUTE_LOOKUP_ENABLED or db is None:
+            return None
+
+        row = db.execute(
+            select(PrecomputedAnalysis.dimension_names, PrecomputedAnalysis.description).where(
+                PrecomputedAnalysis.question_hash == question_hash(description),
+                PrecomputedAnalysis.locale == locale,
+                PrecomputedAnalysis.version == settings.PRECOMPUTE_VERSION,
+            )
+        ).first()
+        PRECOMPUTED_LOOKUPS.inc(result="hit" if row else "miss")
+        if row is None:
+            return None
+        return json.loads(row.dimension_names), row.description
+
+    def store(
+        self,
+        db: Session,
+        question: str,
+        locale: str,
+        dimension_names: List[str],
+        description: str,
+        source_count: int = 0,
+        digest: Optional[str] = None
+    ) -> PrecomputedAnalysis:
+        """Insert or replace the result for the current version."""
+        digest = digest or question_hash(question)
+        entry = db.query(PrecomputedAnalysis).filter(
+            PrecomputedAnalysis.question_hash == digest,
+            PrecomputedAnalysis.locale == locale,
+            PrecomputedAnalysis.version == settings.PRECOMPUTE_VERSION,
+        ).first()
+        if entry is None:
+            entry = PrecomputedAnalysis(question_hash=digest, locale=locale, version=settings.PRECOMPUTE_VERSION)
+            db.add(entry)
+        entry.question = normalize_question(question)
+        entry.dimension_names = json.dumps(dimension_names, ensure_ascii=False)
+        entry.description = description
+        entry.source_count = source_count
+        entry.created_at = datetime.utcnow()
+        db.commit()
+        similarity_index.add(entry.question, locale, dimension_names, description)
+        return entry
+
+    def select_candidates(
+        self,
+        db: Session,
+        top_n: int,
+        min_count: int,
+        locales: List[str],
+        refresh: bool = False
+    ) -> List[Tuple[str, str, int, str]]:
+        """``(question, hash, count, locale)`` entries still missing for the current version."""
+        questions = db.execute(
+            select(ReadingQuestionStat.normalized_text, ReadingQuestionStat.question_hash,
+                   ReadingQuestionStat.question_count)
+            .where(ReadingQuestionStat.question_count >= min_count)
+            .order_by(ReadingQuestionStat.question_count.desc())
+            .limit(top_n)
+        ).all()
+
+        done = set()
+        if not refresh and questions:
+            done = set(db.execute(
+                select(PrecomputedAnalysis.question_hash, PrecomputedAnalysis.locale).where(
+                    PrecomputedAnalysis.version == settings.PRECOMPUTE_VERSION,
+                    PrecomputedAnalysis.question_hash.in_([q.question_hash for q in questions]),
+                )
+            ).all())
+
+        return [
+            (q.normalized_text, q.question_hash, q.question_count, locale)
+            for q in questions
+            for locale in locales
+            if (q.question_hash, locale) not in done
+        ]
+
+    async def run_batch(
+        self,
+        db: Session,
+        llm_service,
+        top_n: Optional[int] = None,
+        min_count: Optional[int] = None,
+        locales: Optional[List[str]] = None,
+        requests_per_minute: Optional[int] = None,
+        refresh: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Precompute missing results, pacing provider calls to ``requests_per_minute``.
+
+        Failed questions are skipped (and retried on the next run); fallback
+        dimensions are never stored.
+        """
+        locales = locales or list(settings.PRECOMPUTE_LOCALES)
+        candidates = self.select_candidates(
+            db,
+            top_n or settings.PRECOMPUTE_TOP_N,
+            min_count or settings.PRECOMPUTE_MIN_COUNT,
+            locales,
+            refresh=refresh,
+        )
+        interval = 60.0 / max(1, requests_per_minute or settings.PRECOMPUTE_REQUESTS_PER_MINUTE)
+
+        stored, failed = 0, 0
+        next_call_at = time.monotonic()
+        for question, digest, count, locale in candidates:
+            delay = next_call_at - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            next_call_at = time.monotonic() + interval
+
+            try:
+                names, description = await llm_service.analyze_user_description(
+                    description=question,
+                    spread_type="three-card",
+                    locale=locale,
+                    endpoint="precompute.analyze",
+                )
+                self.store(db, question, locale, names, description, source_count=count, digest=digest)
+                stored += 1
+            except Exception as e:
+                db.rollback()
+                failed += 1
+                logger.warning(f"Precompute failed for question ({locale}): {e}")
+
+        return {"candidates": len(candidates), "stored": stored, "failed": failed,
+                "version": settings.PRECOMPUTE_VERSION}
+
+    def get_status(self, db: Session) -> Dict[str, Any]:
+        rows = db.execute(
+            select(PrecomputedAnalysis.version, PrecomputedAnalysis.locale, func.count())
+            .group_by(PrecomputedAnalysis.version, PrecomputedAnalysis.locale)
+        ).all()
+        return {
+            "current_version": settings.PRECOMPUTE_VERSION,
+            "entries": [{"version": v, "locale": loc, "count": n} for v, loc, n in rows],
+            "lookups": {
+                "hit": PRECOMPUTED_LOOKUPS.value(result="hit"),
+                "miss": PRECOMPUTED_LOOKUPS.value(result="miss"),
+            },
+            "similarity_index": similarity_index.get_stats(),
+        }
+
+
+# 全局实例
+precompute_service = PrecomputeService()
+
+
+def get_precompute_service() -> PrecomputeService:
+    return precompute_service
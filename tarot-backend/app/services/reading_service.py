@@ -1,15 +1,21 @@
 ﻿"""
 Reading service for tarot card interpretation business logic.
 """
+import asyncio
 import hashlib
 from datetime import datetime
 from typing import Any, Dict, List, Optional
 from sqlalchemy.orm import Session
 
+from ..config import settings
 from ..models import ReadingAnalyzeLog
+from ..utils.batch_writer import BatchWriter
 from ..utils.locale import is_english_locale
 from ..utils.logger import api_logger  # 添加日志导入
+from ..utils.tracing import traced
 from .llm_service import get_llm_service
+from .precompute_service import precompute_service
+from .similarity_index import similarity_index
 
 
 CATEGORY_DEFINITIONS = [
@@ -35,6 +41,16 @@ for canonical, english, aliases in CATEGORY_DEFINITIONS:
         CANONICAL_CATEGORY_BY_ALIAS[alias.lower()] = canonical
 
 
+# 分析日志为纯统计数据，经后台批量写入，不占用请求路径上的提交
+analyze_log_writer = BatchWriter(
+    "reading_analyze_logs",
+    ReadingAnalyzeLog,
+    max_queue=settings.ANALYZE_LOG_QUEUE_SIZE,
+    batch_size=settings.ANALYZE_LOG_BATCH_SIZE,
+    flush_interval=settings.ANALYZE_LOG_FLUSH_SECONDS,
+)
+
+
 class ReadingService:
     """解读服务 - 处理塔罗牌解读的业务逻辑"""
 
@@ -107,26 +123,20 @@ class ReadingService:
 
     def _save_analyze_log(
         self,
-        db: Session,
         questions: str,
         locale: str,
         dimensions: List[Dict[str, Any]]
     ) -> None:
-        """Persist analyze request information for analytics."""
-        if db is None:
-            return
-
+        """Queue analyze request information for analytics (written in batches, never blocks)."""
         try:
             canonical_category = self.resolve_primary_category(dimensions, locale)
-            log_entry = ReadingAnalyzeLog(
-                questions=questions,
-                category=canonical_category,
-                locate=locale,
-            )
-            db.add(log_entry)
-            db.commit()
+            analyze_log_writer.submit({
+                "questions": questions,
+                "category": canonical_category,
+                "locate": locale,
+                "created_at": datetime.utcnow(),
+            })
         except Exception as exc:
-            db.rollback()
             api_logger.log_error(
                 "save_analyze_log",
                 exc,
@@ -137,6 +147,7 @@ class ReadingService:
                 },
             )
 
+    @traced()
     async def analyze_user_description(
         self,
         description: str,
@@ -151,7 +162,7 @@ class ReadingService:
             description: 用户描述（200字以内）
             spread_type: 牌阵类型（当前仅支持 three-card）
             locale: 客户端期望的语言
-            db: 数据库会话
+            db: 请求的数据库会话（已知结果在线程中用同一引擎的独立会话查询；分析日志由后台批量写入）
 
         Returns:
             推荐的维度信息列表
@@ -162,12 +173,16 @@ class ReadingService:
         limit = 3
 
         try:
-            # 调用 LLM 分析，获取推荐的维度名称和统一描述
-            recommended_names, unified_description = await self.llm_service.analyze_user_description(
-                description=description,
-                spread_type=spread_type,
-                locale=locale
-            )
+            # 优先复用预计算结果或近似问题的已知结果，未命中再调用 LLM
+            known = await asyncio.to_thread(self._lookup_known_result, db, description, locale)
+            if known is not None:
+                recommended_names, unified_description = known
+            else:
+                recommended_names, unified_description = await self.llm_service.analyze_user_description(
+                    description=description,
+                    spread_type=spread_type,
+                    locale=locale
+                )
 
             dimensions_result = await self._process_three_card_dimensions(
                 recommended_names=recommended_names,
@@ -176,6 +191,9 @@ class ReadingService:
                 locale=locale
             )
 
+            if known is None and settings.SIMILARITY_LOOKUP_ENABLED and settings.SIMILARITY_INDEX_LIVE_RESULTS:
+                similarity_index.add(description, locale, recommended_names, unified_description)
+
         except Exception as e:
             api_logger.log_error("analyze_user_description", e, {"description": description[:100]})
             default_names, default_description = self._get_default_three_card_dimensions_with_description(locale)
@@ -186,12 +204,41 @@ class ReadingService:
                 locale=locale
             )
 
-            self._save_analyze_log(db, description, locale, fallback_dimensions)
+            self._save_analyze_log(description, locale, fallback_dimensions)
             return fallback_dimensions
 
-        self._save_analyze_log(db, description, locale, dimensions_result)
+        self._save_analyze_log(description, locale, dimensions_result)
         return dimensions_result
 
+    def _lookup_known_result(self, db: Session, description: str, locale: str):
+        """
+        查询已知的分析结果：先按规范化问题精确匹配预计算表，再查近似问题索引。
+        在工作线程中执行，使用与请求会话同一引擎的独立会话（会话不能跨线程共享）。
+        查询失败时视为未命中，不影响正常分析流程。
+        """
+        try:
+            if db is None:
+                return self._query_known_result(None, description, locale)
+            with Session(bind=db.get_bind()) as session:
+                return self._query_known_result(session, description, locale)
+        except Exception as e:
+            api_logger.log_error("lookup_known_analysis", e, {"locale": locale})
+            return None
+
+    @staticmethod
+    def _query_known_result(db: Optional[Session], description: str, locale: str):
+        precomputed = precompute_service.lookup(db, description, locale)
+        if precomputed is not None or not settings.SIMILARITY_LOOKUP_ENABLED:
+            return precomputed
+
+        if db is not None:
+            similarity_index.sync(db)
+        similar = similarity_index.query(description, locale)
+        if similar is None:
+            return None
+        names, unified_description, _score = similar
+        return names, unified_description
+
     async def _process_three_card_dimensions(
         self,
         recommended_names: List[str],
@@ -241,6 +288,7 @@ class ReadingService:
             "三牌阵综合分析，探索问题的时间发展脉络"
         )
 
+    @traced()
     async def generate_interpretation(
         self,
         cards: List[Dict[str, Any]],
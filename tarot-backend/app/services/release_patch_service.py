@@ -0,0 +1,323 @@
+"""
+Binary delta patches between application releases.
+
+After a release is published, bsdiff patches from the previous
+``APP_RELEASE_PATCH_BASES`` releases to the new one are generated in a
+process pool (bsdiff is CPU bound and holds both files in memory, so it must
+stay off the API workers' threads). Finished patches are stored under
+``<APP_RELEASE_STORAGE_DIR>/patches/`` with their SHA-256 and advertised with
+the latest release, so a client that already has one of the base APKs
+downloads only the patch and verifies the rebuilt APK against the release
+checksum.
+
+Each (base, release) pair is claimed by inserting a ``pending`` row under the
+unique constraint before diffing, so the upload worker and the leader's
+catch-up job never build the same patch twice; a claim that is not finished
+within ``APP_RELEASE_PATCH_CLAIM_TIMEOUT_MINUTES`` (e.g. the worker died) can
+be taken over.
+
+bsdiff4 is optional: without it no patches are generated and clients keep
+downloading the full APK.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import multiprocessing
+import os
+import threading
+import uuid
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import and_, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.app_release import AppRelease
+from app.models.app_release_patch import AppReleasePatch
+from app.services.app_release_service import AppReleaseService, app_release_service
+
+try:
+    import bsdiff4
+except ImportError:
+    bsdiff4 = None
+
+logger = logging.getLogger(__name__)
+
+PATCH_ALGORITHM = "bsdiff4"
+PATCH_DIR_NAME = "patches"
+
+
+def build_patch(old_path: str, new_path: str, patch_path: str) -> Tuple[int, str]:
+    """Write the bsdiff patch ``old → new`` and return ``(size, sha256)`` (runs in a worker process)."""
+    # 临时文件名按进程唯一，被接管的旧任务与新任务不会写同一个文件
+    tmp_path = f"{patch_path}.{os.getpid()}.{uuid.uuid4().hex}.tmp"
+    try:
+        bsdiff4.file_diff(old_path, new_path, tmp_path)
+        hasher = hashlib.sha256()
+        with open(tmp_path, "rb") as handle:
+            for chunk in iter(lambda: handle.read(1024 * 1024), b""):
+                hasher.update(chunk)
+        os.replace(tmp_path, patch_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+    return os.path.getsize(patch_path), hasher.hexdigest()
+
+
+class ReleasePatchService:
+    """APK 增量补丁生成与查询"""
+
+    def __init__(
+        self,
+        release_service: AppReleaseService = app_release_service,
+        session_factory: Callable[[], Session] = SessionLocal,
+        executor: Optional[Executor] = None
+    ):
+        self.release_service = release_service
+        self.session_factory = session_factory
+        self.build_patch = build_patch
+        self._executor = executor
+        # 单线程调度：等待进程池结果并写库，不占用请求线程
+        self._scheduler: Optional[ThreadPoolExecutor] = None
+        # 进程内去重；跨进程（上传 worker 与 leader 的补漏任务）由 claim() 保证
+        self._inflight: Set[int] = set()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return settings.APP_RELEASE_PATCH_ENABLED and bsdiff4 is not None
+
+    @property
+    def patch_dir(self) -> Path:
+        return self.release_service.storage_dir / PATCH_DIR_NAME
+
+    def _pool(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                # gunicorn worker 中已有后台线程持有锁（日志监听、指标、链路导出），
+                # fork 出的子进程可能继承被占用的锁而死锁，因此用 spawn 启动
+                self._executor = ProcessPoolExecutor(
+                    max_workers=max(1, settings.APP_RELEASE_PATCH_WORKERS),
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+    # ------------------------------------------------------------------
+    # Generation
+    # ------------------------------------------------------------------
+
+    def select_bases(self, db: Session, release: AppRelease) -> List[AppRelease]:
+        """Previous releases that still need a patch to ``release`` (neither recorded nor claimed)."""
+        done = {
+            row.from_release_id
+            for row in db.query(AppReleasePatch.from_release_id)
+            .filter(
+                AppReleasePatch.to_release_id == release.id,
+                or_(AppReleasePatch.status != "pending", AppReleasePatch.created_at >= self._claim_cutoff()),
+            )
+        }
+        candidates = (
+            db.query(AppRelease)
+            .filter(AppRelease.id < release.id)
+            .order_by(AppRelease.id.desc())
+            .limit(settings.APP_RELEASE_PATCH_BASES)
+            .all()
+        )
+        return [
+            base for base in candidates
+            if base.id not in done
+            and base.checksum_sha256 != release.checksum_sha256
+            and self.release_service.get_file_path(base).is_file()
+        ]
+
+    def patch_file_name(self, base: AppRelease, release: AppRelease) -> str:
+        return f"{Path(release.file_name).stem}__from_{base.id}.bsdiff"
+
+    def _claim_cutoff(self) -> datetime:
+        return datetime.utcnow() - timedelta(minutes=settings.APP_RELEASE_PATCH_CLAIM_TIMEOUT_MINUTES)
+
+    def claim(self, db: Session, base: AppRelease, release: AppRelease) -> Optional[AppReleasePatch]:
+        """Claim the pair ``base → release``; None when another worker owns or has finished it."""
+        patch = AppReleasePatch(from_release_id=base.id, to_release_id=release.id, status="pending")
+        db.add(patch)
+        try:
+            db.commit()
+            return patch
+        except IntegrityError:
+            db.rollback()
+
+        # 已有记录：只接管超时未完成的认领（条件更新，多个 worker 中只有一个成功）
+        taken = (
+            db.query(AppReleasePatch)
+            .filter(
+                AppReleasePatch.from_release_id == base.id,
+                AppReleasePatch.to_release_id == release.id,
+                and_(AppReleasePatch.status == "pending", AppReleasePatch.created_at < self._claim_cutoff()),
+            )
+            .update({AppReleasePatch.created_at: datetime.utcnow()}, synchronize_session=False)
+        )
+        db.commit()
+        if not taken:
+            return None
+        return (
+            db.query(AppReleasePatch)
+            .filter_by(from_release_id=base.id, to_release_id=release.id)
+            .one()
+        )
+
+    def generate_patches(self, db: Session, release: AppRelease) -> Dict[str, int]:
+        """Build the missing patches to ``release`` in the process pool and record them."""
+        counts = {"ready": 0, "skipped": 0, "failed": 0}
+        target_path = self.release_service.get_file_path(release)
+        max_source = settings.APP_RELEASE_PATCH_MAX_SOURCE_MB * 1024 * 1024
+        if not target_path.is_file() or release.file_size > max_source:
+            return counts
+
+        self.patch_dir.mkdir(parents=True, exist_ok=True)
+        jobs = []
+        for base in self.select_bases(db, release):
+            claimed = self.claim(db, base, release)
+            if claimed is None:
+                continue
+            if base.file_size > max_source:
+                self._record(db, claimed, status="skipped", error="基准 APK 超过补丁大小限制")
+                counts["skipped"] += 1
+                continue
+            patch_path = self.patch_dir / self.patch_file_name(base, release)
+            future = self._pool().submit(
+                self.build_patch,
+                str(self.release_service.get_file_path(base)),
+                str(target_path),
+                str(patch_path),
+            )
+            jobs.append((base, claimed, patch_path, future))
+
+        for base, claimed, patch_path, future in jobs:
+            try:
+                size, checksum = future.result()
+            except Exception as exc:
+                logger.warning("Patch %s -> %s failed: %s", base.version, release.version, exc)
+                patch_path.unlink(missing_ok=True)
+                self._record(db, claimed, status="failed", error=str(exc)[:1000])
+                counts["failed"] += 1
+                continue
+
+            if size > release.file_size * settings.APP_RELEASE_PATCH_MAX_RATIO:
+                # 压缩内容变化较大时补丁几乎和完整包一样大，不值得提供
+                patch_path.unlink(missing_ok=True)
+                self._record(db, claimed, status="skipped", error=f"补丁 {size} 字节，收益不足")
+                counts["skipped"] += 1
+                continue
+
+            self._record(
+                db, claimed,
+                status="ready",
+                file_name=patch_path.name,
+                file_size=size,
+                checksum_sha256=checksum,
+                download_url=f"{self.release_service.base_url}/{PATCH_DIR_NAME}/{patch_path.name}",
+            )
+            counts["ready"] += 1
+        return counts
+
+    def _record(self, db: Session, patch: AppReleasePatch, **fields: Any) -> None:
+        """Finish a claimed patch row with its final status."""
+        for name, value in fields.items():
+            setattr(patch, name, value)
+        db.commit()
+
+    def schedule(self, release_id: int) -> bool:
+        """Generate patches to ``release_id`` in the background; False when disabled or already running."""
+        if not self.enabled:
+            return False
+        with self._lock:
+            if release_id in self._inflight:
+                return False
+            self._inflight.add(release_id)
+            if self._scheduler is None:
+                self._scheduler = ThreadPoolExecutor(max_workers=1, thread_name_prefix="release-patch")
+            scheduler = self._scheduler
+        scheduler.submit(self._run, release_id)
+        return True
+
+    def _run(self, release_id: int) -> None:
+        try:
+            with self.session_factory() as db:
+                release = db.get(AppRelease, release_id)
+                if release is not None:
+                    counts = self.generate_patches(db, release)
+                    logger.info("Release %s patches: %s", release.version, counts)
+        except Exception:
+            logger.exception("Patch generation for release %s failed", release_id)
+        finally:
+            with self._lock:
+                self._inflight.discard(release_id)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            scheduler, executor = self._scheduler, self._executor
+            self._scheduler = None
+            self._executor = None
+        if scheduler is not None:
+            scheduler.shutdown(wait=False, cancel_futures=True)
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def list_patches(self, db: Session, release: AppRelease) -> List[Dict[str, Any]]:
+        """Ready patches to ``release`` with the base release each one applies to."""
+        rows = (
+            db.query(AppReleasePatch, AppRelease)
+            .join(AppRelease, AppRelease.id == AppReleasePatch.from_release_id)
+            .filter(AppReleasePatch.to_release_id == release.id, AppReleasePatch.status == "ready")
+            .order_by(AppRelease.id.desc())
+            .all()
+        )
+        return [
+            {
+                "from_version": base.version,
+                "from_build_number": base.build_number,
+                "from_checksum": base.checksum_sha256,
+                "download_url": patch.download_url,
+                "file_size": patch.file_size,
+                "checksum": patch.checksum_sha256,
+                "algorithm": PATCH_ALGORITHM,
+            }
+            for patch, base in rows
+        ]
+
+    def count_ready(self, db: Session, release: AppRelease) -> int:
+        return (
+            db.query(AppReleasePatch.id)
+            .filter(AppReleasePatch.to_release_id == release.id, AppReleasePatch.status == "ready")
+            .count()
+        )
+
+    def get_patch_path(self, db: Session, file_name: str) -> Optional[Tuple[AppReleasePatch, Path]]:
+        if not file_name or Path(file_name).name != file_name:
+            return None
+        patch = (
+            db.query(AppReleasePatch)
+            .filter(AppReleasePatch.file_name == file_name, AppReleasePatch.status == "ready")
+            .first()
+        )
+        if patch is None:
+            return None
+        return patch, self.patch_dir / file_name
+
+
+# 全局实例
+release_patch_service = ReleasePatchService()
+
+
+def get_release_patch_service() -> ReleasePatchService:
+    return release_patch_service
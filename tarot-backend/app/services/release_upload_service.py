@@ -0,0 +1,316 @@
+"""
+Resumable chunked uploads for application releases.
+
+Protocol: ``init`` (file name, total size, optional expected SHA-256) →
+``PUT`` chunks at explicit byte offsets → ``complete`` with the release
+metadata. Each upload is a ``<id>.part`` file plus a ``<id>.json`` sidecar in
+``APP_RELEASE_UPLOAD_DIR``; the part file's size is the authoritative
+received offset, so a client that lost its connection asks for the status
+and continues from there.
+
+Chunks are streamed to disk in an executor and hashed as they arrive. The
+running SHA-256 lives in the worker that received the previous chunk; when a
+chunk lands on another worker (or after a restart) the hash is rebuilt from
+the part file once and then continues incrementally.
+
+A chunk is written under an exclusive ``flock`` on the part file, held across
+the offset check and the appends, so a retried PUT that lands on another
+worker while the first is still streaming gets 409 instead of interleaving
+bytes.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import IO, AsyncIterator, Dict, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.app_release import AppRelease
+from app.services.app_release_service import AppReleaseService, app_release_service
+
+try:
+    import fcntl
+except ImportError:  # Windows 开发环境：只有进程内的锁
+    fcntl = None
+
+_UPLOAD_ID_LENGTH = 32
+_WRITE_BUFFER_BYTES = 1024 * 1024
+
+
+@dataclass
+class UploadSession:
+    """Sidecar metadata of one chunked upload."""
+
+    upload_id: str
+    filename: str
+    content_type: Optional[str]
+    total_size: int
+    expected_sha256: Optional[str]
+    created_by: str
+    created_at: str
+
+    def to_dict(self, received: int) -> dict:
+        return {
+            **asdict(self),
+            "received": received,
+            "chunk_size": settings.APP_RELEASE_UPLOAD_CHUNK_MB * 1024 * 1024,
+            "complete": received == self.total_size,
+        }
+
+
+class ReleaseUploadService:
+    """APK 分片断点续传上传"""
+
+    def __init__(self, release_service: AppReleaseService = app_release_service, upload_dir: Optional[str] = None):
+        self.release_service = release_service
+        self.upload_dir = Path(upload_dir or settings.APP_RELEASE_UPLOAD_DIR)
+        # upload_id -> (已哈希的字节数, 增量 SHA-256)
+        self._hashers: Dict[str, Tuple[int, "hashlib._Hash"]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._hashers_lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Paths and sidecar
+    # ------------------------------------------------------------------
+
+    def _part_path(self, upload_id: str) -> Path:
+        return self.upload_dir / f"{upload_id}.part"
+
+    def _meta_path(self, upload_id: str) -> Path:
+        return self.upload_dir / f"{upload_id}.json"
+
+    def _load(self, upload_id: str) -> UploadSession:
+        if len(upload_id) != _UPLOAD_ID_LENGTH or not upload_id.isalnum():
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="上传任务不存在")
+        try:
+            data = json.loads(self._meta_path(upload_id).read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="上传任务不存在或已过期")
+        return UploadSession(**data)
+
+    def _received(self, upload_id: str) -> int:
+        try:
+            return self._part_path(upload_id).stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    # ------------------------------------------------------------------
+    # Protocol
+    # ------------------------------------------------------------------
+
+    def init_upload(
+        self,
+        filename: str,
+        total_size: int,
+        content_type: Optional[str],
+        expected_sha256: Optional[str],
+        admin_username: str
+    ) -> dict:
+        """Validate the announced file and create an empty upload session."""
+        self.release_service.validate_file_meta(filename, content_type)
+        if total_size <= 0:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="文件内容为空")
+        if total_size > self.release_service.max_size_bytes:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"文件大小超过限制（最大 {settings.APP_RELEASE_MAX_SIZE_MB} MB）",
+            )
+
+        self.upload_dir.mkdir(parents=True, exist_ok=True)
+        session = UploadSession(
+            upload_id=uuid.uuid4().hex,
+            filename=Path(filename).name,
+            content_type=content_type,
+            total_size=total_size,
+            expected_sha256=expected_sha256.lower() if expected_sha256 else None,
+            created_by=admin_username,
+            created_at=datetime.utcnow().isoformat(),
+        )
+        self._part_path(session.upload_id).touch()
+        self._meta_path(session.upload_id).write_text(json.dumps(asdict(session)), encoding="utf-8")
+        return session.to_dict(received=0)
+
+    def get_status(self, upload_id: str) -> dict:
+        return self._load(upload_id).to_dict(self._received(upload_id))
+
+    def _hasher_at(self, upload_id: str, offset: int):
+        """Running SHA-256 of the first ``offset`` bytes, rebuilt from disk if this worker lacks it."""
+        with self._hashers_lock:
+            cached = self._hashers.get(upload_id)
+        if cached is not None and cached[0] == offset:
+            return cached[1]
+
+        hasher = hashlib.sha256()
+        with open(self._part_path(upload_id), "rb") as handle:
+            remaining = offset
+            while remaining > 0:
+                chunk = handle.read(min(_WRITE_BUFFER_BYTES, remaining))
+                if not chunk:
+                    break
+                hasher.update(chunk)
+                remaining -= len(chunk)
+        return hasher
+
+    def _open_locked(self, upload_id: str) -> Tuple[IO[bytes], int]:
+        """Open the part file for appending under an exclusive cross-process lock; returns ``(handle, received)``."""
+        handle = open(self._part_path(upload_id), "ab")
+        if fcntl is not None:
+            try:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                handle.close()
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail={"message": "另一个请求正在写入该上传任务", "received": self._received(upload_id)},
+                )
+        return handle, os.fstat(handle.fileno()).st_size
+
+    @staticmethod
+    def _append(handle: IO[bytes], hasher, data: bytes) -> None:
+        handle.write(data)
+        handle.flush()
+        hasher.update(data)
+
+    async def write_chunk(self, upload_id: str, offset: int, body: AsyncIterator[bytes]) -> dict:
+        """
+        Append a chunk that must start at the current received offset.
+
+        A mismatched offset, or another request (on any worker) still writing
+        this upload, returns 409 with the offset to resume from.
+        """
+        session = self._load(upload_id)
+        lock = self._locks.setdefault(upload_id, asyncio.Lock())
+        async with lock:
+            # 文件锁在关闭句柄时释放
+            handle, received = await asyncio.to_thread(self._open_locked, upload_id)
+            try:
+                if offset != received:
+                    raise HTTPException(
+                        status_code=status.HTTP_409_CONFLICT,
+                        detail={"message": "分片偏移量不匹配", "received": received},
+                    )
+                received = await self._stream(upload_id, session, handle, received, body)
+            finally:
+                handle.close()
+
+        return session.to_dict(received)
+
+    async def _stream(
+        self,
+        upload_id: str,
+        session: UploadSession,
+        handle: IO[bytes],
+        received: int,
+        body: AsyncIterator[bytes]
+    ) -> int:
+        """Append the request body to the locked part file; returns the new received offset."""
+        hasher = await asyncio.to_thread(self._hasher_at, upload_id, received)
+        buffer = bytearray()
+        try:
+            async for data in body:
+                if received + len(buffer) + len(data) > session.total_size:
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail="分片超出声明的文件大小",
+                    )
+                buffer.extend(data)
+                if len(buffer) >= _WRITE_BUFFER_BYTES:
+                    chunk, buffer = bytes(buffer), bytearray()
+                    await asyncio.to_thread(self._append, handle, hasher, chunk)
+                    received += len(chunk)
+        finally:
+            # 连接中断时保留已收到的数据，客户端按 received 续传
+            if buffer:
+                await asyncio.to_thread(self._append, handle, hasher, bytes(buffer))
+                received += len(buffer)
+            with self._hashers_lock:
+                self._hashers[upload_id] = (received, hasher)
+        return received
+
+    def complete_upload(
+        self,
+        db: Session,
+        upload_id: str,
+        version: str,
+        build_number: Optional[str],
+        release_notes: Optional[str],
+        notes_url: Optional[str],
+        admin_username: str
+    ) -> AppRelease:
+        """Verify size and checksum, then publish the assembled file as the active release."""
+        session = self._load(upload_id)
+        received = self._received(upload_id)
+        if received != session.total_size:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail={"message": "文件尚未上传完整", "received": received, "total_size": session.total_size},
+            )
+
+        checksum = self._hasher_at(upload_id, received).hexdigest()
+        if session.expected_sha256 and checksum != session.expected_sha256:
+            self.abort_upload(upload_id)
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="文件校验失败（SHA-256 不匹配），请重新上传",
+            )
+
+        release = self.release_service.create_release_from_file(
+            db,
+            source_path=self._part_path(upload_id),
+            original_filename=session.filename,
+            checksum=checksum,
+            version=version,
+            build_number=build_number,
+            release_notes=release_notes,
+            notes_url=notes_url,
+            admin_username=admin_username,
+        )
+        self.abort_upload(upload_id)
+        return release
+
+    def abort_upload(self, upload_id: str) -> None:
+        with self._hashers_lock:
+            self._hashers.pop(upload_id, None)
+        self._locks.pop(upload_id, None)
+        for path in (self._part_path(upload_id), self._meta_path(upload_id)):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def purge_expired(self) -> dict:
+        """Remove uploads untouched for longer than ``APP_RELEASE_UPLOAD_EXPIRE_HOURS``."""
+        if not self.upload_dir.exists():
+            return {"deleted": 0}
+        cutoff = time.time() - settings.APP_RELEASE_UPLOAD_EXPIRE_HOURS * 3600
+        deleted = 0
+        for meta_path in self.upload_dir.glob("*.json"):
+            upload_id = meta_path.stem
+            part_path = self._part_path(upload_id)
+            last_touched = max(
+                meta_path.stat().st_mtime,
+                part_path.stat().st_mtime if part_path.exists() else 0,
+            )
+            if last_touched < cutoff:
+                self.abort_upload(upload_id)
+                deleted += 1
+        return {"deleted": deleted}
+
+
+# 全局实例
+release_upload_service = ReleaseUploadService()
+
+
+def get_release_upload_service() -> ReleaseUploadService:
+    return release_upload_service
@@ -0,0 +1,264 @@
+"""
+In-memory near-duplicate lookup for analyze questions.
+
+Each question is embedded as a hashed bag of character n-grams (unigrams of
+CJK characters plus bigrams and trigrams of the normalized text), weighted by
+frequency and L2-normalized, so cosine similarity is a dot product. Vectors
+live in a per-locale matrix bounded by ``SIMILARITY_INDEX_MAX_ENTRIES``; when
+it is full the oldest entry is overwritten.
+
+The index is fed from ``precomputed_analyses`` (incrementally, by id), which
+only holds answers to frequently repeated questions. Fresh LLM results of this
+worker are indexed only with ``SIMILARITY_INDEX_LIVE_RESULTS``: they summarize
+one user's personal question and would be served to other users' rewordings.
+NumPy is optional: without it the same
+vectors are stored sparsely and scored in pure Python.
+
+Character n-grams catch rewordings that share most of their characters
+(extra particles, word order, punctuation); they are not a semantic model, so
+the threshold is kept high to avoid reusing dimensions for a different
+question.
+"""
+import json
+import logging
+import threading
+import time
+import zlib
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..database import SessionLocal
+from ..models import PrecomputedAnalysis
+from ..utils.metrics import registry
+from .analytics_service import normalize_question, question_hash
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+SIMILARITY_LOOKUPS = registry.counter(
+    "similarity_index_lookups_total", "Analyze requests checked against the near-duplicate index", ("result",)
+)
+SIMILARITY_ENTRIES = registry.gauge(
+    "similarity_index_entries", "Questions held in the near-duplicate index", ("locale",)
+)
+
+
+def _features(text: str) -> Counter:
+    normalized = normalize_question(text)
+    features: Counter = Counter(ch for ch in normalized if ord(ch) >= 0x2E80)
+    padded = f" {normalized} "
+    for n in (2, 3):
+        features.update(padded[i:i + n] for i in range(len(padded) - n + 1))
+    return features
+
+
+def hash_vector(text: str, dim: int) -> Dict[int, float]:
+    """Sparse L2-normalized hashed n-gram vector ``{bucket: weight}``."""
+    buckets: Dict[int, float] = {}
+    for feature, count in _features(text).items():
+        bucket = zlib.crc32(feature.encode("utf-8")) % dim
+        buckets[bucket] = buckets.get(bucket, 0.0) + count
+    norm = sum(value * value for value in buckets.values()) ** 0.5
+    if not norm:
+        return {}
+    return {bucket: value / norm for bucket, value in buckets.items()}
+
+
+class _LocaleIndex:
+    """单个语言的有界向量索引（满时覆盖最旧的条目）。"""
+
+    def __init__(self, dim: int, capacity: int):
+        self.dim = dim
+        self.capacity = capacity
+        self.keys: List[Optional[str]] = []
+        self.payloads: List[Tuple[List[str], str]] = []
+        self.slots: Dict[str, int] = {}
+        self._next = 0
+        self._matrix = None if np is None else np.zeros((min(capacity, 256), dim), dtype=np.float32)
+        self._sparse: List[Dict[int, float]] = []
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def add(self, key: str, vector: Dict[int, float], payload: Tuple[List[str], str]) -> None:
+        slot = self.slots.get(key)
+        if slot is None:
+            if len(self.keys) < self.capacity:
+                slot = len(self.keys)
+                self.keys.append(None)
+                self.payloads.append(payload)
+                self._sparse.append({})
+            else:
+                slot = self._next
+                self._next = (self._next + 1) % self.capacity
+                self.slots.pop(self.keys[slot], None)
+            self.keys[slot] = key
+            self.slots[key] = slot
+
+        self.payloads[slot] = payload
+        if self._matrix is None:
+            self._sparse[slot] = vector
+            return
+
+        if slot >= self._matrix.shape[0]:
+            grown = np.zeros((min(self.capacity, self._matrix.shape[0] * 2), self.dim), dtype=np.float32)
+            grown[:self._matrix.shape[0]] = self._matrix
+            self._matrix = grown
+        row = self._matrix[slot]
+        row[:] = 0.0
+        if vector:
+            row[list(vector.keys())] = list(vector.values())
+
+    def best_match(self, vector: Dict[int, float]) -> Tuple[int, float]:
+        if not self.keys or not vector:
+            return -1, 0.0
+        if self._matrix is not None:
+            query = np.zeros(self.dim, dtype=np.float32)
+            query[list(vector.keys())] = list(vector.values())
+            scores = self._matrix[:len(self.keys)] @ query
+            slot = int(np.argmax(scores))
+            return slot, float(scores[slot])
+
+        best_slot, best_score = -1, 0.0
+        for slot, stored in enumerate(self._sparse):
+            small, large = (stored, vector) if len(stored) < len(vector) else (vector, stored)
+            score = sum(weight * large.get(bucket, 0.0) for bucket, weight in small.items())
+            if score > best_score:
+                best_slot, best_score = slot, score
+        return best_slot, best_score
+
+
+class SimilarityIndex:
+    """分析问题近似匹配索引（按语言分区，增量同步预计算结果）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # 同一时间只有一个同步在拉取数据；其余调用直接使用现有索引
+        self._sync_lock = threading.Lock()
+        self._locales: Dict[str, _LocaleIndex] = {}
+        self._version: Optional[int] = None
+        self._last_id = 0
+        self._last_sync: Optional[float] = None
+
+    def _locale_index(self, locale: str) -> _LocaleIndex:
+        index = self._locales.get(locale)
+        if index is None:
+            index = _LocaleIndex(settings.SIMILARITY_VECTOR_DIM, settings.SIMILARITY_INDEX_MAX_ENTRIES)
+            self._locales[locale] = index
+        return index
+
+    def _reset_if_version_changed(self) -> None:
+        if self._version != settings.PRECOMPUTE_VERSION:
+            self._locales.clear()
+            self._version = settings.PRECOMPUTE_VERSION
+            self._last_id = 0
+
+    def add(self, question: str, locale: str, dimension_names: List[str], description: str) -> None:
+        """Index a question whose dimensions are known."""
+        vector = hash_vector(question, settings.SIMILARITY_VECTOR_DIM)
+        if not vector:
+            return
+        with self._lock:
+            self._reset_if_version_changed()
+            self._locale_index(locale).add(question_hash(question), vector, (list(dimension_names), description))
+
+    def query(self, question: str, locale: str) -> Optional[Tuple[List[str], str, float]]:
+        """Closest stored ``(dimension_names, description, score)`` above the threshold."""
+        vector = hash_vector(question, settings.SIMILARITY_VECTOR_DIM)
+        with self._lock:
+            index = self._locales.get(locale)
+            if index is None:
+                SIMILARITY_LOOKUPS.inc(result="miss")
+                return None
+            slot, score = index.best_match(vector)
+            if slot < 0 or score < settings.SIMILARITY_THRESHOLD:
+                SIMILARITY_LOOKUPS.inc(result="miss")
+                return None
+            names, description = index.payloads[slot]
+        SIMILARITY_LOOKUPS.inc(result="hit")
+        return list(names), description, score
+
+    def sync(self, db: Session, force: bool = False) -> int:
+        """
+        Pull precomputed results added since the last sync (at most every
+        ``SIMILARITY_SYNC_SECONDS``). Returns 0 without waiting while another
+        sync, such as the start-up warm-up, is running.
+        """
+        now = time.monotonic()
+        if not force and self._last_sync is not None and now - self._last_sync < settings.SIMILARITY_SYNC_SECONDS:
+            return 0
+        if not self._sync_lock.acquire(blocking=False):
+            return 0
+        try:
+            self._last_sync = now
+            return self._sync(db)
+        finally:
+            self._sync_lock.release()
+
+    def _sync(self, db: Session) -> int:
+        with self._lock:
+            self._reset_if_version_changed()
+            last_id = self._last_id
+        rows = db.execute(
+            select(PrecomputedAnalysis.id, PrecomputedAnalysis.question, PrecomputedAnalysis.locale,
+                   PrecomputedAnalysis.dimension_names, PrecomputedAnalysis.description)
+            .where(PrecomputedAnalysis.version == settings.PRECOMPUTE_VERSION,
+                   PrecomputedAnalysis.id > last_id)
+            .order_by(PrecomputedAnalysis.id)
+        ).all()
+        for row in rows:
+            self.add(row.question, row.locale, json.loads(row.dimension_names), row.description)
+        if rows:
+            with self._lock:
+                self._last_id = max(self._last_id, rows[-1].id)
+        return len(rows)
+
+    def schedule_warm(self) -> None:
+        """Load the precomputed results in a background thread (at worker start)."""
+        if not settings.SIMILARITY_LOOKUP_ENABLED:
+            return
+
+        def run():
+            db = SessionLocal()
+            try:
+                count = self.sync(db, force=True)
+                logger.info(f"Similarity index warmed with {count} precomputed results")
+            except Exception as e:
+                logger.error(f"Similarity index warm-up failed: {e}")
+            finally:
+                db.close()
+
+        threading.Thread(target=run, name="similarity-index-warm", daemon=True).start()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": "numpy" if np is not None else "python",
+                "version": self._version,
+                "last_synced_id": self._last_id,
+                "entries": {locale: len(index) for locale, index in self._locales.items()},
+            }
+
+
+# 全局实例
+similarity_index = SimilarityIndex()
+
+
+def get_similarity_index() -> SimilarityIndex:
+    return similarity_index
+
+
+def _collect_metrics() -> None:
+    for locale, count in similarity_index.get_stats()["entries"].items():
+        SIMILARITY_ENTRIES.set(count, locale=locale)
+
+
+registry.add_collector(_collect_metrics)
@@ -6,12 +6,15 @@ from datetime import datetime, timedelta
 from typing import Optional, Tuple
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy import func
+from sqlalchemy import func, update
 
 from ..models import User, UserBalance, CreditTransaction
 from ..database import get_db
 from ..utils.auth import create_access_token, verify_token
+from ..utils.http_cache import response_cache
 from ..config import settings
+from ..utils.metrics import record_credit_operation
+from ..utils.tracing import traced
 
 
 class UserService:
@@ -136,6 +139,20 @@ class UserService:
         ).first()
 
     @staticmethod
+    def get_balance_marker(db: Session, user_id: int) -> Optional[Tuple[int, datetime]]:
+        """
+        Get ``(version, updated_at)`` of the user's balance without loading the row.
+
+        Used as the validator of cached balance and stats responses; every
+        credit change bumps ``version``.
+        """
+        row = db.query(UserBalance.version, UserBalance.updated_at).filter(
+            UserBalance.user_id == user_id
+        ).first()
+        return (row.version, row.updated_at) if row else None
+
+    @staticmethod
+    @traced("UserService.update_user_balance")
     def update_user_balance(
         db: Session,
         user_id: int,
@@ -179,6 +196,7 @@ class UserService:
 
             # Check for sufficient balance on deduction
             if credit_change < 0 and new_credits < 0:
+                record_credit_operation(transaction_type, credit_change, success=False)
                 raise ValueError(f"Insufficient balance. Current: {balance.credits}, Required: {abs(credit_change)}")
 
             # Update balance with optimistic locking
@@ -198,6 +216,7 @@ class UserService:
                 # Concurrent update detected, retry
                 db.rollback()
                 if attempt == max_retries - 1:
+                    record_credit_operation(transaction_type, credit_change, success=False)
                     raise ValueError("Failed to update balance due to concurrent modifications")
                 continue
 
@@ -222,6 +241,8 @@ class UserService:
                     user.total_credits_consumed += abs(credit_change)
 
             db.commit()
+            response_cache.invalidate_user(user_id)
+            record_credit_operation(transaction_type, credit_change, success=True)
 
             # Refresh balance to get updated values
             db.refresh(balance)
@@ -229,6 +250,92 @@ class UserService:
 
         raise ValueError("Max retries exceeded for balance update")
 
+    @staticmethod
+    @traced("UserService.apply_credit_change")
+    def apply_credit_change(
+        db: Session,
+        user_id: int,
+        credit_change: int,
+        transaction_type: str,
+        reference_type: Optional[str] = None,
+        reference_id: Optional[int] = None,
+        description: Optional[str] = None
+    ) -> Tuple[int, CreditTransaction]:
+        """
+        Apply a credit change inside the caller's transaction without committing.
+
+        The balance is changed with a single atomic ``UPDATE ... SET credits =
+        credits + :change`` (no read-modify-write, so no optimistic retry loop);
+        deductions only match while the balance stays non-negative. The ledger
+        row and user totals are written in the same transaction, so the caller
+        can bundle the whole operation into one commit.
+
+        Args:
+            db: Database session
+            user_id: User ID
+            credit_change: Credit amount to add/subtract
+            transaction_type: Type of transaction (earn, consume, refund, admin_adjust)
+            reference_type: Related entity type (purchase, reading, etc.)
+            reference_id: Related entity ID
+            description: Transaction description
+
+        Returns:
+            Tuple[int, CreditTransaction]: New balance and the (flushed) transaction record
+
+        Raises:
+            ValueError: If the balance record is missing or the balance is insufficient
+        """
+        stmt = (
+            update(UserBalance)
+            .where(UserBalance.user_id == user_id)
+            .values(
+                credits=UserBalance.credits + credit_change,
+                version=UserBalance.version + 1,
+                updated_at=datetime.utcnow()
+            )
+            .returning(UserBalance.credits)
+            .execution_options(synchronize_session=False)
+        )
+        if credit_change < 0:
+            stmt = stmt.where(UserBalance.credits + credit_change >= 0)
+
+        new_credits = db.execute(stmt).scalar()
+
+        if new_credits is None:
+            current = db.query(UserBalance.credits).filter(
+                UserBalance.user_id == user_id
+            ).scalar()
+            if current is None:
+                raise ValueError(f"Balance record not found for user {user_id}")
+            record_credit_operation(transaction_type, credit_change, success=False)
+            raise ValueError(f"Insufficient balance. Current: {current}, Required: {abs(credit_change)}")
+
+        transaction = CreditTransaction(
+            user_id=user_id,
+            type=transaction_type,
+            credits=credit_change,
+            balance_after=new_credits,
+            reference_type=reference_type,
+            reference_id=reference_id,
+            description=description
+        )
+        db.add(transaction)
+
+        if credit_change > 0:
+            totals = {User.total_credits_purchased: User.total_credits_purchased + credit_change}
+        elif credit_change < 0:
+            totals = {User.total_credits_consumed: User.total_credits_consumed + abs(credit_change)}
+        else:
+            totals = None
+        if totals:
+            db.query(User).filter(User.id == user_id).update(totals, synchronize_session=False)
+
+        db.flush()
+        # 在提交前失效：并发请求即使回填旧内容，其 ETag 仍是旧版本号，不会命中
+        response_cache.invalidate_user(user_id)
+        record_credit_operation(transaction_type, credit_change, success=True)
+        return new_credits, transaction
+
     @staticmethod
     def get_user_transactions(
         db: Session,
@@ -0,0 +1,201 @@
+"""
+Write-behind batch inserts for append-only tables.
+
+Request handlers hand rows to ``BatchWriter.submit`` which never blocks: rows
+go into a bounded queue and a background thread inserts them with one
+``executemany`` per batch, flushing when ``batch_size`` rows are buffered or
+``flush_interval`` seconds have passed. When the queue is full new rows are
+dropped and counted, so a slow disk never slows the user-facing call down.
+"""
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+_QUEUE_DEPTH = registry.gauge("batch_writer_queue_depth", "Rows waiting in a write-behind queue", ("writer",))
+_ROWS = registry.counter("batch_writer_rows_total", "Rows handled by a write-behind writer", ("writer", "result"))
+
+_STOP = object()
+_writers: List["BatchWriter"] = []
+
+
+class BatchWriter:
+    """Buffered, batched inserter for one table."""
+
+    def __init__(
+        self,
+        name: str,
+        model,
+        session_factory: Optional[Callable[[], Session]] = None,
+        max_queue: int = 10000,
+        batch_size: int = 200,
+        flush_interval: float = 2.0
+    ):
+        self.name = name
+        self.model = model
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+        self.last_error: Optional[str] = None
+        self.last_flush_at: Optional[float] = None
+        _writers.append(self)
+
+    def submit(self, row: Dict[str, Any]) -> bool:
+        """Queue one row for insertion; returns False when it had to be dropped."""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.submitted += 1
+        return True
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=f"batch-writer-{self.name}", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        buffer: List[Dict[str, Any]] = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = None
+
+            waiters: List[threading.Event] = []
+            stop = item is _STOP
+            if isinstance(item, threading.Event):
+                waiters.append(item)
+            elif isinstance(item, dict):
+                buffer.append(item)
+
+            if stop or waiters or len(buffer) >= self.batch_size or time.monotonic() >= deadline:
+                if stop or waiters:
+                    # 关闭或显式 flush 时把队列中剩余的行一并写出
+                    stop = self._drain(buffer, waiters) or stop
+                self._write(buffer)
+                buffer = []
+                for waiter in waiters:
+                    waiter.set()
+                deadline = time.monotonic() + self.flush_interval
+            if stop:
+                return
+
+    def _drain(self, buffer: List[Dict[str, Any]], waiters: List[threading.Event]) -> bool:
+        stop = False
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return stop
+            if item is _STOP:
+                stop = True
+            elif isinstance(item, threading.Event):
+                waiters.append(item)
+            else:
+                buffer.append(item)
+
+    def _session(self) -> Session:
+        if self.session_factory is None:
+            from ..database import SessionLocal  # 延迟导入，避免循环依赖
+            self.session_factory = SessionLocal
+        return self.session_factory()
+
+    def _write(self, rows: List[Dict[str, Any]]) -> None:
+        if not rows:
+            return
+        for start in range(0, len(rows), self.batch_size):
+            chunk = rows[start:start + self.batch_size]
+            db = self._session()
+            try:
+                db.execute(insert(self.model.__table__), chunk)
+                db.commit()
+                self.written += len(chunk)
+                self.batches += 1
+                self.last_flush_at = time.time()
+            except Exception as e:
+                db.rollback()
+                self.failed += len(chunk)
+                self.last_error = str(e)
+                logger.error(f"Batch insert into {self.model.__tablename__} failed ({len(chunk)} rows): {e}")
+            finally:
+                db.close()
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Block until everything submitted so far has been written."""
+        if self._thread is None or not self._thread.is_alive():
+            return True
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Write what is buffered and stop the background thread."""
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            logger.warning(f"Batch writer {self.name} queue full on shutdown")
+            return
+        thread.join(timeout)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "queued": self._queue.qsize(),
+            "capacity": self._queue.maxsize,
+            "submitted": self.submitted,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "batches": self.batches,
+            "last_error": self.last_error,
+            "last_flush_at": self.last_flush_at,
+        }
+
+
+def shutdown_batch_writers(timeout: float = 5.0) -> None:
+    """Flush and stop every writer (called on application shutdown)."""
+    for writer in list(_writers):
+        writer.stop(timeout)
+
+
+def get_batch_writer_stats() -> List[Dict[str, Any]]:
+    return [writer.get_stats() for writer in _writers]
+
+
+def _collect_metrics() -> None:
+    for writer in list(_writers):
+        _QUEUE_DEPTH.set(writer._queue.qsize(), writer=writer.name)
+        for result in ("written", "dropped", "failed"):
+            _ROWS.set_total(getattr(writer, result), writer=writer.name, result=result)
+
+
+registry.add_collector(_collect_metrics)
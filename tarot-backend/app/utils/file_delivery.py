@@ -0,0 +1,136 @@
+"""
+Conditional and ranged delivery of large static files.
+
+Used by the release download endpoint: a strong ``ETag`` derived from the
+stored checksum, ``If-None-Match`` revalidation, single byte ``Range``
+requests (with ``If-Range``) for resumed downloads, and optional hand-off of
+the transfer to nginx through ``X-Accel-Redirect`` so no Python worker time
+is spent streaming the body.
+"""
+import os
+import re
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+from urllib.parse import quote
+
+from fastapi import Request
+from fastapi.responses import FileResponse, PlainTextResponse, Response, StreamingResponse
+
+CHUNK_SIZE = 256 * 1024
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class RangeNotSatisfiable(Exception):
+    """The requested range lies outside the file."""
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """Weak comparison of an ``If-None-Match`` header against ``etag``."""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    target = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == target for candidate in header.split(","))
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single ``bytes=`` range into inclusive ``(start, end)``.
+
+    Returns None for absent, malformed or multi-range headers (the whole file
+    is then sent, as RFC 9110 allows).
+    """
+    if not header:
+        return None
+    match = _RANGE_RE.match(header.strip())
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        length = int(last)
+        if length == 0:
+            raise RangeNotSatisfiable()
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        raise RangeNotSatisfiable()
+    return start, end
+
+
+def _iter_file(path: Path, start: int, length: int) -> Iterator[bytes]:
+    with open(path, "rb") as handle:
+        handle.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = handle.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _content_disposition(filename: str) -> str:
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"attachment; filename*=utf-8''{quoted}"
+    return f'attachment; filename="{filename}"'
+
+
+def file_response(
+    request: Request,
+    path: Path,
+    etag: str,
+    media_type: str,
+    filename: str,
+    cache_control: str,
+    accel_redirect: Optional[str] = None
+) -> Response:
+    """
+    Build the response for a download of ``path`` identified by ``etag``.
+
+    ``accel_redirect`` is the internal nginx location of the file; when set the
+    body is left to nginx (which also serves ``Range`` requests itself).
+    """
+    headers: Dict[str, str] = {
+        "ETag": etag,
+        "Cache-Control": cache_control,
+        "Accept-Ranges": "bytes",
+    }
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    headers["Content-Disposition"] = _content_disposition(filename)
+    if accel_redirect:
+        headers["X-Accel-Redirect"] = accel_redirect
+        return Response(status_code=200, headers=headers, media_type=media_type)
+
+    stat_result = os.stat(path)
+    size = stat_result.st_size
+    if_range = request.headers.get("if-range")
+    byte_range = None
+    if if_range is None or if_range.strip() == etag:
+        try:
+            byte_range = parse_range(request.headers.get("range"), size)
+        except RangeNotSatisfiable:
+            return PlainTextResponse(
+                "Requested range not satisfiable",
+                status_code=416,
+                headers={**headers, "Content-Range": f"bytes */{size}"},
+            )
+
+    if byte_range is None:
+        return FileResponse(path, headers=headers, media_type=media_type, stat_result=stat_result)
+
+    start, end = byte_range
+    length = end - start + 1
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(length)
+    if request.method == "HEAD":
+        return Response(status_code=206, headers=headers, media_type=media_type)
+    return StreamingResponse(
+        _iter_file(path, start, length), status_code=206, headers=headers, media_type=media_type
+    )
@@ -0,0 +1,139 @@
+"""
+Conditional GET and serialized-response caching for hot read-only endpoints.
+
+Each endpoint computes a cheap validator (an ETag built from row versions
+such as ``UserBalance.version`` or the latest release id) before doing any
+real work:
+
+- a matching ``If-None-Match`` is answered with ``304 Not Modified``;
+- otherwise the serialized body cached under ``(endpoint, owner)`` is reused
+  while its ETag still matches;
+- only on a miss is the payload built and serialized.
+
+The cache is per worker. Entries are keyed by ETag, so a change made through
+another worker only costs a miss here; ``invalidate_user`` additionally
+drops a user's entries as soon as this worker changes their balance.
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+
+from ..config import settings
+from .file_delivery import etag_matches
+from .metrics import registry
+
+HTTP_CACHE_RESULTS = registry.counter(
+    "http_cache_results_total", "Conditional GET outcomes of cached endpoints", ("endpoint", "result")
+)
+
+
+class ResponseCache:
+    """Bounded LRU of serialized JSON bodies keyed by ``(endpoint, owner)``."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple[str, Hashable], Tuple[str, bytes, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[str, Hashable], etag: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            cached_etag, body, stored_at = entry
+            if cached_etag != etag or time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return body
+
+    def put(self, key: Tuple[str, Hashable], etag: str, body: bytes) -> None:
+        with self._lock:
+            self._entries[key] = (etag, body, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, endpoint: str, owner: Hashable = None) -> None:
+        with self._lock:
+            self._entries.pop((endpoint, owner), None)
+
+    def invalidate_user(self, user_id: int) -> None:
+        """Drop every per-user entry of ``user_id`` (called when their balance changes)."""
+        with self._lock:
+            for key in [key for key in self._entries if key[1] == user_id]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def _not_modified_since(request: Request, last_modified: Optional[datetime]) -> bool:
+    header = request.headers.get("if-modified-since")
+    if not header or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is not None:
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    return last_modified.replace(microsecond=0) <= since
+
+
+def cached_json_response(
+    request: Request,
+    endpoint: str,
+    etag: str,
+    build: Callable[[], Any],
+    owner: Hashable = None,
+    cache_control: str = "private, no-cache",
+    last_modified: Optional[datetime] = None
+) -> Response:
+    """
+    Answer a GET with 304, a cached body or a freshly built one.
+
+    ``build`` returns the response payload and is only called on a miss.
+    ``last_modified`` (naive UTC) enables ``If-Modified-Since``; pass it only
+    for resources that cannot change twice within a second.
+    """
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(
+            last_modified.replace(microsecond=0, tzinfo=timezone.utc), usegmt=True
+        )
+
+    if_none_match = request.headers.get("if-none-match")
+    if etag_matches(if_none_match, etag) or (if_none_match is None and _not_modified_since(request, last_modified)):
+        HTTP_CACHE_RESULTS.inc(endpoint=endpoint, result="not_modified")
+        return Response(status_code=304, headers=headers)
+
+    if not settings.HTTP_CACHE_ENABLED:
+        return JSONResponse(jsonable_encoder(build()), headers=headers)
+
+    key = (endpoint, owner)
+    body = response_cache.get(key, etag)
+    if body is None:
+        HTTP_CACHE_RESULTS.inc(endpoint=endpoint, result="miss")
+        response = JSONResponse(jsonable_encoder(build()), headers=headers)
+        response_cache.put(key, etag, response.body)
+        return response
+
+    HTTP_CACHE_RESULTS.inc(endpoint=endpoint, result="hit")
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+# 全局实例
+response_cache = ResponseCache(settings.HTTP_CACHE_MAX_ENTRIES, settings.HTTP_CACHE_TTL_SECONDS)
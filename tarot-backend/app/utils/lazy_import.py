@@ -0,0 +1,75 @@
+"""
+Deferred imports for heavy provider SDKs.
+
+``googleapiclient``, ``openai`` and ``zhipuai`` each take hundreds of
+milliseconds to import, and most workers never call some of them. A module
+bound with ``lazy_import`` is a placeholder that imports the real module on
+first attribute access, so ``from x import y`` at the top of a service can
+become ``x = lazy_import("x")`` with ``x.y`` at the call site.
+
+``scripts/import_time_report.py`` checks that these SDKs stay out of the
+``app.main`` import graph.
+"""
+import importlib
+import logging
+import threading
+import time
+import types
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+
+
+class LazyModule(types.ModuleType):
+    """Module placeholder that imports ``name`` on first attribute access."""
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__["_lazy_target"] = None
+
+    def _load(self) -> types.ModuleType:
+        module: Optional[types.ModuleType] = self.__dict__["_lazy_target"]
+        if module is None:
+            with _lock:
+                module = self.__dict__["_lazy_target"]
+                if module is None:
+                    started = time.perf_counter()
+                    module = importlib.import_module(self.__name__)
+                    self.__dict__["_lazy_target"] = module
+                    logger.debug(
+                        "Imported %s on first use in %.1f ms",
+                        self.__name__, (time.perf_counter() - started) * 1000,
+                    )
+        return module
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.__dict__["_lazy_target"] is not None
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr: str, value: Any) -> None:
+        setattr(self._load(), attr, value)
+
+    def __delattr__(self, attr: str) -> None:
+        delattr(self._load(), attr)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.is_loaded else "not loaded"
+        return f"<lazy module '{self.__name__}' ({state})>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    """Return a placeholder for module ``name`` that is imported when first used."""
+    return LazyModule(name)
+
+
+def optional_attr(module_name: str, attr: str) -> Optional[Any]:
+    """Import ``module_name`` now and return ``attr``; None when the package is not installed."""
+    try:
+        return getattr(importlib.import_module(module_name), attr)
+    except ImportError:
+        return None
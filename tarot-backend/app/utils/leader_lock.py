@@ -0,0 +1,81 @@
+"""
+Cross-process leader election based on an exclusive file lock.
+
+gunicorn starts several uvicorn workers from the same image; background jobs
+that must run once per deployment (maintenance sweeps, outbox senders...) take
+a named lock here and only the worker holding it runs them. The OS releases
+the lock when the holder dies, so another worker takes over on its next try.
+"""
+import logging
+import os
+from pathlib import Path
+from typing import IO, Optional
+
+from ..config import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows 开发环境
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderLock:
+    """Non-blocking exclusive lock on ``<RUNTIME_DIR>/<name>.lock``."""
+
+    def __init__(self, name: str, directory: Optional[str] = None):
+        self.name = name
+        self.path = Path(directory or settings.RUNTIME_DIR) / f"{name}.lock"
+        self._handle: Optional[IO] = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self._handle is not None
+
+    def acquire(self) -> bool:
+        """
+        Try to become leader without blocking.
+
+        Returns:
+            bool: True if this process holds the lock
+        """
+        if self._handle is not None:
+            return True
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        handle = open(self.path, "a+")
+        try:
+            if fcntl is not None:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            handle.close()
+            return False
+
+        handle.seek(0)
+        handle.truncate()
+        handle.write(str(os.getpid()))
+        handle.flush()
+        self._handle = handle
+        logger.info(f"Acquired leader lock '{self.name}' (pid {os.getpid()})")
+        return True
+
+    def release(self) -> None:
+        """Release the lock if held."""
+        handle, self._handle = self._handle, None
+        if handle is None:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+            else:
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+        except OSError:
+            pass
+        finally:
+            handle.close()
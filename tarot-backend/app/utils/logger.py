@@ -1,18 +1,255 @@
 """
 日志管理器 - 统一管理应用日志输出
 提供分级日志记录，将详细信息记录到文件，关键信息输出到控制台
+
+所有处理器都挂在一个有界队列之后：请求线程/事件循环只做一次 put_nowait，
+格式化（JSON）、写文件和写控制台都在后台 QueueListener 线程完成。
+队列满时丢弃新记录并计数，日志永远不会阻塞 API 请求。
 """
 
+import atexit
+import json
 import logging
+import queue
 import sys
+import threading
+import traceback
+from datetime import datetime, timedelta
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
-from datetime import datetime
-from typing import Optional
+from typing import Dict, List, Optional
+
+from ..config import settings
 
 # 日志配置
 LOG_DIR = Path("logs")
 LOG_DIR.mkdir(exist_ok=True)
 
+CONSOLE_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+
+class JsonFormatter(logging.Formatter):
+    """Render records as one JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "module": record.module,
+            "func": record.funcName,
+            "line": record.lineno,
+            "process": record.process,
+        }
+        extra_data = getattr(record, "extra_data", None)
+        if extra_data is not None:
+            payload["data"] = extra_data
+        if record.exc_info and record.exc_info[0] is not None:
+            payload["exc"] = "".join(traceback.format_exception(*record.exc_info))
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class DailyFileHandler(logging.Handler):
+    """
+    Append to ``<prefix>_YYYYMMDD.log``, switching files when the date changes.
+
+    No files are renamed, so several worker processes can share the directory
+    safely. Files older than ``retention_days`` are removed on rollover.
+    """
+
+    def __init__(self, directory: Path, prefix: str, retention_days: int = 14):
+        super().__init__()
+        self.directory = Path(directory)
+        self.prefix = prefix
+        self.retention_days = retention_days
+        self._date: Optional[str] = None
+        self._stream = None
+
+    def _roll(self, date: str) -> None:
+        if self._stream is not None:
+            self._stream.close()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._stream = open(self.directory / f"{self.prefix}_{date}.log", "a", encoding="utf-8")
+        self._date = date
+        self._cleanup()
+
+    def _cleanup(self) -> None:
+        if self.retention_days <= 0:
+            return
+        cutoff = (datetime.now() - timedelta(days=self.retention_days)).strftime("%Y%m%d")
+        for path in self.directory.glob(f"{self.prefix}_*.log"):
+            stamp = path.stem[len(self.prefix) + 1:]
+            if stamp.isdigit() and stamp < cutoff:
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            date = datetime.fromtimestamp(record.created).strftime("%Y%m%d")
+            if date != self._date:
+                self._roll(date)
+            self._stream.write(self.format(record) + "\n")
+            self._stream.flush()
+        except Exception:
+            self.handleError(record)
+
+    def close(self) -> None:
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+        super().close()
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that never blocks: records are dropped (and counted) when the queue is full."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self.dropped_by_level: Dict[str, int] = {}
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 只合并 msg/args；异常堆栈与 extra_data 留给后台线程格式化
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            self.dropped_by_level[record.levelname] = self.dropped_by_level.get(record.levelname, 0) + 1
+
+
+class _RoutingHandler(logging.Handler):
+    """Runs in the listener thread and hands records to the sinks of their logger."""
+
+    def __init__(self):
+        super().__init__()
+        self.routes: Dict[str, List[logging.Handler]] = {}
+        self.default: List[logging.Handler] = []
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        top_level = record.name.split(".", 1)[0]
+        for handler in self.routes.get(top_level, self.default):
+            if record.levelno >= handler.level:
+                handler.handle(record)
+        return True
+
+    def emit(self, record: logging.LogRecord) -> None:  # pragma: no cover - handle() is overridden
+        self.handle(record)
+
+    def close(self) -> None:
+        for handler in [h for hs in self.routes.values() for h in hs] + self.default:
+            handler.close()
+        super().close()
+
+
+class _LogPipeline:
+    """Process-wide bounded queue + listener thread shared by all loggers."""
+
+    def __init__(self):
+        self.queue: queue.Queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+        self.queue_handler = DroppingQueueHandler(self.queue)
+        self.router = _RoutingHandler()
+        self.listener: Optional[QueueListener] = None
+        self._lock = threading.Lock()
+
+    def route(self, name: str, handlers: List[logging.Handler]) -> None:
+        self.router.routes[name] = handlers
+
+    def start(self) -> None:
+        with self._lock:
+            if self.listener is None:
+                self.listener = QueueListener(self.queue, self.router)
+                self.listener.start()
+
+    def stop(self) -> None:
+        """Flush queued records and stop the listener thread."""
+        with self._lock:
+            listener, self.listener = self.listener, None
+        if listener is not None:
+            listener.stop()
+
+    def stats(self) -> dict:
+        return {
+            "queued": self.queue.qsize(),
+            "capacity": self.queue.maxsize,
+            "dropped": self.queue_handler.dropped,
+            "dropped_by_level": dict(self.queue_handler.dropped_by_level),
+            "running": self.listener is not None,
+        }
+
+
+_pipeline = _LogPipeline()
+
+
+def _file_handler(prefix: str, level: int = logging.DEBUG) -> logging.Handler:
+    handler = DailyFileHandler(LOG_DIR, prefix, settings.LOG_RETENTION_DAYS)
+    handler.setLevel(level)
+    handler.setFormatter(JsonFormatter())
+    return handler
+
+
+def _console_handler(level: int, fmt: str = CONSOLE_FORMAT) -> logging.Handler:
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setLevel(level)
+    handler.setFormatter(logging.Formatter(fmt))
+    return handler
+
+
+def _extra(data: Optional[dict]) -> Optional[dict]:
+    """结构化附加数据，由后台线程序列化进 JSON 的 data 字段"""
+    return {"extra_data": data} if data else None
+
+
+def _attach(logger: logging.Logger) -> None:
+    """Route ``logger`` through the shared queue (no sinks on the calling thread)."""
+    logger.addHandler(_pipeline.queue_handler)
+    logger.propagate = False
+    _pipeline.start()
+
+
+def setup_logging(level: int = logging.INFO) -> None:
+    """
+    配置根日志记录器：控制台 + app_YYYYMMDD.log（JSON），均经由后台队列写出。
+
+    Args:
+        level: 根日志级别
+    """
+    _pipeline.router.default = [_console_handler(level), _file_handler("app", level)]
+    root = logging.getLogger()
+    root.setLevel(level)
+    for handler in list(root.handlers):
+        if handler is not _pipeline.queue_handler:
+            root.removeHandler(handler)
+    if _pipeline.queue_handler not in root.handlers:
+        root.addHandler(_pipeline.queue_handler)
+    _pipeline.start()
+
+
+def start_logging() -> None:
+    """启动（或在 shutdown 后重新启动）后台日志线程"""
+    _pipeline.start()
+
+
+def shutdown_logging() -> None:
+    """停止后台日志线程并写出队列中剩余的日志"""
+    _pipeline.stop()
+
+
+def get_logging_stats() -> dict:
+    """日志队列状态（积压、容量、丢弃数）"""
+    return _pipeline.stats()
+
+
+atexit.register(shutdown_logging)
+
+
 class AdminLogger:
     """管理员操作日志记录器"""
 
@@ -25,54 +262,31 @@ class AdminLogger:
         """设置日志记录器"""
         self.logger.setLevel(logging.DEBUG)
 
-        # 文件处理器 - 记录详细信息
-        file_handler = logging.FileHandler(
-            LOG_DIR / f"admin_{datetime.now().strftime('%Y%m%d')}.log",
-            encoding='utf-8'
-        )
-        file_handler.setLevel(logging.DEBUG)
-        file_formatter = logging.Formatter(
-            '%(asctime)s - %(name)s - %(levelname)s - %(funcName)s:%(lineno)d - %(message)s'
-        )
-        file_handler.setFormatter(file_formatter)
-
-        # 控制台处理器 - 只记录重要信息
-        console_handler = logging.StreamHandler(sys.stdout)
-        console_handler.setLevel(logging.INFO)
-        console_formatter = logging.Formatter(
-            '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-        )
-        console_handler.setFormatter(console_formatter)
-
-        self.logger.addHandler(file_handler)
-        self.logger.addHandler(console_handler)
+        # 文件记录详细信息（JSON），控制台只记录重要信息
+        _pipeline.route(self.logger.name, [
+            _file_handler(self.logger.name, logging.DEBUG),
+            _console_handler(logging.INFO),
+        ])
+        _attach(self.logger)
 
     def info(self, message: str, extra_data: Optional[dict] = None):
         """记录信息级别日志"""
-        if extra_data:
-            self.logger.debug(f"{message} | 详细数据: {extra_data}")
-        self.logger.info(message)
+        self.logger.info(message, extra=_extra(extra_data))
 
     def debug(self, message: str, data: Optional[dict] = None):
         """记录调试信息（仅文件）"""
-        if data:
-            message = f"{message} | 数据: {data}"
-        self.logger.debug(message)
+        self.logger.debug(message, extra=_extra(data))
 
     def warning(self, message: str, extra_data: Optional[dict] = None):
         """记录警告信息"""
-        if extra_data:
-            self.logger.debug(f"{message} | 详细数据: {extra_data}")
-        self.logger.warning(message)
+        self.logger.warning(message, extra=_extra(extra_data))
 
     def error(self, message: str, error: Optional[Exception] = None, extra_data: Optional[dict] = None):
         """记录错误信息"""
-        if extra_data:
-            self.logger.debug(f"{message} | 详细数据: {extra_data}")
         if error:
-            self.logger.error(f"{message} | 错误: {str(error)}", exc_info=True)
+            self.logger.error(f"{message} | 错误: {str(error)}", exc_info=True, extra=_extra(extra_data))
         else:
-            self.logger.error(message)
+            self.logger.error(message, extra=_extra(extra_data))
 
 class APILogger:
     """API请求日志记录器"""
@@ -86,35 +300,17 @@ class APILogger:
         """设置API日志记录器"""
         self.logger.setLevel(logging.DEBUG)
 
-        # API日志文件
-        file_handler = logging.FileHandler(
-            LOG_DIR / f"api_{datetime.now().strftime('%Y%m%d')}.log",
-            encoding='utf-8'
-        )
-        file_handler.setLevel(logging.DEBUG)
-        file_formatter = logging.Formatter(
-            '%(asctime)s - %(levelname)s - %(message)s'
-        )
-        file_handler.setFormatter(file_formatter)
-
-        # 控制台只显示错误
-        console_handler = logging.StreamHandler(sys.stdout)
-        console_handler.setLevel(logging.ERROR)
-        console_formatter = logging.Formatter(
-            '%(asctime)s - API ERROR - %(message)s'
-        )
-        console_handler.setFormatter(console_formatter)
-
-        self.logger.addHandler(file_handler)
-        self.logger.addHandler(console_handler)
+        # API日志文件（JSON），控制台只显示错误
+        _pipeline.route(self.logger.name, [
+            _file_handler(self.logger.name, logging.DEBUG),
+            _console_handler(logging.ERROR, '%(asctime)s - API ERROR - %(message)s'),
+        ])
+        _attach(self.logger)
 
     def log_request(self, method: str, path: str, user: str, data: Optional[dict] = None):
         """记录API请求"""
         message = f"{method} {path} | 用户: {user}"
-        if data:
-            self.logger.debug(f"{message} | 请求数据: {data}")
-        else:
-            self.logger.debug(message)
+        self.logger.debug(message, extra=_extra(data))
 
     def log_response(self, path: str, status: int, message: str = ""):
         """记录API响应"""
@@ -130,9 +326,7 @@ class APILogger:
     def log_error(self, path: str, error: Exception, context: Optional[dict] = None):
         """记录API错误"""
         message = f"API错误 {path} | {str(error)}"
-        if context:
-            self.logger.debug(f"{message} | 上下文: {context}")
-        self.logger.error(message, exc_info=True)
+        self.logger.error(message, exc_info=True, extra=_extra(context))
 
 # 全局日志实例
 admin_logger = AdminLogger()
@@ -0,0 +1,395 @@
+"""
+In-process metrics registry with Prometheus text exposition.
+
+Counters, gauges and histograms are plain Python objects guarded by a lock, so
+they can be updated from the event loop and from worker threads alike. Each
+gunicorn worker keeps its own registry; Prometheus scrapes and sums them per
+instance label like any multi-process exporter.
+"""
+import math
+import os
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import resource
+except ImportError:  # Windows 开发环境：不采集进程 CPU/RSS
+    resource = None
+
+LabelValues = Tuple[str, ...]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def samples(self) -> Iterable[str]:  # pragma: no cover - abstract
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing value."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def set_total(self, value: float, **labels: str) -> None:
+        """Mirror a total maintained elsewhere (collected at scrape time)."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Gauge(Counter):
+    """Value that can go up and down."""
+
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str) -> None:
+        self.set_total(value, **labels)
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram (``_bucket``/``_sum``/``_count`` series)."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                # 每个桶的计数 + sum + count
+                series = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def count(self, **labels: str) -> float:
+        series = self._values.get(self._key(labels))
+        return series[-1] if series else 0.0
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = [(key, list(series)) for key, series in self._values.items()]
+        for key, series in items:
+            cumulative = 0.0
+            for index, bound in enumerate(self.buckets):
+                cumulative += series[index]
+                labels = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+                yield f"{self.name}_bucket{labels} {_format_value(cumulative)}"
+            labels = _format_labels(self.labelnames, key, ("le", "+Inf"))
+            yield f"{self.name}_bucket{labels} {_format_value(series[-1])}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(series[-2])}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {_format_value(series[-1])}"
+
+
+class MetricsRegistry:
+    """Holds metrics and renders them in Prometheus text format."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector) -> None:
+        """Register a callable invoked before every render (to refresh gauges)."""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception:
+                pass
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.header())
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+# ---------------------------------------------------------------------------
+# Application metrics
+# ---------------------------------------------------------------------------
+
+HTTP_REQUESTS = registry.counter(
+    "http_requests_total", "HTTP requests handled", ("method", "route", "status")
+)
+HTTP_LATENCY = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency", ("method", "route")
+)
+HTTP_IN_PROGRESS = registry.gauge(
+    "http_requests_in_progress", "HTTP requests currently being handled", ("method", "route")
+)
+DB_SESSION_WAIT = registry.histogram(
+    "db_session_wait_seconds", "Time spent waiting for a pooled database connection",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+)
+LLM_LATENCY = registry.histogram(
+    "llm_request_duration_seconds", "LLM API call latency", ("provider", "model", "outcome")
+)
+LLM_TOKENS = registry.counter(
+    "llm_tokens_total", "LLM tokens used", ("provider", "model", "kind")
+)
+CREDIT_OPERATIONS = registry.counter(
+    "credit_operations_total", "Credit balance operations", ("type", "outcome")
+)
+CREDIT_AMOUNT = registry.counter(
+    "credit_amount_total", "Absolute credits moved by successful operations", ("type",)
+)
+
+
+def record_credit_operation(transaction_type: str, credit_change: int, success: bool) -> None:
+    """Count a credit balance change (earn/consume/refund/admin_adjust)."""
+    CREDIT_OPERATIONS.inc(type=transaction_type, outcome="success" if success else "failure")
+    if success:
+        CREDIT_AMOUNT.inc(abs(credit_change), type=transaction_type)
+
+
+def record_llm_usage(provider: str, model: str, usage) -> None:
+    """Count prompt/completion tokens from an OpenAI-compatible ``usage`` object."""
+    if usage is None:
+        return
+    for kind in ("prompt_tokens", "completion_tokens"):
+        value = getattr(usage, kind, None)
+        if value is None and isinstance(usage, dict):
+            value = usage.get(kind)
+        if value:
+            LLM_TOKENS.inc(value, provider=provider, model=model, kind=kind.split("_")[0])
+
+
+# ---------------------------------------------------------------------------
+# Process metrics
+# ---------------------------------------------------------------------------
+
+_CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+_PAGE_SIZE = resource.getpagesize() if resource is not None else 4096
+_START_TIME = time.time()
+
+
+class ProcessSampler:
+    """CPU/RSS of the current process, with CPU percent computed between samples (None where unavailable)."""
+
+    def __init__(self):
+        self._last_cpu: Optional[float] = None
+        self._last_wall: Optional[float] = None
+        self._last_percent = 0.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def cpu_seconds() -> Optional[float]:
+        try:
+            with open("/proc/self/stat", "rb") as stat:
+                fields = stat.read().rsplit(b")", 1)[1].split()
+            return (int(fields[11]) + int(fields[12])) / _CLOCK_TICKS
+        except (OSError, IndexError, ValueError):
+            if resource is None:
+                return None
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            return usage.ru_utime + usage.ru_stime
+
+    @staticmethod
+    def rss_bytes() -> Optional[int]:
+        try:
+            with open("/proc/self/statm", "rb") as statm:
+                return int(statm.read().split()[1]) * _PAGE_SIZE
+        except (OSError, IndexError, ValueError):
+            if resource is None:
+                return None
+            # macOS 上 ru_maxrss 单位为字节，Linux 为 KB（且为峰值）
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    def sample(self) -> dict:
+        cpu = self.cpu_seconds()
+        wall = time.monotonic()
+        with self._lock:
+            if cpu is not None and self._last_cpu is not None and wall - self._last_wall >= 0.5:
+                self._last_percent = max(0.0, (cpu - self._last_cpu) / (wall - self._last_wall) * 100)
+            if cpu is not None and (self._last_cpu is None or wall - self._last_wall >= 0.5):
+                self._last_cpu, self._last_wall = cpu, wall
+            percent = self._last_percent
+
+        try:
+            load1, load5, load15 = os.getloadavg()
+        except (AttributeError, OSError):
+            load1 = load5 = load15 = 0.0
+
+        return {
+            "cpu_seconds": cpu,
+            "cpu_percent": round(percent, 1),
+            "rss_bytes": self.rss_bytes(),
+            "load_average": [load1, load5, load15],
+            "cpu_count": os.cpu_count() or 1,
+            "uptime_seconds": time.time() - _START_TIME,
+        }
+
+
+process_sampler = ProcessSampler()
+
+_PROCESS_START = registry.gauge("process_start_time_seconds", "Process start time (unix epoch)")
+_SYSTEM_LOAD = registry.gauge("system_load1", "1-minute system load average")
+
+
+def _collect_process_metrics() -> None:
+    stats = process_sampler.sample()
+    _PROCESS_START.set(_START_TIME)
+    _SYSTEM_LOAD.set(stats["load_average"][0])
+
+
+registry.add_collector(_collect_process_metrics)
+
+if resource is not None:
+    _PROCESS_CPU = registry.counter("process_cpu_seconds_total", "Total user and system CPU time")
+    _PROCESS_RSS = registry.gauge("process_resident_memory_bytes", "Resident memory size")
+
+    def _collect_resource_metrics() -> None:
+        cpu, rss = process_sampler.cpu_seconds(), process_sampler.rss_bytes()
+        if cpu is not None:
+            _PROCESS_CPU.set_total(cpu)
+        if rss is not None:
+            _PROCESS_RSS.set(rss)
+
+    registry.add_collector(_collect_resource_metrics)
+
+
+# ---------------------------------------------------------------------------
+# HTTP middleware
+# ---------------------------------------------------------------------------
+
+@lru_cache(maxsize=2048)
+def _route_template(app, method: str, path: str) -> str:
+    scope = {"type": "http", "method": method, "path": path, "root_path": ""}
+    for route in getattr(app, "routes", ()):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            # 使用路由模板（/api/v1/readings/{id}）而非原始路径，避免标签基数爆炸
+            return getattr(route, "path_format", None) or getattr(route, "path", "unmatched")
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording per-route request count, latency and in-flight gauge."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = _route_template(scope.get("app"), method, scope["path"])
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_IN_PROGRESS.inc(method=method, route=route)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_PROGRESS.dec(method=method, route=route)
+            HTTP_LATENCY.observe(time.perf_counter() - started, method=method, route=route)
+            HTTP_REQUESTS.inc(method=method, route=route, status=str(status_code))
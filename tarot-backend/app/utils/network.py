@@ -0,0 +1,62 @@
+"""
+Request network helpers.
+"""
+import ipaddress
+from functools import lru_cache
+from typing import Optional, Tuple
+
+from starlette.requests import HTTPConnection
+
+from ..config import settings
+
+
+@lru_cache(maxsize=8)
+def _trusted_networks(proxies: Tuple[str, ...]) -> Tuple[ipaddress._BaseNetwork, ...]:
+    return tuple(ipaddress.ip_network(proxy.strip(), strict=False) for proxy in proxies if proxy.strip())
+
+
+def is_trusted_proxy(host: Optional[str]) -> bool:
+    """Whether ``host`` is one of ``TRUSTED_PROXIES`` (so its forwarding headers are honoured)."""
+    if not host:
+        return False
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in _trusted_networks(tuple(settings.TRUSTED_PROXIES)))
+
+
+def get_client_ip(request: HTTPConnection) -> Optional[str]:
+    """
+    Resolve the client IP address of a request.
+
+    Behind nginx the socket peer is the proxy, so the ``X-Real-IP`` /
+    ``X-Forwarded-For`` headers set in deploy/nginx/nginx.conf take precedence
+    — but only when the peer is a trusted proxy; anyone reaching the backend
+    directly could otherwise pick a fresh address per request.
+
+    Args:
+        request: Incoming request (or websocket) connection
+
+    Returns:
+        Optional[str]: Client IP address, or None if unknown
+    """
+    peer = request.client.host if request.client else None
+    if not is_trusted_proxy(peer):
+        return peer
+
+    real_ip = request.headers.get("x-real-ip")
+    if real_ip:
+        return real_ip.strip()
+
+    forwarded_for = request.headers.get("x-forwarded-for")
+    if forwarded_for:
+        # 从右往左取第一个不是受信代理的地址（左侧的值可由客户端伪造）
+        hops = [hop.strip() for hop in forwarded_for.split(",") if hop.strip()]
+        for hop in reversed(hops):
+            if not is_trusted_proxy(hop):
+                return hop
+        if hops:
+            return hops[0]
+
+    return peer
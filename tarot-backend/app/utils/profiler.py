@@ -0,0 +1,303 @@
+"""
+Opt-in sampling profiler for production requests.
+
+When enabled, a fraction of requests (or every request under the configured
+route prefixes) is profiled by a background thread that snapshots Python
+stacks with ``sys._current_frames()`` at a fixed interval. Samples are written
+as speedscope JSON files (open them at https://www.speedscope.app) into the
+profiles directory, which keeps at most ``max_files`` recent profiles.
+
+The switch lives in ``<RUNTIME_DIR>/profiler.json`` rather than in settings so
+an admin can turn it on for every worker at once without a redeploy; each
+worker re-reads the file when its mtime changes.
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+# 栈顶位于这些模块时线程处于空闲等待，不计入采样
+_IDLE_MODULES = ("threading.py", "queue.py", "selectors.py", "concurrent/futures/thread.py")
+
+FrameKey = Tuple[str, str, int]
+
+
+@dataclass(slots=True)
+class ProfilerConfig:
+    """Runtime switch shared by all workers through a JSON file."""
+
+    enabled: bool = False
+    sample_rate: float = 0.0  # 随机抽样比例（0-1）
+    routes: List[str] = field(default_factory=list)  # 路径前缀，命中即采样
+    interval_ms: float = 5.0
+    max_files: int = 50
+
+    def should_profile(self, path: str) -> bool:
+        if not self.enabled:
+            return False
+        if self.routes and path.startswith(tuple(self.routes)):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+
+class ProfilerConfigStore:
+    """Loads ``profiler.json``, re-reading it only when the file changes."""
+
+    CHECK_INTERVAL = 1.0
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(path or Path(settings.RUNTIME_DIR) / "profiler.json")
+        self._config = self._defaults()
+        self._mtime: Optional[float] = None
+        self._checked_at = 0.0
+
+    @staticmethod
+    def _defaults() -> ProfilerConfig:
+        return ProfilerConfig(
+            enabled=settings.PROFILER_ENABLED,
+            sample_rate=settings.PROFILER_SAMPLE_RATE,
+            routes=list(settings.PROFILER_ROUTES),
+            interval_ms=settings.PROFILER_INTERVAL_MS,
+            max_files=settings.PROFILER_MAX_FILES,
+        )
+
+    def get(self) -> ProfilerConfig:
+        now = time.monotonic()
+        if now - self._checked_at < self.CHECK_INTERVAL:
+            return self._config
+        self._checked_at = now
+
+        try:
+            mtime = self.path.stat().st_mtime
+        except FileNotFoundError:
+            if self._mtime is not None:
+                self._config, self._mtime = self._defaults(), None
+            return self._config
+
+        if mtime != self._mtime:
+            try:
+                data = json.loads(self.path.read_text(encoding="utf-8"))
+                self._config = ProfilerConfig(**{**asdict(self._defaults()), **data})
+                self._mtime = mtime
+            except (OSError, ValueError, TypeError) as e:
+                logger.warning(f"Invalid profiler config {self.path}: {e}")
+        return self._config
+
+    def update(self, **changes) -> ProfilerConfig:
+        """Persist new values (visible to every worker within a second)."""
+        config = ProfilerConfig(**{**asdict(self.get()), **changes})
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(asdict(config), ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+        self._config, self._checked_at = config, 0.0
+        return config
+
+
+class StackSampler:
+    """Background thread recording Python stacks of all other threads."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.samples: Dict[int, List[Tuple[Tuple[FrameKey, ...], float]]] = {}
+        self.thread_names: Dict[int, str] = {}
+        self.started_at = 0.0
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration = time.perf_counter() - self.started_at
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            weight, last = now - last, now
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = self._stack(frame)
+                if stack and not stack[-1][1].endswith(_IDLE_MODULES):
+                    self.samples.setdefault(thread_id, []).append((stack, weight))
+                    self.thread_names.setdefault(thread_id, names.get(thread_id, str(thread_id)))
+
+    @staticmethod
+    def _stack(frame) -> Tuple[FrameKey, ...]:
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append((code.co_name, code.co_filename, frame.f_lineno))
+            frame = frame.f_back
+        stack.reverse()  # 根 → 叶
+        return tuple(stack)
+
+    def to_speedscope(self, name: str) -> dict:
+        frames: List[dict] = []
+        frame_index: Dict[FrameKey, int] = {}
+        profiles = []
+
+        for thread_id, samples in self.samples.items():
+            stacks, weights = [], []
+            for stack, weight in samples:
+                indices = []
+                for key in stack:
+                    index = frame_index.get(key)
+                    if index is None:
+                        index = frame_index[key] = len(frames)
+                        frames.append({"name": key[0], "file": key[1], "line": key[2]})
+                    indices.append(index)
+                stacks.append(indices)
+                weights.append(weight)
+            profiles.append({
+                "type": "sampled",
+                "name": self.thread_names.get(thread_id, str(thread_id)),
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": stacks,
+                "weights": weights,
+            })
+
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": settings.APP_NAME,
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": profiles,
+        }
+
+
+class ProfileStore:
+    """Profiles directory with a retention limit."""
+
+    SUFFIX = ".speedscope.json"
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = Path(directory or settings.PROFILER_OUTPUT_DIR)
+
+    def save(self, name: str, document: dict, max_files: int) -> Path:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"{name}{self.SUFFIX}"
+        path.write_text(json.dumps(document, separators=(",", ":")), encoding="utf-8")
+        self.prune(max_files)
+        return path
+
+    def list(self) -> List[dict]:
+        if not self.directory.exists():
+            return []
+        profiles = []
+        for path in self.directory.glob(f"*{self.SUFFIX}"):
+            stat = path.stat()
+            profiles.append({
+                "name": path.name,
+                "size": stat.st_size,
+                "created_at": datetime.utcfromtimestamp(stat.st_mtime).isoformat(),
+            })
+        profiles.sort(key=lambda item: item["created_at"], reverse=True)
+        return profiles
+
+    def path_for(self, filename: str) -> Optional[Path]:
+        if "/" in filename or "\\" in filename or not filename.endswith(self.SUFFIX):
+            return None
+        path = self.directory / filename
+        return path if path.is_file() else None
+
+    def prune(self, max_files: int) -> None:
+        paths = sorted(self.directory.glob(f"*{self.SUFFIX}"), key=lambda p: p.stat().st_mtime, reverse=True)
+        for path in paths[max(0, max_files):]:
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def _profile_name(method: str, path: str, duration: float) -> str:
+    slug = re.sub(r"[^A-Za-z0-9]+", "-", path).strip("-")[:80] or "root"
+    timestamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S%f")
+    return f"{timestamp}_{method}_{slug}_{int(duration * 1000)}ms_{os.getpid()}"
+
+
+class ProfilerMiddleware:
+    """
+    Pure ASGI middleware profiling selected requests.
+
+    The sampler sees the whole process, so at most one request per worker is
+    profiled at a time; requests arriving meanwhile run unprofiled.
+    """
+
+    def __init__(self, app: ASGIApp, config_store: Optional[ProfilerConfigStore] = None,
+                 store: Optional[ProfileStore] = None):
+        self.app = app
+        self.config_store = config_store or profiler_config
+        self.store = store or profile_store
+        self._busy = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or self._busy:
+            await self.app(scope, receive, send)
+            return
+
+        config = self.config_store.get()
+        if not config.should_profile(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        self._busy = True
+        sampler = StackSampler(max(config.interval_ms, 1.0) / 1000)
+        sampler.start()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            # stop() 要 join 采样线程，序列化也是 CPU 密集的，都不能放在事件循环里
+            def finish() -> None:
+                sampler.stop()
+                name = _profile_name(scope["method"], scope["path"], sampler.duration)
+                try:
+                    self.store.save(name, sampler.to_speedscope(f"{scope['method']} {scope['path']}"), config.max_files)
+                except OSError as e:
+                    logger.warning(f"Failed to write profile {name}: {e}")
+
+            try:
+                await asyncio.to_thread(finish)
+            finally:
+                self._busy = False
+
+
+# 全局实例
+profiler_config = ProfilerConfigStore()
+profile_store = ProfileStore()
+
+
+def get_profiler_config() -> ProfilerConfigStore:
+    return profiler_config
+
+
+def get_profile_store() -> ProfileStore:
+    return profile_store
@@ -0,0 +1,99 @@
+"""
+Authentication of Google Cloud Pub/Sub push requests.
+
+A push subscription with authentication enabled sends
+``Authorization: Bearer <OIDC token>`` signed by Google for the configured
+service account. The token is verified against Google's public certificates
+(cached per their ``Cache-Control`` max-age), the expected audience and,
+when configured, the service account email.
+"""
+import json
+import logging
+import re
+import threading
+import time
+import urllib.request
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from ..config import settings
+from .lazy_import import lazy_import
+
+google_jwt = lazy_import("google.auth.jwt")
+google_exceptions = lazy_import("google.auth.exceptions")
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_OAUTH2_CERTS_URL = "https://www.googleapis.com/oauth2/v1/certs"
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+_MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
+
+class PushAuthenticationError(Exception):
+    """The push request does not carry a valid Pub/Sub OIDC token."""
+
+
+class PushAuthNotConfiguredError(PushAuthenticationError):
+    """No expected audience is configured, so no push request can be trusted."""
+
+
+def fetch_google_certs() -> Tuple[Dict[str, str], float]:
+    """Download Google's OAuth2 signing certificates; returns ``(certs, max_age_seconds)``."""
+    with urllib.request.urlopen(GOOGLE_OAUTH2_CERTS_URL, timeout=10) as response:
+        certs = json.loads(response.read().decode("utf-8"))
+        match = _MAX_AGE_RE.search(response.headers.get("Cache-Control", ""))
+    return certs, float(match.group(1)) if match else 3600.0
+
+
+class PubSubPushVerifier:
+    """校验 Pub/Sub 推送请求携带的 Google OIDC 令牌"""
+
+    def __init__(self, fetch_certs: Callable[[], Tuple[Dict[str, str], float]] = fetch_google_certs):
+        self.fetch_certs = fetch_certs
+        self._certs: Optional[Dict[str, str]] = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+
+    def _get_certs(self) -> Dict[str, str]:
+        with self._lock:
+            if self._certs is None or time.monotonic() >= self._expires_at:
+                certs, max_age = self.fetch_certs()
+                self._certs = certs
+                self._expires_at = time.monotonic() + max_age
+            return self._certs
+
+    def verify(
+        self,
+        authorization: Optional[str],
+        audience: Optional[str] = None,
+        service_account: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Verify an ``Authorization`` header and return the token claims.
+
+        Raises:
+            PushAuthNotConfiguredError: no audience configured
+            PushAuthenticationError: missing, malformed or untrusted token
+        """
+        audience = audience or settings.GOOGLE_PLAY_PUBSUB_AUDIENCE
+        service_account = service_account or settings.GOOGLE_PLAY_PUBSUB_SERVICE_ACCOUNT
+        if not audience:
+            raise PushAuthNotConfiguredError("Pub/Sub push audience is not configured")
+
+        scheme, _, token = (authorization or "").partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            raise PushAuthenticationError("Missing bearer token")
+
+        try:
+            claims = google_jwt.decode(token, certs=self._get_certs(), audience=audience)
+        except (ValueError, google_exceptions.GoogleAuthError) as e:
+            raise PushAuthenticationError(f"Invalid push token: {e}")
+
+        if claims.get("iss") not in GOOGLE_ISSUERS:
+            raise PushAuthenticationError(f"Unexpected token issuer: {claims.get('iss')}")
+        if service_account and (claims.get("email") != service_account or not claims.get("email_verified")):
+            raise PushAuthenticationError(f"Unexpected push service account: {claims.get('email')}")
+        return claims
+
+
+# 全局实例
+pubsub_push_verifier = PubSubPushVerifier()
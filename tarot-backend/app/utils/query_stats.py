@@ -0,0 +1,184 @@
+"""
+Per-request SQL instrumentation.
+
+SQLAlchemy ``before_cursor_execute`` / ``after_cursor_execute`` listeners time
+every statement and add it to the ``QueryStats`` of the current request, held
+in a context var (sync endpoints and dependencies run in the thread pool with a
+copy of the request context, so they record into the same object).
+``QueryStatsMiddleware`` reports the totals in a ``Server-Timing`` header, logs
+slow statements and warns when one statement repeats often enough to look like
+an N+1 loop. ``assert_query_budget`` lets tests fail when an endpoint grows
+extra queries.
+"""
+import logging
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Iterator, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from ..config import settings
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERIES = registry.counter("db_slow_queries_total", "SQL statements slower than SLOW_QUERY_THRESHOLD_MS")
+QUERIES_PER_REQUEST = registry.histogram(
+    "db_queries_per_request", "SQL statements executed per HTTP request",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200)
+)
+
+
+@dataclass(slots=True)
+class QueryStats:
+    """Statements executed while handling one request (or one tracked block)."""
+
+    count: int = 0
+    total_seconds: float = 0.0
+    statements: Counter = field(default_factory=Counter)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record(self, statement: str, elapsed: float) -> None:
+        with self._lock:
+            self.count += 1
+            self.total_seconds += elapsed
+            self.statements[statement] += 1
+
+    @property
+    def total_ms(self) -> float:
+        return self.total_seconds * 1000
+
+    def repeated(self, threshold: int) -> List[tuple]:
+        """Statements executed at least ``threshold`` times (likely N+1)."""
+        return [(sql, n) for sql, n in self.statements.most_common() if n >= threshold]
+
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+_observers: List[QueryStats] = []
+_observers_lock = threading.Lock()
+
+
+def current_query_stats() -> Optional[QueryStats]:
+    """QueryStats of the request being handled, if any."""
+    return _current_stats.get()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_times", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start_times = conn.info.get("query_start_times")
+    if not start_times:
+        return
+    elapsed = time.perf_counter() - start_times.pop()
+
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.record(statement, elapsed)
+    if _observers:
+        with _observers_lock:
+            for observer in _observers:
+                observer.record(statement, elapsed)
+
+    if elapsed * 1000 >= settings.SLOW_QUERY_THRESHOLD_MS:
+        SLOW_QUERIES.inc()
+        logger.warning(f"Slow query ({elapsed * 1000:.1f} ms): {' '.join(statement.split())[:500]}")
+
+
+def _handle_error(exception_context):
+    # 执行失败的语句不会触发 after_cursor_execute，在这里弹出其开始时间，避免列表随连接常驻而增长
+    connection = exception_context.connection
+    start_times = connection.info.get("query_start_times") if connection is not None else None
+    if start_times:
+        start_times.pop()
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Attach the timing listeners to ``engine`` (idempotent)."""
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+class QueryStatsMiddleware:
+    """Pure ASGI middleware collecting SQL stats per request."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not settings.QUERY_STATS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = _current_stats.set(stats)
+        started = time.perf_counter()
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                header = (
+                    f'db;dur={stats.total_ms:.1f};desc="{stats.count} queries", '
+                    f"app;dur={elapsed_ms:.1f}"
+                )
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"server-timing", header.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_stats.reset(token)
+            self._report(scope, stats)
+
+    @staticmethod
+    def _report(scope: Scope, stats: QueryStats) -> None:
+        if stats.count:
+            QUERIES_PER_REQUEST.observe(stats.count)
+        for statement, times in stats.repeated(settings.QUERY_REPEAT_WARNING_THRESHOLD):
+            logger.warning(
+                f"Possible N+1 on {scope['method']} {scope['path']}: statement executed {times} times: "
+                f"{' '.join(statement.split())[:300]}"
+            )
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """Collect every statement executed on instrumented engines, from any thread."""
+    stats = QueryStats()
+    with _observers_lock:
+        _observers.append(stats)
+    try:
+        yield stats
+    finally:
+        with _observers_lock:
+            _observers.remove(stats)
+
+
+@contextmanager
+def assert_query_budget(max_queries: int, engine: Optional[Engine] = None) -> Iterator[QueryStats]:
+    """
+    Test helper failing when the wrapped block runs more than ``max_queries`` statements.
+
+    Usage::
+
+        with assert_query_budget(3, engine):
+            client.get("/api/v1/admin/users")
+    """
+    if engine is not None:
+        instrument_engine(engine)
+    with track_queries() as stats:
+        yield stats
+    if stats.count > max_queries:
+        detail = "\n".join(f"  {n}x {' '.join(sql.split())[:200]}" for sql, n in stats.statements.most_common())
+        raise AssertionError(f"Query budget exceeded: {stats.count} > {max_queries}\n{detail}")
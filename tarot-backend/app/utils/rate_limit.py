@@ -0,0 +1,312 @@
+"""
+Token-bucket rate limiting middleware.
+
+Limits are enforced per route group (``RateLimitRule``) and per client key:
+the installation id inside the bearer token for authenticated requests, the
+client IP otherwise (so users behind one carrier NAT do not share a bucket). Each worker first checks a lock-free in-process bucket; since a
+worker only ever sees a subset of the traffic, an empty local bucket means the
+shared bucket is empty too and the request is rejected without I/O. Otherwise
+the shared SQLite bucket (one atomic UPSERT) decides, so limits hold across
+all uvicorn workers.
+"""
+import asyncio
+import json
+import logging
+import math
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import jwt
+from starlette.requests import HTTPConnection
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from ..config import settings
+from .network import get_client_ip
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class RateLimitRule:
+    """Token bucket applied to every path under ``prefixes``."""
+
+    name: str
+    prefixes: Tuple[str, ...]
+    capacity: float
+    refill_per_second: float
+    exclude_prefixes: Tuple[str, ...] = ()
+
+    def matches(self, path: str) -> bool:
+        return path.startswith(self.prefixes) and not path.startswith(self.exclude_prefixes)
+
+    def retry_after(self, tokens: float) -> float:
+        return max(0.0, (1 - tokens) / self.refill_per_second)
+
+
+def default_rules() -> List[RateLimitRule]:
+    """Rules derived from the RATE_LIMIT settings."""
+    return [
+        RateLimitRule(
+            name="readings",
+            prefixes=("/api/v1/readings",),
+            capacity=settings.RATE_LIMIT_PER_MINUTE,
+            refill_per_second=settings.RATE_LIMIT_PER_MINUTE / 60,
+        ),
+        RateLimitRule(
+            # 购买令牌由 Google 确认，无法枚举；单独计数，避免同一出口 IP 下的
+            # 正常购买被兑换码的严格限额挡住
+            name="google_play",
+            prefixes=("/api/v1/payments/google/verify", "/api/v1/payments/google/consume"),
+            capacity=settings.GOOGLE_PLAY_VERIFY_RATE_LIMIT_PER_HOUR,
+            refill_per_second=settings.GOOGLE_PLAY_VERIFY_RATE_LIMIT_PER_HOUR / 3600,
+        ),
+        RateLimitRule(
+            name="payments",
+            prefixes=("/api/v1/payments",),
+            capacity=settings.PAYMENT_RATE_LIMIT_PER_HOUR,
+            refill_per_second=settings.PAYMENT_RATE_LIMIT_PER_HOUR / 3600,
+            # Google Play 实时通知由 Pub/Sub 推送，不能限流
+            exclude_prefixes=(
+                "/api/v1/payments/webhooks",
+                "/api/v1/payments/google/verify",
+                "/api/v1/payments/google/consume",
+            ),
+        ),
+    ]
+
+
+class InMemoryTokenBuckets:
+    """
+    Per-process buckets.
+
+    Only touched from the event loop thread, so plain dict operations need no
+    lock.
+    """
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets: Dict[str, List[float]] = {}
+
+    def take(self, key: str, rule: RateLimitRule, now: float) -> Tuple[bool, float]:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_keys:
+                self._prune(now)
+            bucket = self._buckets[key] = [rule.capacity, now]
+
+        tokens = min(rule.capacity, bucket[0] + (now - bucket[1]) * rule.refill_per_second)
+        bucket[1] = now
+        if tokens < 1:
+            bucket[0] = tokens
+            return False, rule.retry_after(tokens)
+        bucket[0] = tokens - 1
+        return True, 0.0
+
+    def refund(self, key: str) -> None:
+        bucket = self._buckets.get(key)
+        if bucket is not None:
+            bucket[0] += 1
+
+    def _prune(self, now: float) -> None:
+        # 丢弃最久未访问的一半（满桶的 key 丢弃后行为不变）
+        ordered = sorted(self._buckets.items(), key=lambda item: item[1][1])
+        for key, _ in ordered[: len(ordered) // 2]:
+            del self._buckets[key]
+
+
+class SQLiteTokenBuckets:
+    """Buckets shared by all workers through a small WAL-mode SQLite file."""
+
+    PRUNE_EVERY = 1000
+
+    _TAKE_SQL = """
+        INSERT INTO rate_limit_buckets (key, tokens, updated_at)
+        VALUES (:key, :capacity - 1, :now)
+        ON CONFLICT(key) DO UPDATE SET
+            tokens = MIN(:capacity, tokens + (:now - updated_at) * :rate) - 1,
+            updated_at = :now
+        WHERE MIN(:capacity, tokens + (:now - updated_at) * :rate) >= 1
+        RETURNING tokens
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._local = threading.local()
+        self._calls = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limit_buckets ("
+                "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def take(self, key: str, rule: RateLimitRule, now: float) -> Tuple[bool, float]:
+        conn = self._connection()
+        params = {"key": key, "capacity": rule.capacity, "rate": rule.refill_per_second, "now": now}
+        row = conn.execute(self._TAKE_SQL, params).fetchone()
+
+        self._calls += 1
+        if self._calls % self.PRUNE_EVERY == 0:
+            self._prune(conn, now)
+
+        if row is not None:
+            return True, 0.0
+
+        current = conn.execute(
+            "SELECT tokens, updated_at FROM rate_limit_buckets WHERE key = ?", (key,)
+        ).fetchone()
+        tokens = min(rule.capacity, current[0] + (now - current[1]) * rule.refill_per_second) if current else 0.0
+        return False, rule.retry_after(tokens)
+
+    def refund(self, key: str, rule: RateLimitRule) -> None:
+        self._connection().execute(
+            "UPDATE rate_limit_buckets SET tokens = MIN(?, tokens + 1) WHERE key = ?", (rule.capacity, key)
+        )
+
+    def _prune(self, conn: sqlite3.Connection, now: float) -> None:
+        # 一小时未访问的桶早已回满，删除不影响限流结果
+        conn.execute("DELETE FROM rate_limit_buckets WHERE updated_at < ?", (now - 3600,))
+
+
+@lru_cache(maxsize=4096)
+def _installation_id_from_token(token: str) -> Optional[str]:
+    try:
+        payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
+    except jwt.PyJWTError:
+        return None
+    value = payload.get("installation_id") or payload.get("sub")
+    return str(value) if value else None
+
+
+def client_keys(connection: HTTPConnection) -> List[str]:
+    """Keys a request is limited by: the installation id if authenticated, else the client IP."""
+    authorization = connection.headers.get("authorization", "")
+    if authorization[:7].lower() == "bearer ":
+        installation_id = _installation_id_from_token(authorization[7:].strip())
+        if installation_id:
+            return [f"inst:{installation_id}"]
+
+    client_ip = get_client_ip(connection)
+    return [f"ip:{client_ip}"] if client_ip else []
+
+
+class RateLimitMiddleware:
+    """Pure ASGI middleware returning 429 with ``Retry-After`` when a bucket is empty."""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        rules: Optional[List[RateLimitRule]] = None,
+        backend: Optional[str] = None,
+        shared_path: Optional[str] = None
+    ):
+        self.app = app
+        self.rules = rules if rules is not None else default_rules()
+        self.local = InMemoryTokenBuckets()
+        self.shared: Optional[SQLiteTokenBuckets] = None
+
+        backend = backend or settings.RATE_LIMIT_BACKEND
+        if backend == "sqlite":
+            path = shared_path or str(Path(settings.RUNTIME_DIR) / "ratelimit.db")
+            try:
+                self.shared = SQLiteTokenBuckets(path)
+            except sqlite3.Error as e:
+                logger.error(f"Shared rate limit store unavailable, using per-process limits: {e}")
+
+    def _match(self, path: str) -> Optional[RateLimitRule]:
+        for rule in self.rules:
+            if rule.matches(path):
+                return rule
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not settings.RATE_LIMIT_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        rule = self._match(scope["path"])
+        if rule is None:
+            await self.app(scope, receive, send)
+            return
+
+        keys = [f"{rule.name}:{key}" for key in client_keys(HTTPConnection(scope))]
+        allowed, retry_after = await self._take(keys, rule)
+        if allowed:
+            await self.app(scope, receive, send)
+            return
+
+        await self._reject(scope, send, rule, retry_after)
+
+    async def _take(self, keys: List[str], rule: RateLimitRule) -> Tuple[bool, float]:
+        now = time.time()
+        taken = []
+        for key in keys:
+            allowed, retry_after = self.local.take(key, rule, now)
+            if not allowed:
+                for previous in taken:
+                    self.local.refund(previous)
+                return False, retry_after
+            taken.append(key)
+
+        if self.shared is None:
+            return True, 0.0
+
+        try:
+            allowed, retry_after = await asyncio.to_thread(self._take_shared, keys, rule, now)
+        except sqlite3.Error as e:
+            # 共享存储异常时退化为进程内限流
+            logger.warning(f"Shared rate limit check failed: {e}")
+            return True, 0.0
+
+        if not allowed:
+            for key in keys:
+                self.local.refund(key)
+        return allowed, retry_after
+
+    def _take_shared(self, keys: List[str], rule: RateLimitRule, now: float) -> Tuple[bool, float]:
+        taken = []
+        for key in keys:
+            allowed, retry_after = self.shared.take(key, rule, now)
+            if not allowed:
+                # 被后面的 key 拒绝时退还已扣的令牌（如同一 IP 下的其他设备不受影响）
+                for previous in taken:
+                    self.shared.refund(previous, rule)
+                return False, retry_after
+            taken.append(key)
+        return True, 0.0
+
+    async def _reject(self, scope: Scope, send: Send, rule: RateLimitRule, retry_after: float) -> None:
+        body = json.dumps({
+            "error": "Too many requests",
+            "status_code": 429,
+            "path": scope["path"],
+        }).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+                (b"x-ratelimit-limit", str(int(rule.capacity)).encode()),
+                (b"x-ratelimit-group", rule.name.encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -3,13 +3,16 @@ Redeem code generation and validation utilities.
 """
 import secrets
 import string
+import uuid
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
-from typing import List, Optional
+from typing import Callable, Iterator, List, Optional
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, insert, select, update
 
-from ..models import RedeemCode, User
+from ..models import RedeemCode, User, Purchase, CreditTransaction
 from ..config import settings
+from .redeem_guard import redeem_code_guard
 
 
 class RedeemCodeGenerator:
@@ -80,6 +83,70 @@ class RedeemCodeGenerator:
 
         return list(codes)
 
+    @classmethod
+    def generate_codes_bulk(
+        cls,
+        count: int,
+        length: int = 16,
+        prefix: Optional[str] = None
+    ) -> List[str]:
+        """
+        Generate a large number of codes from bulk random bytes.
+
+        Instead of one ``secrets.choice`` call per character, random bytes are
+        drawn with ``secrets.token_bytes`` and mapped onto the charset through a
+        translation table. Bytes above the largest multiple of the charset size
+        are discarded (rejection sampling) so every character stays uniformly
+        distributed.
+
+        Args:
+            count: Number of codes to generate
+            length: Total length of each code (including prefix)
+            prefix: Optional prefix for codes
+
+        Returns:
+            List[str]: Codes, unique within the returned list
+        """
+        prefix = prefix or ""
+        random_length = length - len(prefix)
+        if prefix and random_length < 4:
+            raise ValueError("Code length too short for prefix")
+        if random_length <= 0:
+            raise ValueError("Code length must be positive")
+        if count <= 0:
+            return []
+
+        valid_chars = cls.get_valid_chars()
+        table, rejected = cls._byte_translation(valid_chars)
+
+        codes: List[str] = []
+        seen = set()
+        while len(codes) < count:
+            missing = count - len(codes)
+            needed = missing * random_length
+            # 按接受率多取一点字节，尽量一次取够
+            raw = secrets.token_bytes(needed * 256 // (256 - len(rejected)) + 64)
+            chars = raw.translate(table, rejected).decode("ascii")
+            for start in range(0, len(chars) - random_length + 1, random_length):
+                code = prefix + chars[start:start + random_length]
+                if code in seen:
+                    continue
+                seen.add(code)
+                codes.append(code)
+                if len(codes) == count:
+                    break
+
+        return codes
+
+    @staticmethod
+    def _byte_translation(valid_chars: str) -> tuple[bytes, bytes]:
+        """Build a ``bytes.translate`` table mapping random bytes onto ``valid_chars``."""
+        size = len(valid_chars)
+        limit = 256 - (256 % size)
+        table = bytes(ord(valid_chars[b % size]) if b < limit else 0 for b in range(256))
+        rejected = bytes(range(limit, 256))
+        return table, rejected
+
     @classmethod
     def create_batch_id(cls) -> str:
         """
@@ -94,11 +161,80 @@ class RedeemCodeGenerator:
         return f"BATCH_{timestamp}_{random_suffix}"
 
 
+@dataclass(slots=True)
+class BulkGenerationProgress:
+    """Progress snapshot emitted by the bulk redeem code engine."""
+
+    batch_id: str
+    requested: int
+    inserted: int = 0
+    collisions: int = 0
+    chunks: int = 0
+    finished: bool = False
+    expires_at: Optional[datetime] = None
+    started_at: datetime = field(default_factory=datetime.utcnow)
+
+    @property
+    def elapsed_seconds(self) -> float:
+        return (datetime.utcnow() - self.started_at).total_seconds()
+
+    def to_dict(self) -> dict:
+        return {
+            "batch_id": self.batch_id,
+            "requested": self.requested,
+            "inserted": self.inserted,
+            "collisions": self.collisions,
+            "chunks": self.chunks,
+            "finished": self.finished,
+            "expires_at": self.expires_at.isoformat() if self.expires_at else None,
+            "elapsed_seconds": round(self.elapsed_seconds, 3),
+        }
+
+
 class RedeemCodeService:
     """Service for managing redeem codes."""
 
+    # 连续多少个分块完全冲突后放弃（说明码空间已接近耗尽）
+    MAX_COLLISION_ROUNDS = 5
+
     @staticmethod
-    def create_redeem_codes(
+    def _insert_ignore_conflicts(db: Session, rows: List[dict]) -> int:
+        """
+        Insert rows with ``ON CONFLICT (code) DO NOTHING`` via executemany.
+
+        Returns:
+            int: Number of rows actually inserted
+        """
+        dialect = db.get_bind().dialect.name
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        elif dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            dialect_insert = None
+
+        if dialect_insert is not None:
+            stmt = dialect_insert(RedeemCode.__table__).on_conflict_do_nothing(
+                index_elements=["code"]
+            )
+            result = db.execute(stmt, rows)
+            if result.rowcount is not None and result.rowcount >= 0:
+                return result.rowcount
+            return len(rows)
+
+        # 不支持 ON CONFLICT 的方言：先过滤已存在的码再插入
+        existing = {
+            code for (code,) in db.query(RedeemCode.code).filter(
+                RedeemCode.code.in_([row["code"] for row in rows])
+            )
+        }
+        fresh = [row for row in rows if row["code"] not in existing]
+        if fresh:
+            db.execute(insert(RedeemCode.__table__), fresh)
+        return len(fresh)
+
+    @staticmethod
+    def iter_create_redeem_codes_bulk(
         db: Session,
         product_id: int,
         credits: int,
@@ -106,10 +242,16 @@ class RedeemCodeService:
         expires_days: Optional[int] = None,
         batch_id: Optional[str] = None,
         prefix: Optional[str] = None,
-        code_length: int = 16
-    ) -> List[RedeemCode]:
+        code_length: int = 16,
+        chunk_size: Optional[int] = None
+    ) -> Iterator[BulkGenerationProgress]:
         """
-        Create a batch of redeem codes.
+        Create a (potentially very large) batch of redeem codes, yielding progress.
+
+        Codes are inserted chunk by chunk with Core ``insert()``/executemany and
+        ``ON CONFLICT DO NOTHING``; each chunk is committed on its own so write
+        locks stay short. Only the rows that collided with existing codes are
+        regenerated and go into the next chunk.
 
         Args:
             db: Database session
@@ -120,125 +262,308 @@ class RedeemCodeService:
             batch_id: Optional batch ID for tracking
             prefix: Optional code prefix
             code_length: Length of each code
+            chunk_size: Rows per insert chunk (defaults to REDEEM_CODE_BULK_CHUNK_SIZE)
 
-        Returns:
-            List[RedeemCode]: Created redeem codes
+        Yields:
+            BulkGenerationProgress: Progress after every committed chunk; the
+            last item has ``finished=True``
 
         Raises:
-            ValueError: If codes already exist or generation fails
+            ValueError: If parameters are invalid or the code space is exhausted
         """
+        if count <= 0:
+            raise ValueError("Count must be positive")
+        if credits <= 0:
+            raise ValueError("Credits must be positive")
+
+        chunk_size = max(1, chunk_size or settings.REDEEM_CODE_BULK_CHUNK_SIZE)
         if not batch_id:
             batch_id = RedeemCodeGenerator.create_batch_id()
 
-        # Set expiration date if specified
         expires_at = None
         if expires_days:
             expires_at = datetime.utcnow() + timedelta(days=expires_days)
 
-        # Generate unique codes
-        max_retries = 3
-        for retry in range(max_retries):
+        progress = BulkGenerationProgress(
+            batch_id=batch_id,
+            requested=count,
+            expires_at=expires_at
+        )
+        collision_rounds = 0
+
+        while progress.inserted < count:
+            wanted = min(chunk_size, count - progress.inserted)
+            codes = RedeemCodeGenerator.generate_codes_bulk(wanted, code_length, prefix)
+            created_at = datetime.utcnow()
+            rows = [
+                {
+                    "code": code,
+                    "product_id": product_id,
+                    "credits": credits,
+                    "status": "active",
+                    "expires_at": expires_at,
+                    "batch_id": batch_id,
+                    "created_at": created_at,
+                }
+                for code in codes
+            ]
+
             try:
-                codes = RedeemCodeGenerator.generate_batch(count, code_length, prefix)
-
-                # Check if any codes already exist in database
-                existing_codes = db.query(RedeemCode.code).filter(
-                    RedeemCode.code.in_(codes)
-                ).all()
-
-                if existing_codes:
-                    if retry == max_retries - 1:
-                        raise ValueError(f"Generated codes conflict with existing codes: {existing_codes}")
-                    continue  # Retry generation
-
-                # Create redeem code records
-                redeem_codes = []
-                for code in codes:
-                    redeem_code = RedeemCode(
-                        code=code,
-                        product_id=product_id,
-                        credits=credits,
-                        status="active",
-                        expires_at=expires_at,
-                        batch_id=batch_id
+                inserted = RedeemCodeService._insert_ignore_conflicts(db, rows)
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+
+            redeem_code_guard.add_codes(codes)
+
+            collided = len(rows) - inserted
+            progress.inserted += inserted
+            progress.collisions += collided
+            progress.chunks += 1
+
+            if inserted == 0:
+                collision_rounds += 1
+                if collision_rounds >= RedeemCodeService.MAX_COLLISION_ROUNDS:
+                    raise ValueError(
+                        f"Could not generate unique codes after {collision_rounds} attempts; "
+                        "increase code length"
                     )
-                    redeem_codes.append(redeem_code)
-                    db.add(redeem_code)
+            else:
+                collision_rounds = 0
 
-                db.commit()
-                return redeem_codes
+            if progress.inserted < count:
+                yield progress
 
-            except Exception as e:
-                db.rollback()
-                if retry == max_retries - 1:
-                    raise e
-                continue
+        progress.finished = True
+        yield progress
+
+    @staticmethod
+    def create_redeem_codes_bulk(
+        db: Session,
+        product_id: int,
+        credits: int,
+        count: int,
+        expires_days: Optional[int] = None,
+        batch_id: Optional[str] = None,
+        prefix: Optional[str] = None,
+        code_length: int = 16,
+        chunk_size: Optional[int] = None,
+        progress_callback: Optional[Callable[[BulkGenerationProgress], None]] = None
+    ) -> BulkGenerationProgress:
+        """
+        Run the bulk engine to completion.
+
+        See ``iter_create_redeem_codes_bulk`` for the arguments.
+
+        Returns:
+            BulkGenerationProgress: Final progress of the batch
+        """
+        progress = None
+        for progress in RedeemCodeService.iter_create_redeem_codes_bulk(
+            db,
+            product_id=product_id,
+            credits=credits,
+            count=count,
+            expires_days=expires_days,
+            batch_id=batch_id,
+            prefix=prefix,
+            code_length=code_length,
+            chunk_size=chunk_size
+        ):
+            if progress_callback:
+                progress_callback(progress)
+        return progress
+
+    @staticmethod
+    def create_redeem_codes(
+        db: Session,
+        product_id: int,
+        credits: int,
+        count: int,
+        expires_days: Optional[int] = None,
+        batch_id: Optional[str] = None,
+        prefix: Optional[str] = None,
+        code_length: int = 16
+    ) -> List[RedeemCode]:
+        """
+        Create a batch of redeem codes.
+
+        Args:
+            db: Database session
+            product_id: Product ID for the codes
+            credits: Credits each code provides
+            count: Number of codes to create
+            expires_days: Days until codes expire (None = never expire)
+            batch_id: Optional batch ID for tracking
+            prefix: Optional code prefix
+            code_length: Length of each code
 
-        raise ValueError("Failed to create redeem codes after multiple retries")
+        Returns:
+            List[RedeemCode]: Created redeem codes
+
+        Raises:
+            ValueError: If generation fails
+        """
+        progress = RedeemCodeService.create_redeem_codes_bulk(
+            db,
+            product_id=product_id,
+            credits=credits,
+            count=count,
+            expires_days=expires_days,
+            batch_id=batch_id,
+            prefix=prefix,
+            code_length=code_length
+        )
+        return RedeemCodeService.get_batch_codes(db, progress.batch_id)
 
     @staticmethod
-    def validate_and_use_code(
+    def claim_code(
         db: Session,
         code: str,
-        user: User
-    ) -> tuple[RedeemCode, bool]:
+        user_id: int,
+        now: Optional[datetime] = None
+    ) -> RedeemCode:
         """
-        Validate and use a redeem code.
+        Atomically claim a redeem code for a user without committing.
+
+        A single ``UPDATE ... WHERE code = ? AND status = 'active' AND
+        (expires_at IS NULL OR expires_at > now)`` both validates and marks the
+        code, so two devices racing on the same code cannot both succeed. The
+        per-device daily limit is checked in the same statement against the
+        credit ledger. Only when no row matches is the failure reason looked up.
 
         Args:
             db: Database session
-            code: Redeem code to validate
-            user: User attempting to use the code
+            code: Redeem code to claim
+            user_id: User claiming the code
+            now: Claim time (defaults to utcnow)
 
         Returns:
-            tuple[RedeemCode, bool]: (redeem_code, was_used_successfully)
+            RedeemCode: The claimed code
 
         Raises:
             ValueError: If code is invalid or cannot be used
         """
-        # Find the redeem code
-        redeem_code = db.query(RedeemCode).filter(
-            RedeemCode.code == code.upper()
-        ).first()
+        now = now or datetime.utcnow()
+        normalized = code.strip().upper()
+        daily_limit = getattr(settings, 'REDEEM_CODE_DAILY_LIMIT_PER_DEVICE', 5)
+        today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+        today_usage = (
+            select(func.count(CreditTransaction.id))
+            .where(
+                CreditTransaction.user_id == user_id,
+                CreditTransaction.reference_type == "redeem_code",
+                CreditTransaction.created_at >= today_start
+            )
+            .scalar_subquery()
+        )
+
+        stmt = (
+            update(RedeemCode)
+            .where(
+                RedeemCode.code == normalized,
+                RedeemCode.status == "active",
+                (RedeemCode.expires_at.is_(None)) | (RedeemCode.expires_at > now),
+                today_usage < daily_limit
+            )
+            .values(status="used", used_by=user_id, used_at=now)
+            .returning(RedeemCode)
+            .execution_options(synchronize_session=False)
+        )
+        claimed = db.scalars(stmt).first()
+        if claimed is not None:
+            return claimed
+
+        RedeemCodeService._raise_claim_failure(db, normalized, user_id, now, daily_limit)
+
+    @staticmethod
+    def _raise_claim_failure(
+        db: Session,
+        code: str,
+        user_id: int,
+        now: datetime,
+        daily_limit: int
+    ) -> None:
+        """Explain why ``claim_code`` matched no row (only runs on the failure path)."""
+        redeem_code = db.query(RedeemCode).filter(RedeemCode.code == code).first()
 
         if not redeem_code:
             raise ValueError("Invalid redeem code")
 
-        # Check if code is already used
         if redeem_code.status == "used":
             raise ValueError("Redeem code has already been used")
 
-        # Check if code is disabled
         if redeem_code.status == "disabled":
             raise ValueError("Redeem code is disabled")
 
-        # Check if code has expired
-        if redeem_code.expires_at and redeem_code.expires_at < datetime.utcnow():
+        if redeem_code.status == "expired":
+            raise ValueError("Redeem code has expired")
+
+        if redeem_code.expires_at and redeem_code.expires_at <= now:
             # Mark as expired
             redeem_code.status = "expired"
             db.commit()
             raise ValueError("Redeem code has expired")
 
-        # Check daily usage limits per device
-        daily_limit = getattr(settings, 'REDEEM_CODE_DAILY_LIMIT_PER_DEVICE', 5)
-        today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        if redeem_code.status == "active":
+            raise ValueError(f"Daily redeem limit exceeded ({daily_limit} codes per day)")
 
-        today_usage = db.query(func.count(RedeemCode.id)).filter(
-            RedeemCode.used_by == user.id,
-            RedeemCode.used_at >= today_start,
-            RedeemCode.status == "used"
-        ).scalar()
+        raise ValueError("Redeem code is not available")
 
-        if today_usage >= daily_limit:
-            raise ValueError(f"Daily redeem limit exceeded ({daily_limit} codes per day)")
+    @staticmethod
+    def redeem_code_for_user(
+        db: Session,
+        code: str,
+        user: User
+    ) -> tuple[RedeemCode, int, CreditTransaction]:
+        """
+        Claim a code, grant its credits and record the purchase in one commit.
 
-        # Mark code as used
-        redeem_code.status = "used"
-        redeem_code.used_by = user.id
-        redeem_code.used_at = datetime.utcnow()
+        Args:
+            db: Database session
+            code: Redeem code to use
+            user: User redeeming the code
 
-        db.commit()
-        return redeem_code, True
+        Returns:
+            tuple[RedeemCode, int, CreditTransaction]: (redeem_code, new_balance, transaction)
+
+        Raises:
+            ValueError: If code is invalid or cannot be used
+        """
+        from ..services.user_service import UserService
+
+        user_id = user.id
+        try:
+            redeem_code = RedeemCodeService.claim_code(db, code, user_id)
+
+            new_balance, transaction = UserService.apply_credit_change(
+                db=db,
+                user_id=user_id,
+                credit_change=redeem_code.credits,
+                transaction_type="earn",
+                reference_type="redeem_code",
+                reference_id=redeem_code.id,
+                description=f"Redeemed code: {redeem_code.code}"
+            )
+
+            db.add(Purchase(
+                order_id=f"redeem_{redeem_code.id}_{uuid.uuid4().hex[:8]}",
+                platform="redeem_code",
+                user_id=user_id,
+                product_id=redeem_code.product_id,
+                credits=redeem_code.credits,
+                status="completed",
+                redeem_code=redeem_code.code,
+                completed_at=redeem_code.used_at
+            ))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        return redeem_code, new_balance, transaction
 
     @staticmethod
     def get_code_info(db: Session, code: str) -> Optional[RedeemCode]:
@@ -349,29 +674,62 @@ class RedeemCodeService:
         )
 
         db.commit()
+        if updated:
+            redeem_code_guard.schedule_rebuild()
         return updated
 
     @staticmethod
-    def cleanup_expired_codes(db: Session) -> int:
+    def cleanup_expired_codes(db: Session, chunk_size: Optional[int] = None) -> int:
         """
         Mark expired codes as expired status.
 
+        With ``chunk_size`` the sweep updates at most that many rows per
+        transaction, so a large backlog never holds the write lock for long.
+
         Args:
             db: Database session
+            chunk_size: Optional number of rows to update per commit
 
         Returns:
             int: Number of codes marked as expired
         """
         now = datetime.utcnow()
 
-        updated = db.query(RedeemCode).filter(
-            RedeemCode.status == "active",
-            RedeemCode.expires_at.isnot(None),
-            RedeemCode.expires_at < now
-        ).update(
-            {"status": "expired"},
-            synchronize_session=False
-        )
+        if not chunk_size:
+            updated = db.query(RedeemCode).filter(
+                RedeemCode.status == "active",
+                RedeemCode.expires_at.isnot(None),
+                RedeemCode.expires_at < now
+            ).update(
+                {"status": "expired"},
+                synchronize_session=False
+            )
 
-        db.commit()
-        return updated
\ No newline at end of file
+            db.commit()
+            return updated
+
+        total = 0
+        while True:
+            ids = [
+                code_id for (code_id,) in db.query(RedeemCode.id).filter(
+                    RedeemCode.status == "active",
+                    RedeemCode.expires_at.isnot(None),
+                    RedeemCode.expires_at < now
+                ).limit(chunk_size)
+            ]
+            if not ids:
+                break
+
+            total += db.query(RedeemCode).filter(
+                RedeemCode.id.in_(ids),
+                RedeemCode.status == "active"
+            ).update(
+                {"status": "expired"},
+                synchronize_session=False
+            )
+            db.commit()
+
+            if len(ids) < chunk_size:
+                break
+
+        return total
@@ -0,0 +1,297 @@
+"""
+Negative cache and brute-force damping for redeem code lookups.
+
+A Bloom filter over all active codes lets ``/payments/redeem`` and
+``/payments/redeem/info`` reject codes that cannot exist without touching the
+database. Every worker keeps its own filter and periodically picks up codes
+that other workers created (id watermark) or re-activated (``updated_at``
+watermark), so a valid code is never rejected. Failed attempts are counted per device and per IP and answered with a
+progressively longer delay, so scripted guessing is slowed down.
+"""
+import asyncio
+import hashlib
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..database import SessionLocal
+from ..models import RedeemCode
+
+logger = logging.getLogger(__name__)
+
+# updated_at 由各 worker 的本地时钟写入，且事务提交晚于写入时间；
+# 增量同步时回看一段时间，重复加入同一兑换码是无害的
+_UPDATED_AT_OVERLAP = timedelta(seconds=30)
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter using blake2b double hashing."""
+
+    def __init__(self, num_bits: int, num_hashes: int):
+        self.num_bits = max(8, num_bits)
+        self.num_hashes = max(1, num_hashes)
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    @classmethod
+    def for_capacity(cls, capacity: int, false_positive_rate: float) -> "BloomFilter":
+        """Create a filter sized for ``capacity`` items at the given false positive rate."""
+        capacity = max(1, capacity)
+        num_bits = int(math.ceil(-capacity * math.log(false_positive_rate) / (math.log(2) ** 2)))
+        num_hashes = int(round(num_bits / capacity * math.log(2)))
+        return cls(num_bits, num_hashes)
+
+    def _positions(self, item: str) -> Iterable[int]:
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class FailureTracker:
+    """Bounded per-key failure counters with a sliding expiry window."""
+
+    def __init__(self, window_seconds: int, max_entries: int = 100_000):
+        self.window_seconds = window_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple[int, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def failures(self, key: str, now: Optional[float] = None) -> int:
+        now = now or time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if not entry:
+                return 0
+            count, last_seen = entry
+            if now - last_seen > self.window_seconds:
+                del self._entries[key]
+                return 0
+            return count
+
+    def record(self, key: str, now: Optional[float] = None) -> int:
+        now = now or time.monotonic()
+        with self._lock:
+            count, last_seen = self._entries.pop(key, (0, now))
+            if now - last_seen > self.window_seconds:
+                count = 0
+            count += 1
+            self._entries[key] = (count, now)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return count
+
+    def reset(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class RedeemCodeGuard:
+    """Bloom filter of active redeem codes plus failed-attempt damping."""
+
+    def __init__(self):
+        self.enabled = settings.REDEEM_GUARD_ENABLED
+        self.false_positive_rate = settings.REDEEM_BLOOM_FALSE_POSITIVE_RATE
+        self.refresh_seconds = settings.REDEEM_BLOOM_REFRESH_SECONDS
+        self.free_attempts = settings.REDEEM_FAILURE_FREE_ATTEMPTS
+        self.base_delay = settings.REDEEM_FAILURE_BASE_DELAY_SECONDS
+        self.max_delay = settings.REDEEM_FAILURE_MAX_DELAY_SECONDS
+        self.failures = FailureTracker(settings.REDEEM_FAILURE_WINDOW_SECONDS)
+
+        self._bloom: Optional[BloomFilter] = None
+        self._capacity = 0
+        self._watermark = 0
+        self._updated_watermark: Optional[datetime] = None
+        self._last_refresh = 0.0
+        self._lock = threading.Lock()
+        self._rebuilding = False
+        self.stats = {"rejected": 0, "passed": 0, "rebuilds": 0, "delayed": 0}
+
+    @property
+    def ready(self) -> bool:
+        return self._bloom is not None
+
+    # ------------------------------------------------------------------ #
+    # Bloom filter maintenance
+    # ------------------------------------------------------------------ #
+
+    def rebuild(self, db: Session) -> int:
+        """
+        Rebuild the filter from all active codes.
+
+        Args:
+            db: Database session
+
+        Returns:
+            int: Number of codes loaded
+        """
+        updated_watermark = datetime.utcnow() - _UPDATED_AT_OVERLAP
+        watermark = db.query(func.max(RedeemCode.id)).scalar() or 0
+        active = db.query(func.count(RedeemCode.id)).filter(RedeemCode.status == "active").scalar() or 0
+
+        # 预留一倍余量给后续增量生成的兑换码
+        capacity = max(10_000, active * 2)
+        bloom = BloomFilter.for_capacity(capacity, self.false_positive_rate)
+        query = db.query(RedeemCode.code).filter(
+            RedeemCode.status == "active",
+            RedeemCode.id <= watermark
+        ).yield_per(10_000)
+        for (code,) in query:
+            bloom.add(code)
+
+        with self._lock:
+            self._bloom = bloom
+            self._capacity = capacity
+            self._watermark = watermark
+            self._updated_watermark = updated_watermark
+            self._last_refresh = time.monotonic()
+            self.stats["rebuilds"] += 1
+
+        logger.info(f"兑换码 Bloom 过滤器已重建: {bloom.count} 个有效兑换码")
+        return bloom.count
+
+    def schedule_rebuild(self) -> None:
+        """Rebuild in a background thread (e.g. after codes were disabled)."""
+        if not self.enabled:
+            return
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+
+        def run():
+            db = SessionLocal()
+            try:
+                self.rebuild(db)
+            except Exception as e:
+                logger.error(f"兑换码 Bloom 过滤器重建失败: {e}")
+            finally:
+                db.close()
+                with self._lock:
+                    self._rebuilding = False
+
+        threading.Thread(target=run, name="redeem-bloom-rebuild", daemon=True).start()
+
+    def add_codes(self, codes: Iterable[str]) -> None:
+        """Add freshly generated codes to the filter."""
+        with self._lock:
+            bloom = self._bloom
+            if bloom is None:
+                return
+            for code in codes:
+                bloom.add(code)
+            overfilled = bloom.count > self._capacity
+        if overfilled:
+            self.schedule_rebuild()
+
+    def _refresh(self, db: Session) -> None:
+        """Pick up codes other workers created or re-activated since the last watermarks."""
+        with self._lock:
+            watermark = self._watermark
+            updated_watermark = self._updated_watermark
+            self._last_refresh = time.monotonic()
+
+        next_updated_watermark = datetime.utcnow() - _UPDATED_AT_OVERLAP
+        changed = RedeemCode.id > watermark
+        if updated_watermark is not None:
+            changed = changed | (RedeemCode.updated_at > updated_watermark)
+        rows: List[tuple] = db.query(RedeemCode.id, RedeemCode.code).filter(
+            changed,
+            RedeemCode.status == "active"
+        ).all()
+
+        if rows:
+            self.add_codes(code for _, code in rows)
+        with self._lock:
+            if rows:
+                self._watermark = max(self._watermark, max(row_id for row_id, _ in rows))
+            if self._updated_watermark is None or next_updated_watermark > self._updated_watermark:
+                self._updated_watermark = next_updated_watermark
+
+    def might_exist(self, code: str, db: Session) -> bool:
+        """
+        Check whether ``code`` could be an active redeem code.
+
+        Returns True when the filter is disabled or not built yet (fail open;
+        the build runs in the background, never on the request path).
+        """
+        if not self.enabled:
+            return True
+        bloom = self._bloom
+        if bloom is None:
+            self.schedule_rebuild()
+            return True
+        if time.monotonic() - self._last_refresh >= self.refresh_seconds:
+            self._refresh(db)
+
+        if code in bloom:
+            self.stats["passed"] += 1
+            return True
+        self.stats["rejected"] += 1
+        return False
+
+    # ------------------------------------------------------------------ #
+    # Brute-force damping
+    # ------------------------------------------------------------------ #
+
+    @staticmethod
+    def throttle_keys(installation_id: Optional[str] = None, client_ip: Optional[str] = None) -> List[str]:
+        keys = []
+        if installation_id:
+            keys.append(f"device:{installation_id}")
+        if client_ip:
+            keys.append(f"ip:{client_ip}")
+        return keys
+
+    def delay_for(self, keys: Iterable[str]) -> float:
+        """Progressive delay (seconds) based on the worst failure count among ``keys``."""
+        failures = max((self.failures.failures(key) for key in keys), default=0)
+        excess = failures - self.free_attempts
+        if excess < 0:
+            return 0.0
+        return min(self.max_delay, self.base_delay * (2 ** excess))
+
+    async def throttle(self, keys: Iterable[str]) -> float:
+        """Sleep for the current penalty of ``keys``; returns the delay applied."""
+        if not self.enabled:
+            return 0.0
+        delay = self.delay_for(keys)
+        if delay > 0:
+            self.stats["delayed"] += 1
+            await asyncio.sleep(delay)
+        return delay
+
+    def record_failure(self, keys: Iterable[str]) -> None:
+        for key in keys:
+            self.failures.record(key)
+
+    def reset_failures(self, keys: Iterable[str]) -> None:
+        for key in keys:
+            self.failures.reset(key)
+
+
+# 全局实例
+redeem_code_guard = RedeemCodeGuard()
+
+
+def get_redeem_code_guard() -> RedeemCodeGuard:
+    """获取兑换码防护实例"""
+    return redeem_code_guard
@@ -0,0 +1,408 @@
+"""
+Lightweight request tracing.
+
+Spans are kept in a context var, so nesting follows the call graph across
+``await`` and into ``asyncio.to_thread`` / thread-pool endpoints (both copy the
+caller's context). Trace ids propagate with the W3C ``traceparent`` header:
+an incoming header continues the caller's trace and every response carries
+the server span's ``traceparent`` plus ``X-Trace-Id``.
+
+Finished spans of sampled traces go to a bounded queue; a background thread
+writes them as JSON lines to ``TRACING_EXPORT_PATH`` or posts them as OTLP/HTTP
+JSON to ``TRACING_OTLP_ENDPOINT`` (e.g. a local collector on :4318). When the
+queue is full spans are dropped rather than slowing requests down.
+"""
+import asyncio
+import functools
+import json
+import logging
+import os
+import queue
+import random
+import re
+import secrets
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+_TRACEPARENT_RE = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+@dataclass(slots=True)
+class Span:
+    """A timed operation within a trace."""
+
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    sampled: bool
+    kind: str = "internal"
+    start_ns: int = field(default_factory=time.time_ns)
+    end_ns: Optional[int] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    status: str = "ok"
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def record_exception(self, exc: BaseException) -> None:
+        self.status = "error"
+        self.attributes["exception.type"] = type(exc).__name__
+        self.attributes["exception.message"] = str(exc)[:500]
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        return None if self.end_ns is None else (self.end_ns - self.start_ns) / 1e6
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": self.duration_ms,
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[Tuple[str, str, bool]]:
+    """Return ``(trace_id, parent_span_id, sampled)`` from a W3C traceparent header."""
+    if not header:
+        return None
+    match = _TRACEPARENT_RE.match(header.strip().lower())
+    if not match or match.group(1) == "0" * 32 or match.group(2) == "0" * 16:
+        return None
+    return match.group(1), match.group(2), bool(int(match.group(3), 16) & 1)
+
+
+def _new_span(name: str, kind: str, attributes: Optional[dict], remote: Optional[Tuple[str, str, bool]]) -> Span:
+    parent = _current_span.get()
+    if parent is not None:
+        trace_id, parent_id, sampled = parent.trace_id, parent.span_id, parent.sampled
+    elif remote is not None:
+        trace_id, parent_id, sampled = remote
+    else:
+        trace_id, parent_id = secrets.token_hex(16), None
+        sampled = random.random() < settings.TRACING_SAMPLE_RATE
+    return Span(
+        name=name,
+        trace_id=trace_id,
+        span_id=secrets.token_hex(8),
+        parent_id=parent_id,
+        sampled=sampled,
+        kind=kind,
+        attributes=dict(attributes or {}),
+    )
+
+
+def _finish(span: Span) -> None:
+    span.end_ns = time.time_ns()
+    if span.sampled:
+        span_exporter.export(span)
+
+
+@contextmanager
+def start_span(
+    name: str,
+    attributes: Optional[dict] = None,
+    kind: str = "internal",
+    remote_parent: Optional[Tuple[str, str, bool]] = None
+) -> Iterator[Optional[Span]]:
+    """Run the block inside a child span of the current one (no-op when tracing is off)."""
+    if not settings.TRACING_ENABLED:
+        yield None
+        return
+
+    span = _new_span(name, kind, attributes, remote_parent)
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as exc:
+        span.record_exception(exc)
+        raise
+    finally:
+        _current_span.reset(token)
+        _finish(span)
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    """Decorator wrapping a sync or async function in a span."""
+    def decorator(func: Callable) -> Callable:
+        span_name = name or func.__qualname__
+
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with start_span(span_name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with start_span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+# ---------------------------------------------------------------------------
+# SQL spans
+# ---------------------------------------------------------------------------
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if not settings.TRACING_ENABLED or _current_span.get() is None:
+        return
+    span = _new_span("db.query", "client", {
+        "db.system": conn.engine.dialect.name,
+        "db.statement": " ".join(statement.split())[:1000],
+    }, None)
+    conn.info.setdefault("trace_spans", []).append(span)
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    spans = conn.info.get("trace_spans")
+    if spans:
+        _finish(spans.pop())
+
+
+def _handle_error(exception_context):
+    spans = exception_context.connection.info.get("trace_spans") if exception_context.connection else None
+    if spans:
+        span = spans.pop()
+        span.record_exception(exception_context.original_exception)
+        _finish(span)
+
+
+def instrument_engine_tracing(engine: Engine) -> None:
+    """Emit a ``db.query`` span for every statement run inside a trace (idempotent)."""
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+# ---------------------------------------------------------------------------
+# HTTP middleware
+# ---------------------------------------------------------------------------
+
+class TracingMiddleware:
+    """Pure ASGI middleware opening the server span of every HTTP request."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not settings.TRACING_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        from .metrics import _route_template
+
+        headers = dict(scope.get("headers") or [])
+        remote = parse_traceparent(headers.get(b"traceparent", b"").decode("latin-1"))
+        route = _route_template(scope.get("app"), scope["method"], scope["path"])
+
+        with start_span(
+            f"{scope['method']} {route}",
+            {"http.method": scope["method"], "http.route": route, "http.target": scope["path"]},
+            kind="server",
+            remote_parent=remote,
+        ) as span:
+            async def send_wrapper(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.status_code", message["status"])
+                    if message["status"] >= 500:
+                        span.status = "error"
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"traceparent", span.traceparent.encode()),
+                        (b"x-trace-id", span.trace_id.encode()),
+                    ]
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper)
+
+
+# ---------------------------------------------------------------------------
+# Exporter
+# ---------------------------------------------------------------------------
+
+class SpanExporter:
+    """Background thread shipping finished spans to a JSONL file or an OTLP/HTTP endpoint."""
+
+    BATCH_SIZE = 256
+    FLUSH_INTERVAL = 1.0
+
+    def __init__(self, maxsize: int = 10000):
+        self._queue: "queue.Queue[Optional[Span]]" = queue.Queue(maxsize=maxsize)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.dropped = 0
+        self.exported = 0
+
+    def export(self, span: Span) -> None:
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            batch: List[Span] = []
+            try:
+                item = self._queue.get(timeout=self.FLUSH_INTERVAL)
+            except queue.Empty:
+                continue
+            stop = item is None
+            if item is not None:
+                batch.append(item)
+            while not stop and len(batch) < self.BATCH_SIZE:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                else:
+                    batch.append(item)
+            if batch:
+                self._write(batch)
+            if stop:
+                return
+
+    def _write(self, batch: List[Span]) -> None:
+        try:
+            if settings.TRACING_OTLP_ENDPOINT:
+                self._post_otlp(batch)
+            else:
+                self._append_jsonl(batch)
+            self.exported += len(batch)
+        except Exception as e:
+            self.dropped += len(batch)
+            logger.warning(f"Failed to export {len(batch)} spans: {e}")
+
+    @staticmethod
+    def _append_jsonl(batch: List[Span]) -> None:
+        path = Path(settings.TRACING_EXPORT_PATH)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        max_bytes = settings.TRACING_EXPORT_MAX_MB * 1024 * 1024
+        if path.exists() and path.stat().st_size > max_bytes:
+            os.replace(path, path.with_name(path.name + ".1"))
+        with path.open("a", encoding="utf-8") as handle:
+            for span in batch:
+                handle.write(json.dumps(span.to_dict(), ensure_ascii=False, default=str) + "\n")
+
+    @staticmethod
+    def _post_otlp(batch: List[Span]) -> None:
+        body = json.dumps(to_otlp(batch), default=str).encode("utf-8")
+        request = urllib.request.Request(
+            settings.TRACING_OTLP_ENDPOINT,
+            data=body,
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=5) as response:
+            response.read()
+
+    def flush(self, timeout: float = 5.0) -> None:
+        """Stop the thread after draining queued spans (used on shutdown and in tests)."""
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        thread.join(timeout)
+
+    def get_stats(self) -> dict:
+        return {"queued": self._queue.qsize(), "exported": self.exported, "dropped": self.dropped}
+
+
+_OTLP_KIND = {"internal": 1, "server": 2, "client": 3}
+
+
+def _otlp_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(batch: List[Span]) -> dict:
+    """Convert spans to an OTLP/HTTP JSON ``ExportTraceServiceRequest``."""
+    spans = []
+    for span in batch:
+        otlp_span = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": _OTLP_KIND.get(span.kind, 1),
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in span.attributes.items()],
+            "status": {"code": 2 if span.status == "error" else 1},
+        }
+        if span.parent_id:
+            otlp_span["parentSpanId"] = span.parent_id
+        spans.append(otlp_span)
+
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [
+                {"key": "service.name", "value": {"stringValue": settings.TRACING_SERVICE_NAME}},
+                {"key": "service.version", "value": {"stringValue": settings.APP_VERSION}},
+            ]},
+            "scopeSpans": [{"scope": {"name": "app.utils.tracing"}, "spans": spans}],
+        }]
+    }
+
+
+# 全局实例
+span_exporter = SpanExporter()
+
+
+def get_span_exporter() -> SpanExporter:
+    return span_exporter
@@ -21,6 +21,14 @@ from app.models import (
     Purchase,
     CreditTransaction,
     AppRelease,
+    AppReleasePatch,
+    LLMCallLog,
+    ReadingDailyStat,
+    ReadingQuestionStat,
+    AnalyticsWatermark,
+    PrecomputedAnalysis,
+    EmailOutbox,
+    GooglePlayNotification,
 )
 
 # this is the Alembic Config object, which provides
@@ -0,0 +1,43 @@
+"""Add precomputed_analyses table
+
+Revision ID: 3f8a2c7d9e14
+Revises: 9d41c6a8e5b2
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "3f8a2c7d9e14"
+down_revision: Union[str, Sequence[str], None] = "9d41c6a8e5b2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create precomputed_analyses."""
+    op.create_table(
+        "precomputed_analyses",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("question_hash", sa.String(length=40), nullable=False, comment="规范化问题文本的 SHA1"),
+        sa.Column("locale", sa.String(length=16), nullable=False, comment="结果语言"),
+        sa.Column("version", sa.Integer(), nullable=False, comment="预计算版本，提示词变化时递增"),
+        sa.Column("question", sa.Text(), nullable=False, comment="规范化后的问题文本"),
+        sa.Column("dimension_names", sa.Text(), nullable=False, comment="推荐维度名称（JSON 数组）"),
+        sa.Column("description", sa.Text(), nullable=False, comment="统一概要描述"),
+        sa.Column("source_count", sa.Integer(), nullable=False, comment="预计算时该问题的累计提问次数"),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint(
+            "question_hash", "locale", "version", name="uq_precomputed_analyses_hash_locale_version"
+        ),
+    )
+
+
+def downgrade() -> None:
+    """Drop precomputed_analyses."""
+    op.drop_table("precomputed_analyses")
@@ -0,0 +1,48 @@
+"""Add email_outbox table
+
+Revision ID: 5a1c9e3b7f20
+Revises: 3f8a2c7d9e14
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "5a1c9e3b7f20"
+down_revision: Union[str, Sequence[str], None] = "3f8a2c7d9e14"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create email_outbox."""
+    op.create_table(
+        "email_outbox",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("to_email", sa.String(length=255), nullable=False, comment="收件人邮箱"),
+        sa.Column("subject", sa.String(length=255), nullable=False, comment="邮件主题"),
+        sa.Column("text_body", sa.Text(), nullable=False, comment="纯文本内容"),
+        sa.Column("html_body", sa.Text(), nullable=True, comment="HTML内容"),
+        sa.Column("kind", sa.String(length=32), nullable=False,
+                  comment="邮件类型：verify_email, reset_password, generic"),
+        sa.Column("status", sa.String(length=16), nullable=False, comment="状态：pending, sent, failed"),
+        sa.Column("attempts", sa.Integer(), nullable=False, comment="已尝试发送次数"),
+        sa.Column("next_attempt_at", sa.DateTime(), nullable=False, comment="下次可发送时间"),
+        sa.Column("last_error", sa.Text(), nullable=True, comment="最近一次发送错误"),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("sent_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_email_outbox_status_next_attempt_at", "email_outbox", ["status", "next_attempt_at"], unique=False
+    )
+
+
+def downgrade() -> None:
+    """Drop email_outbox."""
+    op.drop_index("ix_email_outbox_status_next_attempt_at", table_name="email_outbox")
+    op.drop_table("email_outbox")
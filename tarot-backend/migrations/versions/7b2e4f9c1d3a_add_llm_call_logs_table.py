@@ -0,0 +1,46 @@
+"""Add llm_call_logs table for LLM usage accounting
+
+Revision ID: 7b2e4f9c1d3a
+Revises: 4c8c31a3e2a1
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "7b2e4f9c1d3a"
+down_revision: Union[str, Sequence[str], None] = "4c8c31a3e2a1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create llm_call_logs table."""
+    op.create_table(
+        "llm_call_logs",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False, comment="调用时间（UTC）"),
+        sa.Column("provider", sa.String(length=20), nullable=False, comment="zhipu / openai"),
+        sa.Column("model", sa.String(length=64), nullable=False, comment="模型名称"),
+        sa.Column("locale", sa.String(length=16), nullable=True, comment="请求语言"),
+        sa.Column("endpoint", sa.String(length=50), nullable=True, comment="调用来源，如 readings.generate"),
+        sa.Column("prompt_tokens", sa.Integer(), nullable=True),
+        sa.Column("completion_tokens", sa.Integer(), nullable=True),
+        sa.Column("latency_ms", sa.Integer(), nullable=False, comment="调用耗时（毫秒）"),
+        sa.Column("outcome", sa.String(length=10), nullable=False, comment="success / empty / error"),
+        sa.Column("cost_usd", sa.Float(), nullable=True, comment="按 LLM_PRICING 估算的费用"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_llm_call_logs_created_at", "llm_call_logs", ["created_at"], unique=False)
+    op.create_index("ix_llm_call_logs_model_created_at", "llm_call_logs", ["model", "created_at"], unique=False)
+
+
+def downgrade() -> None:
+    """Drop llm_call_logs table."""
+    op.drop_index("ix_llm_call_logs_model_created_at", table_name="llm_call_logs")
+    op.drop_index("ix_llm_call_logs_created_at", table_name="llm_call_logs")
+    op.drop_table("llm_call_logs")
@@ -0,0 +1,49 @@
+"""Add app_release_patches table
+
+Revision ID: 8e6b4d2a1c57
+Revises: 5a1c9e3b7f20
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "8e6b4d2a1c57"
+down_revision: Union[str, Sequence[str], None] = "5a1c9e3b7f20"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create app_release_patches."""
+    op.create_table(
+        "app_release_patches",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("from_release_id", sa.Integer(), nullable=False, comment="基准版本"),
+        sa.Column("to_release_id", sa.Integer(), nullable=False, comment="目标版本"),
+        sa.Column("status", sa.String(length=16), nullable=False, comment="状态：ready, skipped, failed"),
+        sa.Column("file_name", sa.String(length=255), nullable=True,
+                  comment="补丁文件名（位于发布目录的 patches/ 下）"),
+        sa.Column("file_size", sa.Integer(), nullable=True, comment="补丁大小（字节）"),
+        sa.Column("checksum_sha256", sa.String(length=64), nullable=True, comment="补丁文件的 SHA256"),
+        sa.Column("download_url", sa.String(length=255), nullable=True, comment="补丁下载地址"),
+        sa.Column("error", sa.Text(), nullable=True, comment="生成失败或跳过的原因"),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["from_release_id"], ["app_releases.id"]),
+        sa.ForeignKeyConstraint(["to_release_id"], ["app_releases.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("from_release_id", "to_release_id", name="uq_app_release_patches_from_to"),
+    )
+    op.create_index(
+        "ix_app_release_patches_to_release_id", "app_release_patches", ["to_release_id"], unique=False
+    )
+
+
+def downgrade() -> None:
+    """Drop app_release_patches."""
+    op.drop_index("ix_app_release_patches_to_release_id", table_name="app_release_patches")
+    op.drop_table("app_release_patches")
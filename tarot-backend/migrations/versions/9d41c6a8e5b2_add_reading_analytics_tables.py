@@ -0,0 +1,66 @@
+"""Add reading analytics aggregate tables
+
+Revision ID: 9d41c6a8e5b2
+Revises: 7b2e4f9c1d3a
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "9d41c6a8e5b2"
+down_revision: Union[str, Sequence[str], None] = "7b2e4f9c1d3a"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create reading_daily_stats, reading_question_stats and analytics_watermarks."""
+    op.create_table(
+        "reading_daily_stats",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False, comment="汇总日期（UTC，按日志入账时间）"),
+        sa.Column("category", sa.String(length=32), nullable=False, comment="归类后的关注类别"),
+        sa.Column("locale", sa.String(length=16), nullable=False, comment="语言区域代码，未知为空串"),
+        sa.Column("question_count", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("day", "category", "locale", name="uq_reading_daily_stats_day_category_locale"),
+    )
+    op.create_table(
+        "reading_question_stats",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("question_hash", sa.String(length=40), nullable=False, comment="规范化文本的 SHA1"),
+        sa.Column("normalized_text", sa.Text(), nullable=False, comment="规范化后的问题文本（截断）"),
+        sa.Column("category", sa.String(length=32), nullable=False, comment="最近一次归类的类别"),
+        sa.Column("locale", sa.String(length=16), nullable=False, comment="最近一次提问的语言"),
+        sa.Column("question_count", sa.Integer(), nullable=False),
+        sa.Column("first_seen_at", sa.DateTime(), nullable=False),
+        sa.Column("last_seen_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        op.f("ix_reading_question_stats_question_hash"), "reading_question_stats", ["question_hash"], unique=True
+    )
+    op.create_index(
+        op.f("ix_reading_question_stats_last_seen_at"), "reading_question_stats", ["last_seen_at"], unique=False
+    )
+    op.create_table(
+        "analytics_watermarks",
+        sa.Column("name", sa.String(length=50), nullable=False),
+        sa.Column("last_id", sa.Integer(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("name"),
+    )
+
+
+def downgrade() -> None:
+    """Drop reading analytics tables."""
+    op.drop_table("analytics_watermarks")
+    op.drop_index(op.f("ix_reading_question_stats_last_seen_at"), table_name="reading_question_stats")
+    op.drop_index(op.f("ix_reading_question_stats_question_hash"), table_name="reading_question_stats")
+    op.drop_table("reading_question_stats")
+    op.drop_table("reading_daily_stats")
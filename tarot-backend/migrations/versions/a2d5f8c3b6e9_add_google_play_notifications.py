@@ -0,0 +1,56 @@
+"""Add google_play_notifications table
+
+Revision ID: a2d5f8c3b6e9
+Revises: 8e6b4d2a1c57
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a2d5f8c3b6e9"
+down_revision: Union[str, Sequence[str], None] = "8e6b4d2a1c57"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create google_play_notifications."""
+    op.create_table(
+        "google_play_notifications",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("dedupe_key", sa.String(length=64), nullable=False,
+                  comment="去重键：令牌+类型+事件时间的 SHA256"),
+        sa.Column("message_id", sa.String(length=128), nullable=True, comment="Pub/Sub messageId"),
+        sa.Column("purchase_token", sa.Text(), nullable=True, comment="购买令牌（测试通知为空）"),
+        sa.Column("kind", sa.String(length=32), nullable=False,
+                  comment="通知类别：one_time, subscription, voided, test, unknown"),
+        sa.Column("notification_type", sa.Integer(), nullable=True, comment="Google Play notificationType"),
+        sa.Column("product_id", sa.String(length=255), nullable=True, comment="商品或订阅 ID"),
+        sa.Column("event_time", sa.DateTime(), nullable=False, comment="Google Play 事件时间"),
+        sa.Column("payload", sa.Text(), nullable=False, comment="解码后的通知 JSON"),
+        sa.Column("status", sa.String(length=16), nullable=False, comment="状态：pending, done, failed"),
+        sa.Column("attempts", sa.Integer(), nullable=False, comment="已处理次数"),
+        sa.Column("next_attempt_at", sa.DateTime(), nullable=False, comment="下次可处理时间"),
+        sa.Column("last_error", sa.Text(), nullable=True, comment="最近一次处理错误"),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("processed_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("dedupe_key"),
+    )
+    op.create_index(
+        "ix_google_play_notifications_status_token",
+        "google_play_notifications",
+        ["status", "purchase_token"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Drop google_play_notifications."""
+    op.drop_index("ix_google_play_notifications_status_token", table_name="google_play_notifications")
+    op.drop_table("google_play_notifications")
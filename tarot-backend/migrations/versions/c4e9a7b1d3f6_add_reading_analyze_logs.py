@@ -0,0 +1,52 @@
+"""Add reading_analyze_logs table
+
+The table used to be created only by ``create_tables()`` at startup, so
+databases managed by Alembic alone never got it. Databases that already have
+it (created at startup) only get the new ``created_at`` column, and
+downgrading only removes that column: the table may hold logs written before
+this revision, and re-upgrading adopts it again.
+
+Revision ID: c4e9a7b1d3f6
+Revises: a2d5f8c3b6e9
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c4e9a7b1d3f6"
+down_revision: Union[str, Sequence[str], None] = "a2d5f8c3b6e9"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create reading_analyze_logs, or add created_at if startup already created it."""
+    inspector = sa.inspect(op.get_bind())
+    if inspector.has_table("reading_analyze_logs"):
+        columns = {column["name"] for column in inspector.get_columns("reading_analyze_logs")}
+        if "created_at" not in columns:
+            op.add_column(
+                "reading_analyze_logs",
+                sa.Column("created_at", sa.DateTime(), nullable=True, comment="请求时间（UTC），旧记录为空"),
+            )
+        return
+    op.create_table(
+        "reading_analyze_logs",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("questions", sa.Text(), nullable=False, comment="用户输入的问题内容"),
+        sa.Column("category", sa.String(length=32), nullable=False, comment="归类后的关注类别"),
+        sa.Column("locate", sa.String(length=16), nullable=True, comment="语言区域代码"),
+        sa.Column("created_at", sa.DateTime(), nullable=True, comment="请求时间（UTC），旧记录为空"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_reading_analyze_logs_id"), "reading_analyze_logs", ["id"], unique=False)
+
+
+def downgrade() -> None:
+    """Drop reading_analyze_logs.created_at (the table itself may predate this revision)."""
+    op.drop_column("reading_analyze_logs", "created_at")
@@ -0,0 +1,34 @@
+"""Add redeem_codes.updated_at
+
+Revision ID: d5a8f2c6e1b4
+Revises: c4e9a7b1d3f6
+Create Date: 2026-10-19 21:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d5a8f2c6e1b4"
+down_revision: Union[str, Sequence[str], None] = "c4e9a7b1d3f6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add updated_at (and its index) to redeem_codes."""
+    op.add_column(
+        "redeem_codes",
+        sa.Column("updated_at", sa.DateTime(), nullable=True,
+                  comment="最后更新时间（兑换码 Bloom 过滤器据此同步重新启用的兑换码）"),
+    )
+    op.create_index(op.f("ix_redeem_codes_updated_at"), "redeem_codes", ["updated_at"], unique=False)
+
+
+def downgrade() -> None:
+    """Drop redeem_codes.updated_at."""
+    op.drop_index(op.f("ix_redeem_codes_updated_at"), table_name="redeem_codes")
+    op.drop_column("redeem_codes", "updated_at")
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+回填提问统计汇总表
+
+从上次处理位置（analytics_watermarks）开始，把 reading_analyze_logs 中尚未汇总的
+记录写入 reading_daily_stats / reading_question_stats。可重复执行。
+"""
+import sys
+from pathlib import Path
+
+# 添加父目录到 Python 路径，以便导入 app 模块
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.database import SessionLocal, create_tables
+from app.services.analytics_service import analytics_service
+
+
+def main():
+    """主函数"""
+    create_tables()
+    db = SessionLocal()
+    try:
+        result = analytics_service.refresh_aggregates(db)
+        print(f"已汇总日志记录: {result['processed']}")
+        print(f"汇总进度: {analytics_service.get_status(db)}")
+    except Exception as e:
+        print(f"回填失败: {e}")
+        return 1
+    finally:
+        db.close()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
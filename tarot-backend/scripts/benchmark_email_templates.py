@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+邮件模板渲染基准测试
+
+对比每封验证/重置邮件的渲染耗时：
+- jinja: 每次渲染 Jinja 模板（HTML + 文本）
+- compiled: 预编译骨架，只替换收件人字段
+
+用法:
+    python scripts/benchmark_email_templates.py [--iterations 5000]
+"""
+import argparse
+import sys
+import time
+import uuid
+from pathlib import Path
+
+# 添加父目录到 Python 路径，以便导入 app 模块
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.config import settings
+from app.services.email_service import EmailService
+
+
+def _jinja_verification(service: EmailService, token: str, user_name: str):
+    return service.render_template("email_verification", {
+        "user_name": user_name,
+        "verification_url": f"{settings.APP_BASE_URL}/api/v1/auth/email/verify?token={token}",
+        "app_name": service.from_name,
+        "expires_hours": 24,
+    })
+
+
+def _jinja_reset(service: EmailService, token: str, user_name: str):
+    return service.render_template("password_reset", {
+        "user_name": user_name,
+        "reset_url": f"{settings.APP_BASE_URL}/api/v1/auth/email/reset-password?token={token}",
+        "app_name": service.from_name,
+        "expires_hours": 1,
+    })
+
+
+def _measure(label: str, func, tokens) -> float:
+    started = time.perf_counter()
+    for token in tokens:
+        func(token, "user")
+    per_email_us = (time.perf_counter() - started) / len(tokens) * 1_000_000
+    print(f"  {label:<10} {per_email_us:8.1f} µs/封")
+    return per_email_us
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="邮件模板渲染基准测试")
+    parser.add_argument("--iterations", type=int, default=5000, help="每种方式渲染的邮件数")
+    args = parser.parse_args()
+
+    service = EmailService()
+    service.templates.compile_all()
+    tokens = [uuid.uuid4().hex for _ in range(args.iterations)]
+
+    cases = [
+        ("验证邮件", lambda t, u: _jinja_verification(service, t, u), service.render_verification_email),
+        ("重置邮件", lambda t, u: _jinja_reset(service, t, u), service.render_password_reset_email),
+    ]
+    for name, jinja_func, compiled_func in cases:
+        print(f"{name} ({args.iterations} 次):")
+        baseline = _measure("jinja", jinja_func, tokens)
+        compiled = _measure("compiled", compiled_func, tokens)
+        print(f"  加速比     {baseline / compiled:8.1f}x")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+应用导入耗时报告
+
+在子进程中以 ``python -X importtime`` 导入应用入口，汇总：
+- 总导入耗时（多次运行取中位数）与预算对比
+- 按顶层包统计的自身耗时
+- 最慢的 app.* 模块
+- 应延迟加载的 SDK（zhipuai、openai、googleapiclient）是否被提前导入
+
+超出预算或提前导入了延迟加载的 SDK 时退出码为 1，可用于 CI。
+
+用法:
+    python scripts/import_time_report.py [--module app.main] [--runs 3] [--budget-ms 1500] [--top 15]
+"""
+import argparse
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, NamedTuple
+
+ROOT = Path(__file__).parent.parent
+
+# 只在首次调用时加载的 SDK（见 app/utils/lazy_import.py）
+DEFERRED_PACKAGES = ("zhipuai", "openai", "googleapiclient")
+
+_LINE_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+class ImportRecord(NamedTuple):
+    name: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def measure(module: str) -> List[ImportRecord]:
+    """Import ``module`` in a fresh interpreter and parse its ``-X importtime`` output."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    records = []
+    for line in result.stderr.splitlines():
+        match = _LINE_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            records.append(ImportRecord(name, int(self_us), int(cumulative_us), len(indent) // 2))
+    return records
+
+
+def total_ms(records: List[ImportRecord], module: str) -> float:
+    """Cumulative time of importing ``module`` (its parent packages included), in ms."""
+    top_level = module.split(".")[0]
+    return sum(
+        record.cumulative_us for record in records
+        if record.depth == 0 and record.name.split(".")[0] == top_level
+    ) / 1000
+
+
+def by_package(records: List[ImportRecord]) -> Dict[str, float]:
+    """Self time summed per top-level package (ms)."""
+    totals: Dict[str, float] = defaultdict(float)
+    for record in records:
+        totals[record.name.split(".")[0]] += record.self_us / 1000
+    return dict(totals)
+
+
+def deferred_imported(records: List[ImportRecord]) -> List[str]:
+    loaded = {record.name.split(".")[0] for record in records}
+    return [package for package in DEFERRED_PACKAGES if package in loaded]
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="应用导入耗时报告")
+    parser.add_argument("--module", default="app.main", help="要导入的入口模块")
+    parser.add_argument("--runs", type=int, default=3, help="运行次数（取总耗时中位数）")
+    parser.add_argument("--budget-ms", type=float, default=1500.0, help="总导入耗时预算（毫秒）")
+    parser.add_argument("--top", type=int, default=15, help="显示的条目数")
+    args = parser.parse_args()
+
+    runs = [measure(args.module) for _ in range(max(1, args.runs))]
+    totals = [total_ms(records, args.module) for records in runs]
+    median = statistics.median(totals)
+    records = runs[totals.index(min(totals, key=lambda value: abs(value - median)))]
+
+    print(f"import {args.module}: {median:.0f} ms (中位数，{len(runs)} 次: "
+          f"{', '.join(f'{value:.0f}' for value in totals)})，预算 {args.budget_ms:.0f} ms")
+
+    print(f"\n按顶层包统计（自身耗时，前 {args.top}）:")
+    for package, ms in sorted(by_package(records).items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {package:<32} {ms:8.1f} ms")
+
+    print(f"\n最慢的 app 模块（累计耗时，前 {args.top}）:")
+    app_records = [record for record in records if record.name.split(".")[0] == "app"]
+    for record in sorted(app_records, key=lambda item: -item.cumulative_us)[:args.top]:
+        print(f"  {record.name:<48} {record.cumulative_us / 1000:8.1f} ms (自身 {record.self_us / 1000:.1f})")
+
+    failures = []
+    if median > args.budget_ms:
+        failures.append(f"导入耗时 {median:.0f} ms 超出预算 {args.budget_ms:.0f} ms")
+    eager = deferred_imported(records)
+    if eager:
+        failures.append(f"应延迟加载的 SDK 被提前导入: {', '.join(eager)}")
+
+    if failures:
+        print()
+        for failure in failures:
+            print(f"❌ {failure}")
+        sys.exit(1)
+    print("\n✅ 导入耗时在预算内，延迟加载的 SDK 未被提前导入")
+
+
+if __name__ == "__main__":
+    main()
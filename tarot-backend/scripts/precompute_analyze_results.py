@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+预计算高频问题的分析结果
+
+读取 reading_question_stats 中重复次数最多的问题，按支持的语言逐个调用
+LLMService.analyze_user_description（受速率限制），结果写入 precomputed_analyses。
+已存在当前版本结果的问题会跳过，可重复执行。
+
+用法:
+    python scripts/precompute_analyze_results.py [--top 300] [--min-count 3] [--rpm 30] [--locale zh-CN --locale en] [--refresh]
+"""
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+# 添加父目录到 Python 路径，以便导入 app 模块
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.database import SessionLocal, create_tables
+from app.services.analytics_service import analytics_service
+from app.services.llm_service import get_llm_service
+from app.services.precompute_service import precompute_service
+from app.utils.batch_writer import shutdown_batch_writers
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="预计算高频问题分析结果")
+    parser.add_argument("--top", type=int, default=None, help="处理的高频问题数量")
+    parser.add_argument("--min-count", type=int, default=None, help="最少重复提问次数")
+    parser.add_argument("--rpm", type=int, default=None, help="每分钟最多调用模型次数")
+    parser.add_argument("--locale", action="append", default=None, help="目标语言，可重复指定")
+    parser.add_argument("--refresh", action="store_true", help="重新计算已有结果")
+    return parser.parse_args()
+
+
+async def run(args) -> int:
+    create_tables()
+    db = SessionLocal()
+    try:
+        # 先把最新日志并入统计表，保证候选问题是最新的
+        analytics_service.refresh_aggregates(db)
+        result = await precompute_service.run_batch(
+            db,
+            get_llm_service(),
+            top_n=args.top,
+            min_count=args.min_count,
+            locales=args.locale,
+            requests_per_minute=args.rpm,
+            refresh=args.refresh,
+        )
+        print(f"预计算完成: {result}")
+        print(f"当前状态: {precompute_service.get_status(db)}")
+    except Exception as e:
+        print(f"预计算失败: {e}")
+        return 1
+    finally:
+        db.close()
+        shutdown_batch_writers()
+
+    return 0
+
+
+def main():
+    """主函数"""
+    return asyncio.run(run(parse_args()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
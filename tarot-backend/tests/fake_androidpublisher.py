@@ -0,0 +1,105 @@
+"""
+Minimal local androidpublisher v3 server for Google Play tests.
+
+Serves ``purchases.products.get/acknowledge/consume`` for the purchases in
+``FakeAndroidPublisher.purchases`` and counts calls per operation. Point
+``GOOGLE_PLAY_API_ROOT`` at ``server.url`` to use it.
+"""
+from __future__ import annotations
+
+import json
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict
+
+_PATH_RE = re.compile(
+    r"^/androidpublisher/v3/applications/(?P<package>[^/]+)/purchases/products/"
+    r"(?P<product>[^/]+)/tokens/(?P<token>[^/:?]+)(?::(?P<action>acknowledge|consume))?"
+)
+
+
+class FakeAndroidPublisher:
+    """Threaded HTTP server holding purchase state keyed by token."""
+
+    def __init__(self, delay: float = 0.0):
+        self.purchases: Dict[str, Dict[str, Any]] = {}
+        self.calls: Counter = Counter()
+        self.delay = delay
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}/"
+
+    def add_purchase(self, token: str, order_id: str, purchase_state: int = 0) -> None:
+        self.purchases[token] = {
+            "kind": "androidpublisher#productPurchase",
+            "orderId": order_id,
+            "purchaseState": purchase_state,
+            "consumptionState": 0,
+            "acknowledgementState": 0,
+            "purchaseTimeMillis": str(int(time.time() * 1000)),
+        }
+
+    def __enter__(self) -> "FakeAndroidPublisher":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args) -> None:
+                pass
+
+            def _reply(self, status: int, payload: Dict[str, Any]) -> None:
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _handle(self, method: str) -> None:
+                if fake.delay:
+                    time.sleep(fake.delay)
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    self.rfile.read(length)
+                match = _PATH_RE.match(self.path)
+                if match is None:
+                    self._reply(404, {"error": {"code": 404, "message": "not found"}})
+                    return
+                action = match.group("action") or "get"
+                fake.calls[action] += 1
+                purchase = fake.purchases.get(match.group("token"))
+                if purchase is None:
+                    self._reply(400, {"error": {"code": 400, "message": "The purchase token is invalid."}})
+                    return
+                if action == "get" and method == "GET":
+                    self._reply(200, purchase)
+                elif action == "acknowledge" and method == "POST":
+                    purchase["acknowledgementState"] = 1
+                    self._reply(200, {})
+                elif action == "consume" and method == "POST":
+                    purchase["consumptionState"] = 1
+                    self._reply(200, {})
+                else:
+                    self._reply(405, {"error": {"code": 405, "message": "method not allowed"}})
+
+            def do_GET(self) -> None:
+                self._handle("GET")
+
+            def do_POST(self) -> None:
+                self._handle("POST")
+
+        return Handler
@@ -0,0 +1,108 @@
+"""
+Tests for reading question analytics aggregates.
+"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base
+from app.models import ReadingAnalyzeLog, ReadingDailyStat, ReadingQuestionStat
+from app.services.analytics_service import AnalyticsService, normalize_question, question_hash
+
+
+@pytest.fixture
+def db():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine, autocommit=False, autoflush=False)()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+
+def _log(db, question: str, category: str = "情感", locale: str = "zh-CN", created_at=None) -> None:
+    db.add(ReadingAnalyzeLog(questions=question, category=category, locate=locale, created_at=created_at))
+
+
+def test_normalization_groups_trivial_variants():
+    assert normalize_question("  Will I find LOVE?? ") == "will i find love"
+    assert question_hash("我的感情会好吗？") == question_hash("我的感情会好吗")
+    assert question_hash("Ｗill  I find love") == question_hash("will i find love")
+
+
+def test_refresh_is_incremental_and_idempotent(db):
+    service = AnalyticsService()
+    for question in ["我的感情会好吗？", "我的感情会好吗", "工作会顺利吗"]:
+        _log(db, question)
+    _log(db, "Will I get the job?", category="事业", locale="en")
+    db.commit()
+
+    assert service.refresh_aggregates(db, chunk_size=2) == {"processed": 4}
+    assert service.refresh_aggregates(db) == {"processed": 0}
+
+    _log(db, "我的感情会好吗!")
+    db.commit()
+    assert service.refresh_aggregates(db) == {"processed": 1}
+
+    total = sum(stat.question_count for stat in db.query(ReadingDailyStat))
+    assert total == 5
+    top = db.query(ReadingQuestionStat).order_by(ReadingQuestionStat.question_count.desc()).first()
+    assert top.question_count == 3
+    assert top.normalized_text == "我的感情会好吗"
+    assert service.get_status(db)["pending"] == 0
+
+
+def test_volume_and_top_questions_views(db):
+    service = AnalyticsService()
+    for _ in range(3):
+        _log(db, "Will I get the job?", category="事业", locale="en")
+    _log(db, "我的感情会好吗", category="情感", locale="zh-CN")
+    db.commit()
+    service.refresh_aggregates(db)
+
+    by_category = service.get_volume(db, group_by="category")
+    assert by_category == [{"category": "事业", "count": 3}, {"category": "情感", "count": 1}]
+
+    by_day = service.get_volume(db, group_by="day", locale="en")
+    assert by_day == [{"day": datetime.utcnow().date().isoformat(), "count": 3}]
+
+    top = service.get_top_questions(db, min_count=2)
+    assert [(item["question"], item["count"]) for item in top] == [("will i get the job", 3)]
+
+    with pytest.raises(ValueError):
+        service.get_volume(db, group_by="hour")
+
+
+def test_rows_are_bucketed_by_log_time(db):
+    service = AnalyticsService()
+    today = datetime.utcnow().replace(hour=12, minute=0, second=0, microsecond=0)
+    _log(db, "工作会顺利吗", created_at=today - timedelta(days=2))
+    _log(db, "工作会顺利吗", created_at=today - timedelta(days=2))
+    _log(db, "工作会顺利吗", created_at=today - timedelta(days=1))
+    db.add(ReadingAnalyzeLog(questions="legacy", category="情感", locate="zh-CN"))
+    db.commit()
+    # Rows written before created_at existed fall back to the aggregation time.
+    db.query(ReadingAnalyzeLog).filter_by(questions="legacy").update({"created_at": None})
+    db.commit()
+    service.refresh_aggregates(db)
+
+    by_day = service.get_volume(db, group_by="day")
+    assert by_day == [
+        {"day": (today - timedelta(days=2)).date().isoformat(), "count": 2},
+        {"day": (today - timedelta(days=1)).date().isoformat(), "count": 1},
+        {"day": datetime.utcnow().date().isoformat(), "count": 1},
+    ]
+    stat = db.query(ReadingQuestionStat).filter_by(question_hash=question_hash("工作会顺利吗")).one()
+    assert stat.first_seen_at == today - timedelta(days=2)
+    assert stat.last_seen_at == today - timedelta(days=1)
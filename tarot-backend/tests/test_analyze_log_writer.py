@@ -0,0 +1,81 @@
+"""
+Tests for write-behind batching of reading analyze logs.
+"""
+from __future__ import annotations
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base
+from app.models import ReadingAnalyzeLog
+from app.services import reading_service
+from app.services.reading_service import ReadingService
+from app.utils.batch_writer import BatchWriter
+from app.utils.metrics import registry
+
+
+@pytest.fixture
+def writer(monkeypatch):
+    """Swap the module writer for one bound to an in-memory database."""
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+    test_writer = BatchWriter(
+        "reading_analyze_logs_test", ReadingAnalyzeLog,
+        session_factory=session_factory, batch_size=50, flush_interval=60,
+    )
+    monkeypatch.setattr(reading_service, "analyze_log_writer", test_writer)
+    yield test_writer, session_factory
+    test_writer.stop()
+    engine.dispose()
+
+
+def _service() -> ReadingService:
+    # 不初始化 LLM 客户端
+    return object.__new__(ReadingService)
+
+
+def test_save_analyze_log_is_queued_and_written_in_batch(writer):
+    test_writer, session_factory = writer
+    service = _service()
+
+    for i in range(3):
+        service._save_analyze_log(f"问题 {i}", "zh-CN", [{"category": "情感"}])
+
+    db = session_factory()
+    assert db.query(ReadingAnalyzeLog).count() == 0  # 尚未刷新，请求路径上没有提交
+    assert test_writer.flush()
+
+    rows = db.query(ReadingAnalyzeLog).order_by(ReadingAnalyzeLog.id).all()
+    assert [row.questions for row in rows] == ["问题 0", "问题 1", "问题 2"]
+    assert {row.category for row in rows} == {"情感"}
+    assert test_writer.get_stats()["batches"] == 1
+    db.close()
+
+
+def test_full_queue_drops_without_blocking(writer, monkeypatch):
+    test_writer, _ = writer
+    monkeypatch.setattr(test_writer, "_ensure_started", lambda: None)
+    test_writer._queue.maxsize = 1
+    service = _service()
+
+    service._save_analyze_log("a", "en", [])
+    service._save_analyze_log("b", "en", [])
+
+    assert test_writer.get_stats()["dropped"] == 1
+
+
+def test_writer_counters_are_exported_as_metrics(writer):
+    test_writer, _ = writer
+    _service()._save_analyze_log("q", "en", [])
+    test_writer.flush()
+
+    output = registry.render()
+    assert 'batch_writer_rows_total{writer="reading_analyze_logs_test",result="written"} 1' in output
+    assert 'batch_writer_queue_depth{writer="reading_analyze_logs_test"} 0' in output
@@ -3,20 +3,26 @@ Tests for application release API and service.
 """
 from __future__ import annotations
 
+import asyncio
+import hashlib
+import os
 from tempfile import SpooledTemporaryFile
 from typing import Generator
 from unittest.mock import MagicMock
 
 import pytest
+from fastapi import HTTPException
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import Session, sessionmaker
 from starlette.datastructures import UploadFile
 
+from app.config import settings
 from app.database import Base, get_db
 from app.main import app
 from app.models.app_release import AppRelease
 from app.services.app_release_service import AppReleaseService, app_release_service
+from app.services.release_upload_service import ReleaseUploadService, release_upload_service
 from app.utils.admin_auth import require_admin
 
 
@@ -243,3 +249,183 @@ def test_service_create_release_deactivates_previous(temp_service, memory_sessio
     memory_session.refresh(second)
     assert first.is_active is False
     assert second.is_active is True
+
+
+# --------------------------------------------------------------------------- #
+# Download tests
+# --------------------------------------------------------------------------- #
+
+
+@pytest.fixture
+def stored_release(tmp_path, monkeypatch) -> AppRelease:
+    """Store a fake APK and route download lookups to it."""
+    content = bytes(range(256)) * 40
+    (tmp_path / "20250101_1.0.0.apk").write_bytes(content)
+    release = AppRelease(
+        id=1,
+        version="1.0.0",
+        file_name="20250101_1.0.0.apk",
+        file_size=len(content),
+        checksum_sha256="f" * 64,
+        download_url="/api/v1/app-release/download/20250101_1.0.0.apk",
+        is_active=True,
+    )
+    monkeypatch.setattr(app_release_service, "storage_dir", tmp_path)
+    monkeypatch.setattr(
+        app_release_service,
+        "get_release_by_file_name",
+        lambda db, name: release if name == release.file_name else None,
+    )
+    return release
+
+
+def test_download_uses_checksum_etag_and_revalidates(client, stored_release):
+    url = f"/api/v1/app-release/download/{stored_release.file_name}"
+    etag = f'"{stored_release.checksum_sha256}"'
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.headers["etag"] == etag
+    assert response.headers["accept-ranges"] == "bytes"
+    assert len(response.content) == stored_release.file_size
+
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    assert client.get("/api/v1/app-release/download/missing.apk").status_code == 404
+
+
+def test_download_resumes_with_range(client, stored_release):
+    url = f"/api/v1/app-release/download/{stored_release.file_name}"
+    full = client.get(url).content
+
+    response = client.get(url, headers={"Range": "bytes=1000-", "If-Range": f'"{stored_release.checksum_sha256}"'})
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes 1000-{len(full) - 1}/{len(full)}"
+    assert response.content == full[1000:]
+
+    response = client.get(url, headers={"Range": "bytes=-10"})
+    assert response.content == full[-10:]
+
+    # A stale If-Range validator falls back to the whole file.
+    response = client.get(url, headers={"Range": "bytes=1000-", "If-Range": '"old"'})
+    assert response.status_code == 200
+    assert len(response.content) == len(full)
+
+    response = client.get(url, headers={"Range": f"bytes={len(full)}-"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(full)}"
+
+
+def test_download_offloads_to_nginx(client, stored_release, monkeypatch):
+    monkeypatch.setattr(settings, "APP_RELEASE_X_ACCEL_PREFIX", "/_protected/app-releases/")
+
+    response = client.get(f"/api/v1/app-release/download/{stored_release.file_name}")
+
+    assert response.status_code == 200
+    assert response.headers["x-accel-redirect"] == f"/_protected/app-releases/{stored_release.file_name}"
+    assert response.headers["etag"] == f'"{stored_release.checksum_sha256}"'
+    assert response.content == b""
+
+
+# --------------------------------------------------------------------------- #
+# Chunked upload tests
+# --------------------------------------------------------------------------- #
+
+
+async def _body(*parts: bytes):
+    for part in parts:
+        yield part
+
+
+def test_chunked_upload_resumes_and_publishes(temp_service, memory_session, tmp_path):
+    content = os.urandom(2 * 1024 * 1024 + 4096)
+    upload_dir = tmp_path / "uploads"
+    uploader = ReleaseUploadService(temp_service, upload_dir=str(upload_dir))
+    session = uploader.init_upload(
+        "release.apk", len(content), "application/vnd.android.package-archive",
+        hashlib.sha256(content).hexdigest(), "tester",
+    )
+    upload_id = session["upload_id"]
+
+    first = content[:1536 * 1024]
+    status = asyncio.run(uploader.write_chunk(upload_id, 0, _body(first[:1000], first[1000:])))
+    assert status["received"] == len(first)
+    assert status["complete"] is False
+
+    # Another worker (no cached hash) picks up the upload; a stale offset tells the client where to resume.
+    other = ReleaseUploadService(temp_service, upload_dir=str(upload_dir))
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(other.write_chunk(upload_id, 0, _body(content)))
+    assert excinfo.value.status_code == 409
+    assert excinfo.value.detail["received"] == len(first)
+
+    status = asyncio.run(other.write_chunk(upload_id, len(first), _body(content[len(first):])))
+    assert status["complete"] is True
+
+    release = other.complete_upload(memory_session, upload_id, "2.0.0", "200", None, None, "tester")
+
+    assert release.is_active is True
+    assert release.checksum_sha256 == hashlib.sha256(content).hexdigest()
+    assert release.file_size == len(content)
+    assert (temp_service.storage_dir / release.file_name).read_bytes() == content
+    assert list(upload_dir.iterdir()) == []
+
+
+def test_chunked_upload_rejects_oversize_and_checksum_mismatch(temp_service, memory_session, tmp_path):
+    uploader = ReleaseUploadService(temp_service, upload_dir=str(tmp_path / "uploads"))
+    upload_id = uploader.init_upload("release.apk", 10, None, "0" * 64, "tester")["upload_id"]
+
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(uploader.write_chunk(upload_id, 0, _body(b"x" * 11)))
+    assert excinfo.value.status_code == 400
+
+    asyncio.run(uploader.write_chunk(upload_id, 0, _body(b"x" * 10)))
+    with pytest.raises(HTTPException) as excinfo:
+        uploader.complete_upload(memory_session, upload_id, "2.0.0", None, None, None, "tester")
+    assert excinfo.value.status_code == 400
+    with pytest.raises(HTTPException) as excinfo:
+        uploader.get_status(upload_id)
+    assert excinfo.value.status_code == 404
+
+
+def test_chunked_upload_rejects_writes_while_another_worker_holds_the_part_file(temp_service, tmp_path):
+    fcntl = pytest.importorskip("fcntl")
+    uploader = ReleaseUploadService(temp_service, upload_dir=str(tmp_path / "uploads"))
+    upload_id = uploader.init_upload("release.apk", 10, None, None, "tester")["upload_id"]
+
+    # A retried PUT from another worker is still streaming into the part file.
+    with open(tmp_path / "uploads" / f"{upload_id}.part", "ab") as other_worker:
+        fcntl.flock(other_worker.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        other_worker.write(b"abc")
+        other_worker.flush()
+        with pytest.raises(HTTPException) as excinfo:
+            asyncio.run(uploader.write_chunk(upload_id, 0, _body(b"x" * 10)))
+        assert excinfo.value.status_code == 409
+        assert excinfo.value.detail["received"] == 3
+
+    status = asyncio.run(uploader.write_chunk(upload_id, 3, _body(b"y" * 7)))
+    assert status["complete"] is True
+    assert (tmp_path / "uploads" / f"{upload_id}.part").read_bytes() == b"abc" + b"y" * 7
+
+
+def test_chunked_upload_api_reports_offset(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(release_upload_service, "upload_dir", tmp_path)
+
+    response = client.post(
+        "/api/v1/admin/app-release/uploads",
+        json={"filename": "release.apk", "total_size": 6},
+    )
+    assert response.status_code == 201
+    upload_id = response.json()["upload_id"]
+    url = f"/api/v1/admin/app-release/uploads/{upload_id}"
+
+    assert client.put(f"{url}?offset=0", content=b"abc").json()["received"] == 3
+    response = client.put(f"{url}?offset=0", content=b"abc")
+    assert response.status_code == 409
+    assert response.json()["error"]["received"] == 3
+    assert client.get(url).json()["received"] == 3
+
+    assert client.delete(url).status_code == 204
+    assert client.get(url).status_code == 404
@@ -0,0 +1,73 @@
+"""
+Tests for the app launch bootstrap endpoint.
+"""
+from __future__ import annotations
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base, get_db
+from app.main import app
+from app.models import AppRelease, User, UserBalance
+from app.services.user_service import UserService
+from app.utils.auth import create_access_token
+
+
+@pytest.fixture
+def db(tmp_path):
+    # 文件数据库：并发读取的线程各自持有连接
+    engine = create_engine(f"sqlite:///{tmp_path / 'bootstrap.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine, autocommit=False, autoflush=False)()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+
+@pytest.fixture
+def client(db):
+    app.dependency_overrides[get_db] = lambda: db
+    with TestClient(app) as test_client:
+        yield test_client
+    app.dependency_overrides.pop(get_db, None)
+
+
+def _create_user(db) -> User:
+    user = User(installation_id="device-boot", email="a@example.com", email_verified=True)
+    db.add(user)
+    db.flush()
+    db.add(UserBalance(user_id=user.id, credits=10, version=1))
+    db.commit()
+    return user
+
+
+def test_bootstrap_returns_combined_payload(client, db):
+    user = _create_user(db)
+    for change in (5, -1, -1):
+        UserService.update_user_balance(db, user.id, change, "earn" if change > 0 else "consume")
+    db.add(AppRelease(
+        version="2.0.0", file_name="2.0.0.apk", file_size=10, checksum_sha256="a" * 64,
+        download_url="/download/2.0.0.apk", is_active=True,
+    ))
+    db.commit()
+
+    token = create_access_token({"user_id": user.id, "installation_id": user.installation_id})
+    response = client.get("/api/v1/bootstrap", headers={"Authorization": f"Bearer {token}"})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["user"]["installation_id"] == "device-boot"
+    assert body["balance"]["credits"] == 13
+    assert body["email"] == {"email": "a@example.com", "email_verified": True, "email_verified_at": None}
+    assert body["transactions"]["transaction_count"] == 3
+    assert [item["credits"] for item in body["transactions"]["recent"]][0] == -1
+    assert body["release"]["version"] == "2.0.0"
+    assert body["patches"] == []
+
+
+def test_bootstrap_requires_token(client):
+    assert client.get("/api/v1/bootstrap").status_code in (401, 403)
@@ -0,0 +1,157 @@
+"""
+Tests for the email outbox and its pooled SMTP sender.
+"""
+from __future__ import annotations
+
+import smtplib
+from datetime import datetime, timedelta
+from typing import Generator
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base
+from app.models import EmailOutbox
+from app.services import email_outbox as outbox_module
+from app.services.email_outbox import EmailOutboxService, SMTPConnectionPool, backoff_seconds
+from app.utils.leader_lock import LeaderLock
+
+
+@pytest.fixture
+def session_factory() -> Generator[sessionmaker, None, None]:
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    try:
+        yield sessionmaker(bind=engine, autocommit=False, autoflush=False)
+    finally:
+        engine.dispose()
+
+
+class FakeSMTP:
+    """Stands in for a logged-in ``smtplib.SMTP`` connection."""
+
+    def __init__(self, server: "FakeServer"):
+        self.server = server
+        self.closed = False
+
+    def sendmail(self, from_addr, to_addrs, message):
+        if self.server.disconnect_next:
+            self.server.disconnect_next = False
+            raise smtplib.SMTPServerDisconnected("connection lost")
+        if to_addrs[0] in self.server.refused:
+            raise smtplib.SMTPRecipientsRefused({to_addrs[0]: (550, b"no such user")})
+        if to_addrs[0] in self.server.busy:
+            raise smtplib.SMTPDataError(451, b"try again later")
+        self.server.delivered.append(to_addrs[0])
+
+    def noop(self):
+        return (250, b"ok")
+
+    def quit(self):
+        self.closed = True
+
+
+class FakeServer:
+    def __init__(self):
+        self.connections = 0
+        self.delivered = []
+        self.refused = set()
+        self.busy = set()
+        self.disconnect_next = False
+        self.down = False
+
+    def connect(self) -> FakeSMTP:
+        if self.down:
+            raise OSError("connection refused")
+        self.connections += 1
+        return FakeSMTP(self)
+
+
+@pytest.fixture
+def server() -> FakeServer:
+    return FakeServer()
+
+
+@pytest.fixture
+def outbox(session_factory, server, tmp_path) -> EmailOutboxService:
+    pool = SMTPConnectionPool(server.connect, size=2, idle_check_seconds=30, max_messages=100)
+    return EmailOutboxService(
+        session_factory=session_factory,
+        pool=pool,
+        lock=LeaderLock("email_outbox", directory=str(tmp_path)),
+    )
+
+
+def _enqueue(outbox: EmailOutboxService, session_factory, *recipients: str) -> None:
+    db = session_factory()
+    for recipient in recipients:
+        outbox.enqueue(db, recipient, "Subject", "Body", "<p>Body</p>")
+    db.close()
+
+
+# ---------------------------------------------------------------------------
+# Delivery
+# ---------------------------------------------------------------------------
+
+def test_batch_reuses_pooled_connections(outbox, session_factory, server):
+    _enqueue(outbox, session_factory, *(f"user{i}@example.com" for i in range(6)))
+
+    assert outbox.process_batch() == {"sent": 6, "retried": 0, "failed": 0}
+    _enqueue(outbox, session_factory, "late@example.com")
+    assert outbox.process_batch()["sent"] == 1
+
+    assert len(server.delivered) == 7
+    assert server.connections <= 2
+    db = session_factory()
+    assert {row.status for row in db.query(EmailOutbox)} == {"sent"}
+    db.close()
+
+
+def test_failures_back_off_and_permanent_errors_stop(outbox, session_factory, server, monkeypatch):
+    monkeypatch.setattr(outbox_module.settings, "EMAIL_OUTBOX_MAX_ATTEMPTS", 2)
+    server.refused.add("gone@example.com")
+    server.busy.add("busy@example.com")
+    _enqueue(outbox, session_factory, "gone@example.com", "busy@example.com", "ok@example.com")
+
+    assert outbox.process_batch() == {"sent": 1, "retried": 1, "failed": 1}
+    # The retried message is not due yet.
+    assert outbox.process_batch() == {"sent": 0, "retried": 0, "failed": 0}
+
+    db = session_factory()
+    busy = db.query(EmailOutbox).filter_by(to_email="busy@example.com").one()
+    assert busy.status == "pending"
+    assert busy.next_attempt_at > datetime.utcnow() + timedelta(seconds=backoff_seconds(1) - 5)
+    busy.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+    db.commit()
+    db.close()
+
+    assert outbox.process_batch() == {"sent": 0, "retried": 0, "failed": 1}
+
+
+def test_dropped_connection_is_replaced(outbox, session_factory, server):
+    server.disconnect_next = True
+    _enqueue(outbox, session_factory, "a@example.com", "b@example.com")
+    outbox.pool.size = 1
+
+    assert outbox.process_batch() == {"sent": 1, "retried": 1, "failed": 0}
+    assert server.connections == 2
+
+
+def test_unreachable_server_defers_whole_batch(outbox, session_factory, server):
+    server.down = True
+    _enqueue(outbox, session_factory, "a@example.com", "b@example.com", "c@example.com")
+    outbox.pool.size = 1
+
+    assert outbox.process_batch() == {"sent": 0, "retried": 3, "failed": 0}
+
+
+def test_backoff_is_capped(monkeypatch):
+    monkeypatch.setattr(outbox_module.settings, "EMAIL_OUTBOX_BACKOFF_BASE_SECONDS", 30)
+    monkeypatch.setattr(outbox_module.settings, "EMAIL_OUTBOX_BACKOFF_MAX_SECONDS", 600)
+    assert [backoff_seconds(n) for n in (1, 2, 3, 6)] == [30, 60, 120, 600]
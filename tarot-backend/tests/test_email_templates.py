@@ -0,0 +1,55 @@
+"""
+Tests for precompiled email templates.
+"""
+from __future__ import annotations
+
+import pytest
+
+from app.config import settings
+from app.services.email_service import EmailService
+from app.services.email_templates import EmailTemplateRegistry
+
+
+@pytest.fixture(scope="module")
+def service() -> EmailService:
+    return EmailService()
+
+
+@pytest.mark.parametrize("user_name", ["alice", "<b>&\"'", "用户"])
+def test_compiled_output_matches_jinja_render(service, user_name):
+    token = "abc<def>&ghi"
+    subject, text, html = service.render_verification_email(token, user_name)
+    expected_html, expected_text = service.render_template("email_verification", {
+        "user_name": user_name,
+        "verification_url": f"{settings.APP_BASE_URL}/api/v1/auth/email/verify?token={token}",
+        "app_name": service.from_name,
+        "expires_hours": 24,
+    })
+    assert subject == "验证您的邮箱地址"
+    assert (text, html) == (expected_text, expected_html)
+
+    subject, text, html = service.render_password_reset_email(token, user_name)
+    expected_html, expected_text = service.render_template("password_reset", {
+        "user_name": user_name,
+        "reset_url": f"{settings.APP_BASE_URL}/api/v1/auth/email/reset-password?token={token}",
+        "app_name": service.from_name,
+        "expires_hours": 1,
+    })
+    assert (text, html) == (expected_text, expected_html)
+
+
+def test_locale_directory_overrides_and_html_fallback(tmp_path):
+    (tmp_path / "en").mkdir()
+    (tmp_path / "email_verification.html").write_text("<p>你好 {{ user_name }}</p>", encoding="utf-8")
+    (tmp_path / "en" / "email_verification.html").write_text(
+        "<p>Hi {{ user_name }}, <a href=\"{{ verification_url }}\">verify</a></p>", encoding="utf-8"
+    )
+    registry = EmailTemplateRegistry(tmp_path, html_to_text=lambda html: html.replace("<p>", "").replace("</p>", ""))
+
+    _, text, html = registry.render("email_verification", "en", user_name="<Bob>", verification_url="https://x/?a=1&b=2")
+    assert html == '<p>Hi &lt;Bob&gt;, <a href="https://x/?a=1&amp;b=2">verify</a></p>'
+    assert text == 'Hi <Bob>, <a href="https://x/?a=1&b=2">verify</a>'
+
+    _, text, _ = registry.render("email_verification", "zh-CN", user_name="小明", verification_url="u")
+    assert text == "你好 小明"
+    assert registry.get("email_verification", "en") is registry.get("email_verification", "en")
@@ -1,14 +1,19 @@
 """
 Tests for Google Play Developer API integration.
 """
+import asyncio
+import time
+
 import pytest
 from unittest.mock import Mock, patch, AsyncMock
 from datetime import datetime
 
+from app.config import settings
 from app.services.google_play import GooglePlayService
 from app.schemas.payment import GooglePlayPurchaseRequest
 from app.models.user import User
 from app.models.payment import Purchase
+from fake_androidpublisher import FakeAndroidPublisher
 
 
 class TestGooglePlayService:
@@ -222,5 +227,87 @@ class TestGooglePlayService:
             assert not service.is_available()
 
 
+
+class TestGooglePlayAgainstFakeServer:
+    """Run the real googleapiclient requests against a local androidpublisher server."""
+
+    @pytest.fixture
+    def fake_play(self, monkeypatch):
+        monkeypatch.setattr(settings, "GOOGLE_PLAY_ENABLED", True)
+        monkeypatch.setattr(settings, "GOOGLE_PLAY_SERVICE_ACCOUNT_JSON", None)
+        with FakeAndroidPublisher() as server:
+            monkeypatch.setattr(settings, "GOOGLE_PLAY_API_ROOT", server.url)
+            yield server
+
+    @pytest.mark.asyncio
+    async def test_verify_uses_token_cache_and_consume_updates_state(self, fake_play):
+        fake_play.add_purchase("tok-1", "GPA.1")
+        service = GooglePlayService()
+        assert service.is_available()
+
+        first = await service._verify_purchase_token("com.mysixth.tarot.credits_5", "tok-1")
+        second = await service._verify_purchase_token("com.mysixth.tarot.credits_5", "tok-1")
+        assert first["orderId"] == second["orderId"] == "GPA.1"
+        assert fake_play.calls["get"] == 1
+
+        assert await service.acknowledge_purchase("com.mysixth.tarot.credits_5", "tok-1") is True
+        mock_db = Mock()
+        mock_db.query.return_value.filter.return_value.first.return_value = None
+        assert await service.consume_purchase(mock_db, "com.mysixth.tarot.credits_5", "tok-1") is True
+        assert fake_play.purchases["tok-1"]["consumptionState"] == 1
+
+        # The cached state follows our own consume, without another API call.
+        assert await service._verify_purchase_token("com.mysixth.tarot.credits_5", "tok-1") is None
+        assert fake_play.calls["get"] == 1
+
+    @pytest.mark.asyncio
+    async def test_pending_purchase_is_not_cached(self, fake_play):
+        fake_play.add_purchase("tok-pending", "GPA.3", purchase_state=2)
+        service = GooglePlayService()
+
+        assert await service._verify_purchase_token("com.mysixth.tarot.credits_5", "tok-pending") is None
+        fake_play.purchases["tok-pending"]["purchaseState"] = 0
+        result = await service._verify_purchase_token("com.mysixth.tarot.credits_5", "tok-pending")
+        assert result["orderId"] == "GPA.3"
+        assert fake_play.calls["get"] == 2
+
+    @pytest.mark.asyncio
+    async def test_unknown_token_is_invalid(self, fake_play):
+        service = GooglePlayService()
+        assert await service._verify_purchase_token("com.mysixth.tarot.credits_5", "missing") is None
+
+    @pytest.mark.asyncio
+    async def test_slow_api_hits_deadline_without_blocking_event_loop(self, fake_play, monkeypatch):
+        fake_play.delay = 0.5
+        fake_play.add_purchase("tok-slow", "GPA.2")
+        monkeypatch.setattr(settings, "GOOGLE_PLAY_DEADLINE_SECONDS", 0.2)
+        monkeypatch.setattr(settings, "GOOGLE_PLAY_NUM_RETRIES", 0)
+        service = GooglePlayService()
+
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticking = asyncio.create_task(ticker())
+        started = time.perf_counter()
+        request = GooglePlayPurchaseRequest(
+            installation_id="install-slow",
+            product_id="com.mysixth.tarot.credits_5",
+            purchase_token="tok-slow"
+        )
+        result = await service.verify_purchase(Mock(), request)
+        elapsed = time.perf_counter() - started
+        ticking.cancel()
+
+        assert not result.success
+        assert "timed out" in result.error
+        assert elapsed < 0.45
+        assert ticks >= 5
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
\ No newline at end of file
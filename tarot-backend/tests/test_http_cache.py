@@ -0,0 +1,167 @@
+"""
+Tests for conditional GET and response caching of hot read-only endpoints.
+"""
+from __future__ import annotations
+
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base, get_db
+from app.main import app
+from app.models import AppRelease, AppReleasePatch, User, UserBalance
+from app.services.user_service import UserService
+from app.utils.auth import create_access_token
+from app.utils.http_cache import HTTP_CACHE_RESULTS, ResponseCache, response_cache
+
+
+@pytest.fixture
+def db():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine, autocommit=False, autoflush=False)()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+
+@pytest.fixture
+def client(db):
+    response_cache.clear()
+    app.dependency_overrides[get_db] = lambda: db
+    with TestClient(app) as test_client:
+        yield test_client
+    app.dependency_overrides.pop(get_db, None)
+    response_cache.clear()
+
+
+@pytest.fixture
+def user(db) -> User:
+    user = User(installation_id="device-cache", last_active_at=datetime(2026, 10, 1, 12, 0, 0))
+    db.add(user)
+    db.flush()
+    db.add(UserBalance(user_id=user.id, credits=10, version=1))
+    db.commit()
+    return user
+
+
+def _auth(user: User) -> dict:
+    token = create_access_token({"user_id": user.id, "installation_id": user.installation_id})
+    return {"Authorization": f"Bearer {token}"}
+
+
+# ---------------------------------------------------------------------------
+# Per-user endpoints
+# ---------------------------------------------------------------------------
+
+def test_balance_revalidates_and_follows_credit_changes(client, db, user):
+    headers = _auth(user)
+
+    first = client.get("/api/v1/me/balance", headers=headers)
+    assert first.status_code == 200
+    assert first.json()["credits"] == 10
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"] == "private, no-cache"
+
+    assert client.get("/api/v1/me/balance", headers={**headers, "If-None-Match": etag}).status_code == 304
+
+    hits = HTTP_CACHE_RESULTS.value(endpoint="me_balance", result="hit")
+    assert client.get("/api/v1/me/balance", headers=headers).content == first.content
+    assert HTTP_CACHE_RESULTS.value(endpoint="me_balance", result="hit") == hits + 1
+
+    UserService.apply_credit_change(db, user.id, -3, "consume")
+    db.commit()
+    assert len([key for key in response_cache._entries if key[1] == user.id]) == 0
+
+    changed = client.get("/api/v1/me/balance", headers={**headers, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.json()["credits"] == 7
+    assert changed.headers["etag"] != etag
+
+
+def test_stats_etag_covers_transactions(client, db, user):
+    headers = _auth(user)
+    first = client.get("/api/v1/me/stats", headers=headers)
+    assert first.status_code == 200
+    assert first.json()["transaction_count"] == 0
+
+    UserService.update_user_balance(db, user.id, 5, "earn")
+    response = client.get("/api/v1/me/stats", headers={**headers, "If-None-Match": first.headers["etag"]})
+    assert response.status_code == 200
+    assert response.json()["transaction_count"] == 1
+    assert response.json()["current_balance"] == 15
+
+
+# ---------------------------------------------------------------------------
+# Shared endpoints
+# ---------------------------------------------------------------------------
+
+def test_categories_support_etag_and_last_modified(client):
+    first = client.get("/api/v1/dimensions/categories/list")
+    assert first.status_code == 200
+    assert first.json()["total"] == len(first.json()["categories"])
+
+    assert client.get(
+        "/api/v1/dimensions/categories/list", headers={"If-None-Match": first.headers["etag"]}
+    ).status_code == 304
+    assert client.get(
+        "/api/v1/dimensions/categories/list", headers={"If-Modified-Since": first.headers["last-modified"]}
+    ).status_code == 304
+    assert client.get(
+        "/api/v1/dimensions/categories/list", headers={"If-Modified-Since": "Mon, 01 Jan 2001 00:00:00 GMT"}
+    ).status_code == 200
+
+
+def test_latest_release_etag_changes_with_new_patch(client, db):
+    assert client.get("/api/v1/app-release/latest").headers["etag"] == '"r0"'
+
+    for version, active in (("1.0.0", False), ("1.1.0", True)):
+        db.add(AppRelease(
+            version=version, file_name=f"{version}.apk", file_size=10, checksum_sha256="a" * 64,
+            download_url=f"/download/{version}.apk", is_active=active,
+        ))
+    db.commit()
+
+    first = client.get("/api/v1/app-release/latest")
+    assert first.json()["release"]["version"] == "1.1.0"
+    assert first.json()["patches"] == []
+    etag = first.headers["etag"]
+    assert client.get("/api/v1/app-release/latest", headers={"If-None-Match": etag}).status_code == 304
+
+    db.add(AppReleasePatch(
+        from_release_id=1, to_release_id=2, status="ready", file_name="p.bsdiff", file_size=3,
+        checksum_sha256="b" * 64, download_url="/download/patches/p.bsdiff",
+    ))
+    db.commit()
+    response = client.get("/api/v1/app-release/latest", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert len(response.json()["patches"]) == 1
+
+
+# ---------------------------------------------------------------------------
+# Cache
+# ---------------------------------------------------------------------------
+
+def test_response_cache_is_bounded_and_keyed_by_etag():
+    cache = ResponseCache(max_entries=2, ttl_seconds=60)
+    cache.put(("me_balance", 1), '"a"', b"1")
+    cache.put(("me_stats", 1), '"a"', b"2")
+    cache.put(("me_balance", 2), '"a"', b"3")
+
+    assert cache.get(("me_balance", 1), '"a"') is None  # evicted
+    assert cache.get(("me_stats", 1), '"b"') is None  # stale validator
+    assert cache.get(("me_balance", 2), '"a"') == b"3"
+
+    cache.put(("me_stats", 2), '"a"', b"4")
+    cache.invalidate_user(2)
+    assert len(cache) == 0
@@ -0,0 +1,166 @@
+"""
+Tests for the LLM usage ledger, its batch writer and the aggregate queries.
+"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.config import settings
+from app.database import Base
+from app.models import LLMCallLog
+from app.services import llm_service as llm_service_module
+from app.services.llm_service import LLMService
+from app.services.llm_usage_service import LLMUsageService, estimate_cost
+from app.utils.batch_writer import BatchWriter
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    try:
+        yield sessionmaker(bind=engine, autocommit=False, autoflush=False)
+    finally:
+        engine.dispose()
+
+
+def _row(**overrides) -> dict:
+    row = {
+        "created_at": datetime.utcnow(),
+        "provider": "openai",
+        "model": "gpt-test",
+        "locale": "zh-CN",
+        "endpoint": "readings.generate",
+        "prompt_tokens": 100,
+        "completion_tokens": 50,
+        "latency_ms": 1000,
+        "outcome": "success",
+        "cost_usd": None,
+    }
+    row.update(overrides)
+    return row
+
+
+# ---------------------------------------------------------------------------
+# Batch writer
+# ---------------------------------------------------------------------------
+
+def test_batch_writer_inserts_in_batches(session_factory):
+    writer = BatchWriter("test", LLMCallLog, session_factory=session_factory, batch_size=10, flush_interval=60)
+
+    for i in range(25):
+        assert writer.submit(_row(latency_ms=i))
+    assert writer.flush()
+    writer.stop()
+
+    db = session_factory()
+    assert db.query(LLMCallLog).count() == 25
+    db.close()
+    stats = writer.get_stats()
+    assert stats["written"] == 25
+    assert stats["batches"] == 3
+    assert stats["dropped"] == 0
+
+
+def test_batch_writer_drops_when_queue_is_full(session_factory, monkeypatch):
+    writer = BatchWriter("test-full", LLMCallLog, session_factory=session_factory, max_queue=2)
+    monkeypatch.setattr(writer, "_ensure_started", lambda: None)
+
+    results = [writer.submit(_row()) for _ in range(5)]
+
+    assert results == [True, True, False, False, False]
+    assert writer.get_stats()["dropped"] == 3
+
+
+def test_batch_writer_stop_writes_pending_rows(session_factory):
+    writer = BatchWriter("test-stop", LLMCallLog, session_factory=session_factory, batch_size=100, flush_interval=60)
+    writer.submit(_row())
+    writer.stop()
+
+    db = session_factory()
+    assert db.query(LLMCallLog).count() == 1
+    db.close()
+
+
+# ---------------------------------------------------------------------------
+# Accounting
+# ---------------------------------------------------------------------------
+
+def test_estimate_cost_uses_pricing(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_PRICING", {"gpt-test": [1.0, 4.0]})
+
+    assert estimate_cost("gpt-test", 1000, 500) == pytest.approx(0.003)
+    assert estimate_cost("unknown", 1000, 500) is None
+
+
+def test_daily_stats_report_percentiles(session_factory):
+    db = session_factory()
+    yesterday = datetime.utcnow() - timedelta(days=1)
+    db.add_all([LLMCallLog(**_row(latency_ms=ms, created_at=yesterday, cost_usd=0.001)) for ms in range(1, 101)])
+    db.add(LLMCallLog(**_row(model="glm-test", latency_ms=5000, outcome="error", created_at=yesterday)))
+    db.commit()
+
+    service = LLMUsageService()
+    stats = {row["model"]: row for row in service.get_daily_model_stats(db, days=7)}
+
+    assert stats["gpt-test"]["calls"] == 100
+    assert stats["gpt-test"]["p50_latency_ms"] == 50
+    assert stats["gpt-test"]["p95_latency_ms"] == 95
+    assert stats["gpt-test"]["prompt_tokens"] == 10000
+    assert stats["gpt-test"]["cost_usd"] == pytest.approx(0.1)
+    assert stats["glm-test"]["failures"] == 1
+    db.close()
+
+
+def test_endpoint_stats_average_tokens_per_reading(session_factory):
+    db = session_factory()
+    db.add_all([
+        LLMCallLog(**_row(prompt_tokens=100, completion_tokens=300)),
+        LLMCallLog(**_row(prompt_tokens=200, completion_tokens=500)),
+        LLMCallLog(**_row(endpoint="readings.analyze", prompt_tokens=50, completion_tokens=20)),
+    ])
+    db.commit()
+
+    stats = {row["endpoint"]: row for row in LLMUsageService().get_endpoint_stats(db)}
+
+    assert stats["readings.generate"]["calls"] == 2
+    assert stats["readings.generate"]["avg_prompt_tokens"] == 150
+    assert stats["readings.generate"]["avg_completion_tokens"] == 400
+    db.close()
+
+
+def test_llm_call_is_recorded_with_usage(monkeypatch):
+    recorded = []
+    monkeypatch.setattr(
+        llm_service_module.llm_usage_service, "record_call",
+        lambda *args, **kwargs: recorded.append((args, kwargs))
+    )
+
+    response = SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=" ok "))],
+        usage=SimpleNamespace(prompt_tokens=12, completion_tokens=3),
+    )
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=lambda **kwargs: response)))
+    service = object.__new__(LLMService)
+    service.config = settings
+    service.clients = {"openai": client}
+
+    result = service._call_ai_api_sync("prompt", "openai", "gpt-test", False, "en", "readings.generate")
+
+    assert result == "ok"
+    (args, kwargs), = recorded
+    assert args[:2] == ("openai", "gpt-test")
+    assert args[3] == "success"
+    assert kwargs["usage"].prompt_tokens == 12
+    assert kwargs["endpoint"] == "readings.generate"
+    assert kwargs["locale"] == "en"
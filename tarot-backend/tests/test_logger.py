@@ -0,0 +1,81 @@
+"""
+Tests for the queue-based logging pipeline.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import queue
+import sys
+from datetime import datetime, timedelta
+
+from app.utils.logger import DailyFileHandler, DroppingQueueHandler, JsonFormatter
+
+
+def _record(message: str = "hello", level: int = logging.INFO, **extra) -> logging.LogRecord:
+    record = logging.LogRecord("api", level, __file__, 1, message, None, None)
+    for key, value in extra.items():
+        setattr(record, key, value)
+    return record
+
+
+def test_queue_handler_drops_and_counts_when_full():
+    """A full queue must not block the caller; the record is dropped and counted."""
+    handler = DroppingQueueHandler(queue.Queue(maxsize=1))
+
+    handler.handle(_record("first"))
+    handler.handle(_record("second", logging.WARNING))
+
+    assert handler.queue.qsize() == 1
+    assert handler.dropped == 1
+    assert handler.dropped_by_level == {"WARNING": 1}
+
+
+def test_queue_handler_defers_exception_formatting():
+    """Only msg/args are merged on the caller thread; exc_info stays for the listener."""
+    handler = DroppingQueueHandler(queue.Queue())
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        record = logging.LogRecord("api", logging.ERROR, __file__, 1, "failed %s", ("x",), sys.exc_info())
+
+    handler.handle(record)
+    queued = handler.queue.get_nowait()
+
+    assert queued.getMessage() == "failed x"
+    assert queued.exc_info is not None
+    assert queued.exc_text is None
+
+
+def test_json_formatter_includes_structured_data():
+    try:
+        raise RuntimeError("bad")
+    except RuntimeError:
+        record = _record(extra_data={"preview": "x" * 10})
+        record.exc_info = sys.exc_info()
+
+    payload = json.loads(JsonFormatter().format(record))
+
+    assert payload["message"] == "hello"
+    assert payload["level"] == "INFO"
+    assert payload["data"] == {"preview": "x" * 10}
+    assert "RuntimeError: bad" in payload["exc"]
+
+
+def test_daily_file_handler_switches_file_by_date(tmp_path):
+    handler = DailyFileHandler(tmp_path, "api", retention_days=3)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    stale = tmp_path / f"api_{(datetime.now() - timedelta(days=10)).strftime('%Y%m%d')}.log"
+    stale.write_text("old\n")
+
+    today = _record("today")
+    yesterday = _record("yesterday")
+    yesterday.created = (datetime.now() - timedelta(days=1)).timestamp()
+    handler.handle(yesterday)
+    handler.handle(today)
+    handler.close()
+
+    files = sorted(path.name for path in tmp_path.iterdir())
+    assert stale.name not in files
+    assert len(files) == 2
+    assert (tmp_path / f"api_{datetime.now().strftime('%Y%m%d')}.log").read_text() == "today\n"
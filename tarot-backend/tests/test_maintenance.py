@@ -0,0 +1,122 @@
+"""
+Tests for the background maintenance scheduler and leader lock.
+"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import Generator
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base
+from app.models import EmailVerification, RedeemCode, User
+from app.services import maintenance_service
+from app.services.maintenance_service import MaintenanceScheduler, ScheduledJob
+from app.utils.leader_lock import LeaderLock
+
+
+@pytest.fixture
+def session_factory() -> Generator[sessionmaker, None, None]:
+    """Provide a session factory bound to a shared in-memory SQLite database."""
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    try:
+        yield sessionmaker(bind=engine, autocommit=False, autoflush=False)
+    finally:
+        engine.dispose()
+
+
+def test_leader_lock_is_exclusive(tmp_path):
+    """Only one holder may own a named lock until it is released."""
+    first = LeaderLock("jobs", directory=str(tmp_path))
+    second = LeaderLock("jobs", directory=str(tmp_path))
+
+    assert first.acquire()
+    assert not second.acquire()
+
+    first.release()
+    assert second.acquire()
+    second.release()
+
+
+def test_expiry_sweep_runs_in_chunks(session_factory, monkeypatch):
+    """Expired active codes are marked in several chunked commits."""
+    monkeypatch.setattr(maintenance_service.settings, "MAINTENANCE_CHUNK_SIZE", 2)
+    past = datetime.utcnow() - timedelta(days=1)
+    db = session_factory()
+    db.add_all(
+        [RedeemCode(code=f"EXPIRED{i:04d}", product_id=1, credits=1, status="active", expires_at=past) for i in range(5)]
+        + [RedeemCode(code="FRESHCODE001", product_id=1, credits=1, status="active")]
+    )
+    db.commit()
+
+    result = maintenance_service.expire_redeem_codes(db)
+
+    assert result == {"expired": 5}
+    assert db.query(RedeemCode).filter(RedeemCode.status == "active").count() == 1
+    db.close()
+
+
+def test_purge_email_verifications_keeps_recent_tokens(session_factory):
+    """Only tokens used or expired before the retention cutoff are deleted."""
+    db = session_factory()
+    user = User(installation_id="device-1")
+    db.add(user)
+    db.flush()
+    now = datetime.utcnow()
+    old = now - timedelta(days=30)
+    db.add_all([
+        EmailVerification(user_id=user.id, email="a@x.com", token="old-used", token_type="verify_email",
+                          expires_at=now + timedelta(days=1), verified_at=old),
+        EmailVerification(user_id=user.id, email="a@x.com", token="old-expired", token_type="verify_email",
+                          expires_at=old),
+        EmailVerification(user_id=user.id, email="a@x.com", token="pending", token_type="verify_email",
+                          expires_at=now + timedelta(hours=1)),
+    ])
+    db.commit()
+
+    assert maintenance_service.purge_email_verifications(db) == {"deleted": 2}
+    assert [row.token for row in db.query(EmailVerification)] == ["pending"]
+    db.close()
+
+
+def test_sqlite_jobs_run_against_sqlite(session_factory):
+    db = session_factory()
+    assert maintenance_service.sqlite_optimize(db) == {"optimized": True}
+    assert maintenance_service.sqlite_analyze(db) == {"analyzed": True}
+    assert "skipped" in maintenance_service.sqlite_wal_checkpoint(db)
+    db.close()
+
+
+def test_scheduler_records_job_metrics(session_factory, tmp_path):
+    """run_job tracks runs, failures, durations and the last result."""
+    def failing_job(db):
+        raise RuntimeError("boom")
+
+    scheduler = MaintenanceScheduler(
+        jobs=[
+            ScheduledJob("ok", 60, lambda db: {"done": 1}),
+            ScheduledJob("broken", 60, failing_job),
+        ],
+        session_factory=session_factory,
+        lock=LeaderLock("maintenance", directory=str(tmp_path)),
+    )
+
+    scheduler.run_job("ok")
+    scheduler.run_job("ok")
+    scheduler.run_job("broken")
+
+    status = scheduler.get_status()["jobs"]
+    assert status["ok"]["runs"] == 2
+    assert status["ok"]["failures"] == 0
+    assert status["ok"]["last_result"] == {"done": 1}
+    assert status["ok"]["last_duration_ms"] is not None
+    assert status["broken"]["failures"] == 1
+    assert status["broken"]["last_error"] == "boom"
@@ -0,0 +1,118 @@
+"""
+Tests for the in-process metrics registry and HTTP metrics middleware.
+"""
+from __future__ import annotations
+
+import subprocess
+import sys
+from pathlib import Path
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.utils.metrics import (
+    HTTP_LATENCY,
+    HTTP_REQUESTS,
+    MetricsRegistry,
+    MetricsMiddleware,
+    process_sampler,
+    record_llm_usage,
+    LLM_TOKENS,
+)
+
+ROOT = Path(__file__).parent.parent
+
+
+# ---------------------------------------------------------------------------
+# Registry
+# ---------------------------------------------------------------------------
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry()
+    latency = registry.histogram("demo_seconds", "Demo latency", ("route",), buckets=(0.1, 1.0))
+
+    latency.observe(0.05, route="/a")
+    latency.observe(0.5, route="/a")
+    latency.observe(3.0, route="/a")
+
+    output = registry.render()
+    assert "# TYPE demo_seconds histogram" in output
+    assert 'demo_seconds_bucket{route="/a",le="0.1"} 1' in output
+    assert 'demo_seconds_bucket{route="/a",le="1"} 2' in output
+    assert 'demo_seconds_bucket{route="/a",le="+Inf"} 3' in output
+    assert 'demo_seconds_count{route="/a"} 3' in output
+
+
+def test_counter_and_gauge_labels_are_escaped():
+    registry = MetricsRegistry()
+    counter = registry.counter("demo_total", "Demo counter", ("path",))
+    gauge = registry.gauge("demo_in_progress", "Demo gauge")
+
+    counter.inc(path='say "hi"')
+    gauge.inc()
+    gauge.inc()
+    gauge.dec()
+
+    output = registry.render()
+    assert 'demo_total{path="say \\"hi\\""} 1' in output
+    assert "demo_in_progress 1" in output
+
+
+def test_registering_same_name_returns_existing_metric():
+    registry = MetricsRegistry()
+    assert registry.counter("dup_total", "x") is registry.counter("dup_total", "x")
+
+
+def test_llm_usage_is_counted_per_kind():
+    usage = {"prompt_tokens": 120, "completion_tokens": 30}
+    before = LLM_TOKENS.value(provider="test", model="m", kind="prompt")
+
+    record_llm_usage("test", "m", usage)
+
+    assert LLM_TOKENS.value(provider="test", model="m", kind="prompt") == before + 120
+    assert LLM_TOKENS.value(provider="test", model="m", kind="completion") >= 30
+
+
+def test_process_sampler_reports_real_figures():
+    stats = process_sampler.sample()
+    assert stats["rss_bytes"] > 0
+    assert stats["cpu_seconds"] > 0
+    assert len(stats["load_average"]) == 3
+
+
+def test_metrics_import_without_resource_module():
+    """Platforms without ``resource`` (Windows) skip the CPU/RSS fallbacks."""
+    code = (
+        "import sys; sys.modules['resource'] = None; "
+        "from app.utils import metrics; "
+        "output = metrics.registry.render(); "
+        "print(metrics.resource, 'process_resident_memory_bytes ' in output, 'process_start_time_seconds ' in output)"
+    )
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.split() == ["None", "False", "True"]
+
+
+# ---------------------------------------------------------------------------
+# Middleware
+# ---------------------------------------------------------------------------
+
+def test_middleware_labels_requests_by_route_template():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/metrics-test/items/{item_id}")
+    async def get_item(item_id: int):
+        return {"id": item_id}
+
+    client = TestClient(app)
+    route = "/metrics-test/items/{item_id}"
+    before = HTTP_REQUESTS.value(method="GET", route=route, status="200")
+
+    assert client.get("/metrics-test/items/1").status_code == 200
+    assert client.get("/metrics-test/items/2").status_code == 200
+    assert client.get("/metrics-test/nowhere").status_code == 404
+
+    assert HTTP_REQUESTS.value(method="GET", route=route, status="200") == before + 2
+    assert HTTP_LATENCY.count(method="GET", route=route) >= 2
+    assert HTTP_REQUESTS.value(method="GET", route="unmatched", status="404") >= 1
@@ -0,0 +1,267 @@
+"""
+Tests for the Google Play RTDN inbox: fast-ack ingestion, deduplication and
+in-order background processing per purchase token.
+"""
+from __future__ import annotations
+
+import base64
+import json
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from google.auth import crypt, jwt
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.config import settings
+from app.database import Base, get_db
+from app.main import app
+from app.models import GooglePlayNotification, Purchase, User
+from app.services.google_play import google_play_service
+from app.services.play_notification_service import (
+    PLAY_NOTIFICATIONS_BACKLOG,
+    PLAY_NOTIFICATIONS_RECEIVED,
+    InvalidNotificationError,
+    PlayNotificationService,
+    backoff_seconds,
+)
+from app.utils.leader_lock import LeaderLock
+from app.utils.pubsub_auth import PubSubPushVerifier, pubsub_push_verifier
+
+AUDIENCE = "https://api.example.com/api/v1/payments/webhooks/google/play"
+PUSH_ACCOUNT = "rtdn-push@example.iam.gserviceaccount.com"
+
+
+@pytest.fixture
+def db():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine, autocommit=False, autoflush=False)()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+
+@pytest.fixture
+def service() -> PlayNotificationService:
+    return PlayNotificationService(lock=LeaderLock("test_play_notifications"))
+
+
+@pytest.fixture(scope="module")
+def signing_key():
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_pem = key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    )
+    public_pem = key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    return crypt.RSASigner.from_string(private_pem, key_id="k1"), {"k1": public_pem.decode("ascii")}
+
+
+@pytest.fixture
+def push_auth(signing_key, monkeypatch):
+    """Configure webhook verification with a local key; returns a token factory."""
+    signer, certs = signing_key
+    monkeypatch.setattr(settings, "GOOGLE_PLAY_PUBSUB_AUDIENCE", AUDIENCE)
+    monkeypatch.setattr(settings, "GOOGLE_PLAY_PUBSUB_SERVICE_ACCOUNT", PUSH_ACCOUNT)
+    monkeypatch.setattr(pubsub_push_verifier, "fetch_certs", lambda: (certs, 3600))
+    monkeypatch.setattr(pubsub_push_verifier, "_certs", None)
+
+    def token(**overrides) -> dict:
+        now = int(time.time())
+        claims = {
+            "iss": "https://accounts.google.com", "aud": AUDIENCE, "email": PUSH_ACCOUNT,
+            "email_verified": True, "iat": now, "exp": now + 600,
+        }
+        claims.update(overrides)
+        return {"Authorization": f"Bearer {jwt.encode(signer, claims).decode('ascii')}"}
+
+    return token
+
+
+def _push(notification: dict, message_id: str = "m-1", event_millis: int = 1_760_000_000_000) -> dict:
+    payload = {"version": "1.0", "packageName": settings.GOOGLE_PACKAGE_NAME, "eventTimeMillis": str(event_millis)}
+    payload.update(notification)
+    data = base64.b64encode(json.dumps(payload).encode("utf-8")).decode("ascii")
+    return {"message": {"data": data, "messageId": message_id}, "subscription": "projects/p/subscriptions/s"}
+
+
+def _one_time(token: str, notification_type: int = 1) -> dict:
+    return {"oneTimeProductNotification": {
+        "version": "1.0", "notificationType": notification_type, "purchaseToken": token, "sku": "credits_10",
+    }}
+
+
+def _voided(token: str) -> dict:
+    return {"voidedPurchaseNotification": {"purchaseToken": token, "orderId": "GPA.1", "productType": 2}}
+
+
+def _purchase(db, token: str, status: str = "completed") -> Purchase:
+    user = User(installation_id=f"device-{token}")
+    db.add(user)
+    db.flush()
+    purchase = Purchase(
+        order_id=f"GPA.{token}", platform="google_play", user_id=user.id, product_id=1,
+        credits=10, status=status, purchase_token=token,
+    )
+    db.add(purchase)
+    db.commit()
+    return purchase
+
+
+# ---------------------------------------------------------------------------
+# Ingestion
+# ---------------------------------------------------------------------------
+
+def test_webhook_stores_notification_and_drops_redeliveries(db, push_auth):
+    url = "/api/v1/payments/webhooks/google/play"
+    app.dependency_overrides[get_db] = lambda: db
+    try:
+        with TestClient(app) as client:
+            duplicates = PLAY_NOTIFICATIONS_RECEIVED.value(result="duplicate")
+            first = client.post(url, json=_push(_one_time("tok-a")), headers=push_auth())
+            assert first.status_code == 200
+            assert first.json() == {"status": "received", "duplicate": False}
+
+            # Pub/Sub redelivery and a second notification of the same event (new messageId)
+            assert client.post(url, json=_push(_one_time("tok-a")), headers=push_auth()).json()["duplicate"] is True
+            assert client.post(
+                url, json=_push(_one_time("tok-a"), message_id="m-2"), headers=push_auth()
+            ).json()["duplicate"] is True
+            assert PLAY_NOTIFICATIONS_RECEIVED.value(result="duplicate") == duplicates + 2
+
+            assert client.post(url, json={"foo": 1}, headers=push_auth()).status_code == 400
+            assert client.post(
+                url, json={"message": {"data": "not base64!"}}, headers=push_auth()
+            ).status_code == 400
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+
+    [row] = db.query(GooglePlayNotification).all()
+    assert (row.kind, row.notification_type, row.product_id) == ("one_time", 1, "credits_10")
+    assert row.purchase_token == "tok-a"
+    assert row.status == "pending"
+
+
+def test_test_notifications_dedupe_by_message_id(db, service):
+    assert service.ingest(db, _push({"testNotification": {"version": "1.0"}}, message_id="t-1"))
+    assert not service.ingest(db, _push({"testNotification": {"version": "1.0"}}, message_id="t-1"))
+    assert service.ingest(db, _push({"testNotification": {"version": "1.0"}}, message_id="t-2"))
+    with pytest.raises(InvalidNotificationError):
+        service.ingest(db, {"message": {}})
+    assert service.process_batch(db) == {"done": 2, "retried": 0, "failed": 0}
+
+
+def test_webhook_rejects_unauthenticated_pushes(db, push_auth, monkeypatch):
+    url = "/api/v1/payments/webhooks/google/play"
+    body = _push(_voided("tok-forged"))
+    app.dependency_overrides[get_db] = lambda: db
+    try:
+        with TestClient(app) as client:
+            assert client.post(url, json=body).status_code == 401
+            assert client.post(url, json=body, headers={"Authorization": "Bearer nonsense"}).status_code == 401
+            assert client.post(url, json=body, headers=push_auth(aud="https://other.example.com")).status_code == 401
+            assert client.post(url, json=body, headers=push_auth(email="attacker@example.com")).status_code == 401
+            assert client.post(url, json=body, headers=push_auth(exp=int(time.time()) - 3600)).status_code == 401
+
+            monkeypatch.setattr(settings, "GOOGLE_PLAY_PUBSUB_AUDIENCE", None)
+            assert client.post(url, json=body, headers=push_auth()).status_code == 503
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+
+    assert db.query(GooglePlayNotification).count() == 0
+
+
+def test_verifier_caches_google_certs(signing_key):
+    fetches = []
+
+    def fetch():
+        fetches.append(1)
+        return signing_key[1], 3600
+
+    verifier = PubSubPushVerifier(fetch_certs=fetch)
+    now = int(time.time())
+    token = jwt.encode(signing_key[0], {
+        "iss": "accounts.google.com", "aud": AUDIENCE, "iat": now, "exp": now + 600,
+    }).decode("ascii")
+    for _ in range(3):
+        assert verifier.verify(f"Bearer {token}", audience=AUDIENCE, service_account=None)["aud"] == AUDIENCE
+    assert len(fetches) == 1
+
+
+# ---------------------------------------------------------------------------
+# Processing
+# ---------------------------------------------------------------------------
+
+def test_processes_one_notification_per_token_in_event_order(db, service):
+    cancelled = _purchase(db, "tok-order", status="pending")
+    base = 1_760_000_000_000
+    # Arrive out of order: the cancel was sent after the purchase event.
+    service.ingest(db, _push(_one_time("tok-order", 2), message_id="b", event_millis=base + 5000))
+    service.ingest(db, _push(_one_time("tok-order", 1), message_id="a", event_millis=base))
+    service.ingest(db, _push(_one_time("tok-other"), message_id="c", event_millis=base + 1000))
+
+    assert service.process_batch(db) == {"done": 2, "retried": 0, "failed": 0}
+    rows = {row.message_id: row.status for row in db.query(GooglePlayNotification)}
+    assert rows == {"a": "done", "b": "pending", "c": "done"}
+    assert PLAY_NOTIFICATIONS_BACKLOG.value() == 1
+
+    assert service.process_batch(db)["done"] == 1
+    db.refresh(cancelled)
+    assert cancelled.status == "failed"
+    assert PLAY_NOTIFICATIONS_BACKLOG.value() == 0
+    assert service.get_status(db)["counts"] == {"done": 3}
+
+
+def test_failed_head_is_retried_with_backoff_and_blocks_its_token(db, service, monkeypatch):
+    monkeypatch.setattr(settings, "GOOGLE_PLAY_NOTIFICATION_MAX_ATTEMPTS", 2)
+    service.ingest(db, _push(_voided("tok-retry"), message_id="v", event_millis=1_760_000_000_000))
+    service.ingest(db, _push(_one_time("tok-retry"), message_id="o", event_millis=1_760_000_001_000))
+
+    def broken(db, entry):
+        raise RuntimeError("database is locked")
+
+    service.handlers["voided"] = broken
+    assert service.process_batch(db) == {"done": 0, "retried": 1, "failed": 0}
+    head = db.query(GooglePlayNotification).filter_by(message_id="v").one()
+    assert head.attempts == 1
+    assert "database is locked" in head.last_error
+    assert head.next_attempt_at >= datetime.utcnow() + timedelta(seconds=backoff_seconds(1) - 5)
+
+    # While the head waits, the later event of the same token is not processed.
+    assert service.process_batch(db) == {"done": 0, "retried": 0, "failed": 0}
+
+    head.next_attempt_at = datetime.utcnow()
+    db.commit()
+    assert service.process_batch(db) == {"done": 0, "retried": 0, "failed": 1}
+    assert db.query(GooglePlayNotification).filter_by(message_id="v").one().status == "failed"
+    assert service.process_batch(db)["done"] == 1
+
+
+def test_voided_purchase_is_marked_refunded(db, service):
+    purchase = _purchase(db, "tok-void")
+    google_play_service.token_cache.put("credits_10", "tok-void", {"valid": True})
+
+    service.ingest(db, _push(_voided("tok-void")))
+    assert service.process_batch(db)["done"] == 1
+
+    db.refresh(purchase)
+    assert purchase.status == "refunded"
+    assert google_play_service.token_cache.get("credits_10", "tok-void") is None
+
+    old = db.query(GooglePlayNotification).one()
+    old.created_at = datetime.utcnow() - timedelta(days=settings.GOOGLE_PLAY_NOTIFICATION_RETENTION_DAYS + 1)
+    db.commit()
+    assert service.purge(db) == {"deleted": 1}
@@ -0,0 +1,147 @@
+"""
+Tests for offline precomputed analyze results.
+"""
+from __future__ import annotations
+
+import asyncio
+import threading
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.config import settings
+from app.database import Base
+from app.models import PrecomputedAnalysis, ReadingAnalyzeLog
+from app.services.analytics_service import AnalyticsService
+from app.services.precompute_service import PrecomputeService
+from app.services import reading_service as reading_service_module
+from app.services.reading_service import ReadingService
+
+
+@pytest.fixture
+def db():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine, autocommit=False, autoflush=False)()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+
+class FakeLLM:
+    def __init__(self, fail_on: str | None = None):
+        self.calls = []
+        self.fail_on = fail_on
+
+    async def analyze_user_description(self, description, spread_type="three-card", locale="zh-CN",
+                                       endpoint="readings.analyze"):
+        self.calls.append((description, locale, endpoint))
+        if description == self.fail_on:
+            raise RuntimeError("provider error")
+        return [f"{locale}-a", f"{locale}-b", f"{locale}-c"], f"summary for {description}"
+
+
+def _seed(db, question: str, times: int) -> None:
+    for _ in range(times):
+        db.add(ReadingAnalyzeLog(questions=question, category="情感", locate="zh-CN"))
+    db.commit()
+
+
+# ---------------------------------------------------------------------------
+# Batch
+# ---------------------------------------------------------------------------
+
+def test_batch_precomputes_top_questions_per_locale(db):
+    _seed(db, "我的感情会好吗？", 4)
+    _seed(db, "工作会顺利吗", 3)
+    _seed(db, "rare question", 1)
+    AnalyticsService().refresh_aggregates(db)
+
+    service = PrecomputeService()
+    llm = FakeLLM(fail_on="工作会顺利吗")
+    result = asyncio.run(service.run_batch(
+        db, llm, top_n=10, min_count=2, locales=["zh-CN", "en"], requests_per_minute=60000
+    ))
+
+    assert result["candidates"] == 4
+    assert result["stored"] == 2
+    assert result["failed"] == 2
+    assert {endpoint for _, _, endpoint in llm.calls} == {"precompute.analyze"}
+
+    # Failed questions are retried on the next run; stored ones are skipped.
+    llm.fail_on = None
+    result = asyncio.run(service.run_batch(
+        db, llm, top_n=10, min_count=2, locales=["zh-CN", "en"], requests_per_minute=60000
+    ))
+    assert (result["candidates"], result["stored"]) == (2, 2)
+    assert db.query(PrecomputedAnalysis).count() == 4
+
+
+def test_lookup_matches_normalized_question_and_version(db, monkeypatch):
+    service = PrecomputeService()
+    service.store(db, "Will I find love?", "en", ["Past", "Present", "Future"], "A summary")
+
+    assert service.lookup(db, "  will i find LOVE ", "en") == (["Past", "Present", "Future"], "A summary")
+    assert service.lookup(db, "will i find love", "zh-CN") is None
+
+    monkeypatch.setattr(settings, "PRECOMPUTE_VERSION", settings.PRECOMPUTE_VERSION + 1)
+    assert service.lookup(db, "will i find love", "en") is None
+
+
+# ---------------------------------------------------------------------------
+# ReadingService integration
+# ---------------------------------------------------------------------------
+
+def test_reading_service_uses_precomputed_result_before_llm(db, monkeypatch):
+    PrecomputeService().store(db, "Will I find love?", "en", ["A", "B", "C"], "Stored summary")
+
+    service = object.__new__(ReadingService)
+    service.llm_service = FakeLLM()
+    captured = {}
+
+    async def fake_process(recommended_names, unified_description, limit, locale):
+        captured["names"] = recommended_names
+        return [{"name": name, "description": unified_description} for name in recommended_names]
+
+    monkeypatch.setattr(service, "_process_three_card_dimensions", fake_process)
+    monkeypatch.setattr(service, "_save_analyze_log", lambda *args: None)
+
+    result = asyncio.run(service.analyze_user_description("will i find love", "three-card", "en", db))
+
+    assert captured["names"] == ["A", "B", "C"]
+    assert result[0]["description"] == "Stored summary"
+    assert service.llm_service.calls == []
+
+    asyncio.run(service.analyze_user_description("something new", "three-card", "en", db))
+    assert [call[0] for call in service.llm_service.calls] == ["something new"]
+
+
+def test_known_result_lookup_runs_off_the_event_loop(db, monkeypatch):
+    service = object.__new__(ReadingService)
+    service.llm_service = FakeLLM()
+    threads = {}
+
+    def lookup(session, description, locale):
+        threads["lookup"] = threading.get_ident()
+        assert session is not db and session.get_bind() is db.get_bind()
+        return ["A", "B", "C"], "Stored summary"
+
+    async def fake_process(recommended_names, unified_description, limit, locale):
+        threads["loop"] = threading.get_ident()
+        return [{"name": name} for name in recommended_names]
+
+    monkeypatch.setattr(reading_service_module.precompute_service, "lookup", lookup)
+    monkeypatch.setattr(service, "_process_three_card_dimensions", fake_process)
+    monkeypatch.setattr(service, "_save_analyze_log", lambda *args: None)
+
+    assert len(asyncio.run(service.analyze_user_description("will i find love", "three-card", "en", db))) == 3
+    assert threads["lookup"] != threads["loop"]
+    assert service.llm_service.calls == []
@@ -0,0 +1,127 @@
+"""
+Tests for the opt-in sampling profiler.
+"""
+from __future__ import annotations
+
+import json
+import threading
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.utils.profiler import (
+    ProfileStore,
+    ProfilerConfigStore,
+    ProfilerMiddleware,
+    StackSampler,
+)
+
+
+def _busy(seconds: float) -> int:
+    total = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        total += 1
+    return total
+
+
+def _make_client(tmp_path) -> tuple[TestClient, ProfilerConfigStore, ProfileStore]:
+    config_store = ProfilerConfigStore(str(tmp_path / "profiler.json"))
+    store = ProfileStore(str(tmp_path / "profiles"))
+    app = FastAPI()
+    app.add_middleware(ProfilerMiddleware, config_store=config_store, store=store)
+
+    @app.get("/api/v1/readings/generate")
+    def generate():
+        return {"n": _busy(0.05)}
+
+    @app.get("/health")
+    def health():
+        return {"ok": True}
+
+    return TestClient(app), config_store, store
+
+
+def test_disabled_profiler_writes_nothing(tmp_path):
+    client, _, store = _make_client(tmp_path)
+
+    assert client.get("/api/v1/readings/generate").status_code == 200
+    assert store.list() == []
+
+
+def test_route_prefix_is_profiled_to_speedscope_file(tmp_path):
+    client, config_store, store = _make_client(tmp_path)
+    config_store.update(enabled=True, routes=["/api/v1/readings"], interval_ms=1)
+
+    client.get("/health")
+    client.get("/api/v1/readings/generate")
+
+    profiles = store.list()
+    assert len(profiles) == 1
+    assert "readings-generate" in profiles[0]["name"]
+
+    document = json.loads(store.path_for(profiles[0]["name"]).read_text())
+    assert document["$schema"].startswith("https://www.speedscope.app")
+    frame_names = {frame["name"] for frame in document["shared"]["frames"]}
+    assert "_busy" in frame_names
+    assert all(profile["type"] == "sampled" for profile in document["profiles"])
+
+
+def test_profile_is_finished_off_the_event_loop(tmp_path, monkeypatch):
+    client, config_store, store = _make_client(tmp_path)
+    config_store.update(enabled=True, routes=["/api/v1/readings"], interval_ms=1)
+    threads = {}
+
+    @client.app.get("/api/v1/readings/loop")
+    async def loop_thread():
+        threads["loop"] = threading.get_ident()
+        return {}
+
+    def recording(method):
+        def wrapper(self, *args):
+            threads[method.__name__] = threading.get_ident()
+            return method(self, *args)
+        return wrapper
+
+    monkeypatch.setattr(StackSampler, "stop", recording(StackSampler.stop))
+    monkeypatch.setattr(StackSampler, "to_speedscope", recording(StackSampler.to_speedscope))
+
+    assert client.get("/api/v1/readings/loop").status_code == 200
+    assert len(store.list()) == 1
+    assert threads["loop"] not in (threads["stop"], threads["to_speedscope"])
+
+
+def test_config_file_changes_are_picked_up(tmp_path):
+    path = tmp_path / "profiler.json"
+    store = ProfilerConfigStore(str(path))
+    assert store.get().enabled is False
+
+    path.write_text(json.dumps({"enabled": True, "sample_rate": 1.0}))
+    store._checked_at = 0.0
+
+    config = store.get()
+    assert config.enabled is True
+    assert config.should_profile("/anything")
+
+
+def test_retention_keeps_most_recent_profiles(tmp_path):
+    store = ProfileStore(str(tmp_path))
+    for i in range(5):
+        store.save(f"profile-{i}", {"profiles": []}, max_files=3)
+        time.sleep(0.01)
+
+    names = [item["name"] for item in store.list()]
+    assert len(names) == 3
+    assert store.path_for("../profiler.json") is None
+
+
+def test_sampler_skips_idle_threads():
+    sampler = StackSampler(interval=0.001)
+    sampler.start()
+    _busy(0.03)
+    sampler.stop()
+
+    document = sampler.to_speedscope("test")
+    names = [profile["name"] for profile in document["profiles"]]
+    assert "MainThread" in names
@@ -0,0 +1,157 @@
+"""
+Tests for per-request SQL statistics, the N+1 detector and the query budget helper.
+"""
+from __future__ import annotations
+
+import logging
+from typing import Generator
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base, get_db
+from app.models import User, UserBalance
+from app.utils.query_stats import QueryStatsMiddleware, assert_query_budget, instrument_engine
+
+
+@pytest.fixture
+def engine():
+    """Shared in-memory SQLite engine with the timing listeners attached."""
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    instrument_engine(engine)
+    try:
+        yield engine
+    finally:
+        engine.dispose()
+
+
+@pytest.fixture
+def session_factory(engine) -> sessionmaker:
+    return sessionmaker(bind=engine, autocommit=False, autoflush=False)
+
+
+def _override_db(session_factory):
+    def _get_db() -> Generator[Session, None, None]:
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+    return _get_db
+
+
+# ---------------------------------------------------------------------------
+# Middleware
+# ---------------------------------------------------------------------------
+
+def _make_app(session_factory) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(QueryStatsMiddleware)
+
+    @app.get("/three")
+    def three_queries(db: Session = Depends(get_db)):
+        for _ in range(3):
+            db.execute(text("SELECT 1"))
+        return {"ok": True}
+
+    @app.get("/loop")
+    def loop(db: Session = Depends(get_db)):
+        for user_id in range(12):
+            db.execute(text("SELECT * FROM users WHERE id = :id"), {"id": user_id})
+        return {"ok": True}
+
+    app.dependency_overrides[get_db] = _override_db(session_factory)
+    return app
+
+
+def test_server_timing_header_reports_query_count(session_factory):
+    client = TestClient(_make_app(session_factory))
+
+    response = client.get("/three")
+
+    assert response.status_code == 200
+    server_timing = response.headers["server-timing"]
+    assert 'desc="3 queries"' in server_timing
+    assert server_timing.startswith("db;dur=")
+    assert "app;dur=" in server_timing
+
+
+def test_repeated_statement_is_reported_as_n_plus_one(session_factory, caplog):
+    client = TestClient(_make_app(session_factory))
+
+    with caplog.at_level(logging.WARNING, logger="app.utils.query_stats"):
+        client.get("/loop")
+
+    assert any("Possible N+1 on GET /loop" in record.getMessage() for record in caplog.records)
+
+
+def test_slow_queries_are_logged(session_factory, monkeypatch, caplog):
+    monkeypatch.setattr("app.utils.query_stats.settings.SLOW_QUERY_THRESHOLD_MS", 0)
+    db = session_factory()
+
+    with caplog.at_level(logging.WARNING, logger="app.utils.query_stats"):
+        db.execute(text("SELECT 42"))
+
+    assert any("Slow query" in record.getMessage() for record in caplog.records)
+    db.close()
+
+
+def test_failed_statements_do_not_leak_start_times(engine):
+    with engine.connect() as conn:
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                conn.execute(text("SELECT * FROM no_such_table"))
+        conn.execute(text("SELECT 1"))
+        assert conn.connection.info.get("query_start_times") == []
+
+
+# ---------------------------------------------------------------------------
+# Query budget helper
+# ---------------------------------------------------------------------------
+
+def test_query_budget_fails_when_exceeded(session_factory):
+    db = session_factory()
+
+    with pytest.raises(AssertionError, match="Query budget exceeded: 3 > 2"):
+        with assert_query_budget(2):
+            for _ in range(3):
+                db.execute(text("SELECT 1"))
+    db.close()
+
+
+def test_admin_user_list_stays_within_query_budget(session_factory, engine):
+    """Listing users loads balances eagerly: count + page, independent of page size."""
+    from app.api.admin import get_current_admin
+    from app.main import app
+
+    db = session_factory()
+    for i in range(15):
+        user = User(installation_id=f"device-{i}")
+        db.add(user)
+        db.flush()
+        db.add(UserBalance(user_id=user.id, credits=i))
+    db.commit()
+    db.close()
+
+    app.dependency_overrides[get_db] = _override_db(session_factory)
+    app.dependency_overrides[get_current_admin] = lambda: "admin"
+    try:
+        client = TestClient(app)
+        with assert_query_budget(2, engine):
+            response = client.get("/api/v1/admin/users?size=15")
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+        app.dependency_overrides.pop(get_current_admin, None)
+
+    assert response.status_code == 200
+    assert len(response.json()["users"]) == 15
@@ -0,0 +1,185 @@
+"""
+Tests for the token-bucket rate limiting middleware.
+"""
+from __future__ import annotations
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.requests import HTTPConnection
+
+from app.utils.auth import create_access_token
+from app.utils.network import get_client_ip
+from app.utils.rate_limit import (
+    InMemoryTokenBuckets,
+    RateLimitMiddleware,
+    RateLimitRule,
+    SQLiteTokenBuckets,
+    default_rules,
+)
+
+
+def _rules():
+    return [
+        RateLimitRule(
+            name="readings",
+            prefixes=("/api/v1/readings",),
+            capacity=2,
+            refill_per_second=1 / 60,
+        ),
+        RateLimitRule(
+            name="payments",
+            prefixes=("/api/v1/payments",),
+            capacity=1,
+            refill_per_second=1 / 3600,
+            exclude_prefixes=("/api/v1/payments/webhooks",),
+        ),
+    ]
+
+
+def _make_client(backend: str, tmp_path, peer: str = "testclient") -> TestClient:
+    app = FastAPI()
+    app.add_middleware(
+        RateLimitMiddleware,
+        rules=_rules(),
+        backend=backend,
+        shared_path=str(tmp_path / "ratelimit.db"),
+    )
+
+    @app.post("/api/v1/readings/analyze")
+    async def analyze():
+        return {"ok": True}
+
+    @app.post("/api/v1/payments/webhooks/google/play")
+    async def webhook():
+        return {"ok": True}
+
+    @app.get("/health")
+    async def health():
+        return {"ok": True}
+
+    return TestClient(app, client=(peer, 50000))
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_returns_429_with_retry_after_when_bucket_empty(backend, tmp_path):
+    client = _make_client(backend, tmp_path)
+
+    assert client.post("/api/v1/readings/analyze").status_code == 200
+    assert client.post("/api/v1/readings/analyze").status_code == 200
+
+    response = client.post("/api/v1/readings/analyze")
+    assert response.status_code == 429
+    assert int(response.headers["retry-after"]) >= 1
+    assert response.json()["error"] == "Too many requests"
+
+
+def test_unmatched_and_excluded_paths_are_not_limited(tmp_path):
+    client = _make_client("memory", tmp_path)
+
+    for _ in range(5):
+        assert client.get("/health").status_code == 200
+        assert client.post("/api/v1/payments/webhooks/google/play").status_code == 200
+
+
+def _device(installation_id: str) -> dict:
+    return {"Authorization": f"Bearer {create_access_token({'installation_id': installation_id})}"}
+
+
+def test_installation_id_is_limited_across_ips(tmp_path):
+    """The same device is limited even when it changes IP."""
+    client = _make_client("memory", tmp_path, peer="127.0.0.1")
+    headers = _device("device-1")
+
+    assert client.post("/api/v1/readings/analyze", headers={**headers, "X-Real-IP": "1.1.1.1"}).status_code == 200
+    assert client.post("/api/v1/readings/analyze", headers={**headers, "X-Real-IP": "2.2.2.2"}).status_code == 200
+    assert client.post("/api/v1/readings/analyze", headers={**headers, "X-Real-IP": "3.3.3.3"}).status_code == 429
+    # 其他设备、其他 IP 不受影响
+    assert client.post("/api/v1/readings/analyze", headers={"X-Real-IP": "4.4.4.4"}).status_code == 200
+
+
+def test_devices_behind_one_nat_do_not_share_a_bucket(tmp_path):
+    client = _make_client("memory", tmp_path, peer="127.0.0.1")
+    nat = {"X-Real-IP": "100.64.0.1"}
+
+    for device in ("device-1", "device-2", "device-3"):
+        assert client.post("/api/v1/readings/analyze", headers={**nat, **_device(device)}).status_code == 200
+        assert client.post("/api/v1/readings/analyze", headers={**nat, **_device(device)}).status_code == 200
+    assert client.post("/api/v1/readings/analyze", headers={**nat, **_device("device-1")}).status_code == 429
+
+
+def test_forwarded_headers_are_ignored_from_untrusted_peers(tmp_path):
+    """A client reaching the backend directly cannot pick a fresh IP per request."""
+    client = _make_client("memory", tmp_path, peer="203.0.113.7")
+
+    assert client.post("/api/v1/readings/analyze", headers={"X-Real-IP": "1.1.1.1"}).status_code == 200
+    assert client.post("/api/v1/readings/analyze", headers={"X-Forwarded-For": "2.2.2.2"}).status_code == 200
+    assert client.post("/api/v1/readings/analyze", headers={"X-Real-IP": "3.3.3.3"}).status_code == 429
+
+
+def test_client_ip_from_trusted_proxy_headers():
+    def connection(peer, headers):
+        return HTTPConnection({
+            "type": "http", "client": (peer, 1234),
+            "headers": [(name.lower().encode(), value.encode()) for name, value in headers.items()],
+        })
+
+    assert get_client_ip(connection("127.0.0.1", {"X-Real-IP": "1.1.1.1"})) == "1.1.1.1"
+    assert get_client_ip(connection("172.18.0.5", {"X-Forwarded-For": "6.6.6.6, 1.1.1.1, 172.18.0.9"})) == "1.1.1.1"
+    assert get_client_ip(connection("203.0.113.7", {"X-Real-IP": "1.1.1.1"})) == "203.0.113.7"
+
+
+def test_denied_request_refunds_earlier_shared_keys(tmp_path):
+    """A device over its limit does not drain the shared IP bucket."""
+    middleware = RateLimitMiddleware(FastAPI(), rules=_rules(), backend="sqlite", shared_path=str(tmp_path / "r.db"))
+    rule = _rules()[0]
+    # The device bucket is already empty in the shared store (used from another worker).
+    assert middleware.shared.take("readings:inst:device-1", rule, now=1000.0)[0]
+    assert middleware.shared.take("readings:inst:device-1", rule, now=1000.0)[0]
+
+    keys = ["readings:ip:1.1.1.1", "readings:inst:device-1"]
+    for _ in range(3):
+        assert middleware._take_shared(keys, rule, now=1000.0)[0] is False
+    # The IP bucket still has its full budget for other devices.
+    assert middleware.shared.take("readings:ip:1.1.1.1", rule, now=1000.0)[0]
+    assert middleware.shared.take("readings:ip:1.1.1.1", rule, now=1000.0)[0]
+
+
+def test_default_rules_keep_google_play_out_of_the_payments_bucket():
+    middleware = RateLimitMiddleware(FastAPI(), rules=default_rules(), backend="memory")
+
+    def match(path):
+        rule = middleware._match(path)
+        return rule.name if rule else None
+
+    assert match("/api/v1/payments/google/verify") == "google_play"
+    assert match("/api/v1/payments/google/consume") == "google_play"
+    assert match("/api/v1/payments/redeem") == "payments"
+    assert match("/api/v1/payments/webhooks/google/play") is None
+
+
+def test_shared_buckets_hold_across_workers(tmp_path):
+    """Two workers sharing the SQLite store share a single budget."""
+    rule = _rules()[0]
+    path = str(tmp_path / "shared.db")
+    worker_a = SQLiteTokenBuckets(path)
+    worker_b = SQLiteTokenBuckets(path)
+
+    assert worker_a.take("ip:1", rule, now=1000.0)[0]
+    assert worker_b.take("ip:1", rule, now=1000.0)[0]
+    allowed, retry_after = worker_a.take("ip:1", rule, now=1000.0)
+    assert not allowed
+    assert retry_after == pytest.approx(60.0)
+
+    # 一分钟后补充一个令牌
+    assert worker_b.take("ip:1", rule, now=1060.0)[0]
+
+
+def test_in_memory_bucket_refills_over_time():
+    rule = _rules()[0]
+    buckets = InMemoryTokenBuckets()
+
+    assert buckets.take("k", rule, now=0.0)[0]
+    assert buckets.take("k", rule, now=0.0)[0]
+    assert not buckets.take("k", rule, now=30.0)[0]
+    assert buckets.take("k", rule, now=61.0)[0]
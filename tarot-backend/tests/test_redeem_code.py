@@ -0,0 +1,252 @@
+"""
+Tests for redeem code generation and redemption utilities.
+"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import Generator
+
+import pytest
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.config import settings
+from app.database import Base
+from app.models import Purchase, RedeemCode, User, UserBalance
+from app.utils.redeem_code import RedeemCodeGenerator, RedeemCodeService
+
+
+# --------------------------------------------------------------------------- #
+# Test fixtures
+# --------------------------------------------------------------------------- #
+
+
+@pytest.fixture
+def memory_session() -> Generator[Session, None, None]:
+    """Provide an in-memory SQLite session for service tests."""
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+    )
+    TestingSession = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+    Base.metadata.create_all(bind=engine)
+
+    session = TestingSession()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+
+# --------------------------------------------------------------------------- #
+# Generator tests
+# --------------------------------------------------------------------------- #
+
+
+def test_generate_codes_bulk_uses_valid_charset():
+    """Bulk codes should only contain allowed characters and honour the prefix."""
+    valid_chars = set(RedeemCodeGenerator.get_valid_chars())
+
+    codes = RedeemCodeGenerator.generate_codes_bulk(500, length=16, prefix="TAROT")
+
+    assert len(codes) == 500
+    assert len(set(codes)) == 500
+    for code in codes:
+        assert len(code) == 16
+        assert code.startswith("TAROT")
+        assert set(code[5:]) <= valid_chars
+
+
+def test_generate_codes_bulk_rejects_short_random_part():
+    """Prefix leaving fewer than 4 random characters is rejected."""
+    with pytest.raises(ValueError):
+        RedeemCodeGenerator.generate_codes_bulk(10, length=8, prefix="TAROT")
+
+
+# --------------------------------------------------------------------------- #
+# Bulk engine tests
+# --------------------------------------------------------------------------- #
+
+
+def test_bulk_engine_streams_progress_per_chunk(memory_session):
+    """Engine should commit chunk by chunk and finish with the full count."""
+    progress_items = [
+        (progress.inserted, progress.finished)
+        for progress in RedeemCodeService.iter_create_redeem_codes_bulk(
+            memory_session,
+            product_id=1,
+            credits=5,
+            count=2500,
+            batch_id="BULK",
+            chunk_size=1000,
+        )
+    ]
+
+    assert progress_items == [(1000, False), (2000, False), (2500, True)]
+    total = memory_session.query(func.count(RedeemCode.id)).filter(
+        RedeemCode.batch_id == "BULK"
+    ).scalar()
+    assert total == 2500
+
+
+def test_bulk_engine_regenerates_only_collided_rows(memory_session, monkeypatch):
+    """Codes that already exist are skipped and only those rows are regenerated."""
+    memory_session.add(RedeemCode(code="EXISTING01", product_id=1, credits=1, status="active"))
+    memory_session.commit()
+
+    batches = iter([
+        ["EXISTING01", "NEWCODE001", "NEWCODE002"],
+        ["NEWCODE003"],
+    ])
+    requested = []
+
+    def fake_generate(count, length=16, prefix=None):
+        requested.append(count)
+        return next(batches)
+
+    monkeypatch.setattr(RedeemCodeGenerator, "generate_codes_bulk", fake_generate)
+
+    progress = RedeemCodeService.create_redeem_codes_bulk(
+        memory_session,
+        product_id=1,
+        credits=3,
+        count=3,
+        batch_id="COLLIDE",
+    )
+
+    assert requested == [3, 1]
+    assert progress.inserted == 3
+    assert progress.collisions == 1
+    assert progress.finished is True
+    codes = {
+        code for (code,) in memory_session.query(RedeemCode.code).filter(
+            RedeemCode.batch_id == "COLLIDE"
+        )
+    }
+    assert codes == {"NEWCODE001", "NEWCODE002", "NEWCODE003"}
+
+
+def test_bulk_engine_gives_up_when_code_space_exhausted(memory_session, monkeypatch):
+    """Repeated full-chunk collisions should raise instead of looping forever."""
+    memory_session.add(RedeemCode(code="SAMECODE", product_id=1, credits=1, status="active"))
+    memory_session.commit()
+
+    monkeypatch.setattr(
+        RedeemCodeGenerator,
+        "generate_codes_bulk",
+        lambda count, length=16, prefix=None: ["SAMECODE"],
+    )
+
+    with pytest.raises(ValueError):
+        RedeemCodeService.create_redeem_codes_bulk(
+            memory_session, product_id=1, credits=1, count=1
+        )
+
+
+def test_create_redeem_codes_returns_orm_rows(memory_session):
+    """Legacy API keeps returning the created ORM objects."""
+    codes = RedeemCodeService.create_redeem_codes(
+        memory_session,
+        product_id=2,
+        credits=10,
+        count=20,
+        expires_days=30,
+        batch_id="LEGACY",
+    )
+
+    assert len(codes) == 20
+    assert all(code.expires_at is not None for code in codes)
+    assert all(code.status == "active" for code in codes)
+
+
+# --------------------------------------------------------------------------- #
+# Atomic redeem tests
+# --------------------------------------------------------------------------- #
+
+
+def _make_user(session: Session, installation_id: str = "device-1", credits: int = 0) -> User:
+    user = User(installation_id=installation_id)
+    session.add(user)
+    session.flush()
+    session.add(UserBalance(user_id=user.id, credits=credits, version=1))
+    session.commit()
+    return user
+
+
+def test_redeem_code_for_user_claims_and_grants_in_one_commit(memory_session, monkeypatch):
+    """A redeem marks the code, credits the balance and records ledger + purchase with one commit."""
+    user = _make_user(memory_session, credits=2)
+    memory_session.add(RedeemCode(code="GIFTCODE0001", product_id=7, credits=5, status="active"))
+    memory_session.commit()
+
+    commits = []
+    original_commit = memory_session.commit
+    monkeypatch.setattr(memory_session, "commit", lambda: (commits.append(1), original_commit()))
+
+    redeem_code, balance, transaction = RedeemCodeService.redeem_code_for_user(
+        memory_session, "giftcode0001", user
+    )
+
+    assert len(commits) == 1
+    assert redeem_code.status == "used"
+    assert redeem_code.used_by == user.id
+    assert balance == 7
+    assert transaction.balance_after == 7
+    assert transaction.reference_type == "redeem_code"
+    assert memory_session.query(UserBalance).filter_by(user_id=user.id).one().version == 2
+    assert memory_session.query(User).filter_by(id=user.id).one().total_credits_purchased == 5
+    purchase = memory_session.query(Purchase).filter_by(redeem_code="GIFTCODE0001").one()
+    assert purchase.credits == 5
+    assert purchase.platform == "redeem_code"
+
+
+def test_claim_code_second_device_loses_race(memory_session):
+    """Once claimed, the same code cannot be claimed again."""
+    first = _make_user(memory_session, "device-a")
+    second = _make_user(memory_session, "device-b")
+    memory_session.add(RedeemCode(code="RACECODE0001", product_id=1, credits=1, status="active"))
+    memory_session.commit()
+
+    RedeemCodeService.redeem_code_for_user(memory_session, "RACECODE0001", first)
+
+    with pytest.raises(ValueError, match="already been used"):
+        RedeemCodeService.redeem_code_for_user(memory_session, "RACECODE0001", second)
+
+    assert memory_session.query(UserBalance).filter_by(user_id=second.id).one().credits == 0
+
+
+def test_claim_code_marks_expired_code(memory_session):
+    """An expired active code is rejected and flagged as expired."""
+    user = _make_user(memory_session)
+    memory_session.add(RedeemCode(
+        code="OLDCODE00001",
+        product_id=1,
+        credits=1,
+        status="active",
+        expires_at=datetime.utcnow() - timedelta(days=1),
+    ))
+    memory_session.commit()
+
+    with pytest.raises(ValueError, match="expired"):
+        RedeemCodeService.redeem_code_for_user(memory_session, "OLDCODE00001", user)
+
+    assert memory_session.query(RedeemCode).filter_by(code="OLDCODE00001").one().status == "expired"
+
+
+def test_claim_code_enforces_daily_limit(memory_session, monkeypatch):
+    """The per-device daily limit is enforced inside the claim statement."""
+    monkeypatch.setattr(settings, "REDEEM_CODE_DAILY_LIMIT_PER_DEVICE", 1)
+    user = _make_user(memory_session)
+    memory_session.add_all([
+        RedeemCode(code="LIMITCODE001", product_id=1, credits=1, status="active"),
+        RedeemCode(code="LIMITCODE002", product_id=1, credits=1, status="active"),
+    ])
+    memory_session.commit()
+
+    RedeemCodeService.redeem_code_for_user(memory_session, "LIMITCODE001", user)
+
+    with pytest.raises(ValueError, match="Daily redeem limit"):
+        RedeemCodeService.redeem_code_for_user(memory_session, "LIMITCODE002", user)
+
+    assert memory_session.query(RedeemCode).filter_by(code="LIMITCODE002").one().status == "active"
@@ -0,0 +1,141 @@
+"""
+Tests for the redeem code Bloom filter and brute-force damping.
+"""
+from __future__ import annotations
+
+from typing import Generator
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.database import Base
+from app.models import RedeemCode
+from app.utils.redeem_guard import BloomFilter, FailureTracker, RedeemCodeGuard
+
+
+@pytest.fixture
+def memory_session() -> Generator[Session, None, None]:
+    """Provide an in-memory SQLite session for service tests."""
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+    )
+    TestingSession = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+    Base.metadata.create_all(bind=engine)
+
+    session = TestingSession()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+
+@pytest.fixture
+def guard() -> RedeemCodeGuard:
+    guard = RedeemCodeGuard()
+    guard.enabled = True
+    guard.free_attempts = 2
+    guard.base_delay = 0.5
+    guard.max_delay = 4.0
+    return guard
+
+
+def test_bloom_filter_has_no_false_negatives():
+    """Every added item must be reported as present."""
+    bloom = BloomFilter.for_capacity(2000, 0.001)
+    items = [f"CODE{i:06d}" for i in range(2000)]
+    for item in items:
+        bloom.add(item)
+
+    assert all(item in bloom for item in items)
+    false_positives = sum(f"MISS{i:06d}" in bloom for i in range(5000))
+    assert false_positives < 50
+
+
+def test_guard_rejects_unknown_codes_without_query(memory_session, guard):
+    """Unknown codes are rejected from memory once the filter is built."""
+    memory_session.add_all([
+        RedeemCode(code="ACTIVECODE01", product_id=1, credits=1, status="active"),
+        RedeemCode(code="USEDCODE0001", product_id=1, credits=1, status="used"),
+    ])
+    memory_session.commit()
+
+    assert guard.rebuild(memory_session) == 1
+    assert guard.might_exist("ACTIVECODE01", memory_session)
+    assert not guard.might_exist("USEDCODE0001", memory_session)
+    assert not guard.might_exist("NOSUCHCODE01", memory_session)
+    assert guard.stats["rejected"] == 2
+
+
+def test_guard_refresh_picks_up_codes_from_other_workers(memory_session, guard):
+    """Codes inserted after the build are found through the id watermark."""
+    guard.rebuild(memory_session)
+    memory_session.add(RedeemCode(code="LATECODE0001", product_id=1, credits=1, status="active"))
+    memory_session.commit()
+
+    guard.refresh_seconds = 0
+    assert guard.might_exist("LATECODE0001", memory_session)
+
+
+def test_guard_refresh_picks_up_codes_reactivated_elsewhere(memory_session, guard):
+    """Re-activating an existing code (another worker) is seen through updated_at."""
+    code = RedeemCode(code="REVIVED00001", product_id=1, credits=1, status="disabled")
+    memory_session.add(code)
+    memory_session.commit()
+    guard.rebuild(memory_session)
+    guard.refresh_seconds = 3600
+    assert not guard.might_exist("REVIVED00001", memory_session)
+
+    code.status = "active"
+    memory_session.commit()
+    assert code.updated_at is not None
+
+    guard.refresh_seconds = 0
+    assert guard.might_exist("REVIVED00001", memory_session)
+
+
+def test_guard_builds_in_background_and_fails_open(memory_session, guard, monkeypatch):
+    """The first lookup never builds the filter on the request path."""
+    scheduled = []
+    monkeypatch.setattr(guard, "schedule_rebuild", lambda: scheduled.append(1))
+    monkeypatch.setattr(guard, "rebuild", lambda db: pytest.fail("rebuild on request path"))
+
+    assert guard.might_exist("NOSUCHCODE01", memory_session)
+    assert scheduled == [1]
+    assert not guard.ready
+
+
+def test_guard_fails_open_when_disabled(memory_session, guard):
+    guard.enabled = False
+    assert guard.might_exist("ANYTHING0001", memory_session)
+
+
+def test_progressive_delay_grows_and_resets(guard):
+    """Delay starts after the free attempts, doubles, caps and resets on success."""
+    keys = guard.throttle_keys("device-1", "10.0.0.1")
+
+    delays = []
+    for _ in range(6):
+        delays.append(guard.delay_for(keys))
+        guard.record_failure(keys)
+
+    assert delays == [0.0, 0.0, 0.5, 1.0, 2.0, 4.0]
+    assert guard.delay_for(["ip:10.0.0.1"]) == 4.0
+
+    guard.reset_failures(keys)
+    assert guard.delay_for(keys) == 0.0
+
+
+def test_failure_tracker_expires_and_is_bounded():
+    tracker = FailureTracker(window_seconds=10, max_entries=2)
+    tracker.record("a", now=100.0)
+    tracker.record("a", now=101.0)
+    assert tracker.failures("a", now=105.0) == 2
+    assert tracker.failures("a", now=200.0) == 0
+
+    for key in ("x", "y", "z"):
+        tracker.record(key, now=300.0)
+    assert tracker.failures("x", now=300.0) == 0
+    assert tracker.failures("z", now=300.0) == 1
@@ -0,0 +1,215 @@
+"""
+Tests for binary delta patches between app releases.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.config import settings
+from app.database import Base, get_db
+from app.main import app
+from app.models import AppRelease, AppReleasePatch
+from app.services.app_release_service import AppReleaseService, app_release_service
+from app.services.release_patch_service import ReleasePatchService, build_patch, release_patch_service
+
+
+@pytest.fixture
+def db():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine, autocommit=False, autoflush=False)()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+
+@pytest.fixture
+def release_service(tmp_path) -> AppReleaseService:
+    service = AppReleaseService()
+    service.storage_dir = tmp_path
+    return service
+
+
+@pytest.fixture
+def patcher(release_service):
+    service = ReleasePatchService(release_service, executor=ThreadPoolExecutor(max_workers=2))
+    service.build_patch = _suffix_patch
+    yield service
+    service.shutdown()
+
+
+def _suffix_patch(old_path: str, new_path: str, patch_path: str):
+    """Stand-in diff: the part of the new file after the common prefix."""
+    with open(old_path, "rb") as old, open(new_path, "rb") as new:
+        old_data, new_data = old.read(), new.read()
+    patch = new_data[len(os.path.commonprefix([old_data, new_data])):]
+    with open(patch_path, "wb") as handle:
+        handle.write(patch)
+    return len(patch), hashlib.sha256(patch).hexdigest()
+
+
+def _add_release(db, service: AppReleaseService, version: str, content: bytes) -> AppRelease:
+    file_name = f"{version}.apk"
+    (service.storage_dir / file_name).write_bytes(content)
+    release = AppRelease(
+        version=version,
+        file_name=file_name,
+        file_size=len(content),
+        checksum_sha256=hashlib.sha256(content).hexdigest(),
+        download_url=f"{service.base_url}/{file_name}",
+        is_active=False,
+    )
+    db.add(release)
+    db.commit()
+    return release
+
+
+# ---------------------------------------------------------------------------
+# Generation
+# ---------------------------------------------------------------------------
+
+def test_generates_patches_from_recent_releases(db, release_service, patcher, monkeypatch):
+    monkeypatch.setattr(settings, "APP_RELEASE_PATCH_BASES", 3)
+    common = os.urandom(4000)
+    oldest = _add_release(db, release_service, "0.9.0", os.urandom(4100))
+    first = _add_release(db, release_service, "1.0.0", common + b"a" * 100)
+    second = _add_release(db, release_service, "1.1.0", common + b"b" * 100)
+    latest = _add_release(db, release_service, "1.2.0", common + b"c" * 200)
+
+    counts = patcher.generate_patches(db, latest)
+
+    # The unrelated oldest build would need nearly the whole file.
+    assert counts == {"ready": 2, "skipped": 1, "failed": 0}
+    patches = patcher.list_patches(db, latest)
+    assert [patch["from_version"] for patch in patches] == ["1.1.0", "1.0.0"]
+    assert patches[0]["from_checksum"] == second.checksum_sha256
+    assert patches[0]["file_size"] == 200
+    assert patches[0]["download_url"].startswith(f"{release_service.base_url}/patches/")
+    patch_file = release_service.storage_dir / "patches" / patches[1]["download_url"].rsplit("/", 1)[1]
+    assert hashlib.sha256(patch_file.read_bytes()).hexdigest() == patches[1]["checksum"]
+
+    skipped = db.query(AppReleasePatch).filter_by(from_release_id=oldest.id).one()
+    assert skipped.status == "skipped"
+    assert len(list((release_service.storage_dir / "patches").iterdir())) == 2
+
+    # Already recorded pairs are not rebuilt.
+    assert patcher.select_bases(db, latest) == []
+    assert patcher.generate_patches(db, latest) == {"ready": 0, "skipped": 0, "failed": 0}
+    assert first.id in {row.from_release_id for row in db.query(AppReleasePatch)}
+
+
+def test_failed_patch_is_recorded(db, release_service, patcher):
+    base = _add_release(db, release_service, "1.0.0", b"a" * 1000)
+    latest = _add_release(db, release_service, "1.1.0", b"b" * 1000)
+
+    def broken(*args):
+        raise RuntimeError("diff crashed")
+
+    patcher.build_patch = broken
+    assert patcher.generate_patches(db, latest)["failed"] == 1
+    row = db.query(AppReleasePatch).filter_by(from_release_id=base.id).one()
+    assert row.status == "failed"
+    assert "diff crashed" in row.error
+    assert patcher.list_patches(db, latest) == []
+
+
+def test_claimed_pairs_are_not_built_twice(db, release_service, patcher, monkeypatch):
+    monkeypatch.setattr(settings, "APP_RELEASE_PATCH_CLAIM_TIMEOUT_MINUTES", 30)
+    common = os.urandom(2000)
+    base = _add_release(db, release_service, "1.0.0", common + b"a")
+    latest = _add_release(db, release_service, "1.1.0", common + b"b" * 20)
+
+    # Another worker is still diffing this pair.
+    other = ReleasePatchService(release_service)
+    assert other.claim(db, base, latest) is not None
+    assert other.claim(db, base, latest) is None
+    assert patcher.select_bases(db, latest) == []
+    assert patcher.generate_patches(db, latest) == {"ready": 0, "skipped": 0, "failed": 0}
+    assert patcher.list_patches(db, latest) == []
+
+    # The claim went stale (worker died): it is taken over exactly once.
+    row = db.query(AppReleasePatch).one()
+    row.created_at = datetime.utcnow() - timedelta(minutes=31)
+    db.commit()
+    assert patcher.select_bases(db, latest) == [base]
+    assert patcher.generate_patches(db, latest)["ready"] == 1
+    assert db.query(AppReleasePatch).one().status == "ready"
+    assert other.claim(db, base, latest) is None
+
+
+def test_process_pool_uses_spawn(release_service, monkeypatch):
+    monkeypatch.setattr(settings, "APP_RELEASE_PATCH_WORKERS", 1)
+    service = ReleasePatchService(release_service)
+    try:
+        assert service._pool()._mp_context.get_start_method() == "spawn"
+    finally:
+        service.shutdown()
+
+
+def test_bsdiff_patch_roundtrip(tmp_path):
+    bsdiff4 = pytest.importorskip("bsdiff4")
+    old = os.urandom(50_000)
+    new = old[:20_000] + os.urandom(500) + old[20_000:]
+    (tmp_path / "old.apk").write_bytes(old)
+    (tmp_path / "new.apk").write_bytes(new)
+
+    size, checksum = build_patch(str(tmp_path / "old.apk"), str(tmp_path / "new.apk"), str(tmp_path / "p.bsdiff"))
+
+    patch = (tmp_path / "p.bsdiff").read_bytes()
+    assert size == len(patch) < len(new) // 2
+    assert checksum == hashlib.sha256(patch).hexdigest()
+    assert bsdiff4.patch(old, patch) == new
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["new.apk", "old.apk", "p.bsdiff"]
+
+
+# ---------------------------------------------------------------------------
+# API
+# ---------------------------------------------------------------------------
+
+def test_latest_release_advertises_patches(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(app_release_service, "storage_dir", tmp_path)
+    patcher = ReleasePatchService(app_release_service, executor=ThreadPoolExecutor(max_workers=1))
+    patcher.build_patch = _suffix_patch
+    common = os.urandom(3000)
+    _add_release(db, app_release_service, "1.0.0", common + b"a")
+    latest = _add_release(db, app_release_service, "1.1.0", common + b"b" * 50)
+    latest.is_active = True
+    db.commit()
+    patcher.generate_patches(db, latest)
+    patcher.shutdown()
+
+    app.dependency_overrides[get_db] = lambda: db
+    try:
+        with TestClient(app) as client:
+            body = client.get("/api/v1/app-release/latest").json()
+            assert body["release"]["version"] == "1.1.0"
+            [patch] = body["patches"]
+            assert patch["from_version"] == "1.0.0"
+            assert patch["algorithm"] == "bsdiff4"
+
+            response = client.get(patch["download_url"])
+            assert response.status_code == 200
+            assert response.content == b"b" * 50
+            assert response.headers["etag"] == f'"{patch["checksum"]}"'
+            assert client.get(f"{patch['download_url']}x").status_code == 404
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+
+    # Without bsdiff4 (or when disabled) uploads do not schedule anything.
+    monkeypatch.setattr(settings, "APP_RELEASE_PATCH_ENABLED", False)
+    assert release_patch_service.schedule(latest.id) is False
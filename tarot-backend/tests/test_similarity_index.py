@@ -0,0 +1,109 @@
+"""
+Tests for the near-duplicate analyze question index.
+"""
+from __future__ import annotations
+
+import time
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.config import settings
+from app.database import Base
+from app.services import similarity_index as similarity_module
+from app.services.precompute_service import PrecomputeService
+from app.services.similarity_index import SimilarityIndex, _LocaleIndex, hash_vector
+
+
+@pytest.fixture
+def db():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine, autocommit=False, autoflush=False)()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+
+@pytest.fixture(params=["python", "numpy"])
+def backend(request, monkeypatch):
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(similarity_module, "np", None)
+    return request.param
+
+
+def _cosine(a: str, b: str) -> float:
+    va, vb = hash_vector(a, 1024), hash_vector(b, 1024)
+    return sum(weight * vb.get(bucket, 0.0) for bucket, weight in va.items())
+
+
+def test_vectors_separate_rewordings_from_different_questions():
+    assert _cosine("我和男朋友会复合吗", "我和男朋友还会复合吗？") >= settings.SIMILARITY_THRESHOLD
+    assert _cosine("我和男朋友会复合吗", "我和男朋友会结婚吗") < settings.SIMILARITY_THRESHOLD
+    assert _cosine("Will I get the job?", "Will I get the house?") < settings.SIMILARITY_THRESHOLD
+
+
+def test_query_is_per_locale_and_thresholded(backend):
+    index = SimilarityIndex()
+    index.add("我和男朋友会复合吗", "zh-CN", ["过去", "现在", "未来"], "复合")
+
+    names, description, score = index.query("我和男朋友还会复合吗", "zh-CN")
+    assert names == ["过去", "现在", "未来"]
+    assert description == "复合"
+    assert score >= settings.SIMILARITY_THRESHOLD
+    assert index.query("我和男朋友还会复合吗", "en") is None
+    assert index.query("我和男朋友会结婚吗", "zh-CN") is None
+
+
+def test_locale_index_overwrites_oldest_when_full(backend):
+    index = _LocaleIndex(dim=256, capacity=2)
+    for key in ("a", "b", "c"):
+        index.add(key, hash_vector(f"question {key * 5}", 256), ([key], key))
+
+    assert len(index) == 2
+    assert set(index.slots) == {"b", "c"}
+    slot, score = index.best_match(hash_vector("question ccccc", 256))
+    assert index.keys[slot] == "c"
+    assert score == pytest.approx(1.0, abs=1e-5)
+
+
+def test_sync_is_incremental_and_resets_on_version_change(db, monkeypatch):
+    service = PrecomputeService()
+    service.store(db, "Will I get back together with my ex?", "en", ["A", "B", "C"], "Ex")
+
+    index = SimilarityIndex()
+    assert index.sync(db, force=True) == 1
+    assert index.sync(db, force=True) == 0
+    assert index.query("will i get back together with my ex boyfriend", "en")[0] == ["A", "B", "C"]
+
+    monkeypatch.setattr(settings, "PRECOMPUTE_VERSION", settings.PRECOMPUTE_VERSION + 1)
+    assert index.sync(db, force=True) == 0
+    assert index.query("will i get back together with my ex", "en") is None
+
+
+def test_sync_does_not_wait_for_a_running_warm_up(db, monkeypatch):
+    PrecomputeService().store(db, "Will I pass the exam?", "en", ["A", "B", "C"], "Exam")
+    index = SimilarityIndex()
+
+    with index._sync_lock:  # the start-up warm-up is loading rows
+        assert index.sync(db, force=True) == 0
+    assert index.sync(db, force=True) == 1
+
+    session_factory = sessionmaker(bind=db.get_bind(), autocommit=False, autoflush=False)
+    monkeypatch.setattr(similarity_module, "SessionLocal", session_factory)
+    warmed = SimilarityIndex()
+    warmed.schedule_warm()
+    deadline = time.monotonic() + 5
+    while not warmed.get_stats()["entries"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert warmed.get_stats()["entries"] == {"en": 1}
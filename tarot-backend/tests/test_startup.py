@@ -0,0 +1,210 @@
+"""
+Tests for worker start-up cost: deferred SDK imports and the schema revision check.
+"""
+from __future__ import annotations
+
+import subprocess
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import database
+from app.config import settings
+from app.database import (
+    SCHEMA_HEAD_REVISION,
+    create_tables,
+    ensure_schema,
+    get_db,
+    get_schema_revision,
+    missing_columns,
+    missing_tables,
+)
+from app.main import app
+from app.models import ReadingAnalyzeLog
+from app.utils.batch_writer import BatchWriter
+from app.utils.redeem_guard import RedeemCodeGuard, redeem_code_guard
+from app.utils.lazy_import import lazy_import
+
+ROOT = Path(__file__).parent.parent
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    monkeypatch.setattr(database, "engine", engine)
+    try:
+        yield engine
+    finally:
+        engine.dispose()
+
+
+# ---------------------------------------------------------------------------
+# Schema revision
+# ---------------------------------------------------------------------------
+
+def _alembic_config() -> Config:
+    # 不读取 alembic.ini，避免 fileConfig 改动测试进程的日志配置
+    config = Config()
+    config.set_main_option("script_location", str(ROOT / "migrations"))
+    return config
+
+
+def test_schema_head_revision_matches_migrations():
+    assert ScriptDirectory.from_config(_alembic_config()).get_heads() == [SCHEMA_HEAD_REVISION]
+
+
+def test_migrations_create_every_model_table(tmp_path, monkeypatch):
+    url = f"sqlite:///{tmp_path / 'migrated.db'}"
+    monkeypatch.setattr(settings, "DATABASE_URL", url)
+    command.upgrade(_alembic_config(), "head")
+
+    engine = create_engine(url)
+    try:
+        assert get_schema_revision(engine) == SCHEMA_HEAD_REVISION
+        assert missing_tables(engine) == []
+    finally:
+        engine.dispose()
+
+
+def test_analyze_logs_migration_downgrade_keeps_existing_logs(tmp_path, monkeypatch):
+    url = f"sqlite:///{tmp_path / 'migrated.db'}"
+    monkeypatch.setattr(settings, "DATABASE_URL", url)
+    config = _alembic_config()
+    command.upgrade(config, "a2d5f8c3b6e9")
+    engine = create_engine(url)
+    try:
+        # 旧版本启动时由 create_tables() 建好的表
+        with engine.begin() as conn:
+            conn.execute(text(
+                "CREATE TABLE reading_analyze_logs (id INTEGER PRIMARY KEY, questions TEXT NOT NULL, "
+                "category VARCHAR(32) NOT NULL, locate VARCHAR(16))"
+            ))
+            conn.execute(text("INSERT INTO reading_analyze_logs (questions, category) VALUES ('q', '情感')"))
+
+        command.upgrade(config, "c4e9a7b1d3f6")
+        command.downgrade(config, "a2d5f8c3b6e9")
+
+        with engine.connect() as conn:
+            assert conn.execute(text("SELECT questions FROM reading_analyze_logs")).scalars().all() == ["q"]
+        assert "created_at" not in {column["name"] for column in inspect(engine).get_columns("reading_analyze_logs")}
+    finally:
+        engine.dispose()
+
+
+def test_ensure_schema_creates_tables_unless_at_head(engine):
+    assert get_schema_revision() is None
+    assert ensure_schema() is True
+    assert "google_play_notifications" in inspect(engine).get_table_names()
+
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE alembic_version (version_num VARCHAR(32) NOT NULL PRIMARY KEY)"))
+        conn.execute(text("INSERT INTO alembic_version VALUES ('8e6b4d2a1c57')"))
+    # Behind head: create_all still runs to add the missing tables.
+    assert ensure_schema() is True
+
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE alembic_version SET version_num = :head"), {"head": SCHEMA_HEAD_REVISION})
+    assert get_schema_revision() == SCHEMA_HEAD_REVISION
+    assert ensure_schema() is False
+
+    # At head but a table is missing: fall back to create_all.
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE reading_analyze_logs"))
+    assert ensure_schema() is True
+    assert missing_tables() == []
+    assert ensure_schema() is False
+
+
+def _baseline_schema(engine) -> None:
+    """Schema as built by ``create_tables()`` before the columns added since the baseline."""
+    create_tables()
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX ix_redeem_codes_updated_at"))
+        conn.execute(text("ALTER TABLE redeem_codes DROP COLUMN updated_at"))
+        conn.execute(text("ALTER TABLE reading_analyze_logs DROP COLUMN created_at"))
+
+
+def test_startup_adds_columns_missing_from_a_baseline_database(engine, monkeypatch):
+    # 全局 Bloom 过滤器在后台用默认引擎构建，这里单独用新实例校验
+    monkeypatch.setattr(redeem_code_guard, "enabled", False)
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", False)
+    _baseline_schema(engine)
+    assert missing_columns() == {"reading_analyze_logs": ["created_at"], "redeem_codes": ["updated_at"]}
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO redeem_codes (code, product_id, credits, status, created_at) "
+            "VALUES ('BASELINE01', 1, 5, 'active', CURRENT_TIMESTAMP)"
+        ))
+    db = sessionmaker(bind=engine, autocommit=False, autoflush=False)()
+
+    app.dependency_overrides[get_db] = lambda: db
+    try:
+        with TestClient(app) as client:
+            response = client.post("/api/v1/payments/redeem/info", json={"code": "BASELINE01"})
+            assert response.status_code == 200, response.text
+            assert response.json()["valid"] is True
+            assert response.json()["code_info"]["credits"] == 5
+        guard = RedeemCodeGuard()
+        assert guard.rebuild(db) == 1
+        guard._refresh(db)
+        assert guard.might_exist("BASELINE01", db)
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+        db.close()
+
+    assert missing_columns() == {}
+    assert "ix_redeem_codes_updated_at" in {index["name"] for index in inspect(engine).get_indexes("redeem_codes")}
+    assert ensure_schema() is True  # never stamped by Alembic: checked again, nothing left to add
+
+
+def test_analyze_logs_are_written_to_a_baseline_database(engine):
+    _baseline_schema(engine)
+    ensure_schema()
+
+    session_factory = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+    writer = BatchWriter("reading_analyze_logs_baseline", ReadingAnalyzeLog, session_factory=session_factory)
+    try:
+        writer.submit({
+            "questions": "我和他会复合吗", "category": "情感", "locate": "zh-CN", "created_at": datetime.utcnow(),
+        })
+        assert writer.flush()
+    finally:
+        writer.stop()
+    assert (writer.written, writer.failed) == (1, 0)
+    with session_factory() as db:
+        assert db.query(ReadingAnalyzeLog).one().created_at is not None
+
+
+# ---------------------------------------------------------------------------
+# Deferred imports
+# ---------------------------------------------------------------------------
+
+def test_app_import_does_not_load_provider_sdks():
+    code = (
+        "import sys, app.main; "
+        "print('loaded:', [m for m in ('zhipuai', 'openai', 'googleapiclient') if m in sys.modules])"
+    )
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert "loaded: []" in result.stdout.splitlines()
+
+
+def test_lazy_module_imports_on_first_use():
+    module = lazy_import("json.tool")
+    assert not module.is_loaded
+    assert callable(module.main)
+    assert module.is_loaded
+    assert "not loaded" not in repr(module)
@@ -0,0 +1,157 @@
+"""
+Tests for request tracing, traceparent propagation and span export.
+"""
+from __future__ import annotations
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+
+from app.utils import tracing
+from app.utils.tracing import (
+    TracingMiddleware,
+    instrument_engine_tracing,
+    parse_traceparent,
+    span_exporter,
+    start_span,
+    traced,
+)
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+@pytest.fixture
+def tracing_enabled(monkeypatch, tmp_path):
+    monkeypatch.setattr(tracing.settings, "TRACING_ENABLED", True)
+    monkeypatch.setattr(tracing.settings, "TRACING_SAMPLE_RATE", 1.0)
+    monkeypatch.setattr(tracing.settings, "TRACING_OTLP_ENDPOINT", None)
+    monkeypatch.setattr(tracing.settings, "TRACING_EXPORT_PATH", str(tmp_path / "traces.jsonl"))
+    yield tmp_path / "traces.jsonl"
+    span_exporter.flush()
+
+
+def _read_spans(path) -> list[dict]:
+    span_exporter.flush()
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def _make_client() -> TestClient:
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    instrument_engine_tracing(engine)
+
+    @traced("ReadingService.generate_interpretation")
+    def generate():
+        with engine.connect() as conn:
+            return conn.execute(text("SELECT 1")).scalar()
+
+    app = FastAPI()
+    app.add_middleware(TracingMiddleware)
+
+    @app.get("/api/v1/readings/{reading_id}")
+    def get_reading(reading_id: int):
+        return {"value": generate()}
+
+    return TestClient(app)
+
+
+# ---------------------------------------------------------------------------
+# Propagation
+# ---------------------------------------------------------------------------
+
+def test_parse_traceparent_rejects_malformed_headers():
+    assert parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-01") == (TRACE_ID, PARENT_ID, True)
+    assert parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-00")[2] is False
+    assert parse_traceparent("garbage") is None
+    assert parse_traceparent(f"00-{'0' * 32}-{PARENT_ID}-01") is None
+    assert parse_traceparent(None) is None
+
+
+def test_incoming_traceparent_continues_trace(tracing_enabled):
+    client = _make_client()
+
+    response = client.get("/api/v1/readings/7", headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"})
+
+    assert response.status_code == 200
+    assert response.headers["x-trace-id"] == TRACE_ID
+    assert parse_traceparent(response.headers["traceparent"])[0] == TRACE_ID
+
+    spans = {span["name"]: span for span in _read_spans(tracing_enabled)}
+    server = spans["GET /api/v1/readings/{reading_id}"]
+    service = spans["ReadingService.generate_interpretation"]
+    query = spans["db.query"]
+
+    assert server["parent_id"] == PARENT_ID
+    assert server["attributes"]["http.status_code"] == 200
+    assert service["parent_id"] == server["span_id"]
+    assert query["parent_id"] == service["span_id"]
+    assert query["attributes"]["db.statement"] == "SELECT 1"
+    assert {span["trace_id"] for span in spans.values()} == {TRACE_ID}
+
+
+def test_unsampled_trace_is_propagated_but_not_exported(tracing_enabled):
+    client = _make_client()
+
+    response = client.get("/api/v1/readings/1", headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-00"})
+
+    assert response.headers["x-trace-id"] == TRACE_ID
+    span_exporter.flush()
+    assert not tracing_enabled.exists()
+
+
+def test_span_records_exception(tracing_enabled):
+    with pytest.raises(RuntimeError):
+        with start_span("LLMService.call_ai_api"):
+            raise RuntimeError("provider down")
+
+    (span,) = _read_spans(tracing_enabled)
+    assert span["status"] == "error"
+    assert span["attributes"]["exception.message"] == "provider down"
+
+
+def test_disabled_tracing_is_a_no_op(monkeypatch):
+    monkeypatch.setattr(tracing.settings, "TRACING_ENABLED", False)
+    with start_span("anything") as span:
+        assert span is None
+    assert "x-trace-id" not in _make_client().get("/api/v1/readings/1").headers
+
+
+# ---------------------------------------------------------------------------
+# OTLP export
+# ---------------------------------------------------------------------------
+
+def test_spans_are_posted_to_otlp_collector(tracing_enabled, monkeypatch):
+    received = []
+
+    class Collector(BaseHTTPRequestHandler):
+        def do_POST(self):
+            received.append(json.loads(self.rfile.read(int(self.headers["Content-Length"]))))
+            self.send_response(200)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Collector)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(
+        tracing.settings, "TRACING_OTLP_ENDPOINT", f"http://127.0.0.1:{server.server_port}/v1/traces"
+    )
+    try:
+        with start_span("UserService.update_user_balance", {"credits": 5}):
+            pass
+        span_exporter.flush()
+    finally:
+        server.shutdown()
+
+    (payload,) = received
+    (span,) = payload["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert span["name"] == "UserService.update_user_balance"
+    assert span["attributes"] == [{"key": "credits", "value": {"intValue": "5"}}]
+    assert span["status"] == {"code": 1}